@@ -14,7 +14,7 @@
 
 """All necessary imports for registration."""
 # pylint: disable=unused-import
-from official import vision
 from official.nlp import tasks
 from official.nlp.configs import experiment_configs
 from official.utils.testing import mock_task
+from official.vision import registry_imports as vision_registry_imports
@@ -23,6 +23,7 @@ from official.core import export_base
 from official.core import file_writers
 from official.core import input_reader
 from official.core import registry
+from official.core import registry_manifest
 from official.core import savedmodel_checkpoint_manager
 from official.core import task_factory
 from official.core import tf_example_builder
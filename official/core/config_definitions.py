@@ -51,6 +51,20 @@ class DataConfig(base_config.Config):
       dataset after applying the decode_fn and parse_fn. It can be used to avoid
       re-reading from disk, re-decoding and re-parsing the example on the second
       epoch, but it requires significant memory overhead.
+    cache_ram_budget_mb: An optional budget in MB for caching decoded examples
+      in memory, before `parser_fn`, so that augmentations still vary across
+      epochs. The examples of each input pipeline are cached if their decoded
+      size, estimated from a few decoded records and the size of the input
+      files, fits in the budget. It can not be used together with `cache`.
+    snapshot_dir: An optional local directory to snapshot decoded examples to,
+      before `parser_fn`. The first epoch writes the snapshot, and later epochs
+      and runs read it back in shuffled shard order instead of re-reading and
+      re-decoding the input. Snapshots are written under a key derived from the
+      input files and the decoder, so that stale snapshots are not read. It can
+      be combined with `cache_ram_budget_mb`, which then caches the examples
+      read back from the snapshot in memory, but not with `cache`.
+    snapshot_num_shards: The number of shards of a snapshot, which are read in
+      a different order on each epoch when training.
     cycle_length: The number of files that will be processed concurrently when
       interleaving files.
     block_length: The number of consecutive elements to produce from each input
@@ -117,6 +131,9 @@ class DataConfig(base_config.Config):
   drop_remainder: bool = True
   shuffle_buffer_size: int = 100
   cache: bool = False
+  cache_ram_budget_mb: Optional[int] = None
+  snapshot_dir: str = ""
+  snapshot_num_shards: int = 16
   cycle_length: Optional[int] = None
   block_length: int = 1
   ram_budget: Optional[int] = None
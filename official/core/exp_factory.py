@@ -16,6 +16,7 @@
 
 from official.core import config_definitions as cfg
 from official.core import registry
+from official.core import registry_manifest
 
 
 _REGISTERED_CONFIGS = {}
@@ -27,6 +28,22 @@ def register_config_factory(name):
 
 
 def get_exp_config(exp_name: str) -> cfg.ExperimentConfig:
-  """Looks up the `ExperimentConfig` according to the `exp_name`."""
-  exp_creater = registry.lookup(_REGISTERED_CONFIGS, exp_name)
+  """Looks up the `ExperimentConfig` according to the `exp_name`.
+
+  If `exp_name` is not registered yet, the module registering it is imported
+  according to the registry manifest, if any.
+
+  Args:
+    exp_name: The name of a registered experiment.
+
+  Returns:
+    The `ExperimentConfig` created by the registered factory.
+  """
+  try:
+    exp_creater = registry.lookup(_REGISTERED_CONFIGS, exp_name)
+  except LookupError:
+    if not registry_manifest.import_registering_module(
+        registry_manifest.EXPERIMENTS, exp_name):
+      raise
+    exp_creater = registry.lookup(_REGISTERED_CONFIGS, exp_name)
   return exp_creater()
@@ -0,0 +1,63 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Generates the manifest of the lazily registered experiments and tasks.
+
+Imports the given registry imports modules, and writes the modules registering
+each experiment and task config class to the manifest used by `exp_factory`
+and `task_factory`. Regenerate the manifest when registrations are added,
+moved or removed.
+
+Example:
+
+$> python -m official.core.generate_registry_manifest
+"""
+
+import importlib
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from official.core import exp_factory
+from official.core import registry_manifest
+from official.core import task_factory
+
+_REGISTRY_IMPORTS = flags.DEFINE_list(
+    'registry_imports', ['official.common.registry_imports'],
+    'Modules importing the registrations to include in the manifest.')
+_OUTPUT_PATH = flags.DEFINE_string(
+    'output_path', registry_manifest.MANIFEST_PATH,
+    'Path of the manifest to write.')
+
+
+def generate_manifest(registry_imports):
+  """Imports `registry_imports` and returns the manifest of registrations."""
+  for module in registry_imports:
+    importlib.import_module(module)
+  return registry_manifest.build_manifest(
+      exp_factory._REGISTERED_CONFIGS,  # pylint: disable=protected-access
+      task_factory._REGISTERED_TASK_CLS)  # pylint: disable=protected-access
+
+
+def main(_):
+  manifest = generate_manifest(_REGISTRY_IMPORTS.value)
+  registry_manifest.write_manifest(manifest, _OUTPUT_PATH.value)
+  logging.info('Wrote %d experiments and %d tasks to %s.',
+               len(manifest[registry_manifest.EXPERIMENTS]),
+               len(manifest[registry_manifest.TASKS]), _OUTPUT_PATH.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
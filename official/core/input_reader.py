@@ -14,6 +14,11 @@
 
 """A common dataset reader."""
 import dataclasses
+import functools
+import hashlib
+import inspect
+import json
+import os
 import random
 from typing import Any, Callable, Dict, List, Optional, Sequence, Text, Union
 
@@ -24,10 +29,75 @@ import tensorflow_datasets as tfds
 from official.core import config_definitions as cfg
 
 
+# The number of records decoded to estimate the decoded size of a dataset.
+_NUM_RECORDS_TO_ESTIMATE_SIZE = 8
+# The length and CRC fields around each record of a TFRecord file.
+_TFRECORD_OVERHEAD_BYTES = 16
+_UNSUPPORTED = object()
+
+
 def _get_random_integer():
   return random.randint(0, (1 << 31) - 1)
 
 
+def _to_plain_value(value: Any) -> Any:
+  """Returns a JSON serializable form of a config value, or `_UNSUPPORTED`."""
+  if value is None or isinstance(value, (bool, int, float, str)):
+    return value
+  if isinstance(value, tf.dtypes.DType):
+    return value.name
+  if isinstance(value, tf.TensorShape):
+    return value.as_list() if value.rank is not None else None
+  if isinstance(value, cfg.base_config.Config):
+    value = value.as_dict()
+  if isinstance(value, (list, tuple)):
+    items = [_to_plain_value(v) for v in value]
+    return _UNSUPPORTED if _UNSUPPORTED in items else items
+  if isinstance(value, dict):
+    items = {str(k): _to_plain_value(v) for k, v in value.items()}
+    return _UNSUPPORTED if _UNSUPPORTED in items.values() else items
+  return _UNSUPPORTED
+
+
+def _fn_fingerprint(fn: Optional[Callable[..., Any]]) -> Any:
+  """Returns the name and the plain config attributes of a function."""
+  if fn is None:
+    return None
+  if isinstance(fn, functools.partial):
+    return {
+        'func': _fn_fingerprint(fn.func),
+        'args': _to_plain_value(fn.args),
+        'keywords': _to_plain_value(fn.keywords),
+    }
+  owner = getattr(fn, '__self__', None)
+  if owner is None and not inspect.isfunction(fn):
+    owner = fn  # A callable object.
+  fingerprint = {
+      'name': getattr(fn, '__qualname__', type(fn).__qualname__),
+      'module': getattr(fn, '__module__', type(fn).__module__),
+  }
+  if owner is not None:
+    attributes = {}
+    for name, value in sorted(getattr(owner, '__dict__', {}).items()):
+      value = _to_plain_value(value)
+      if value is not _UNSUPPORTED:
+        attributes[name] = value
+    fingerprint['attributes'] = attributes
+  return fingerprint
+
+
+def _nbytes(tensors: Any) -> int:
+  """Returns the size in bytes of a nested structure of tensors."""
+  nbytes = 0
+  for tensor in tf.nest.flatten(tensors, expand_composites=True):
+    tensor = tf.convert_to_tensor(tensor)
+    if tensor.dtype == tf.string:
+      nbytes += int(tf.reduce_sum(tf.strings.length(tensor)))
+    else:
+      nbytes += tensor.shape.num_elements() * tensor.dtype.size
+  return nbytes
+
+
 def _maybe_map_fn(dataset: tf.data.Dataset,
                   fn: Optional[Callable[..., Any]] = None) -> tf.data.Dataset:
   """Calls dataset.map if a valid function is passed in."""
@@ -291,6 +361,17 @@ class InputReader:
     self._drop_remainder = params.drop_remainder
     self._shuffle_buffer_size = params.shuffle_buffer_size
     self._cache = params.cache
+    self._cache_ram_budget_mb = params.cache_ram_budget_mb
+    self._snapshot_dir = params.snapshot_dir
+    self._snapshot_num_shards = params.snapshot_num_shards
+    if self._cache and (self._cache_ram_budget_mb or self._snapshot_dir):
+      raise ValueError(
+          '`cache` can not be used together with `cache_ram_budget_mb` or '
+          '`snapshot_dir`, which cache decoded examples.')
+    # Whether decoded examples are cached in memory or snapshotted to disk. In
+    # both cases, as with `cache`, the input is read once and not repeated.
+    self._cache_decoded = bool(self._cache_ram_budget_mb or self._snapshot_dir)
+    self._read_once = self._cache or self._cache_decoded
     self._cycle_length = params.cycle_length
     self._block_length = params.block_length
     self._deterministic = params.deterministic
@@ -369,6 +450,153 @@ class InputReader:
       matched_files = match_files(input_path)
     return matched_files
 
+  def _source_files(self, name: Optional[str]) -> Optional[List[str]]:
+    """Returns the files of the source `name`, or None for TFDS sources."""
+    if self._matched_files is None:
+      return None
+    if isinstance(self._matched_files, dict):
+      return self._matched_files[name]
+    return self._matched_files
+
+  def _cache_key(self,
+                 name: Optional[str],
+                 input_context: Optional[tf.distribute.InputContext]) -> str:
+    """Returns a key of the decoded examples of the source `name`.
+
+    The key changes with the input files, their sizes and modification times,
+    the decoder and its plain config attributes, and the input pipeline that
+    reads the examples, so that stale caches are not read.
+
+    Args:
+      name: The name of the source if the input is a dictionary, or None.
+      input_context: The `tf.distribute.InputContext` of the input pipeline.
+
+    Returns:
+      A hexadecimal key.
+    """
+    files = self._source_files(name)
+    if files is not None:
+      source = []
+      for path in files:
+        stat = tf.io.gfile.stat(path)
+        source.append([path, stat.length, stat.mtime_nsec])
+    else:
+      tfds_name = self._tfds_name
+      if isinstance(tfds_name, cfg.base_config.Config):
+        tfds_name = tfds_name.as_dict()[name]
+      source = {
+          'tfds_name': tfds_name,
+          'tfds_split': self._tfds_split,
+          'tfds_data_dir': self._tfds_data_dir,
+          'tfds_as_supervised': self._tfds_as_supervised,
+          'tfds_skip_decoding_feature': self._tfds_skip_decoding_feature,
+      }
+    shard = [0, 1]
+    if self._sharding and input_context:
+      shard = [input_context.input_pipeline_id,
+               input_context.num_input_pipelines]
+    key = {
+        'source': source,
+        'decoder': _fn_fingerprint(self._decoder_fn),
+        'shard': shard,
+    }
+    return hashlib.sha256(
+        json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+  def _estimate_decoded_bytes(
+      self,
+      name: Optional[str],
+      input_context: Optional[tf.distribute.InputContext]) -> Optional[int]:
+    """Estimates the decoded size of the examples read by an input pipeline.
+
+    A few records of the first file are decoded, and the ratio of their decoded
+    to encoded size is applied to the size of the input files.
+
+    Args:
+      name: The name of the source if the input is a dictionary, or None.
+      input_context: The `tf.distribute.InputContext` of the input pipeline.
+
+    Returns:
+      The estimated size in bytes, or None if it can not be estimated, e.g. for
+      TFDS sources.
+    """
+    files = self._source_files(name)
+    if not files:
+      return None
+    try:
+      records = list(
+          self._dataset_fn(files[0]).take(_NUM_RECORDS_TO_ESTIMATE_SIZE))
+      if not records or any(r.dtype != tf.string for r in records):
+        return None
+      encoded_bytes = sum(
+          len(r.numpy()) + _TFRECORD_OVERHEAD_BYTES for r in records)
+      decoded_bytes = sum(
+          _nbytes(self._decoder_fn(r) if self._decoder_fn else r)
+          for r in records)
+    except Exception as e:  # pylint: disable=broad-except
+      logging.warning('Could not estimate the decoded size of %s: %s', files[0],
+                      e)
+      return None
+    total_bytes = sum(tf.io.gfile.stat(path).length for path in files)
+    if self._sharding and input_context:
+      total_bytes /= input_context.num_input_pipelines
+    return int(total_bytes * decoded_bytes / encoded_bytes)
+
+  def _cache_decoded_dataset(
+      self,
+      dataset: tf.data.Dataset,
+      name: Optional[str],
+      input_context: Optional[tf.distribute.InputContext] = None
+  ) -> tf.data.Dataset:
+    """Caches decoded examples in a snapshot on disk and/or in memory."""
+    if self._snapshot_dir:
+      num_shards = self._snapshot_num_shards
+
+      def reader_func(shards):
+        # Reads the shards in a different order on each epoch.
+        if self._is_training:
+          shards = shards.shuffle(num_shards, seed=self._seed)
+        return shards.interleave(
+            lambda shard: shard,
+            cycle_length=num_shards,
+            num_parallel_calls=tf.data.experimental.AUTOTUNE,
+            deterministic=self._deterministic)
+
+      path = os.path.join(self._snapshot_dir,
+                          self._cache_key(name, input_context))
+      logging.info('Snapshotting decoded examples to %s.', path)
+      # Snapshots are written uncompressed: decoded images barely compress,
+      # and the snappy reader fails on elements larger than its 256KB buffer.
+      dataset = dataset.enumerate().snapshot(
+          path,
+          compression=None,
+          reader_func=reader_func,
+          shard_func=lambda index, _: index % num_shards)
+      dataset = dataset.map(
+          lambda _, example: example,
+          num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+    if self._cache_ram_budget_mb:
+      decoded_bytes = self._estimate_decoded_bytes(name, input_context)
+      budget_bytes = self._cache_ram_budget_mb * 1024 * 1024
+      if decoded_bytes is not None and decoded_bytes <= budget_bytes:
+        logging.info('Caching about %d MB of decoded examples in memory.',
+                     decoded_bytes // (1024 * 1024))
+        dataset = dataset.cache()
+      elif decoded_bytes is None:
+        logging.info('Not caching decoded examples in memory, their size can '
+                     'not be estimated.')
+      else:
+        logging.info(
+            'Not caching decoded examples in memory, their estimated size of '
+            '%d MB exceeds the budget of %d MB.',
+            decoded_bytes // (1024 * 1024), self._cache_ram_budget_mb)
+
+    if self._is_training:
+      dataset = dataset.repeat()
+      dataset = dataset.shuffle(self._shuffle_buffer_size, seed=self._seed)
+    return dataset
+
   def _read_data_source(
       self,
       matched_files: Union[Dict[str, List[str]], List[str]],
@@ -394,7 +622,7 @@ class InputReader:
               dataset_fn,
               input_context,
               sharding=self._sharding,
-              repeat=self._is_training and not self._cache)
+              repeat=self._is_training and not self._read_once)
         else:
           return _shard_files_then_read(
               files,
@@ -403,7 +631,7 @@ class InputReader:
               seed=self._seed,
               is_training=self._is_training,
               sharding=self._sharding,
-              cache=self._cache,
+              cache=self._read_once,
               cycle_length=self._cycle_length,
               block_length=self._block_length,
               deterministic=self._deterministic)
@@ -413,7 +641,7 @@ class InputReader:
             dataset_fn,
             input_context,
             sharding=self._sharding,
-            repeat=self._is_training and not self._cache)
+            repeat=self._is_training and not self._read_once)
       else:
         raise ValueError('It is unexpected that `tfds_builder` is None and '
                          'there is also no `files`.')
@@ -431,7 +659,7 @@ class InputReader:
               input_context=input_context,
               seed=self._seed,
               is_training=self._is_training,
-              cache=self._cache,
+              cache=self._read_once,
               cycle_length=self._cycle_length,
               block_length=self._block_length)
       else:
@@ -444,7 +672,7 @@ class InputReader:
             input_context=input_context,
             seed=self._seed,
             is_training=self._is_training,
-            cache=self._cache,
+            cache=self._read_once,
             cycle_length=self._cycle_length,
             block_length=self._block_length)
     elif isinstance(matched_files, (list, tuple)):
@@ -466,15 +694,22 @@ class InputReader:
   ) -> tf.data.Dataset:
     """Returns a tf.data.Dataset object after shuffling, decoding, and parsing."""
 
-    def _shuffle_and_decode(ds):
+    def _shuffle_and_decode(ds, name=None):
       # If cache is enabled, we will call `shuffle()` later after `cache()`.
-      if self._is_training and not self._cache:
+      if self._is_training and not self._read_once:
         ds = ds.shuffle(self._shuffle_buffer_size, seed=self._seed)
       # Decode
       ds = _maybe_map_fn(ds, self._decoder_fn)
+      if self._cache_decoded:
+        ds = self._cache_decoded_dataset(ds, name, input_context)
       return ds
 
-    dataset = tf.nest.map_structure(_shuffle_and_decode, dataset)
+    if isinstance(dataset, dict):
+      dataset = {
+          name: _shuffle_and_decode(ds, name) for name, ds in dataset.items()
+      }
+    else:
+      dataset = tf.nest.map_structure(_shuffle_and_decode, dataset)
     if tf.nest.is_nested(dataset):
       dataset = self._combine_fn(dataset)
 
@@ -0,0 +1,181 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for input_reader."""
+
+import os
+
+from absl.testing import parameterized
+import tensorflow as tf, tf_keras
+
+from official.core import config_definitions as cfg
+from official.core import input_reader
+
+_NUM_FILES = 4
+_NUM_EXAMPLES_PER_FILE = 8
+_NUM_EXAMPLES = _NUM_FILES * _NUM_EXAMPLES_PER_FILE
+_DATA_SIZE = 1024
+
+
+def _write_files(directory, offset=0):
+  paths = []
+  for i in range(_NUM_FILES):
+    path = os.path.join(directory, f'data-{i}.tfrecord')
+    with tf.io.TFRecordWriter(path) as writer:
+      for j in range(_NUM_EXAMPLES_PER_FILE):
+        value = offset + i * _NUM_EXAMPLES_PER_FILE + j
+        example = tf.train.Example(
+            features=tf.train.Features(
+                feature={
+                    'value':
+                        tf.train.Feature(
+                            int64_list=tf.train.Int64List(value=[value])),
+                    'data':
+                        tf.train.Feature(
+                            bytes_list=tf.train.BytesList(
+                                value=[b'x' * _DATA_SIZE])),
+                }))
+        writer.write(example.SerializeToString())
+    paths.append(path)
+  return paths
+
+
+def _decode(serialized):
+  return tf.io.parse_single_example(
+      serialized, {
+          'value': tf.io.FixedLenFeature([], tf.int64),
+          'data': tf.io.FixedLenFeature([], tf.string),
+      })
+
+
+class _Decoder:
+
+  def __init__(self, include_data):
+    self._include_data = include_data
+
+  def decode(self, serialized):
+    example = _decode(serialized)
+    if not self._include_data:
+      del example['data']
+    return example
+
+
+def _parse(example):
+  # A random augmentation, which should vary across epochs.
+  return {
+      'value': example['value'],
+      'noise': tf.random.uniform([]),
+  }
+
+
+class InputReaderTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _read(self, params, num_batches):
+    reader = input_reader.InputReader(
+        params, decoder_fn=_decode, parser_fn=_parse)
+    dataset = reader.read()
+    batches = list(dataset.take(num_batches).as_numpy_iterator())
+    return [(int(b['value'][0]), float(b['noise'][0])) for b in batches]
+
+  @parameterized.parameters(
+      {'snapshot': True, 'cache_ram_budget_mb': None},
+      {'snapshot': True, 'cache_ram_budget_mb': 16},
+      {'snapshot': False, 'cache_ram_budget_mb': 16},
+  )
+  def test_cache_decoded_examples(self, snapshot, cache_ram_budget_mb):
+    paths = _write_files(self.create_tempdir().full_path)
+    snapshot_dir = self.create_tempdir().full_path if snapshot else ''
+    params = cfg.DataConfig(
+        input_path=paths,
+        global_batch_size=1,
+        is_training=True,
+        shuffle_buffer_size=1,
+        cache_ram_budget_mb=cache_ram_budget_mb,
+        snapshot_dir=snapshot_dir,
+        snapshot_num_shards=4)
+
+    for _ in range(2):
+      outputs = self._read(params, 2 * _NUM_EXAMPLES)
+      first_epoch, second_epoch = (outputs[:_NUM_EXAMPLES],
+                                   outputs[_NUM_EXAMPLES:])
+      for epoch in (first_epoch, second_epoch):
+        self.assertCountEqual([value for value, _ in epoch],
+                              range(_NUM_EXAMPLES))
+      # The parser runs on the cached examples on every epoch.
+      first_noise = dict(first_epoch)
+      self.assertNotAllClose([first_noise[v] for v, _ in second_epoch],
+                             [noise for _, noise in second_epoch])
+    if snapshot:
+      self.assertLen(tf.io.gfile.listdir(snapshot_dir), 1)
+
+  def test_snapshot_key_changes_with_input(self):
+    data_dir = self.create_tempdir().full_path
+    snapshot_dir = self.create_tempdir().full_path
+    params = cfg.DataConfig(
+        input_path=_write_files(data_dir),
+        global_batch_size=1,
+        is_training=False,
+        snapshot_dir=snapshot_dir)
+    values = [value for value, _ in self._read(params, _NUM_EXAMPLES)]
+    self.assertCountEqual(values, range(_NUM_EXAMPLES))
+
+    # Rewrites the files with other values, which should not be read from the
+    # stale snapshot.
+    _write_files(data_dir, offset=100)
+    values = [value for value, _ in self._read(params, _NUM_EXAMPLES)]
+    self.assertCountEqual(values, range(100, 100 + _NUM_EXAMPLES))
+    self.assertLen(tf.io.gfile.listdir(snapshot_dir), 2)
+
+  def test_estimate_decoded_bytes(self):
+    params = cfg.DataConfig(
+        input_path=_write_files(self.create_tempdir().full_path),
+        global_batch_size=1,
+        cache_ram_budget_mb=1)
+    reader = input_reader.InputReader(params, decoder_fn=_decode)
+    decoded_bytes = reader._estimate_decoded_bytes(None, None)  # pylint: disable=protected-access
+    # Each decoded example holds the data and the int64 value.
+    self.assertAllClose(decoded_bytes, _NUM_EXAMPLES * (_DATA_SIZE + 8),
+                        rtol=0.1)
+
+  def test_cache_key(self):
+    params = cfg.DataConfig(
+        input_path=_write_files(self.create_tempdir().full_path),
+        global_batch_size=1,
+        snapshot_dir=self.create_tempdir().full_path)
+
+    def cache_key(decoder_fn, input_context=None):
+      reader = input_reader.InputReader(params, decoder_fn=decoder_fn)
+      return reader._cache_key(None, input_context)  # pylint: disable=protected-access
+
+    self.assertEqual(cache_key(_decode), cache_key(_decode))
+    self.assertEqual(
+        cache_key(_Decoder(True).decode), cache_key(_Decoder(True).decode))
+    self.assertNotEqual(
+        cache_key(_Decoder(True).decode), cache_key(_Decoder(False).decode))
+    self.assertNotEqual(cache_key(_decode), cache_key(_Decoder(True).decode))
+    self.assertNotEqual(
+        cache_key(_decode),
+        cache_key(_decode, tf.distribute.InputContext(num_input_pipelines=2)))
+
+  def test_cache_and_snapshot_are_exclusive(self):
+    params = cfg.DataConfig(
+        input_path=_write_files(self.create_tempdir().full_path),
+        cache=True,
+        snapshot_dir=self.create_tempdir().full_path)
+    with self.assertRaisesRegex(ValueError, '`cache` can not be used'):
+      input_reader.InputReader(params)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,114 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lazy registration of experiments and tasks from a generated manifest.
+
+The manifest maps the names of registered experiments, and the registered
+task config classes, to the modules registering them. `exp_factory` and
+`task_factory` use it to import the module of an experiment or a task on
+demand when it is not registered yet, so that trainers do not need to import
+every registering package at startup. The manifest is generated by
+`generate_registry_manifest.py`.
+"""
+
+import functools
+import importlib
+import json
+import os
+import sys
+from typing import Any, Dict, Mapping
+
+MANIFEST_PATH = os.path.join(
+    os.path.dirname(__file__), 'registry_manifest.json')
+
+EXPERIMENTS = 'experiments'
+TASKS = 'tasks'
+
+
+def class_key(cls: type) -> str:
+  """Returns the manifest key of a task config class."""
+  return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _flatten(registered_collection: Mapping[str, Any], prefix: str = ''):
+  """Yields the hierarchical keys and values of a registered collection."""
+  for key, value in registered_collection.items():
+    if isinstance(value, dict):
+      yield from _flatten(value, f'{prefix}{key}/')
+    else:
+      yield f'{prefix}{key}', value
+
+
+def build_manifest(
+    registered_configs: Mapping[str, Any],
+    registered_task_cls: Mapping[type, Any]) -> Dict[str, Dict[str, str]]:
+  """Builds the manifest of the registrations made so far.
+
+  Args:
+    registered_configs: The registered experiment config factories of
+      `exp_factory`.
+    registered_task_cls: The registered task factories of `task_factory`.
+
+  Returns:
+    A dictionary mapping `EXPERIMENTS` to a dictionary of experiment names to
+    modules, and `TASKS` to a dictionary of task config class keys to modules.
+  """
+  experiments = {
+      name: factory.__module__
+      for name, factory in _flatten(registered_configs)
+      if hasattr(factory, '__module__')
+  }
+  tasks = {
+      class_key(config_cls): factory.__module__
+      for config_cls, factory in registered_task_cls.items()
+      if hasattr(factory, '__module__')
+  }
+  return {
+      EXPERIMENTS: dict(sorted(experiments.items())),
+      TASKS: dict(sorted(tasks.items())),
+  }
+
+
+def write_manifest(manifest: Mapping[str, Mapping[str, str]],
+                   path: str = MANIFEST_PATH):
+  with open(path, 'w') as f:
+    json.dump(manifest, f, indent=2)
+    f.write('\n')
+
+
+@functools.lru_cache(maxsize=None)
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, Dict[str, str]]:
+  """Loads the manifest, or returns an empty one if it does not exist."""
+  if not os.path.exists(path):
+    return {EXPERIMENTS: {}, TASKS: {}}
+  with open(path) as f:
+    return json.load(f)
+
+
+def import_registering_module(kind: str, key: str) -> bool:
+  """Imports the module registering `key` according to the manifest.
+
+  Args:
+    kind: `EXPERIMENTS` or `TASKS`.
+    key: An experiment name, or the `class_key` of a task config class.
+
+  Returns:
+    True if a module was imported, False if `key` is not in the manifest or its
+    module was already imported, in which case a new lookup would fail again.
+  """
+  module = load_manifest().get(kind, {}).get(key)
+  if module is None or module in sys.modules:
+    return False
+  importlib.import_module(module)
+  return True
@@ -0,0 +1,89 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for registry_manifest."""
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import tensorflow as tf, tf_keras
+from official.core import registry_manifest
+
+
+class RegistryManifestTest(tf.test.TestCase):
+
+  def test_build_manifest(self):
+
+    class TaskConfig:
+      pass
+
+    def experiment():
+      pass
+
+    manifest = registry_manifest.build_manifest(
+        {'bert': {'squad': experiment}, 'resnet': experiment},
+        {TaskConfig: experiment})
+    self.assertEqual(
+        manifest, {
+            registry_manifest.EXPERIMENTS: {
+                'bert/squad': __name__,
+                'resnet': __name__
+            },
+            registry_manifest.TASKS: {
+                f'{__name__}.RegistryManifestTest.test_build_manifest.'
+                '<locals>.TaskConfig': __name__
+            },
+        })
+    self.assertFalse(
+        registry_manifest.import_registering_module(
+            registry_manifest.EXPERIMENTS, 'not_registered'))
+
+  def test_manifest_is_up_to_date(self):
+    # Generates the manifest in a new interpreter, since the registrations of
+    # the modules imported by other tests are not part of it.
+    output_path = os.path.join(self.get_temp_dir(), 'registry_manifest.json')
+    subprocess.run([
+        sys.executable, '-m', 'official.core.generate_registry_manifest',
+        f'--output_path={output_path}'
+    ], check=True)
+    self.assertEqual(
+        registry_manifest.load_manifest(output_path),
+        registry_manifest.load_manifest(),
+        'The registry manifest is out of date, please regenerate it with '
+        '`python -m official.core.generate_registry_manifest`.')
+
+  def test_lazy_lookup(self):
+    # Runs in a new interpreter, in which nothing is registered yet.
+    code = textwrap.dedent("""
+        import sys
+        from official.core import exp_factory
+        from official.core import task_factory
+
+        config = exp_factory.get_exp_config('resnet_imagenet')
+        task_cls = task_factory.get_task_cls(type(config.task))
+        assert task_cls.__name__ == 'ImageClassificationTask', task_cls
+        assert 'official.nlp.tasks' not in sys.modules
+        try:
+          exp_factory.get_exp_config('not_registered')
+          raise AssertionError('Expected a LookupError.')
+        except LookupError:
+          pass
+    """)
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+if __name__ == '__main__':
+  tf.test.main()
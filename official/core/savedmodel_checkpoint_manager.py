@@ -14,21 +14,44 @@
 
 """Custom checkpoint manager that also exports saved models."""
 
+import concurrent.futures
 import os
 import re
+import threading
 import time
-from typing import Callable, List, Mapping, Optional, Union
+from typing import Callable, Dict, List, Mapping, Optional, Union
 
 from absl import logging
 import tensorflow as tf, tf_keras
 
 SAVED_MODULES_PATH_SUFFIX = 'saved_modules'
+_TEMP_SUFFIX = '_temp'
+# Files of an exported module which are rewritten on every asynchronous export,
+# the others are copied from the first export.
+_VARIABLES_DIRECTORY = 'variables'
+_FINGERPRINT_FILENAME = 'fingerprint.pb'
 
 
 def make_saved_modules_directory_name(checkpoint_name: str) -> str:
   return f'{checkpoint_name}_{SAVED_MODULES_PATH_SUFFIX}'
 
 
+def _read_export_template(export_dir: str) -> Dict[str, bytes]:
+  """Reads the files of an exported module, other than its variables."""
+  template = {}
+  for dirname, subdirs, filenames in tf.io.gfile.walk(export_dir):
+    relative_dirname = os.path.relpath(dirname, export_dir)
+    if relative_dirname == '.':
+      # The fingerprint depends on the variables, and is optional.
+      subdirs[:] = [d for d in subdirs if d != _VARIABLES_DIRECTORY]
+      filenames = [f for f in filenames if f != _FINGERPRINT_FILENAME]
+      relative_dirname = ''
+    for filename in filenames:
+      with tf.io.gfile.GFile(os.path.join(dirname, filename), 'rb') as f:
+        template[os.path.join(relative_dirname, filename)] = f.read()
+  return template
+
+
 class SavedModelCheckpointManager(tf.train.CheckpointManager):
   """A CheckpointManager that also exports `SavedModel`s."""
 
@@ -41,8 +64,31 @@ class SavedModelCheckpointManager(tf.train.CheckpointManager):
                checkpoint_name: str = 'ckpt',
                step_counter: Optional[tf.Variable] = None,
                checkpoint_interval: Optional[int] = None,
-               init_fn: Optional[Callable[[], None]] = None):
-    """See base class."""
+               init_fn: Optional[Callable[[], None]] = None,
+               async_export: bool = False):
+    """Initializes the checkpoint manager.
+
+    With `async_export`, the graphs of the modules are only traced and written
+    by the first export. Later exports snapshot the variables of the modules to
+    host memory, which is the only part blocking `save`, then write them and
+    copy the other files of the first export on background threads. The modules
+    must then not create variables or change their signatures after the first
+    export. Call `sync` to wait for the export in flight, e.g. before reading
+    `savedmodels`.
+
+    Args:
+      checkpoint: See base class.
+      directory: See base class.
+      max_to_keep: See base class.
+      modules_to_export: The modules to export as SavedModels next to each
+        checkpoint, keyed by the name of their directory.
+      keep_checkpoint_every_n_hours: See base class.
+      checkpoint_name: See base class.
+      step_counter: See base class.
+      checkpoint_interval: See base class.
+      init_fn: See base class.
+      async_export: Whether to export the SavedModels asynchronously.
+    """
     super().__init__(
         checkpoint=checkpoint,
         directory=directory,
@@ -54,16 +100,25 @@ class SavedModelCheckpointManager(tf.train.CheckpointManager):
         init_fn=init_fn)
     self._modules_to_export = modules_to_export
     self._savedmodels = self.get_existing_savedmodels()
+    self._async_export = async_export
+    self._lock = threading.Lock()
+    # Per module, the files of the first export other than its variables.
+    self._export_templates: Dict[str, Dict[str, bytes]] = {}
+    self._export_checkpoints: Dict[str, tf.train.Checkpoint] = {}
+    self._export_executor = None
+    self._export_future = None
 
   def save(self,
            checkpoint_number: Optional[int] = None,
            check_interval: bool = True,
            options: Optional[tf.train.CheckpointOptions] = None):
     """See base class."""
-    checkpoint_path = super().save(
-        checkpoint_number=checkpoint_number,
-        check_interval=check_interval,
-        options=options)
+    # The checkpoints are read by the export in flight to delete old exports.
+    with self._lock:
+      checkpoint_path = super().save(
+          checkpoint_number=checkpoint_number,
+          check_interval=check_interval,
+          options=options)
     if not checkpoint_path:  # Nothing got written.
       return
     if not self._modules_to_export:  # No modules to export.
@@ -75,33 +130,92 @@ class SavedModelCheckpointManager(tf.train.CheckpointManager):
     # Atomic export of SavedModel. Write into a temporary direcotory and then
     # rename as the final direcotory after finishing the writing.
     # This can avoid trying to read an unfinished savedmodel.
-    saved_modules_directory_tmp = saved_modules_directory + '_temp'
+    saved_modules_directory_tmp = saved_modules_directory + _TEMP_SUFFIX
+    if not self._async_export:
+      for model_name, model in self._modules_to_export.items():
+        signatures = getattr(model, 'saved_model_signatures', None)
+        if signatures is not None:
+          tf.saved_model.save(
+              obj=model,
+              export_dir=os.path.join(saved_modules_directory_tmp, model_name),
+              signatures=signatures)
+      self._finalize_export(saved_modules_directory)
+      return checkpoint_path
+
+    # Only one export is in flight, which also surfaces its errors.
+    self._wait_for_export()
     for model_name, model in self._modules_to_export.items():
+      export_dir = os.path.join(saved_modules_directory_tmp, model_name)
+      if model_name in self._export_checkpoints:
+        self._export_checkpoints[model_name].write(
+            os.path.join(export_dir, _VARIABLES_DIRECTORY,
+                         _VARIABLES_DIRECTORY),
+            options=tf.train.CheckpointOptions(enable_async=True))
+        continue
       signatures = getattr(model, 'saved_model_signatures', None)
       if signatures is not None:
         tf.saved_model.save(
-            obj=model,
-            export_dir=os.path.join(saved_modules_directory_tmp, model_name),
-            signatures=signatures)
+            obj=model, export_dir=export_dir, signatures=signatures)
+        self._export_templates[model_name] = _read_export_template(export_dir)
+        self._export_checkpoints[model_name] = tf.train.Checkpoint(root=model)
+    if self._export_executor is None:
+      self._export_executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=1, thread_name_prefix='savedmodel_export')
+    self._export_future = self._export_executor.submit(
+        self._finish_async_export, saved_modules_directory)
+    return checkpoint_path
+
+  def sync(self):
+    """Waits for the checkpoint and SavedModel exports in flight to finish."""
+    super().sync()
+    self._wait_for_export()
+
+  def _wait_for_export(self):
+    """Waits for the asynchronous export in flight, raising its errors."""
+    if self._export_future is not None:
+      future, self._export_future = self._export_future, None
+      future.result()
+
+  def _finish_async_export(self, saved_modules_directory: str):
+    """Completes the export started by `save` on a background thread."""
+    saved_modules_directory_tmp = saved_modules_directory + _TEMP_SUFFIX
+    for model_name, template in self._export_templates.items():
+      export_dir = os.path.join(saved_modules_directory_tmp, model_name)
+      # Waits for the variables snapshotted by `save` to be written.
+      self._export_checkpoints[model_name].sync()
+      for relative_path, contents in template.items():
+        path = os.path.join(export_dir, relative_path)
+        tf.io.gfile.makedirs(os.path.dirname(path))
+        with tf.io.gfile.GFile(path, 'wb') as f:
+          f.write(contents)
+    self._finalize_export(saved_modules_directory)
+
+  def _finalize_export(self, saved_modules_directory: str):
+    """Publishes an export, and deletes the ones of deleted checkpoints."""
+    saved_modules_directory_tmp = saved_modules_directory + _TEMP_SUFFIX
     if tf.io.gfile.exists(saved_modules_directory_tmp):
       tf.io.gfile.rename(saved_modules_directory_tmp, saved_modules_directory)
 
-    saved_modules_directories_to_keep = [
-        make_saved_modules_directory_name(ckpt) for ckpt in self.checkpoints
-    ]
-    existing_saved_modules_dirs = self.get_existing_savedmodels()
-
-    self._savedmodels = []
-    # Keep savedmodels in the same order as checkpoints (from oldest to newest).
-    for saved_modules_dir_to_keep in saved_modules_directories_to_keep:
-      if saved_modules_dir_to_keep in existing_saved_modules_dirs:
-        self._savedmodels.append(saved_modules_dir_to_keep)
-
-    for existing_saved_modules_dir in existing_saved_modules_dirs:
-      if existing_saved_modules_dir not in self._savedmodels:
-        tf.io.gfile.rmtree(existing_saved_modules_dir)
-
-    return checkpoint_path
+    # The exports in flight are still in temporary directories, and are not
+    # deleted. An export whose checkpoint got deleted while it was in flight is
+    # deleted here once it is finished.
+    with self._lock:
+      saved_modules_directories_to_keep = [
+          make_saved_modules_directory_name(ckpt) for ckpt in self.checkpoints
+      ]
+      existing_saved_modules_dirs = self.get_existing_savedmodels()
+
+      savedmodels = []
+      # Keep savedmodels in the same order as checkpoints (from oldest to
+      # newest).
+      for saved_modules_dir_to_keep in saved_modules_directories_to_keep:
+        if saved_modules_dir_to_keep in existing_saved_modules_dirs:
+          savedmodels.append(saved_modules_dir_to_keep)
+      self._savedmodels = savedmodels
+
+      for existing_saved_modules_dir in existing_saved_modules_dirs:
+        if existing_saved_modules_dir not in self._savedmodels:
+          tf.io.gfile.rmtree(existing_saved_modules_dir)
 
   def get_existing_savedmodels(self) -> List[str]:
     """Gets a list of all existing SavedModel paths in `directory`.
@@ -127,8 +241,9 @@ class SavedModelCheckpointManager(tf.train.CheckpointManager):
     Returns:
       The latest SavedModel path. If there are no SavedModels, returns `None`.
     """
-    if self._savedmodels:
-      return self._savedmodels[-1]
+    with self._lock:
+      if self._savedmodels:
+        return self._savedmodels[-1]
     return None
 
   @property
@@ -138,7 +253,8 @@ class SavedModelCheckpointManager(tf.train.CheckpointManager):
     Returns:
       A list of SavedModel paths, sorted from oldest to newest.
     """
-    return self._savedmodels
+    with self._lock:
+      return list(self._savedmodels)
 
   @property
   def modules_to_export(self) -> Union[Mapping[str, tf.Module], None]:
@@ -16,6 +16,8 @@ import os
 import time
 from typing import Iterable
 
+from absl.testing import parameterized
+import numpy as np
 import tensorflow as tf, tf_keras
 
 from official.core import savedmodel_checkpoint_manager
@@ -46,13 +48,16 @@ class _ModelForTest(tf_keras.Model):
     return dict(serving_default=self.call)
 
 
-class CheckpointManagerTest(tf.test.TestCase):
+class CheckpointManagerTest(tf.test.TestCase, parameterized.TestCase):
 
-  def _create_manager(self, max_to_keep: int = 1) -> tf.train.CheckpointManager:
+  def _create_manager(self,
+                      max_to_keep: int = 1,
+                      async_export: bool = False) -> tf.train.CheckpointManager:
     """Sets up SavedModelCheckpointManager object.
 
     Args:
       max_to_keep: max number of savedmodels to keep.
+      async_export: whether to export the savedmodels asynchronously.
 
     Returns:
       created savedmodel manager.
@@ -66,14 +71,17 @@ class CheckpointManagerTest(tf.test.TestCase):
         checkpoint=checkpoint,
         directory=self.get_temp_dir(),
         max_to_keep=max_to_keep,
-        modules_to_export=models)
+        modules_to_export=models,
+        async_export=async_export)
     return manager
 
-  def test_max_to_keep(self):
-    manager = self._create_manager()
+  @parameterized.parameters(False, True)
+  def test_max_to_keep(self, async_export):
+    manager = self._create_manager(async_export=async_export)
     models = manager.modules_to_export
     first_path = manager.save()
     second_path = manager.save()
+    manager.sync()
 
     savedmodel = savedmodel_checkpoint_manager.make_saved_modules_directory_name(
         manager.latest_checkpoint)
@@ -81,6 +89,29 @@ class CheckpointManagerTest(tf.test.TestCase):
     self.assertTrue(_models_exist(second_path, models.keys()))
     self.assertFalse(_models_exist(first_path, models.keys()))
 
+  def test_async_export(self):
+    manager = self._create_manager(max_to_keep=2, async_export=True)
+    model = manager.modules_to_export['model_1']
+    inputs = tf.ones([2, 16])
+    model(inputs)
+    expected_outputs = []
+    for step in range(3):
+      model.dense.kernel.assign_add(tf.ones_like(model.dense.kernel))
+      expected_outputs.append(model(inputs).numpy())
+      manager.save(checkpoint_number=step)
+      # Training goes on while the export is in flight.
+      model.dense.kernel.assign(tf.zeros_like(model.dense.kernel))
+    manager.sync()
+
+    self.assertLen(manager.savedmodels, 2)
+    self.assertEqual(
+        set(manager.savedmodels), set(manager.get_existing_savedmodels()))
+    for savedmodel, expected in zip(manager.savedmodels, expected_outputs[1:]):
+      loaded = tf.saved_model.load(os.path.join(savedmodel, 'model_1'))
+      outputs = loaded.signatures['serving_default'](inputs)
+      self.assertAllClose(list(outputs.values())[0], expected)
+      self.assertFalse(np.allclose(expected, model(inputs)))
+
   def test_returns_none_after_timeout(self):
     manager = self._create_manager()
     start = time.time()
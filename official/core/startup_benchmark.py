@@ -0,0 +1,102 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks the startup time of the `train.py` entry points.
+
+Each entry point is imported in a new interpreter run with `python -X
+importtime`, then the config of an experiment and its task class are looked
+up, as a trainer does before building the task. This runs:
+- `eager`: after importing `official.common.registry_imports`, as trainers did
+  to register all experiments and tasks upfront.
+- `lazy`: with the experiment and task modules imported on demand from the
+  registry manifest.
+The median wall time of the runs is reported, together with the cumulative
+import time of the slowest `official` modules in the last run.
+
+Example usage:
+  python -m official.core.startup_benchmark --num_runs=3
+"""
+
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+
+_ENTRY_POINTS = flags.DEFINE_list(
+    'entry_points', [
+        'official.vision.train:resnet_imagenet',
+        'official.vision.train:retinanet_resnetfpn_coco',
+        'official.nlp.train:bert/sentence_prediction',
+    ], 'Entry point modules and experiments, as module:experiment.')
+_NUM_RUNS = flags.DEFINE_integer('num_runs', 3, 'Runs per measurement.')
+_TOP_K = flags.DEFINE_integer(
+    'top_k', 5, 'Number of slowest `official` modules to report.')
+
+_REGISTRY_IMPORTS = 'from official.common import registry_imports\n'
+
+_LOOKUP = """
+import {module}
+from official.core import exp_factory
+from official.core import task_factory
+config = exp_factory.get_exp_config('{experiment}')
+task_factory.get_task_cls(type(config.task))
+"""
+
+# Lines of `-X importtime`, e.g.
+# "import time:       312 |       1402 |   official.core.registry".
+_IMPORT_TIME_RE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def _run(code):
+  """Runs `code` in a new interpreter, returns its time and import times."""
+  start = time.perf_counter()
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          check=True, capture_output=True, text=True)
+  elapsed = time.perf_counter() - start
+  import_times = {}
+  for line in result.stderr.splitlines():
+    match = _IMPORT_TIME_RE.match(line)
+    if match:
+      import_times[match.group(3)] = int(match.group(1)) * 1e-6
+  return elapsed, import_times
+
+
+def main(_):
+  for entry_point in _ENTRY_POINTS.value:
+    module, experiment = entry_point.split(':', 1)
+    code = _LOOKUP.format(module=module, experiment=experiment)
+    for mode, mode_code in (('eager', _REGISTRY_IMPORTS + code),
+                            ('lazy', code)):
+      times = []
+      for _ in range(_NUM_RUNS.value):
+        elapsed, import_times = _run(mode_code)
+        times.append(elapsed)
+      num_official = sum(1 for m in import_times if m.startswith('official.'))
+      logging.info('%-48s %-5s %6.2f s, %4d official modules imported',
+                   entry_point, mode, statistics.median(times), num_official)
+      slowest = sorted(
+          ((seconds, name) for name, seconds in import_times.items()
+           if name.startswith('official.') and name.count('.') <= 2),
+          reverse=True)[:_TOP_K.value]
+      for seconds, name in slowest:
+        logging.info('    %-44s %6.2f s', name, seconds)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -15,6 +15,7 @@
 """A global factory to register and access all registered tasks."""
 
 from official.core import registry
+from official.core import registry_manifest
 
 _REGISTERED_TASK_CLS = {}
 
@@ -66,5 +67,22 @@ def get_task(task_config, **kwargs):
 # The user-visible get_task() is defined after classes have been registered.
 # TODO(b/158741360): Add type annotations once pytype checks across modules.
 def get_task_cls(task_config_cls):
-  task_cls = registry.lookup(_REGISTERED_TASK_CLS, task_config_cls)
+  """Looks up the Task factory registered for a subclass of TaskConfig.
+
+  If `task_config_cls` is not registered yet, the module registering it is
+  imported according to the registry manifest, if any.
+
+  Args:
+    task_config_cls: a subclass of TaskConfig.
+
+  Returns:
+    The registered Task class or factory.
+  """
+  try:
+    task_cls = registry.lookup(_REGISTERED_TASK_CLS, task_config_cls)
+  except LookupError:
+    if not registry_manifest.import_registering_module(
+        registry_manifest.TASKS, registry_manifest.class_key(task_config_cls)):
+      raise
+    task_cls = registry.lookup(_REGISTERED_TASK_CLS, task_config_cls)
   return task_cls
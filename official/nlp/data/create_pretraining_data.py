@@ -16,6 +16,7 @@
 
 import collections
 import itertools
+import multiprocessing
 import random
 
 from absl import app
@@ -98,6 +99,30 @@ flags.DEFINE_float(
     "Probability of creating sequences which are shorter than the "
     "maximum length.")
 
+flags.DEFINE_bool(
+    "streaming", False,
+    "Whether to stream the input through bounded buffers instead of loading "
+    "the whole corpus into memory. Each worker owns a slice of the input "
+    "files and writes its own output shards.")
+
+flags.DEFINE_integer(
+    "num_workers", 1,
+    "Number of worker processes in streaming mode. With more than one worker, "
+    "each output file is sharded as `<output_file>-<worker>-of-<num_workers>`.")
+
+flags.DEFINE_integer(
+    "document_buffer_size", 1000,
+    "Number of documents each streaming worker holds to sample random next "
+    "sentences from and to shuffle documents.")
+
+flags.DEFINE_integer(
+    "shuffle_buffer_size", 100000,
+    "Number of serialized examples each streaming worker holds to shuffle "
+    "its output.")
+
+# Number of lines tokenized together when reading the input files.
+_TOKENIZE_BATCH_SIZE = 1024
+
 
 class TrainingInstance(object):
   """A single training instance (sentence pair)."""
@@ -141,45 +166,8 @@ def write_instance_to_example_files(instances, tokenizer, max_seq_length,
 
   total_written = 0
   for (inst_index, instance) in enumerate(instances):
-    input_ids = tokenizer.convert_tokens_to_ids(instance.tokens)
-    input_mask = [1] * len(input_ids)
-    segment_ids = list(instance.segment_ids)
-    assert len(input_ids) <= max_seq_length
-
-    while len(input_ids) < max_seq_length:
-      input_ids.append(0)
-      input_mask.append(0)
-      segment_ids.append(0)
-
-    assert len(input_ids) == max_seq_length
-    assert len(input_mask) == max_seq_length
-    assert len(segment_ids) == max_seq_length
-
-    masked_lm_positions = list(instance.masked_lm_positions)
-    masked_lm_ids = tokenizer.convert_tokens_to_ids(instance.masked_lm_labels)
-    masked_lm_weights = [1.0] * len(masked_lm_ids)
-
-    while len(masked_lm_positions) < max_predictions_per_seq:
-      masked_lm_positions.append(0)
-      masked_lm_ids.append(0)
-      masked_lm_weights.append(0.0)
-
-    next_sentence_label = 1 if instance.is_random_next else 0
-
-    features = collections.OrderedDict()
-    if use_v2_feature_names:
-      features["input_word_ids"] = create_int_feature(input_ids)
-      features["input_type_ids"] = create_int_feature(segment_ids)
-    else:
-      features["input_ids"] = create_int_feature(input_ids)
-      features["segment_ids"] = create_int_feature(segment_ids)
-
-    features["input_mask"] = create_int_feature(input_mask)
-    features["masked_lm_positions"] = create_int_feature(masked_lm_positions)
-    features["masked_lm_ids"] = create_int_feature(masked_lm_ids)
-    features["masked_lm_weights"] = create_float_feature(masked_lm_weights)
-    features["next_sentence_labels"] = create_int_feature([next_sentence_label])
-
+    features = _create_features(instance, tokenizer, max_seq_length,
+                                max_predictions_per_seq, use_v2_feature_names)
     tf_example = tf.train.Example(features=tf.train.Features(feature=features))
 
     writers[writer_index].write(tf_example.SerializeToString())
@@ -207,6 +195,51 @@ def write_instance_to_example_files(instances, tokenizer, max_seq_length,
   logging.info("Wrote %d total instances", total_written)
 
 
+def _create_features(instance, tokenizer, max_seq_length,
+                     max_predictions_per_seq, use_v2_feature_names):
+  """Creates the padded features of a `TrainingInstance`."""
+  input_ids = tokenizer.convert_tokens_to_ids(instance.tokens)
+  input_mask = [1] * len(input_ids)
+  segment_ids = list(instance.segment_ids)
+  assert len(input_ids) <= max_seq_length
+
+  while len(input_ids) < max_seq_length:
+    input_ids.append(0)
+    input_mask.append(0)
+    segment_ids.append(0)
+
+  assert len(input_ids) == max_seq_length
+  assert len(input_mask) == max_seq_length
+  assert len(segment_ids) == max_seq_length
+
+  masked_lm_positions = list(instance.masked_lm_positions)
+  masked_lm_ids = tokenizer.convert_tokens_to_ids(instance.masked_lm_labels)
+  masked_lm_weights = [1.0] * len(masked_lm_ids)
+
+  while len(masked_lm_positions) < max_predictions_per_seq:
+    masked_lm_positions.append(0)
+    masked_lm_ids.append(0)
+    masked_lm_weights.append(0.0)
+
+  next_sentence_label = 1 if instance.is_random_next else 0
+
+  features = collections.OrderedDict()
+  if use_v2_feature_names:
+    features["input_word_ids"] = create_int_feature(input_ids)
+    features["input_type_ids"] = create_int_feature(segment_ids)
+  else:
+    features["input_ids"] = create_int_feature(input_ids)
+    features["segment_ids"] = create_int_feature(segment_ids)
+
+  features["input_mask"] = create_int_feature(input_mask)
+  features["masked_lm_positions"] = create_int_feature(masked_lm_positions)
+  features["masked_lm_ids"] = create_int_feature(masked_lm_ids)
+  features["masked_lm_weights"] = create_float_feature(masked_lm_weights)
+  features["next_sentence_labels"] = create_int_feature([next_sentence_label])
+
+  return features
+
+
 def create_int_feature(values):
   feature = tf.train.Feature(int64_list=tf.train.Int64List(value=list(values)))
   return feature
@@ -231,28 +264,8 @@ def create_training_instances(
     max_ngram_size=None,
 ):
   """Create `TrainingInstance`s from raw text."""
-  all_documents = [[]]
-
-  # Input file format:
-  # (1) One sentence per line. These should ideally be actual sentences, not
-  # entire paragraphs or arbitrary spans of text. (Because we use the
-  # sentence boundaries for the "next sentence prediction" task).
-  # (2) Blank lines between documents. Document boundaries are needed so
-  # that the "next sentence prediction" task doesn't span between documents.
-  for input_file in input_files:
-    with tf.io.gfile.GFile(input_file, "rb") as reader:
-      for line in reader:
-        line = processor_text_fn(line)
-
-        # Empty lines are used as document delimiters
-        if not line:
-          all_documents.append([])
-        tokens = tokenizer.tokenize(line)
-        if tokens:
-          all_documents[-1].append(tokens)
-
-  # Remove empty documents
-  all_documents = [x for x in all_documents if x]
+  all_documents = list(
+      _read_documents(input_files, tokenizer, processor_text_fn))
   rng.shuffle(all_documents)
 
   vocab_words = list(tokenizer.vocab.keys())
@@ -269,6 +282,232 @@ def create_training_instances(
   return instances
 
 
+def _read_documents(input_files, tokenizer, processor_text_fn):
+  """Yields the non-empty tokenized documents of `input_files` in order."""
+
+  def tokenize_lines(lines):
+    if hasattr(tokenizer, "tokenize_batch"):
+      return zip(lines, tokenizer.tokenize_batch(lines))
+    return ((line, tokenizer.tokenize(line)) for line in lines)
+
+  def tokenized_lines():
+    for input_file in input_files:
+      with tf.io.gfile.GFile(input_file, "rb") as reader:
+        lines = []
+        for line in reader:
+          lines.append(processor_text_fn(line))
+          if len(lines) == _TOKENIZE_BATCH_SIZE:
+            yield from tokenize_lines(lines)
+            lines = []
+        yield from tokenize_lines(lines)
+
+  # Input file format:
+  # (1) One sentence per line. These should ideally be actual sentences, not
+  # entire paragraphs or arbitrary spans of text. (Because we use the
+  # sentence boundaries for the "next sentence prediction" task).
+  # (2) Blank lines between documents. Document boundaries are needed so
+  # that the "next sentence prediction" task doesn't span between documents.
+  document = []
+  for line, tokens in tokenized_lines():
+    # Empty lines are used as document delimiters
+    if not line and document:
+      yield document
+      document = []
+    if tokens:
+      document.append(tokens)
+  if document:
+    yield document
+
+
+class _ShuffledExampleWriter(object):
+  """Writes serialized examples round-robin through a shuffle buffer."""
+
+  def __init__(self, output_files, gzip_compress, shuffle_buffer_size, rng):
+    self._writers = [
+        tf.io.TFRecordWriter(
+            output_file, options="GZIP" if gzip_compress else "")
+        for output_file in output_files
+    ]
+    self._writer_index = 0
+    self._buffer = []
+    self._shuffle_buffer_size = shuffle_buffer_size
+    self._rng = rng
+    self.total_written = 0
+
+  def _write(self, serialized):
+    self._writers[self._writer_index].write(serialized)
+    self._writer_index = (self._writer_index + 1) % len(self._writers)
+    self.total_written += 1
+
+  def add(self, serialized):
+    """Adds an example, writing a random buffered one if the buffer is full."""
+    if len(self._buffer) < self._shuffle_buffer_size:
+      self._buffer.append(serialized)
+      return
+    index = self._rng.randrange(len(self._buffer))
+    self._write(self._buffer[index])
+    self._buffer[index] = serialized
+
+  def close(self):
+    """Writes the remaining buffered examples and closes the files."""
+    self._rng.shuffle(self._buffer)
+    for serialized in self._buffer:
+      self._write(serialized)
+    self._buffer = []
+    for writer in self._writers:
+      writer.close()
+
+
+def _worker_output_files(output_files, worker_index, num_workers):
+  """Returns the output shards written by a streaming worker."""
+  if num_workers == 1:
+    return list(output_files)
+  return [
+      "%s-%05d-of-%05d" % (output_file, worker_index, num_workers)
+      for output_file in output_files
+  ]
+
+
+def _write_worker_examples(worker_index, input_files, output_files, tokenizer,
+                           processor_text_fn, options):
+  """Streams the input files of one worker into its output shards."""
+  rng = random.Random(options["random_seed"] + worker_index)
+  vocab_words = list(tokenizer.vocab.keys())
+  writer = _ShuffledExampleWriter(
+      _worker_output_files(output_files, worker_index, options["num_workers"]),
+      options["gzip_compress"], options["shuffle_buffer_size"], rng)
+
+  def write_document(documents, document_index):
+    for _ in range(options["dupe_factor"]):
+      for instance in create_instances_from_document(
+          documents, document_index, options["max_seq_length"],
+          options["short_seq_prob"], options["masked_lm_prob"],
+          options["max_predictions_per_seq"], vocab_words, rng,
+          options["do_whole_word_mask"], options["max_ngram_size"]):
+        features = _create_features(instance, tokenizer,
+                                    options["max_seq_length"],
+                                    options["max_predictions_per_seq"],
+                                    options["use_v2_feature_names"])
+        tf_example = tf.train.Example(
+            features=tf.train.Features(feature=features))
+        writer.add(tf_example.SerializeToString())
+
+  # Documents are emitted from a random slot of a bounded buffer, which both
+  # shuffles them and provides the candidates for random next sentences.
+  documents = []
+  for document in _read_documents(
+      input_files[worker_index::options["num_workers"]], tokenizer,
+      processor_text_fn):
+    if len(documents) < options["document_buffer_size"]:
+      documents.append(document)
+      continue
+    document_index = rng.randrange(len(documents))
+    write_document(documents, document_index)
+    documents[document_index] = document
+  rng.shuffle(documents)
+  for document_index in range(len(documents)):
+    write_document(documents, document_index)
+
+  writer.close()
+  logging.info("Worker %d wrote %d instances", worker_index,
+               writer.total_written)
+  return writer.total_written
+
+
+_worker_args = None
+
+
+def _init_streaming_worker(*args):
+  global _worker_args
+  _worker_args = args
+
+
+def _write_examples_in_worker(worker_index):
+  return _write_worker_examples(worker_index, *_worker_args)
+
+
+def create_pretraining_data_streaming(
+    input_files,
+    output_files,
+    tokenizer,
+    processor_text_fn,
+    max_seq_length,
+    dupe_factor,
+    short_seq_prob,
+    masked_lm_prob,
+    max_predictions_per_seq,
+    random_seed,
+    do_whole_word_mask=False,
+    max_ngram_size=None,
+    num_workers=1,
+    document_buffer_size=1000,
+    shuffle_buffer_size=100000,
+    gzip_compress=False,
+    use_v2_feature_names=False,
+):
+  """Streams raw text into TF example files with bounded memory.
+
+  Unlike `create_training_instances`, the corpus is never held in memory.
+  Worker `i` of `num_workers` reads every `num_workers`-th input file, keeps at
+  most `document_buffer_size` documents (the candidates for random next
+  sentences) and `shuffle_buffer_size` serialized examples, and writes its own
+  output shards. The output is deterministic for a given `random_seed` and
+  `num_workers`.
+
+  Args:
+    input_files: List of raw text files.
+    output_files: List of output TF example files. With more than one worker,
+      each one is sharded as `<output_file>-<worker>-of-<num_workers>`.
+    tokenizer: The tokenizer.
+    processor_text_fn: Function applied to each input line.
+    max_seq_length: Maximum sequence length.
+    dupe_factor: Number of instances created from each document.
+    short_seq_prob: Probability of creating shorter sequences.
+    masked_lm_prob: Masked LM probability.
+    max_predictions_per_seq: Maximum number of masked LM predictions.
+    random_seed: Random seed of the first worker; worker `i` uses
+      `random_seed + i`.
+    do_whole_word_mask: Whether to use whole word masking.
+    max_ngram_size: Maximum size of the masked n-grams.
+    num_workers: Number of worker processes.
+    document_buffer_size: Number of documents held by each worker.
+    shuffle_buffer_size: Number of serialized examples held by each worker.
+    gzip_compress: Whether to GZIP compress the output files.
+    use_v2_feature_names: Whether to use the v2 feature names.
+
+  Returns:
+    The total number of written examples.
+  """
+  options = dict(
+      num_workers=num_workers,
+      random_seed=random_seed,
+      max_seq_length=max_seq_length,
+      dupe_factor=dupe_factor,
+      short_seq_prob=short_seq_prob,
+      masked_lm_prob=masked_lm_prob,
+      max_predictions_per_seq=max_predictions_per_seq,
+      do_whole_word_mask=do_whole_word_mask,
+      max_ngram_size=max_ngram_size,
+      document_buffer_size=document_buffer_size,
+      shuffle_buffer_size=shuffle_buffer_size,
+      gzip_compress=gzip_compress,
+      use_v2_feature_names=use_v2_feature_names,
+  )
+  args = (input_files, output_files, tokenizer, processor_text_fn, options)
+  if num_workers == 1:
+    total_written = _write_worker_examples(0, *args)
+  else:
+    # The arguments are handed to the workers on start-up so that tokenizers
+    # and text functions which cannot be pickled still work with `fork`.
+    with multiprocessing.Pool(
+        num_workers, initializer=_init_streaming_worker,
+        initargs=args) as pool:
+      total_written = sum(
+          pool.map(_write_examples_in_worker, range(num_workers)))
+  logging.info("Wrote %d total instances", total_written)
+  return total_written
+
+
 def create_instances_from_document(
     all_documents, document_index, max_seq_length, short_seq_prob,
     masked_lm_prob, max_predictions_per_seq, vocab_words, rng,
@@ -520,9 +759,12 @@ def _masking_ngrams(grams, max_ngram_size, max_masked_tokens, rng):
   # to guarantee this loop terminates.
   while (sum(masked_tokens) < max_masked_tokens and
          sum(len(s) for s in ngrams.values())):
-    # Pick an n-gram size based on our weights.
-    sz = random.choices(range(1, max_ngram_size+1),
-                        cum_weights=cummulative_weights)[0]
+    # Pick an n-gram size based on our weights. `rng` rather than the global
+    # `random` keeps the output deterministic for a given seed.
+    sz = 1
+    if max_ngram_size > 1:
+      sz = rng.choices(range(1, max_ngram_size+1),
+                       cum_weights=cummulative_weights)[0]
 
     # Ensure this size doesn't result in too many masked tokens.
     # E.g., a two-gram contains _at least_ two tokens.
@@ -684,6 +926,28 @@ def main(_):
   for input_file in input_files:
     logging.info("  %s", input_file)
 
+  output_files = FLAGS.output_file.split(",")
+  if FLAGS.streaming:
+    create_pretraining_data_streaming(
+        input_files,
+        output_files,
+        tokenizer,
+        processor_text_fn,
+        FLAGS.max_seq_length,
+        FLAGS.dupe_factor,
+        FLAGS.short_seq_prob,
+        FLAGS.masked_lm_prob,
+        FLAGS.max_predictions_per_seq,
+        FLAGS.random_seed,
+        FLAGS.do_whole_word_mask,
+        FLAGS.max_ngram_size,
+        num_workers=FLAGS.num_workers,
+        document_buffer_size=FLAGS.document_buffer_size,
+        shuffle_buffer_size=FLAGS.shuffle_buffer_size,
+        gzip_compress=FLAGS.gzip_compress,
+        use_v2_feature_names=FLAGS.use_v2_feature_names)
+    return
+
   rng = random.Random(FLAGS.random_seed)
   instances = create_training_instances(
       input_files,
@@ -699,7 +963,6 @@ def main(_):
       FLAGS.max_ngram_size,
   )
 
-  output_files = FLAGS.output_file.split(",")
   logging.info("*** Writing to output files ***")
   for output_file in output_files:
     logging.info("  %s", output_file)
@@ -13,15 +13,37 @@
 # limitations under the License.
 
 """Tests for official.nlp.data.create_pretraining_data."""
+import os
 import random
 
 import tensorflow as tf, tf_keras
 
 from official.nlp.data import create_pretraining_data as cpd
+from official.nlp.tools import tokenization
 
 _VOCAB_WORDS = ["vocab_1", "vocab_2"]
 
 
+def _write_corpus(directory, num_files, num_documents, seed=0):
+  """Writes random documents to text files and returns a tokenizer."""
+  rng = random.Random(seed)
+  words = ["word%d" % i for i in range(50)]
+  vocab_file = os.path.join(directory, "vocab.txt")
+  with tf.io.gfile.GFile(vocab_file, "w") as f:
+    f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+  input_files = []
+  for i in range(num_files):
+    input_file = os.path.join(directory, "input%d.txt" % i)
+    with tf.io.gfile.GFile(input_file, "w") as f:
+      for _ in range(num_documents):
+        for _ in range(rng.randint(1, 8)):
+          f.write(" ".join(rng.choices(words, k=rng.randint(1, 20))) + "\n")
+        f.write("\n")
+    input_files.append(input_file)
+  tokenizer = tokenization.FullTokenizer(vocab_file, do_lower_case=True)
+  return input_files, tokenizer
+
+
 class CreatePretrainingDataTest(tf.test.TestCase):
 
   def assertTokens(self, input_tokens, output_tokens, masked_positions,
@@ -123,6 +145,58 @@ class CreatePretrainingDataTest(tf.test.TestCase):
       self.assertLen(masked_labels, 76)
       self.assertTokens(tokens, output_tokens, masked_positions, masked_labels)
 
+  def _stream(self, input_files, tokenizer, output_dir, num_workers):
+    output_files = [os.path.join(output_dir, "a.tfrecord"),
+                    os.path.join(output_dir, "b.tfrecord")]
+    total_written = cpd.create_pretraining_data_streaming(
+        input_files,
+        output_files,
+        tokenizer,
+        cpd.get_processor_text_fn(False, True),
+        max_seq_length=32,
+        dupe_factor=2,
+        short_seq_prob=0.1,
+        masked_lm_prob=0.15,
+        max_predictions_per_seq=5,
+        random_seed=7,
+        do_whole_word_mask=True,
+        max_ngram_size=2,
+        num_workers=num_workers,
+        document_buffer_size=8,
+        shuffle_buffer_size=16)
+    records = {}
+    for path in sorted(tf.io.gfile.glob(os.path.join(output_dir, "*"))):
+      records[os.path.basename(path)] = [
+          r.numpy() for r in tf.data.TFRecordDataset(path)]
+    self.assertEqual(total_written, sum(len(r) for r in records.values()))
+    return records
+
+  def test_create_pretraining_data_streaming(self):
+    input_files, tokenizer = _write_corpus(
+        self.create_tempdir().full_path, num_files=3, num_documents=20)
+
+    for num_workers in (1, 2):
+      records = self._stream(input_files, tokenizer,
+                             self.create_tempdir().full_path, num_workers)
+      repeated = self._stream(input_files, tokenizer,
+                              self.create_tempdir().full_path, num_workers)
+      self.assertEqual(records, repeated)
+      if num_workers == 1:
+        self.assertCountEqual(["a.tfrecord", "b.tfrecord"], records)
+      else:
+        self.assertCountEqual([
+            "a.tfrecord-00000-of-00002", "a.tfrecord-00001-of-00002",
+            "b.tfrecord-00000-of-00002", "b.tfrecord-00001-of-00002"
+        ], records)
+
+      for serialized in records[sorted(records)[0]]:
+        example = tf.train.Example.FromString(serialized)
+        feature = example.features.feature
+        self.assertLen(feature["input_ids"].int64_list.value, 32)
+        self.assertLen(feature["masked_lm_positions"].int64_list.value, 5)
+        self.assertEqual(feature["input_ids"].int64_list.value[0],
+                         tokenizer.vocab["[CLS]"])
+
 
 if __name__ == "__main__":
   tf.test.main()
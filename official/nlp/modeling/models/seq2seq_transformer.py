@@ -51,6 +51,8 @@ class Seq2SeqTransformer(tf_keras.Model):
                encoder_layer=None,
                decoder_layer=None,
                eos_id=EOS_ID,
+               lazy_cache_gather=False,
+               early_termination=False,
                **kwargs):
     """Initialize layers to build Transformer model.
 
@@ -67,6 +69,11 @@ class Seq2SeqTransformer(tf_keras.Model):
       encoder_layer: An initialized encoder layer.
       decoder_layer: An initialized decoder layer.
       eos_id: Id of end of sentence token.
+      lazy_cache_gather: Whether beam search stores beam-parent indices and
+        gathers the decoder cache once per step, only when beams are reordered.
+      early_termination: Whether beam search stops decoding each example as
+        soon as its result is final. Requires `lazy_cache_gather` and no padded
+        decode.
       **kwargs: other keyword arguments.
     """
     super().__init__(**kwargs)
@@ -79,6 +86,8 @@ class Seq2SeqTransformer(tf_keras.Model):
     self._beam_size = beam_size
     self._alpha = alpha
     self._eos_id = eos_id
+    self._lazy_cache_gather = lazy_cache_gather
+    self._early_termination = early_termination
     self.embedding_lookup = layers.OnDeviceEmbedding(
         vocab_size=self._vocab_size,
         embedding_width=self._embedding_width,
@@ -105,6 +114,8 @@ class Seq2SeqTransformer(tf_keras.Model):
         "alpha": self._alpha,
         "encoder_layer": self.encoder_layer,
         "decoder_layer": self.decoder_layer,
+        "lazy_cache_gather": self._lazy_cache_gather,
+        "early_termination": self._early_termination,
     }
     base_config = super(Seq2SeqTransformer, self).get_config()
     return dict(list(base_config.items()) + list(config.items()))
@@ -254,7 +265,9 @@ class Seq2SeqTransformer(tf_keras.Model):
           max_decode_length=max_decode_length,
           eos_id=self._eos_id,
           padded_decode=self._padded_decode,
-          dtype=self.compute_dtype)
+          dtype=self.compute_dtype,
+          lazy_cache_gather=self._lazy_cache_gather,
+          early_termination=self._early_termination)
 
       # Get the top sequence for each batch element
       top_decoded_ids = decoded_ids[:, 0, 1:]
@@ -34,6 +34,7 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
       embedding_width,
       self_attention_cls=None,
       cross_attention_cls=None,
+      **kwargs,
   ):
     num_layers = 1
     num_attention_heads = 2
@@ -66,7 +67,8 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
         beam_size=4,
         alpha=0.6,
         encoder_layer=encoder_layer,
-        decoder_layer=decoder_layer)
+        decoder_layer=decoder_layer,
+        **kwargs)
 
   @combinations.generate(
       combinations.combine(
@@ -160,6 +162,28 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(self_attention_called, custom_self_attention)
     self.assertEqual(cross_attention_called, custom_cross_attention)
 
+  @parameterized.parameters((True, False), (False, False), (False, True))
+  def test_lazy_cache_gather(self, padded_decode, early_termination):
+    decode_max_length = 10
+    embedding_width = 16
+    model = self._build_model(padded_decode, decode_max_length,
+                              embedding_width)
+    lazy_model = self._build_model(
+        padded_decode,
+        decode_max_length,
+        embedding_width,
+        lazy_cache_gather=True,
+        early_termination=early_termination)
+    inputs = dict(
+        inputs=np.random.RandomState(0).randint(
+            1, 100, size=(1, decode_max_length)).astype(np.int32))
+    expected = model(inputs)
+    lazy_model(inputs)
+    lazy_model.set_weights(model.get_weights())
+    outputs = lazy_model(inputs)
+    self.assertAllEqual(expected["outputs"], outputs["outputs"])
+    self.assertAllClose(expected["scores"], outputs["scores"])
+
   @parameterized.parameters(True, False)
   def test_create_savedmodel(self, padded_decode):
     decode_max_length = 10
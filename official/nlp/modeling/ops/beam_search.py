@@ -73,6 +73,15 @@ class _StateKeys(object):
   # where the mask is 1.
   CONSTRAINT_MASK = "CONSTRAINT_MASK"
 
+  # Only used with `lazy_cache_gather`, where ALIVE_CACHE holds the flat cache
+  # rows as returned by the last call to `symbols_to_logits_fn`, without being
+  # reordered to the alive beams. CACHE_PARENTS is the row of ALIVE_CACHE that
+  # each alive beam continues from. Shape [num_active * beam_size]
+  CACHE_PARENTS = "CACHE_PARENTS"
+  # Only used with `early_termination`. Batch indices of the examples that are
+  # still decoded. Shape [num_active]
+  ACTIVE_INDICES = "ACTIVE_INDICES"
+
 
 def _expand_to_same_rank(tensor, target):
   """Expands a given tensor to target's rank to be broadcastable.
@@ -114,6 +123,8 @@ class SequenceBeamSearch(tf.Module):
       dtype=tf.float32,
       noise_multiplier: float = 0.0,
       decoding_name=None,
+      lazy_cache_gather: bool = False,
+      early_termination: bool = False,
   ):
     """Initialize sequence beam search.
 
@@ -138,7 +149,25 @@ class SequenceBeamSearch(tf.Module):
         tf.float32.
       noise_multiplier: The amount of noise.
       decoding_name: an optional name for the decoding loop tensors.
+      lazy_cache_gather: A bool. If True, the cache is not tiled to the beams
+        and reordered twice per step. Instead, the beam-parent row of each
+        alive beam is stored and the cache is gathered once, at the start of
+        the next step, and only if the beams were reordered. The results are
+        identical to the default layout.
+      early_termination: A bool. If True, examples stop being decoded as soon
+        as their finished sequences cannot change, and are removed from the
+        batch passed to `symbols_to_logits_fn`. Each example then gets the
+        result of decoding it on its own. Requires `lazy_cache_gather` and
+        `padded_decode=False`.
+
+    Raises:
+      ValueError: If `early_termination` is used without `lazy_cache_gather`
+        or with `padded_decode`.
     """
+    if early_termination and (padded_decode or not lazy_cache_gather):
+      raise ValueError(
+          "early_termination requires lazy_cache_gather=True and "
+          "padded_decode=False.")
     self.symbols_to_logits_fn = symbols_to_logits_fn
     self.vocab_size = vocab_size
     self.beam_size = beam_size
@@ -152,6 +181,8 @@ class SequenceBeamSearch(tf.Module):
     self.dtype = tf.as_dtype(dtype)
     self.decoding_name = decoding_name
     self.noise_multiplier = noise_multiplier
+    self.lazy_cache_gather = lazy_cache_gather
+    self.early_termination = early_termination
 
   def search(self, initial_ids, initial_cache, constraint_mask=None):
     """Beam search for sequences with highest scores.
@@ -168,6 +199,10 @@ class SequenceBeamSearch(tf.Module):
     Returns:
       finished_seq and finished_scores.
     """
+    if self.lazy_cache_gather:
+      return self._search_with_cache_parents(
+          initial_ids, initial_cache, constraint_mask=constraint_mask)
+
     batch_size = (
         initial_ids.shape.as_list()[0]
         if self.padded_decode else tf.shape(initial_ids)[0])
@@ -210,28 +245,7 @@ class SequenceBeamSearch(tf.Module):
 
       flat_logits, flat_cache = self.symbols_to_logits_fn(
           flat_ids, i, flat_cache)
-
-      if _StateKeys.CONSTRAINT_MASK in state:
-        constraint_mask = state[_StateKeys.CONSTRAINT_MASK]
-        constraint_mask = tf.cond(
-            tf.equal(i, 0),
-            lambda: constraint_mask,
-            lambda: tf.ones_like(constraint_mask),
-        )
-        penalty = tf.cast(
-            tf.cast(constraint_mask != 1, tf.int32) * 999_999_999,
-            flat_logits.dtype,
-        )
-        flat_logits = flat_logits - penalty[tf.newaxis, :]
-      else:
-        constraint_mask = None
-
-      if self.noise_multiplier > 0:
-        noise = tf.random.uniform(flat_logits.shape, dtype=flat_logits.dtype)
-        # Generates standard Gumbel(0, 1) noise, GSE Tensors
-        noise = -tf.math.log(-tf.math.log(noise))
-        # NOMUTANTS -- may not impact final result.
-        flat_logits = flat_logits + noise * self.noise_multiplier
+      flat_logits, constraint_mask = self._adjust_logits(flat_logits, i, state)
 
       # Unflatten logits to shape [batch_size, beam_size, vocab_size]
       logits = _unflatten_beam_dim(flat_logits, batch_size, self.beam_size)
@@ -328,44 +342,12 @@ class SequenceBeamSearch(tf.Module):
            Scores of finished sequences,
            Finished flags of finished sequences}
       """
-      i = state[_StateKeys.CUR_INDEX]
-      finished_seq = state[_StateKeys.FINISHED_SEQ]
-      finished_scores = state[_StateKeys.FINISHED_SCORES]
-      finished_flags = state[_StateKeys.FINISHED_FLAGS]
-
-      # First append a column of 0-ids to finished_seq to increment the length.
-      # New shape of finished_seq: [batch_size, beam_size, i + 1]
-      if not self.padded_decode:
-        finished_seq = tf.concat(
-            [finished_seq,
-             tf.zeros([batch_size, self.beam_size, 1], tf.int32)],
-            axis=2)
-
-      # Calculate new seq scores from log probabilities.
-      length_norm = _length_normalization(self.alpha, i + 1, dtype=self.dtype)
-      new_scores = new_log_probs / length_norm
-
-      # Set the scores of the still-alive seq in new_seq to large negative
-      # values.
-      new_scores += ((1. - tf.cast(new_finished_flags, self.dtype)) *
-                     -inf(self.dtype))
-
-      # Combine sequences, scores, and flags.
-      finished_seq = tf.concat([finished_seq, new_seq], axis=1)
-      finished_scores = tf.concat([finished_scores, new_scores], axis=1)
-      finished_flags = tf.concat([finished_flags, new_finished_flags], axis=1)
-
-      # Return the finished sequences with the best scores.
-      _, topk_indexes = tf.nn.top_k(finished_scores, k=self.beam_size)
-      top_finished_seq, top_finished_scores, top_finished_flags = (
-          self._gather_beams([finished_seq, finished_scores, finished_flags],
-                             topk_indexes, batch_size, self.beam_size))
-
-      return {
-          _StateKeys.FINISHED_SEQ: top_finished_seq,
-          _StateKeys.FINISHED_SCORES: top_finished_scores,
-          _StateKeys.FINISHED_FLAGS: top_finished_flags
-      }
+      return self._merge_finished(state[_StateKeys.CUR_INDEX],
+                                  state[_StateKeys.FINISHED_SEQ],
+                                  state[_StateKeys.FINISHED_SCORES],
+                                  state[_StateKeys.FINISHED_FLAGS], new_seq,
+                                  new_log_probs, new_finished_flags,
+                                  batch_size)
 
     def _search_step(state):
       """Beam search loop body.
@@ -388,12 +370,7 @@ class SequenceBeamSearch(tf.Module):
       new_seq, new_log_probs, topk_ids, new_cache, constraint_mask = (
           _grow_alive_seq(state)
       )
-      new_finished_flags = tf.equal(topk_ids, self.eos_id[0])
-      for eos_id in self.eos_id[1:]:
-        one_finished_flags = tf.equal(topk_ids, eos_id)
-        new_finished_flags = tf.logical_or(
-            new_finished_flags, one_finished_flags
-        )
+      new_finished_flags = self._is_eos(topk_ids)
       # Collect top beam_size alive sequences
       alive_state = _get_new_alive_state(new_seq, new_log_probs,
                                          new_finished_flags, new_cache)
@@ -423,6 +400,286 @@ class SequenceBeamSearch(tf.Module):
     finished_state = finished_state[0]
     return self._process_finished_state(finished_state)
 
+  def _search_with_cache_parents(self, initial_ids, initial_cache,
+                                 constraint_mask=None):
+    """Beam search that stores beam-parent indices instead of gathered caches.
+
+    See `lazy_cache_gather` and `early_termination` in `__init__`.
+
+    Args:
+      initial_ids: initial ids to pass into the symbols_to_logits_fn. int tensor
+        with shape [batch_size, 1]
+      initial_cache: dictionary storing values to be passed into the
+        symbols_to_logits_fn.
+      constraint_mask: a [vocab_size] tensor, with 1 represent prefix.
+
+    Returns:
+      finished_seq and finished_scores.
+    """
+    batch_size = (
+        initial_ids.shape.as_list()[0]
+        if self.padded_decode else tf.shape(initial_ids)[0])
+    if self.padded_decode:
+      # Static shapes are needed, so the cache is tiled to the beams upfront.
+      state, state_shapes = self._create_initial_state(
+          initial_ids, initial_cache, batch_size,
+          constraint_mask=constraint_mask)
+      cache = tf.nest.map_structure(flatten_beam_dim,
+                                    state[_StateKeys.ALIVE_CACHE])
+      cache_parents = tf.range(batch_size * self.beam_size)
+      state_shapes[_StateKeys.ALIVE_CACHE] = tf.nest.map_structure(
+          lambda t: t.get_shape(), cache)
+      state_shapes[_StateKeys.CACHE_PARENTS] = tf.TensorShape(
+          [batch_size * self.beam_size])
+    else:
+      # The untiled cache is expanded to the beams by the first gather.
+      self._check_cache_dtype(initial_cache)
+      state, state_shapes = self._create_initial_state(
+          initial_ids, {}, batch_size, constraint_mask=constraint_mask)
+      cache = initial_cache
+      cache_parents = tf.range(batch_size * self.beam_size) // self.beam_size
+      state_shapes[_StateKeys.ALIVE_CACHE] = tf.nest.map_structure(
+          _get_shape_keep_last_dim, cache)
+      state_shapes[_StateKeys.CACHE_PARENTS] = tf.TensorShape([None])
+    state[_StateKeys.ALIVE_CACHE] = cache
+    state[_StateKeys.CACHE_PARENTS] = cache_parents
+    if self.early_termination:
+      state[_StateKeys.ACTIVE_INDICES] = tf.range(batch_size)
+      state_shapes[_StateKeys.ACTIVE_INDICES] = tf.TensorShape([None])
+
+    def _search_step(state):
+      """Beam search loop body; see `search` for the default layout."""
+      i = state[_StateKeys.CUR_INDEX]
+      alive_seq = state[_StateKeys.ALIVE_SEQ]
+      alive_log_probs = state[_StateKeys.ALIVE_LOG_PROBS]
+      finished_seq = state[_StateKeys.FINISHED_SEQ]
+      finished_scores = state[_StateKeys.FINISHED_SCORES]
+      finished_flags = state[_StateKeys.FINISHED_FLAGS]
+      beams_to_keep = 2 * self.beam_size
+
+      # Only the active examples are decoded.
+      if self.early_termination:
+        active_indices = state[_StateKeys.ACTIVE_INDICES]
+        num_active = tf.size(active_indices)
+        alive_seq, alive_log_probs, finished_seq, finished_scores, \
+            finished_flags = [
+                tf.gather(t, active_indices)
+                for t in (alive_seq, alive_log_probs, finished_seq,
+                          finished_scores, finished_flags)
+            ]
+      else:
+        num_active = batch_size
+
+      if self.padded_decode:
+        flat_ids = tf.reshape(
+            tf.slice(alive_seq, [0, 0, i], [batch_size, self.beam_size, 1]),
+            [batch_size * self.beam_size, -1])
+      else:
+        flat_ids = flatten_beam_dim(alive_seq)
+      flat_cache = self._gather_cache(state[_StateKeys.ALIVE_CACHE],
+                                      state[_StateKeys.CACHE_PARENTS])
+      flat_logits, flat_cache = self.symbols_to_logits_fn(
+          flat_ids, i, flat_cache)
+      flat_logits, constraint_mask = self._adjust_logits(flat_logits, i, state)
+
+      logits = _unflatten_beam_dim(flat_logits, num_active, self.beam_size)
+      log_probs = _log_prob_from_logits(logits) + tf.expand_dims(
+          alive_log_probs, axis=2)
+      flat_log_probs = tf.reshape(log_probs,
+                                  [-1, self.beam_size * self.vocab_size])
+      topk_log_probs, topk_indices = tf.nn.top_k(
+          flat_log_probs, k=beams_to_keep)
+      topk_beam_indices = topk_indices // self.vocab_size
+      topk_ids = topk_indices % self.vocab_size
+      # Only the sequences are gathered here; the cache is gathered at the next
+      # step through the parent indices.
+      topk_seq = self._gather_beams(alive_seq, topk_beam_indices, num_active,
+                                    beams_to_keep)
+      if self.padded_decode:
+        topk_seq = tf.transpose(topk_seq, perm=[2, 0, 1])
+        topk_seq = tf.tensor_scatter_nd_update(topk_seq, [[i + 1]],
+                                               tf.expand_dims(topk_ids, axis=0))
+        topk_seq = tf.transpose(topk_seq, perm=[1, 2, 0])
+      else:
+        topk_seq = tf.concat(
+            [topk_seq, tf.expand_dims(topk_ids, axis=2)], axis=2)
+      new_finished_flags = self._is_eos(topk_ids)
+
+      # Collect the top beam_size alive sequences and their cache parents.
+      alive_candidate_log_probs = topk_log_probs + tf.cast(
+          new_finished_flags, self.dtype) * -inf(self.dtype)
+      _, alive_indexes = tf.nn.top_k(
+          alive_candidate_log_probs, k=self.beam_size)
+      new_alive_seq, new_alive_log_probs, parent_beams = self._gather_beams(
+          [topk_seq, alive_candidate_log_probs, topk_beam_indices],
+          alive_indexes, num_active, self.beam_size)
+      cache_parents = tf.reshape(
+          parent_beams +
+          tf.expand_dims(tf.range(num_active) * self.beam_size, axis=1), [-1])
+
+      finished_state = self._merge_finished(i, finished_seq, finished_scores,
+                                            finished_flags, topk_seq,
+                                            topk_log_probs, new_finished_flags,
+                                            num_active)
+      new_state = {
+          _StateKeys.CUR_INDEX: i + 1,
+          _StateKeys.ALIVE_SEQ: new_alive_seq,
+          _StateKeys.ALIVE_LOG_PROBS: new_alive_log_probs,
+          _StateKeys.ALIVE_CACHE: flat_cache,
+          _StateKeys.CACHE_PARENTS: cache_parents,
+      }
+      new_state.update(finished_state)
+
+      if self.early_termination:
+        # Write the active examples back. The sequences of the finished
+        # examples are padded with 0s to the new length.
+        scatter_indices = tf.expand_dims(active_indices, axis=1)
+        for key in (_StateKeys.ALIVE_SEQ, _StateKeys.FINISHED_SEQ):
+          new_state[key] = tf.tensor_scatter_nd_update(
+              tf.pad(state[key], [[0, 0], [0, 0], [0, 1]]), scatter_indices,
+              new_state[key])
+        for key in (_StateKeys.ALIVE_LOG_PROBS, _StateKeys.FINISHED_SCORES,
+                    _StateKeys.FINISHED_FLAGS):
+          new_state[key] = tf.tensor_scatter_nd_update(state[key],
+                                                       scatter_indices,
+                                                       new_state[key])
+        # Drop the examples whose finished sequences can no longer change.
+        keep = tf.logical_not(
+            self._is_example_done(new_alive_log_probs,
+                                  finished_state[_StateKeys.FINISHED_SCORES],
+                                  finished_state[_StateKeys.FINISHED_FLAGS]))
+        new_state[_StateKeys.ACTIVE_INDICES] = tf.boolean_mask(
+            active_indices, keep)
+        new_state[_StateKeys.CACHE_PARENTS] = tf.reshape(
+            tf.boolean_mask(
+                tf.reshape(cache_parents, [num_active, self.beam_size]), keep),
+            [-1])
+      if constraint_mask is not None:
+        new_state[_StateKeys.CONSTRAINT_MASK] = constraint_mask
+      return [new_state]
+
+    def _continue_search(state):
+      if not self.early_termination:
+        return self._continue_search(state)
+      return tf.logical_and(
+          tf.less(state[_StateKeys.CUR_INDEX], self.max_decode_length),
+          tf.greater(tf.size(state[_StateKeys.ACTIVE_INDICES]), 0))
+
+    finished_state = tf.nest.map_structure(
+        tf.stop_gradient,
+        tf.while_loop(
+            _continue_search,
+            _search_step,
+            loop_vars=[state],
+            shape_invariants=[state_shapes],
+            parallel_iterations=1,
+            name=self.decoding_name))
+    return self._process_finished_state(finished_state[0])
+
+  def _gather_cache(self, cache, cache_parents):
+    """Gathers the cache rows of the alive beams, unless already in order."""
+    num_rows = tf.shape(tf.nest.flatten(cache)[0])[0]
+    num_parents = tf.size(cache_parents)
+    in_order = tf.logical_and(
+        tf.equal(num_rows, num_parents),
+        tf.reduce_all(tf.equal(cache_parents, tf.range(num_parents))))
+    return tf.cond(
+        in_order, lambda: cache,
+        lambda: tf.nest.map_structure(lambda t: tf.gather(t, cache_parents),
+                                      cache))
+
+  def _adjust_logits(self, flat_logits, i, state):
+    """Applies the prefix constraint and the noise to the logits."""
+    if _StateKeys.CONSTRAINT_MASK in state:
+      constraint_mask = state[_StateKeys.CONSTRAINT_MASK]
+      constraint_mask = tf.cond(
+          tf.equal(i, 0),
+          lambda: constraint_mask,
+          lambda: tf.ones_like(constraint_mask),
+      )
+      penalty = tf.cast(
+          tf.cast(constraint_mask != 1, tf.int32) * 999_999_999,
+          flat_logits.dtype,
+      )
+      flat_logits = flat_logits - penalty[tf.newaxis, :]
+    else:
+      constraint_mask = None
+
+    if self.noise_multiplier > 0:
+      noise = tf.random.uniform(flat_logits.shape, dtype=flat_logits.dtype)
+      # Generates standard Gumbel(0, 1) noise, GSE Tensors
+      noise = -tf.math.log(-tf.math.log(noise))
+      # NOMUTANTS -- may not impact final result.
+      flat_logits = flat_logits + noise * self.noise_multiplier
+    return flat_logits, constraint_mask
+
+  def _is_eos(self, ids):
+    """Returns whether each id is one of the EOS ids."""
+    flags = tf.equal(ids, self.eos_id[0])
+    for eos_id in self.eos_id[1:]:
+      flags = tf.logical_or(flags, tf.equal(ids, eos_id))
+    return flags
+
+  def _merge_finished(self, i, finished_seq, finished_scores, finished_flags,
+                      new_seq, new_log_probs, new_finished_flags, batch_size):
+    """Combine new and old finished sequences, and gather the top k sequences.
+
+    Args:
+      i: The loop index.
+      finished_seq: Current finished sequences, int32 tensor with shape
+        [batch_size, beam_size, i + 1] ([..., max_decode_length + 1] with
+        padded decode).
+      finished_scores: Scores of the finished sequences, [batch_size,
+        beam_size].
+      finished_flags: Flags of the finished sequences, [batch_size, beam_size].
+      new_seq: New sequences generated by growing the current alive sequences
+        int32 tensor with shape [batch_size, 2 * beam_size, i + 2]
+      new_log_probs: Log probabilities of new sequences float32 tensor with
+        shape [batch_size, 2 * beam_size]
+      new_finished_flags: A boolean Tensor indicates which sequences are live
+        inside the beam.
+      batch_size: The batch size.
+
+    Returns:
+      Dictionary with finished keys from _StateKeys:
+        {Top beam_size finished sequences based on score,
+         Scores of finished sequences,
+         Finished flags of finished sequences}
+    """
+    # First append a column of 0-ids to finished_seq to increment the length.
+    # New shape of finished_seq: [batch_size, beam_size, i + 1]
+    if not self.padded_decode:
+      finished_seq = tf.concat(
+          [finished_seq,
+           tf.zeros([batch_size, self.beam_size, 1], tf.int32)],
+          axis=2)
+
+    # Calculate new seq scores from log probabilities.
+    length_norm = _length_normalization(self.alpha, i + 1, dtype=self.dtype)
+    new_scores = new_log_probs / length_norm
+
+    # Set the scores of the still-alive seq in new_seq to large negative
+    # values.
+    new_scores += ((1. - tf.cast(new_finished_flags, self.dtype)) *
+                   -inf(self.dtype))
+
+    # Combine sequences, scores, and flags.
+    finished_seq = tf.concat([finished_seq, new_seq], axis=1)
+    finished_scores = tf.concat([finished_scores, new_scores], axis=1)
+    finished_flags = tf.concat([finished_flags, new_finished_flags], axis=1)
+
+    # Return the finished sequences with the best scores.
+    _, topk_indexes = tf.nn.top_k(finished_scores, k=self.beam_size)
+    top_finished_seq, top_finished_scores, top_finished_flags = (
+        self._gather_beams([finished_seq, finished_scores, finished_flags],
+                           topk_indexes, batch_size, self.beam_size))
+
+    return {
+        _StateKeys.FINISHED_SEQ: top_finished_seq,
+        _StateKeys.FINISHED_SCORES: top_finished_scores,
+        _StateKeys.FINISHED_FLAGS: top_finished_flags
+    }
+
   def _process_finished_state(self, finished_state):
     alive_seq = finished_state[_StateKeys.ALIVE_SEQ]
     alive_log_probs = finished_state[_StateKeys.ALIVE_LOG_PROBS]
@@ -441,10 +698,7 @@ class SequenceBeamSearch(tf.Module):
     finished_scores = tf.where(score_cond, finished_scores, alive_log_probs)
     return finished_seq, finished_scores
 
-  def _create_initial_state(
-      self, initial_ids, initial_cache, batch_size, constraint_mask=None
-  ):
-    """Return initial state dictionary and its shape invariants."""
+  def _check_cache_dtype(self, initial_cache):
     for key, value in initial_cache.items():
       for inner_value in tf.nest.flatten(value):
         if inner_value.dtype != self.dtype:
@@ -453,6 +707,12 @@ class SequenceBeamSearch(tf.Module):
               "match SequenceBeamSearch's dtype of %s. Value: %s" %
               (key, inner_value.dtype.name, self.dtype.name, inner_value))
 
+  def _create_initial_state(
+      self, initial_ids, initial_cache, batch_size, constraint_mask=None
+  ):
+    """Return initial state dictionary and its shape invariants."""
+    self._check_cache_dtype(initial_cache)
+
     # Current loop index (starts at 0)
     cur_index = tf.constant(0)
 
@@ -563,12 +823,29 @@ class SequenceBeamSearch(tf.Module):
       terminate.
     """
     i = state[_StateKeys.CUR_INDEX]
-    alive_log_probs = state[_StateKeys.ALIVE_LOG_PROBS]
-    finished_scores = state[_StateKeys.FINISHED_SCORES]
-    finished_flags = state[_StateKeys.FINISHED_FLAGS]
-
     not_at_max_decode_length = tf.less(i, self.max_decode_length)
+    worst_finished_score_better_than_best_alive_score = tf.reduce_all(
+        self._is_example_done(state[_StateKeys.ALIVE_LOG_PROBS],
+                              state[_StateKeys.FINISHED_SCORES],
+                              state[_StateKeys.FINISHED_FLAGS]))
 
+    return tf.logical_and(
+        not_at_max_decode_length,
+        tf.logical_not(worst_finished_score_better_than_best_alive_score))
+
+  def _is_example_done(self, alive_log_probs, finished_scores, finished_flags):
+    """Returns whether the worst finished score beats the best alive score.
+
+    Args:
+      alive_log_probs: Log probabilities of the alive sequences, [batch_size,
+        beam_size].
+      finished_scores: Scores of the finished sequences, [batch_size,
+        beam_size].
+      finished_flags: Flags of the finished sequences, [batch_size, beam_size].
+
+    Returns:
+      Bool tensor with shape [batch_size].
+    """
     # Calculate largest length penalty (the larger penalty, the better score).
     max_length_norm = _length_normalization(
         self.alpha, self.max_decode_length, dtype=self.dtype)
@@ -590,12 +867,7 @@ class SequenceBeamSearch(tf.Module):
     lowest_finished_scores += ((1.0 - tf.cast(finished_batches, self.dtype)) *
                                -inf(self.dtype))
 
-    worst_finished_score_better_than_best_alive_score = tf.reduce_all(
-        tf.greater(lowest_finished_scores, best_alive_scores))
-
-    return tf.logical_and(
-        not_at_max_decode_length,
-        tf.logical_not(worst_finished_score_better_than_best_alive_score))
+    return tf.greater(lowest_finished_scores, best_alive_scores)
 
   @staticmethod
   def _gather_beams(nested, beam_indices, batch_size, new_beam_size):
@@ -649,6 +921,8 @@ def sequence_beam_search(
     noise_multiplier: float = 0.0,
     decoding_name=None,
     constraint_mask=None,
+    lazy_cache_gather=False,
+    early_termination=False,
 ):
   """Search for sequence of subtoken ids with the largest probability.
 
@@ -678,6 +952,11 @@ def sequence_beam_search(
     decoding_name: an optional name for the decoding loop tensors.
     constraint_mask: The BS will only constraint the next token to where the
       mask is 1.
+    lazy_cache_gather: Whether to store beam-parent indices and gather the
+      cache once per step, only when the beams were reordered.
+    early_termination: Whether to stop decoding each example as soon as its
+      finished sequences cannot change. Requires `lazy_cache_gather` and no
+      padded decode.
 
   Returns:
     Top decoded sequences [batch_size, beam_size, max_decode_length]
@@ -694,6 +973,8 @@ def sequence_beam_search(
       dtype,
       noise_multiplier,
       decoding_name,
+      lazy_cache_gather=lazy_cache_gather,
+      early_termination=early_termination,
   )
   return sbs.search(initial_ids, initial_cache, constraint_mask=constraint_mask)
 
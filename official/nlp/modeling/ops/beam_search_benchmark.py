@@ -0,0 +1,131 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks the beam search cache layouts on `Seq2SeqTransformer` decoding.
+
+Compares the default layout, which tiles the decoder cache to the beams and
+gathers it twice per step, with `lazy_cache_gather` and `early_termination`,
+and checks that the decoded ids match the default layout.
+
+Example usage:
+  python -m official.nlp.modeling.ops.beam_search_benchmark \
+    --batch_sizes=1,8,32 --beam_sizes=4,8
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+
+_BATCH_SIZES = flags.DEFINE_list('batch_sizes', ['1', '8', '32'],
+                                 'Batch sizes to benchmark.')
+_BEAM_SIZES = flags.DEFINE_list('beam_sizes', ['4', '8'],
+                                'Beam sizes to benchmark.')
+_NUM_LAYERS = flags.DEFINE_integer('num_layers', 2,
+                                   'Number of encoder and decoder layers.')
+_HIDDEN_SIZE = flags.DEFINE_integer('hidden_size', 256, 'Hidden size.')
+_NUM_HEADS = flags.DEFINE_integer('num_heads', 4, 'Number of attention heads.')
+_VOCAB_SIZE = flags.DEFINE_integer('vocab_size', 8000, 'Vocabulary size.')
+_INPUT_LENGTH = flags.DEFINE_integer('input_length', 32, 'Input length.')
+_DECODE_LENGTH = flags.DEFINE_integer('decode_length', 64,
+                                      'Maximum decode length.')
+_NUM_RUNS = flags.DEFINE_integer('num_runs', 3,
+                                 'Number of timed runs per configuration.')
+
+_MODES = (
+    ('default', dict()),
+    ('lazy_cache_gather', dict(lazy_cache_gather=True)),
+    ('early_termination', dict(lazy_cache_gather=True,
+                               early_termination=True)),
+)
+
+
+def _build_model(beam_size, **kwargs):
+  encdec_kwargs = dict(
+      num_layers=_NUM_LAYERS.value,
+      num_attention_heads=_NUM_HEADS.value,
+      intermediate_size=4 * _HIDDEN_SIZE.value,
+      activation='relu',
+      dropout_rate=0.0,
+      attention_dropout_rate=0.0,
+      use_bias=False,
+      norm_first=True,
+      norm_epsilon=1e-6,
+      intermediate_dropout=0.0)
+  return seq2seq_transformer.Seq2SeqTransformer(
+      vocab_size=_VOCAB_SIZE.value,
+      embedding_width=_HIDDEN_SIZE.value,
+      decode_max_length=_DECODE_LENGTH.value,
+      beam_size=beam_size,
+      alpha=0.6,
+      encoder_layer=seq2seq_transformer.TransformerEncoder(**encdec_kwargs),
+      decoder_layer=seq2seq_transformer.TransformerDecoder(**encdec_kwargs),
+      **kwargs)
+
+
+def _time_decode(model, inputs):
+  decode = tf.function(lambda inputs: model(dict(inputs=inputs)))
+  outputs = decode(inputs)  # Traces the function.
+  latencies = []
+  for _ in range(_NUM_RUNS.value):
+    start = time.perf_counter()
+    outputs = decode(inputs)
+    outputs['outputs'].numpy()
+    latencies.append(time.perf_counter() - start)
+  return np.median(latencies), outputs['outputs'].numpy()
+
+
+def main(_):
+  rng = np.random.default_rng(0)
+  for beam_size in [int(x) for x in _BEAM_SIZES.value]:
+    reference = _build_model(beam_size)
+    reference(dict(inputs=tf.ones([1, _INPUT_LENGTH.value], tf.int32)))
+    for batch_size in [int(x) for x in _BATCH_SIZES.value]:
+      inputs = tf.constant(
+          rng.integers(1, _VOCAB_SIZE.value,
+                       size=(batch_size, _INPUT_LENGTH.value)), tf.int32)
+      default_latency = None
+      for name, kwargs in _MODES:
+        if kwargs:
+          model = _build_model(beam_size, **kwargs)
+          model(dict(inputs=inputs[:1]))
+          model.set_weights(reference.get_weights())
+        else:
+          model = reference
+        latency, outputs = _time_decode(model, inputs)
+        if default_latency is None:
+          default_latency, default_outputs = latency, outputs
+          matches = True
+        elif kwargs.get('early_termination'):
+          # Each example matches its own decode rather than the batched one,
+          # so only the top sequences up to the common length are compared.
+          length = min(outputs.shape[1], default_outputs.shape[1])
+          matches = np.mean(
+              np.all(outputs[:, :length] == default_outputs[:, :length],
+                     axis=1))
+        else:
+          matches = np.array_equal(outputs, default_outputs)
+        logging.info(
+            'batch %3d beam %d %-18s %8.1f ms  speedup %.2fx  matches %s',
+            batch_size, beam_size, name, latency * 1e3,
+            default_latency / latency, matches)
+
+
+if __name__ == '__main__':
+  app.run(main)
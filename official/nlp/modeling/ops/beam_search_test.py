@@ -19,6 +19,42 @@ import tensorflow as tf, tf_keras
 
 from official.nlp.modeling.ops import beam_search
 
+_VOCAB_SIZE = 7
+_HIDDEN_SIZE = 8
+
+
+def _recurrent_symbols_to_logits_fn(padded_decode):
+  """Returns a toy decoder whose logits depend on its per-beam cache."""
+  rng = tf.random.Generator.from_seed(1)
+  embeddings = rng.normal([_VOCAB_SIZE, _HIDDEN_SIZE])
+  recurrent = rng.normal([_HIDDEN_SIZE, _HIDDEN_SIZE])
+  output = rng.normal([_HIDDEN_SIZE, _VOCAB_SIZE]) * 2.0
+
+  def symbols_to_logits_fn(ids, i, cache):
+    hidden = tf.tanh(
+        tf.matmul(cache['hidden'], recurrent) +
+        tf.gather(embeddings, ids[:, -1]) + cache['encoder_outputs'])
+    if padded_decode:
+      history = cache['history'] + tf.one_hot(
+          i, tf.shape(cache['history'])[1])[None, :, None] * hidden[:, None]
+    else:
+      history = tf.concat([cache['history'], hidden[:, None]], axis=1)
+    cache = dict(cache, hidden=hidden, history=history)
+    logits = tf.matmul(hidden + tf.reduce_mean(history, axis=1), output)
+    return logits, cache
+
+  return symbols_to_logits_fn
+
+
+def _recurrent_initial_cache(batch_size, max_decode_length, padded_decode):
+  rng = tf.random.Generator.from_seed(2)
+  history_length = max_decode_length if padded_decode else 0
+  return {
+      'encoder_outputs': rng.normal([batch_size, _HIDDEN_SIZE]),
+      'hidden': tf.zeros([batch_size, _HIDDEN_SIZE]),
+      'history': tf.zeros([batch_size, history_length, _HIDDEN_SIZE]),
+  }
+
 
 class BeamSearchTests(tf.test.TestCase, parameterized.TestCase):
 
@@ -198,6 +234,64 @@ class BeamSearchTests(tf.test.TestCase, parameterized.TestCase):
     else:
       self.assertAllEqual([[[0, 0, 0, 1], [0, 0, 1, 2]]], predictions)
 
+  @parameterized.parameters(True, False)
+  def test_lazy_cache_gather_matches_default(self, padded_decode):
+    batch_size, max_decode_length = 5, 12
+    cache = _recurrent_initial_cache(batch_size, max_decode_length,
+                                     padded_decode)
+    kwargs = dict(
+        symbols_to_logits_fn=_recurrent_symbols_to_logits_fn(padded_decode),
+        initial_ids=tf.zeros([batch_size], dtype=tf.int32),
+        initial_cache=cache,
+        vocab_size=_VOCAB_SIZE,
+        beam_size=3,
+        alpha=0.6,
+        max_decode_length=max_decode_length,
+        eos_id=1,
+        padded_decode=padded_decode)
+    expected_ids, expected_scores = beam_search.sequence_beam_search(**kwargs)
+    ids, scores = beam_search.sequence_beam_search(
+        lazy_cache_gather=True, **kwargs)
+    self.assertAllEqual(expected_ids, ids)
+    self.assertAllClose(expected_scores, scores)
+
+  def test_early_termination_matches_single_example_search(self):
+    batch_size, max_decode_length = 6, 12
+    cache = _recurrent_initial_cache(batch_size, max_decode_length, False)
+    kwargs = dict(
+        symbols_to_logits_fn=_recurrent_symbols_to_logits_fn(False),
+        vocab_size=_VOCAB_SIZE,
+        beam_size=3,
+        alpha=0.6,
+        max_decode_length=max_decode_length,
+        eos_id=1)
+    ids, scores = beam_search.sequence_beam_search(
+        initial_ids=tf.zeros([batch_size], dtype=tf.int32),
+        initial_cache=cache,
+        lazy_cache_gather=True,
+        early_termination=True,
+        **kwargs)
+
+    lengths = []
+    for b in range(batch_size):
+      expected_ids, expected_scores = beam_search.sequence_beam_search(
+          initial_ids=tf.zeros([1], dtype=tf.int32),
+          initial_cache={k: v[b:b + 1] for k, v in cache.items()},
+          **kwargs)
+      length = expected_ids.shape[2]
+      lengths.append(length)
+      self.assertAllEqual(expected_ids[0], ids[b, :, :length])
+      self.assertAllEqual(tf.zeros_like(ids[b, :, length:]), ids[b, :, length:])
+      self.assertAllClose(expected_scores[0], scores[b])
+    # The examples must stop at different steps for the test to be meaningful.
+    self.assertGreater(len(set(lengths)), 1)
+
+  def test_early_termination_requires_lazy_cache_gather(self):
+    with self.assertRaises(ValueError):
+      beam_search.SequenceBeamSearch(
+          None, _VOCAB_SIZE, 3, 0.6, 10, 1, padded_decode=False,
+          early_termination=True)
+
 
 if __name__ == '__main__':
   tf.test.main()
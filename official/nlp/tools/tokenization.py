@@ -20,7 +20,10 @@ https://github.com/google-research/bert/blob/master/tokenization.py.
 """
 
 import collections
+import functools
+import multiprocessing
 import re
+import sys
 import unicodedata
 
 import six
@@ -164,15 +167,176 @@ def whitespace_tokenize(text):
   return tokens
 
 
+# Flags of the codepoint class table used by the fast tokenization path.
+# `_CONTROL` marks every character removed by `BasicTokenizer._clean_text`.
+_CONTROL = 1
+_WHITESPACE = 2
+_PUNCTUATION = 4
+_CHINESE = 8
+_NONSPACING_MARK = 16
+
+
+@functools.lru_cache(maxsize=None)
+def _codepoint_class_table():
+  """Returns a bytearray with the class flags of every Unicode codepoint."""
+  # pylint: disable=protected-access
+  is_chinese_char = BasicTokenizer()._is_chinese_char
+  # pylint: enable=protected-access
+  table = bytearray(sys.maxunicode + 1)
+  for cp in range(sys.maxunicode + 1):
+    char = chr(cp)
+    table[cp] = (
+        (_CONTROL if cp == 0 or cp == 0xfffd or _is_control(char) else 0)
+        | (_WHITESPACE if _is_whitespace(char) else 0)
+        | (_PUNCTUATION if _is_punctuation(char) else 0)
+        | (_CHINESE if is_chinese_char(cp) else 0)
+        | (_NONSPACING_MARK if unicodedata.category(char) == "Mn" else 0))
+  return table
+
+
+def _codepoints_with_class(flag):
+  """Returns the codepoints whose class table entry has `flag` set."""
+  return [
+      cp for cp, flags in enumerate(_codepoint_class_table()) if flags & flag
+  ]
+
+
+def _build_trie(words):
+  """Builds a character trie; the "" key of a node holds its word's value."""
+  root = {}
+  for word, value in words:
+    node = root
+    for char in word:
+      node = node.setdefault(char, {})
+    node[""] = value
+  return root
+
+
+class _FastFullTokenizer(object):
+  """Fast path of `FullTokenizer` producing identical tokens.
+
+  Instead of per-character `unicodedata` lookups, the character classes come
+  from a precomputed codepoint table and are applied with `str.translate` and
+  regular expressions. WordPiece uses tries over the vocabulary for the
+  greedy longest match. Since the basic tokenizer processes every whitespace
+  separated token independently, the word pieces of each token are cached.
+  """
+
+  def __init__(self, tokenizer, word_cache_size):
+    basic_tokenizer = tokenizer.basic_tokenizer
+    wordpiece_tokenizer = tokenizer.wordpiece_tokenizer
+    self._do_lower_case = basic_tokenizer.do_lower_case
+    self._unk_token = wordpiece_tokenizer.unk_token
+    self._max_input_chars_per_word = (
+        wordpiece_tokenizer.max_input_chars_per_word)
+
+    # `BasicTokenizer._clean_text` and `_tokenize_chinese_chars`.
+    self._clean_map = dict.fromkeys(_codepoints_with_class(_CONTROL))
+    self._clean_map.update(
+        dict.fromkeys(_codepoints_with_class(_WHITESPACE), " "))
+    chinese_ranges = []
+    for cp in _codepoints_with_class(_CHINESE):
+      if chinese_ranges and chinese_ranges[-1][1] == cp - 1:
+        chinese_ranges[-1][1] = cp
+      else:
+        chinese_ranges.append([cp, cp])
+    self._chinese_regex = re.compile("[%s]" % "".join(
+        "%s-%s" % (re.escape(chr(start)), re.escape(chr(end)))
+        for start, end in chinese_ranges))
+
+    # `_run_strip_accents` and `_run_split_on_punc`; spaces around punctuation
+    # give the same tokens once split on whitespace.
+    self._word_map = {}
+    if self._do_lower_case:
+      self._word_map.update(
+          dict.fromkeys(_codepoints_with_class(_NONSPACING_MARK)))
+    if basic_tokenizer.split_on_punc:
+      self._word_map.update({
+          cp: " %s " % chr(cp)
+          for cp in _codepoints_with_class(_PUNCTUATION)
+      })
+
+    vocab = wordpiece_tokenizer.vocab
+    self._prefix_trie = _build_trie((token, token) for token in vocab)
+    self._suffix_trie = _build_trie(
+        (token[2:], token) for token in vocab if token.startswith("##"))
+    self.tokenize_word = functools.lru_cache(maxsize=word_cache_size)(
+        self._tokenize_word)
+
+  def tokenize(self, text):
+    text = convert_to_unicode(text).translate(self._clean_map)
+    text = self._chinese_regex.sub(r" \g<0> ", text)
+    tokens = []
+    for word in text.split():
+      tokens.extend(self.tokenize_word(word))
+    return tokens
+
+  def _tokenize_word(self, word):
+    """Returns the word pieces of a whitespace separated token."""
+    if self._do_lower_case:
+      word = unicodedata.normalize("NFD", word.lower())
+    tokens = []
+    for sub_word in word.translate(self._word_map).split():
+      tokens.extend(self._wordpiece(sub_word))
+    return tuple(tokens)
+
+  def _wordpiece(self, word):
+    """Greedy longest-match-first WordPiece using the vocabulary tries."""
+    if len(word) > self._max_input_chars_per_word:
+      return [self._unk_token]
+    tokens = []
+    trie = self._prefix_trie
+    start = 0
+    while start < len(word):
+      node = trie
+      token = None
+      for end in range(start, len(word)):
+        node = node.get(word[end])
+        if node is None:
+          break
+        if "" in node:
+          token, match_end = node[""], end + 1
+      if token is None:
+        return [self._unk_token]
+      tokens.append(token)
+      start = match_end
+      trie = self._suffix_trie
+    return tokens
+
+
+_worker_tokenizer = None
+
+
+def _init_tokenizer_worker(tokenizer):
+  global _worker_tokenizer
+  _worker_tokenizer = tokenizer
+
+
+def _tokenize_in_worker(text):
+  return _worker_tokenizer.tokenize_batch([text])[0]
+
+
 class FullTokenizer(object):
   """Runs end-to-end tokenziation."""
 
-  def __init__(self, vocab_file, do_lower_case=True, split_on_punc=True):
+  def __init__(self,
+               vocab_file,
+               do_lower_case=True,
+               split_on_punc=True,
+               word_cache_size=1 << 18):
     self.vocab = load_vocab(vocab_file)
     self.inv_vocab = {v: k for k, v in self.vocab.items()}
     self.basic_tokenizer = BasicTokenizer(
         do_lower_case=do_lower_case, split_on_punc=split_on_punc)
     self.wordpiece_tokenizer = WordpieceTokenizer(vocab=self.vocab)
+    self._word_cache_size = word_cache_size
+    self._fast_tokenizer = None
+
+  def __getstate__(self):
+    # The fast path holds an unpicklable cache and is rebuilt on demand.
+    state = self.__dict__.copy()
+    state["_fast_tokenizer"] = None
+    return state
 
   def tokenize(self, text):
     split_tokens = []
@@ -182,6 +346,36 @@ class FullTokenizer(object):
 
     return split_tokens
 
+  def tokenize_batch(self, texts, num_workers=0):
+    """Tokenizes a batch of texts with the fast path.
+
+    The output is identical to `[self.tokenize(text) for text in texts]`. The
+    codepoint table, vocabulary tries and word cache are built on the first
+    call.
+
+    Args:
+      texts: A sequence of texts.
+      num_workers: If positive, the texts are tokenized by a pool of this many
+        processes, each with its own fast path and word cache.
+
+    Returns:
+      A list with the list of tokens of each text.
+    """
+    if num_workers > 0:
+      # Building the codepoint table before forking shares it with the workers.
+      _codepoint_class_table()
+      with multiprocessing.Pool(
+          num_workers,
+          initializer=_init_tokenizer_worker,
+          initargs=(self,)) as pool:
+        return pool.map(
+            _tokenize_in_worker,
+            texts,
+            chunksize=max(1, len(texts) // (4 * num_workers)))
+    if self._fast_tokenizer is None:
+      self._fast_tokenizer = _FastFullTokenizer(self, self._word_cache_size)
+    return [self._fast_tokenizer.tokenize(text) for text in texts]
+
   def convert_tokens_to_ids(self, tokens):
     return convert_by_vocab(self.vocab, tokens)
 
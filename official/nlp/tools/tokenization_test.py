@@ -13,15 +13,41 @@
 # limitations under the License.
 
 import os
+import random
 import tempfile
 
+from absl.testing import parameterized
 import six
 import tensorflow as tf, tf_keras
 
 from official.nlp.tools import tokenization
 
 
-class TokenizationTest(tf.test.TestCase):
+def _random_corpus(num_texts, seed=0):
+  """Generates texts mixing scripts, accents, punctuation and control chars."""
+  rng = random.Random(seed)
+  alphabet = (
+      list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") +
+      list(".,;:!?'\"()[]{}<>-_/\\@#$%^&*+=~`|") +
+      list(" \t\n\r\u00a0\u3000\u2009") +  # Whitespace.
+      list("\x00\x05\u200b\u200d\ufffd\u00ad") +  # Removed characters.
+      list("\u00e9\u00fc\u00c5\u00f1\u0301\u0308") +  # Accents.
+      list("\u03a3\u03c3\u03c2\u0391\u0399\u0130") +  # Greek, dotted I.
+      list("\u0416\u0436\u05d0\u0627\u0e01\uac00\u3042") +
+      list("\u535a\u63a8\u4e2d\U00020000\uf900") +  # CJK.
+      list("\u00bf\u00a1\u2014\u201c\u3001\U0001f4a9\u2160\ufb01"))
+  words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+           for _ in range(200)]
+  texts = []
+  for _ in range(num_texts):
+    text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+    if rng.random() < 0.1:
+      text += "x" * 450  # Longer than max_input_chars_per_word.
+    texts.append(text)
+  return texts
+
+
+class TokenizationTest(tf.test.TestCase, parameterized.TestCase):
   """Tokenization test.
 
     The implementation is forked from
@@ -151,6 +177,35 @@ class TokenizationTest(tf.test.TestCase):
     self.assertFalse(tokenization._is_punctuation(u"A"))
     self.assertFalse(tokenization._is_punctuation(u" "))
 
+  @parameterized.parameters((True, True), (True, False), (False, True))
+  def test_tokenize_batch_matches_tokenize(self, do_lower_case, split_on_punc):
+    corpus = _random_corpus(300)
+    # A vocabulary of frequent prefixes and suffixes of the reference basic
+    # tokens, so that texts mix word pieces and unknown words.
+    basic_tokenizer = tokenization.BasicTokenizer(
+        do_lower_case=do_lower_case, split_on_punc=split_on_punc)
+    vocab_tokens = {"[UNK]"}
+    for text in corpus[:100]:
+      for token in basic_tokenizer.tokenize(text):
+        vocab_tokens.add(token[:3])
+        vocab_tokens.add("##" + token[3:6])
+        vocab_tokens.add("##" + token[-2:])
+    vocab_file = os.path.join(self.get_temp_dir(), "vocab.txt")
+    with tf.io.gfile.GFile(vocab_file, "w") as f:
+      f.write("".join(token + "\n" for token in sorted(vocab_tokens)
+                      if token.strip() == token and token))
+
+    tokenizer = tokenization.FullTokenizer(
+        vocab_file, do_lower_case=do_lower_case, split_on_punc=split_on_punc,
+        word_cache_size=64)
+    expected = [tokenizer.tokenize(text) for text in corpus]
+    self.assertGreater(
+        sum(token != "[UNK]" for tokens in expected for token in tokens), 1000)
+    self.assertEqual(tokenizer.tokenize_batch(corpus), expected)
+    # Second pass served partly from the word cache.
+    self.assertEqual(tokenizer.tokenize_batch(corpus), expected)
+    self.assertEqual(tokenizer.tokenize_batch(corpus, num_workers=2), expected)
+
 
 if __name__ == "__main__":
   tf.test.main()
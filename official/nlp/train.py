@@ -21,9 +21,6 @@ import gin
 import tensorflow as tf, tf_keras
 
 from official.common import distribute_utils
-# pylint: disable=unused-import
-from official.common import registry_imports
-# pylint: enable=unused-import
 from official.common import flags as tfm_flags
 from official.core import task_factory
 from official.core import train_lib
@@ -91,6 +91,9 @@ setup(
         'official.colab*',
         'official.recommendation.ranking.data.preprocessing*',
     ]),
+    package_data={
+        'official.core': ['registry_manifest.json'],
+    },
     exclude_package_data={
         '': ['*_test.py',],
     },
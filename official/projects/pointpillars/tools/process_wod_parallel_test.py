@@ -0,0 +1,110 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for process_wod_parallel."""
+
+import json
+from multiprocessing import pool as mp_pool
+import os
+from unittest import mock
+
+import tensorflow as tf, tf_keras
+
+from official.projects.pointpillars.configs import pointpillars as cfg
+from official.projects.pointpillars.tools import process_wod_parallel
+
+
+def _config_hash(num_pillars=24000):
+  return process_wod_parallel.config_hash(
+      cfg.ImageConfig().as_dict(),
+      cfg.PillarsConfig(num_pillars=num_pillars).as_dict())
+
+
+class ProcessWodParallelTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._src_dir = self.create_tempdir().full_path
+    self._dst_dir = os.path.join(self.create_tempdir().full_path, 'training')
+    for name in ['segment_1', 'segment_0']:
+      with open(os.path.join(self._src_dir, name + '.tfrecord'), 'w') as f:
+        f.write(name)
+    self._converted = []
+    # Converts segments in threads of the test process.
+    self._pool = mp_pool.ThreadPool(2)
+    self.addCleanup(self._pool.terminate)
+
+  def _convert_segment(self, src_path, dst_path):
+    self._converted.append(os.path.basename(src_path))
+    with open(dst_path, 'w') as f:
+      f.write('examples')
+    return 3
+
+  def _process_wod(self, expected_hash):
+    self._converted = []
+    with mock.patch.object(process_wod_parallel, 'convert_segment',
+                           self._convert_segment):
+      process_wod_parallel.process_wod(
+          self._pool, os.path.join(self._src_dir, '*.tfrecord'),
+          self._dst_dir, expected_hash)
+    return sorted(self._converted)
+
+  def test_config_hash(self):
+    self.assertEqual(_config_hash(), _config_hash())
+    self.assertNotEqual(_config_hash(), _config_hash(num_pillars=12000))
+
+  def test_is_converted(self):
+    dst_path = os.path.join(self.create_tempdir().full_path, 'a.tfrecord')
+    self.assertFalse(process_wod_parallel.is_converted(dst_path, 'hash'))
+    with open(dst_path, 'w') as f:
+      f.write('examples')
+    # The output is incomplete without its metadata.
+    self.assertFalse(process_wod_parallel.is_converted(dst_path, 'hash'))
+    with open(dst_path + '.json', 'w') as f:
+      json.dump({'config_hash': 'hash', 'num_frames': 1}, f)
+
+    self.assertTrue(process_wod_parallel.is_converted(dst_path, 'hash'))
+    self.assertFalse(process_wod_parallel.is_converted(dst_path, 'other'))
+
+  def test_process_wod_skips_converted_segments(self):
+    self.assertEqual(
+        self._process_wod(_config_hash()),
+        ['segment_0.tfrecord', 'segment_1.tfrecord'])
+    with open(os.path.join(self._dst_dir, 'segment_0.tfrecord.json')) as f:
+      self.assertEqual(
+          json.load(f), {'config_hash': _config_hash(), 'num_frames': 3})
+
+    self.assertEmpty(self._process_wod(_config_hash()))
+
+  def test_process_wod_resumes_interrupted_conversion(self):
+    self._process_wod(_config_hash())
+    os.remove(os.path.join(self._dst_dir, 'segment_1.tfrecord.json'))
+
+    self.assertEqual(
+        self._process_wod(_config_hash()), ['segment_1.tfrecord'])
+
+  def test_process_wod_reconverts_with_changed_config(self):
+    self._process_wod(_config_hash())
+
+    self.assertEqual(
+        self._process_wod(_config_hash(num_pillars=12000)),
+        ['segment_0.tfrecord', 'segment_1.tfrecord'])
+    self.assertTrue(
+        process_wod_parallel.is_converted(
+            os.path.join(self._dst_dir, 'segment_0.tfrecord'),
+            _config_hash(num_pillars=12000)))
+
+
+if __name__ == '__main__':
+  tf.test.main()
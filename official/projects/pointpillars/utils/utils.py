@@ -15,7 +15,7 @@
 """Contains utility functions for pointpillars."""
 
 import collections
-from typing import Any, List, Mapping, Tuple
+from typing import Any, List, Mapping, Optional, Tuple
 
 import numpy as np
 import tensorflow as tf, tf_keras
@@ -61,6 +61,140 @@ def pad_or_trim_to_shape(x: np.ndarray, shape: List[int]) -> np.ndarray:
   return y
 
 
+def pillarize(
+    points: np.ndarray, points_location: np.ndarray, image_width: int,
+    num_pillars: int, num_points_per_pillar: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+  """Group points into randomly selected pillars.
+
+  Points are grouped by the linear id of their pillar with a stable sort, and
+  the first `num_points_per_pillar` points of each pillar are kept in their
+  input order. `num_pillars` non-empty pillars are selected by shuffling them
+  in row-major order with `rng`, then padded if fewer. Only the selected
+  pillars are materialized, rather than the whole pseudo image.
+
+  Args:
+    points: The point cloud, an np array with shape (M, F).
+    points_location: The pseudo image col/row of points, an int np array with
+      shape (M, 2), which must be inside the image.
+    image_width: An int of image width.
+    num_pillars: An int of the number of pillars P to output.
+    num_points_per_pillar: An int of the maximum number of points N per pillar.
+    rng: The random generator selecting the pillars.
+
+  Returns:
+    pillar_points: A float32 np array with shape (P, N, F).
+    pillar_num_points: An int32 np array with shape (P,), the number of points
+      in each pillar.
+    pillar_locations: An int32 np array with shape (P, 2), col/row.
+    pillars_count: The number of non-empty pillars before pad/trim.
+  """
+  p, n = num_pillars, num_points_per_pillar
+  m, f = points.shape
+
+  # (m,)
+  cell_ids = (points_location[:, 1].astype(np.int64) * image_width +
+              points_location[:, 0])
+  order = np.argsort(cell_ids, kind='stable')
+  sorted_cell_ids = cell_ids[order]
+  is_first = np.ones(m, dtype=bool)
+  is_first[1:] = sorted_cell_ids[1:] != sorted_cell_ids[:-1]
+  # (m,) index of the pillar of each sorted point, and its rank in the pillar.
+  pillar_index = np.cumsum(is_first) - 1
+  first_index = np.flatnonzero(is_first)
+  rank = np.arange(m) - first_index[pillar_index]
+  # (k,)
+  pillar_cell_ids = sorted_cell_ids[first_index]
+  pillar_counts = np.bincount(pillar_index, minlength=len(first_index))
+  k = len(first_index)
+
+  # Select p pillars randomly.
+  selection = np.arange(k)
+  rng.shuffle(selection)
+  selection = selection[:p]
+  num_selected = len(selection)
+  slots = np.full(k, -1, dtype=np.int64)
+  slots[selection] = np.arange(num_selected)
+  point_slots = slots[pillar_index]
+  keep = (point_slots >= 0) & (rank < n)
+
+  pillar_points = np.zeros((p, n, f), dtype=np.float32)
+  pillar_points[point_slots[keep], rank[keep]] = points[order[keep]]
+  pillar_num_points = np.zeros(p, dtype=np.int32)
+  pillar_num_points[:num_selected] = np.minimum(pillar_counts[selection], n)
+  pillar_locations = np.zeros((p, 2), dtype=np.int32)
+  pillar_locations[:num_selected, 0] = pillar_cell_ids[selection] % image_width
+  pillar_locations[:num_selected, 1] = pillar_cell_ids[selection] // image_width
+  return pillar_points, pillar_num_points, pillar_locations, k
+
+
+def pillarize_tf(
+    points: tf.Tensor, points_location: tf.Tensor, image_width: int,
+    num_pillars: int, num_points_per_pillar: int, seed: Optional[int] = None
+) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor]:
+  """Group points into randomly selected pillars with TF ops.
+
+  This is the same as `pillarize`, for on-the-fly pillarization in `tf.data`
+  pipelines, except that pillars are selected with `tf.random.shuffle`.
+
+  Args:
+    points: The point cloud, a tensor with shape (M, F).
+    points_location: The pseudo image col/row of points, an int tensor with
+      shape (M, 2), which must be inside the image.
+    image_width: An int of image width.
+    num_pillars: An int of the number of pillars P to output.
+    num_points_per_pillar: An int of the maximum number of points N per pillar.
+    seed: The optional seed of the pillar selection.
+
+  Returns:
+    pillar_points: A float32 tensor with shape (P, N, F).
+    pillar_num_points: An int32 tensor with shape (P,), the number of points in
+      each pillar.
+    pillar_locations: An int32 tensor with shape (P, 2), col/row.
+    pillars_count: An int32 scalar tensor, the number of non-empty pillars
+      before pad/trim.
+  """
+  p, n = num_pillars, num_points_per_pillar
+  points = tf.convert_to_tensor(points, dtype=tf.float32)
+  points_location = tf.cast(points_location, tf.int64)
+  m = tf.shape(points)[0]
+  f = points.shape[-1]
+
+  # (m,)
+  cell_ids = points_location[:, 1] * image_width + points_location[:, 0]
+  order = tf.argsort(cell_ids, stable=True)
+  # Unique ids of a sorted tensor are sorted too.
+  pillar_cell_ids, pillar_index = tf.unique(tf.gather(cell_ids, order))
+  k = tf.size(pillar_cell_ids)
+  pillar_counts = tf.math.bincount(pillar_index, minlength=k)
+  first_index = tf.cumsum(pillar_counts, exclusive=True)
+  rank = tf.range(m) - tf.gather(first_index, pillar_index)
+
+  # Select p pillars randomly.
+  selection = tf.random.shuffle(tf.range(k), seed=seed)[:p]
+  num_selected = tf.size(selection)
+  slots = tf.tensor_scatter_nd_update(
+      tf.fill([k], -1), selection[:, tf.newaxis], tf.range(num_selected))
+  point_slots = tf.gather(slots, pillar_index)
+  keep = tf.logical_and(point_slots >= 0, rank < n)
+
+  indices = tf.stack(
+      [tf.boolean_mask(point_slots, keep), tf.boolean_mask(rank, keep)],
+      axis=-1)
+  pillar_points = tf.scatter_nd(
+      indices, tf.gather(points, tf.boolean_mask(order, keep)), [p, n, f])
+  padding = [[0, p - num_selected]]
+  pillar_num_points = tf.pad(
+      tf.minimum(tf.gather(pillar_counts, selection), n), padding)
+  selected_cell_ids = tf.gather(pillar_cell_ids, selection)
+  pillar_locations = tf.stack([
+      tf.pad(selected_cell_ids % image_width, padding),
+      tf.pad(selected_cell_ids // image_width, padding)
+  ], axis=-1)
+  return (pillar_points, tf.ensure_shape(pillar_num_points, [p]),
+          tf.cast(tf.ensure_shape(pillar_locations, [p, 2]), tf.int32), k)
+
+
 def clip_boxes(boxes: np.ndarray, image_height: int,
                image_width: int) -> np.ndarray:
   """Clip boxes to image boundaries.
@@ -130,6 +264,24 @@ def image_to_frame_coord(image_xy: np.ndarray, vehicle_xy: Tuple[int, int],
   return frame_xy
 
 
+def image_to_frame_coord_tf(image_xy: tf.Tensor, vehicle_xy: Tuple[int, int],
+                            resolution: float) -> tf.Tensor:
+  """Convert int image (x, y) to float frame (x, y) with TF ops.
+
+  Args:
+    image_xy: A tensor of image xy cooridnates.
+    vehicle_xy: An int tuple of (vehicle_x, vehicle_y) in image.
+    resolution: A float of image resolution.
+  Returns:
+    frame_xy: A float32 tensor of frame xy coordinates.
+  """
+  image_xy = tf.cast(image_xy, tf.float32)
+  return tf.stack([
+      (image_xy[..., 0] - vehicle_xy[0]) * resolution,
+      (vehicle_xy[1] - 1 - image_xy[..., 1]) * resolution
+  ], axis=-1)
+
+
 def frame_to_image_boxes(frame_boxes: Any, vehicle_xy: Tuple[int, int],
                          one_over_resolution: float) -> Any:
   """Convert boxes from frame coordinate to image coordinate.
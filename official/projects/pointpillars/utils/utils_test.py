@@ -22,6 +22,44 @@ import tensorflow as tf, tf_keras
 from official.projects.pointpillars.utils import utils
 
 
+def _pillarize_with_grid(points, points_location, image_height, image_width,
+                         num_pillars, num_points_per_pillar, rng):
+  """Groups points into pillars one point at a time on a dense grid."""
+  h, w = image_height, image_width
+  p, n = num_pillars, num_points_per_pillar
+  f = points.shape[-1]
+  grid_num_points = np.zeros((h, w), dtype=np.int32)
+  grid_points = np.zeros((h, w, n, f), dtype=np.float32)
+  for point, (c, r) in zip(points, points_location):
+    point_count = grid_num_points[r][c]
+    if point_count == n:
+      continue
+    grid_num_points[r][c] += 1
+    grid_points[r][c][point_count][:] = point[:]
+
+  selection = np.where(grid_num_points > 0)
+  selection = [(i, j) for i, j in zip(selection[0], selection[1])]
+  rng.shuffle(selection)
+  k = len(selection)
+  pillar_locations = np.array([(j, i) for i, j in selection],
+                              dtype=np.int32).reshape(k, 2)
+  selection = ([i[0] for i in selection], [i[1] for i in selection])
+  return (utils.pad_or_trim_to_shape(grid_points[selection], [p, n, f]),
+          utils.pad_or_trim_to_shape(grid_num_points[selection], [p]),
+          utils.pad_or_trim_to_shape(pillar_locations, [p, 2]), k)
+
+
+def _random_point_cloud(num_points, image_height, image_width):
+  rng = np.random.default_rng(0)
+  points = rng.normal(size=(num_points, 5)).astype(np.float32)
+  # Points are concentrated in few pillars, some of which overflow.
+  points_location = np.stack([
+      rng.integers(0, image_width // 2, num_points),
+      rng.integers(0, image_height, num_points)
+  ], axis=-1).astype(np.int32)
+  return points, points_location
+
+
 class UtilsTest(parameterized.TestCase, tf.test.TestCase):
 
   @parameterized.parameters(
@@ -34,6 +72,53 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
     x = utils.pad_or_trim_to_shape(x, expected_shape)
     self.assertAllEqual(x.shape, expected_shape)
 
+  @parameterized.parameters(
+      (0, 16),
+      (1, 16),
+      (300, 16),
+      (300, 64),
+  )
+  def test_pillarize(self, num_points, num_pillars):
+    points, points_location = _random_point_cloud(num_points, 8, 10)
+    expected = _pillarize_with_grid(
+        points, points_location, 8, 10, num_pillars, 4,
+        np.random.default_rng(42))
+    outputs = utils.pillarize(
+        points, points_location, 10, num_pillars, 4,
+        np.random.default_rng(42))
+    for output, expected_output in zip(outputs, expected):
+      self.assertAllEqual(output, expected_output)
+
+  @parameterized.parameters(16, 64)
+  def test_pillarize_tf(self, num_pillars):
+    points, points_location = _random_point_cloud(300, 8, 10)
+    expected = utils.pillarize(points, points_location, 10, 64, 4,
+                               np.random.default_rng(42))
+    dataset = tf.data.Dataset.from_tensors((points, points_location)).map(
+        lambda x, y: utils.pillarize_tf(x, y, 10, num_pillars, 4, seed=1))
+    pillar_points, pillar_num_points, pillar_locations, k = next(
+        dataset.as_numpy_iterator())
+
+    self.assertEqual(k, expected[3])
+    self.assertEqual(pillar_points.shape, (num_pillars, 4, 5))
+    # The pillars are the same, in another random order.
+    expected_pillars = {
+        tuple(location): (num, pillar)
+        for pillar, num, location in zip(*expected[:3])
+        if num > 0
+    }
+    num_selected = min(num_pillars, k)
+    self.assertAllEqual(pillar_num_points[num_selected:],
+                        np.zeros(num_pillars - num_selected))
+    for pillar, num, location in zip(pillar_points[:num_selected],
+                                     pillar_num_points[:num_selected],
+                                     pillar_locations[:num_selected]):
+      expected_num, expected_pillar = expected_pillars.pop(tuple(location))
+      self.assertEqual(num, expected_num)
+      self.assertAllEqual(pillar, expected_pillar)
+    if num_pillars >= k:
+      self.assertEmpty(expected_pillars)
+
   @parameterized.parameters(
       ([[1.1, 1.1, 2.2, 2.2]], 10.0, 5.0),
       ([[1.1, 10.1, 2.2, 10.2]], 10.0, 10.0),
@@ -64,6 +149,15 @@ class UtilsTest(parameterized.TestCase, tf.test.TestCase):
     frame_xy_1 = utils.image_to_frame_coord(image_xy, vehicle_xy, resolution)
     self.assertAllEqual(frame_xy_1, np.floor(frame_xy))
 
+  def test_image_to_frame_coord_tf(self):
+    image_xy = np.array([[0, 0], [3, 7], [9, 2]], dtype=np.int32)
+    vehicle_xy = (5, 4)
+    resolution = 0.32
+    frame_xy = utils.image_to_frame_coord_tf(image_xy, vehicle_xy, resolution)
+    self.assertAllClose(
+        frame_xy,
+        utils.image_to_frame_coord(image_xy, vehicle_xy, resolution))
+
   @parameterized.parameters(
       ([[1.0, 1.0, 2.0, 2.0]]),
       ([[-2.2, -4.2, 2.2, 4.2]]),
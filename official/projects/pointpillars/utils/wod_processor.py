@@ -210,53 +210,18 @@ class WodProcessor:
       pillars_count: The number of computed pillars before pad/trim.
 
     Notations:
-      h: image height
-      w: image widht
       p: number of pillars per example after trimming or padding
       n: number of points per pillar
       d: number of features per point after processing
       f: number of features per point before processing
       k: number of pillars before trimming or padding
     """
-    h, w = self._image_height, self._image_width
     p, n, d = (self._num_pillars, self._num_points_per_pillar,
                self._num_features_per_point)
-    f = points.shape[-1]
 
-    grid_num_points = np.zeros((h, w), dtype=np.int32)
-    grid_locations = np.zeros((h, w, 2), dtype=np.int32)
-    grid_points = np.zeros((h, w, n, f), dtype=np.float32)
-
-    # Fill points into 2D grid.
-    for i, (point, (c, r)) in enumerate(zip(points, points_location)):
-      point_count = grid_num_points[r][c]
-      if point_count == n:
-        continue
-      grid_num_points[r][c] += 1
-      grid_locations[r][c] = [c, r]
-      grid_points[r][c][point_count][:] = point[:]
-
-    # Select k non-empty pillars randomly.
-    selection = np.where(grid_num_points > 0)
-    selection = [(i, j) for i, j in zip(selection[0], selection[1])]
-    self._rng.shuffle(selection)
-    selection = ([i[0] for i in selection], [i[1] for i in selection])
-
-    k = len(selection[0])
-    # (k,)
-    pillar_num_points = grid_num_points[selection]
-    # (k, 2)
-    pillar_locations = grid_locations[selection]
-    # (k, n, f)
-    pillar_points = grid_points[selection]
-
-    # Pad or trim to p pillars.
-    # (p,)
-    pillar_num_points = utils.pad_or_trim_to_shape(pillar_num_points, [p])
-    # (p, 2)
-    pillar_locations = utils.pad_or_trim_to_shape(pillar_locations, [p, 2])
-    # (p, n, f)
-    pillar_points = utils.pad_or_trim_to_shape(pillar_points, [p, n, f])
+    # (p, n, f), (p,), (p, 2)
+    pillar_points, pillar_num_points, pillar_locations, k = utils.pillarize(
+        points, points_location, self._image_width, p, n, self._rng)
 
     # Compute pillar features.
     # (p, n, 3)
@@ -289,6 +254,53 @@ class WodProcessor:
     pillar_locations = tf.convert_to_tensor(pillar_locations, dtype=tf.int32)
     return pillar_features, pillar_locations, k
 
+  def compute_pillars_tf(
+      self,
+      points: tf.Tensor,
+      points_location: tf.Tensor,
+      seed: Optional[int] = None) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor]:
+    """Compute pillars from point cloud with TF ops, e.g. in `tf.data`.
+
+    This is the same as `compute_pillars`, except that pillars are selected
+    with `tf.random.shuffle` rather than the random generator of the processor.
+
+    Args:
+      points: The point cloud, a tensor with shape (M, F).
+      points_location: The pseudo image col/row of points, a tensor (M, 2).
+      seed: The optional seed of the pillar selection.
+
+    Returns:
+      pillar_features: A tensor with shape (P, N, D).
+      pillar_indices: A tensor with shape (P, 2), row/col, int32.
+      pillars_count: The number of computed pillars before pad/trim.
+    """
+    p, n, d = (self._num_pillars, self._num_points_per_pillar,
+               self._num_features_per_point)
+
+    pillar_points, pillar_num_points, pillar_locations, k = utils.pillarize_tf(
+        points, points_location, self._image_width, p, n, seed=seed)
+
+    pillar_xyz = pillar_points[..., 0:3]
+    pillar_others = pillar_points[..., 3:]
+    pillar_sum_xyz = tf.reduce_sum(pillar_xyz, axis=1, keepdims=True)
+    num_points = tf.reshape(
+        tf.maximum(tf.cast(pillar_num_points, tf.float32), 1.0), [p, 1, 1])
+    pillar_mean_xyz = pillar_sum_xyz / num_points
+    pillar_dxyz = pillar_xyz - pillar_mean_xyz
+    pillar_center_xy = tf.reshape(
+        utils.image_to_frame_coord_tf(
+            pillar_locations, self._vehicle_xy, self._resolution), [p, 1, 2])
+
+    pillar_features = tf.concat([
+        pillar_dxyz,
+        pillar_others,
+        tf.tile(pillar_mean_xyz, [1, n, 1]),
+        tf.tile(pillar_center_xy, [1, n, 1])], axis=-1)
+    pillar_features = tf.ensure_shape(pillar_features, [p, n, d])
+    # Get pillar indices [row, col].
+    pillar_indices = tf.reverse(pillar_locations, axis=[-1])
+    return pillar_features, pillar_indices, k
+
   def _adjust_label_type(self, label: label_pb2.Label) -> int:
     # Only care about (vehicle, pedestrian, cyclist) types, override sign type
     # with cyclist. After this, the types mapping would be:
@@ -0,0 +1,61 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for wod_processor."""
+
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.projects.pointpillars.configs import pointpillars as cfg
+from official.projects.pointpillars.utils import utils
+from official.projects.pointpillars.utils import wod_processor
+
+
+class WodProcessorTest(tf.test.TestCase):
+
+  def test_compute_pillars_tf(self):
+    image_config = cfg.ImageConfig(
+        x_range=(-3.0, 3.0), y_range=(-3.0, 3.0), resolution=0.5)
+    # All pillars of the 12x12 image are kept.
+    pillars_config = cfg.PillarsConfig(
+        num_pillars=200, num_points_per_pillar=4, num_features_per_point=10)
+    processor = wod_processor.WodProcessor(image_config, pillars_config)
+    rng = np.random.default_rng(0)
+    # Points are concentrated in few pillars, some of which overflow.
+    points = np.concatenate([
+        rng.uniform(-3.0, 0.0, (300, 2)),
+        rng.uniform(-3.0, 3.0, (300, 3)),
+    ], axis=-1).astype(np.float32)
+    points_location = utils.frame_to_image_coord(
+        points[:, 0:2], processor._vehicle_xy, 1.0 / image_config.resolution)
+
+    features, indices, k = processor.compute_pillars(points, points_location)
+    features_tf, indices_tf, k_tf = processor.compute_pillars_tf(
+        points, points_location, seed=1)
+
+    self.assertEqual(k_tf, k)
+    self.assertLess(k, pillars_config.num_pillars)
+    # The pillars are the same, in another random order, then padded.
+    order = np.lexsort(np.transpose(indices[:k])[::-1])
+    order_tf = np.lexsort(np.transpose(indices_tf[:k])[::-1])
+    self.assertAllEqual(
+        tf.gather(indices_tf, order_tf), tf.gather(indices, order))
+    self.assertAllClose(
+        tf.gather(features_tf, order_tf), tf.gather(features, order))
+    self.assertAllEqual(indices_tf[k:], indices[k:])
+    self.assertAllClose(features_tf[k:], features[k:])
+
+
+if __name__ == '__main__':
+  tf.test.main()
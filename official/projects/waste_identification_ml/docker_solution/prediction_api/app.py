@@ -16,46 +16,90 @@
 
 This script sets up a FastAPI server that uses 2 trained Mask RCNN instance
 segmentation models to predict objects present in uploaded images.
-The results of the predictions are serialized into a JSON format and returned
+Concurrent requests are coalesced into batches of up to `MAX_BATCH_SIZE` images,
+waiting at most `MAX_BATCH_WAIT_MS` milliseconds for a batch to fill, and both
+models process each batch concurrently on worker threads. The results of the
+predictions are serialized into a JSON format, or into the compact binary format
+of `app_utils.encode_predictions` with `?response_format=binary`, and returned
 to the client.
 
+Batching requires models exported with a dynamic batch size. Models exported
+for a fixed batch size of 1 must be served with `MAX_BATCH_SIZE=1`.
+
 The server utilizes Uvicorn, an ASGI server, to serve FastAPI applications.
 The setup is intended to be containerized using Docker and subsequently deployed
 on a VM instance at the client's side.
 """
 
+import asyncio
+import concurrent.futures
 import io
 import json
+import os
 import fastapi
 import PIL
 import tensorflow as tf, tf_keras
 import uvicorn
 from official.projects.waste_identification_ml.docker_solution.prediction_api import app_utils
+from official.projects.waste_identification_ml.docker_solution.prediction_api import batcher
 
 
 HEIGHT, WIDTH = 512, 1024
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1'))
+MAX_BATCH_WAIT_MS = float(os.environ.get('MAX_BATCH_WAIT_MS', '5'))
+NUM_BATCH_WORKERS = int(os.environ.get('NUM_BATCH_WORKERS', '1'))
 
 app = fastapi.FastAPI()
 model_manager = app_utils.ModelManager()
+request_batcher = None
 
 
 @app.on_event('startup')
 def startup_event():
+  global request_batcher
   model_manager.load_all_models()
+  model_executor = concurrent.futures.ThreadPoolExecutor(
+      max_workers=NUM_BATCH_WORKERS * len(model_manager.detection_fns)
+  )
+  request_batcher = batcher.MicroBatcher(
+      lambda images: app_utils.perform_batch_detection(
+          model_manager.detection_fns, images, model_executor
+      ),
+      max_batch_size=MAX_BATCH_SIZE,
+      max_wait_s=MAX_BATCH_WAIT_MS / 1000,
+      num_workers=NUM_BATCH_WORKERS,
+  )
+
+
+def load_image(p_image: PIL.Image.Image) -> tf.Tensor:
+  tf_image = tf.image.resize(
+      p_image, (HEIGHT, WIDTH), method=tf.image.ResizeMethod.AREA
+  )
+  image_cp = tf.cast(tf_image, tf.uint8)
+  return app_utils.preprocess_image(image_cp)
 
 
 @app.post('/predict')
 async def predict(
     image: fastapi.UploadFile = fastapi.File(default=None),
-) -> fastapi.responses.JSONResponse:
+    response_format: str = 'json',
+) -> fastapi.responses.Response:
   """Predicts objects in the uploaded image.
 
   Args:
     image: Image from which to generate predictions.
+    response_format: 'json' for a JSON encoded list of detections, or 'binary'
+      for the format of `app_utils.encode_predictions`.
 
   Returns:
-    A JSON encoded list of detections.
+    The detections of each model.
   """
+  if response_format not in ('json', 'binary'):
+    return fastapi.responses.JSONResponse(
+        content={'message': f'Unknown response_format: {response_format}.'},
+        status_code=400,
+    )  # Bad Request
+
   image_data = await image.read()
   try:
     p_image = PIL.Image.open(io.BytesIO(image_data))
@@ -66,20 +110,18 @@ async def predict(
     )  # Bad Request
 
   try:
-    tf_image = tf.image.resize(
-        p_image, (HEIGHT, WIDTH), method=tf.image.ResizeMethod.AREA
-    )
-    image_cp = tf.cast(tf_image, tf.uint8)
-    image = app_utils.preprocess_image(image_cp)
-    detections = list(
-        map(
-            lambda model: app_utils.perform_detection(model, image),
-            model_manager.detection_fns,
-        )
-    )
-
-    json_dump = json.dumps(
-        {'predictions': detections}, cls=app_utils.NumpyEncoder
+    image = await asyncio.to_thread(load_image, p_image)
+    detections = await request_batcher.submit(image)
+
+    if response_format == 'binary':
+      content = await asyncio.to_thread(
+          app_utils.encode_predictions, detections
+      )
+      return fastapi.responses.Response(
+          content=content, media_type='application/octet-stream'
+      )
+    json_dump = await asyncio.to_thread(
+        json.dumps, {'predictions': detections}, cls=app_utils.NumpyEncoder
     )
     return fastapi.responses.JSONResponse(content=json_dump)
 
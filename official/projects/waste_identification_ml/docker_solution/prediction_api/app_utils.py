@@ -14,12 +14,14 @@
 
 """Model manager for the server."""
 
+import concurrent.futures
 import json
 import logging
 import logging.config
+import struct
 import sys
 import types
-from typing import Any, Callable
+from typing import Any, Callable, Sequence
 import numpy as np
 import tensorflow as tf, tf_keras
 
@@ -30,6 +32,9 @@ sys.path.append(
 )
 from official.projects.waste_identification_ml.model_inference import preprocessing  # pylint: disable=g-import-not-at-top,g-bad-import-order
 
+# Magic bytes of the binary prediction format, see `encode_predictions`.
+BINARY_FORMAT_MAGIC = b'WIP1'
+
 MODELS_DIR_PATH = types.MappingProxyType({
     'material_model': 'material/saved_model/',
     'material_form_model': 'material_form/saved_model/',
@@ -149,3 +154,136 @@ def perform_detection(
   detection = {key: value.numpy() for key, value in detection.items()}
   return detection
 
+
+def perform_batch_detection(
+    models: Sequence[Callable[[tf.Tensor], dict[str, np.ndarray]]],
+    images: Sequence[tf.Tensor],
+    executor: concurrent.futures.Executor | None = None,
+) -> list[list[dict[str, np.ndarray]]]:
+  """Performs Mask RCNN with several models on a batch of images.
+
+  The images are concatenated into a single batch, which every model processes
+  in one call. The models run concurrently when an executor is given.
+
+  Args:
+    models: Functions that can be used to make predictions. They must accept
+      batches of `len(images)` images.
+    images: Preprocessed images, each with a leading batch dimension of 1.
+    executor: An optional executor used to run the models concurrently.
+
+  Returns:
+    For each image, the detections of each model, with the same structure as
+    `perform_detection` returns for that image alone.
+  """
+  batch = tf.concat(list(images), axis=0)
+  run = lambda model: perform_detection(model, batch)
+  if executor is None:
+    batch_detections = [run(model) for model in models]
+  else:
+    batch_detections = list(executor.map(run, models))
+  return [
+      [
+          {key: value[i : i + 1] for key, value in detection.items()}
+          for detection in batch_detections
+      ]
+      for i in range(len(images))
+  ]
+
+
+def _rle_encode(mask: np.ndarray) -> np.ndarray:
+  """Run-length encodes a boolean array in C order, starting with zeros."""
+  flat = mask.ravel()
+  if not flat.size:
+    return np.zeros([0], np.uint32)
+  boundaries = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+  counts = np.diff(np.concatenate([[0], boundaries, [flat.size]]))
+  if flat[0]:
+    counts = np.concatenate([[0], counts])
+  return counts.astype(np.uint32)
+
+
+def _rle_decode(counts: np.ndarray, shape: Sequence[int]) -> np.ndarray:
+  values = np.arange(len(counts)) % 2 == 1
+  return np.repeat(values, counts).reshape(shape)
+
+
+def encode_predictions(
+    predictions: Sequence[dict[str, np.ndarray]],
+    mask_threshold: float = 0.5,
+) -> bytes:
+  """Encodes the detections of each model into a compact binary message.
+
+  The message is `BINARY_FORMAT_MAGIC`, the little-endian uint32 length of a
+  JSON header, the header, and the concatenated array buffers. For each model,
+  the header maps each key to the `dtype`, `shape`, `encoding`, `offset` and
+  `size` of its buffer. Arrays whose key contains 'mask' are binarized with
+  `mask_threshold` and run-length encoded as uint32 counts of alternating
+  false and true runs in C order, starting with false ('rle' encoding). Other
+  arrays are stored as their raw bytes in C order ('raw' encoding).
+
+  Args:
+    predictions: The detections of each model, as from `perform_detection`.
+    mask_threshold: Mask values greater than this threshold are foreground.
+
+  Returns:
+    The encoded predictions, which `decode_predictions` decodes.
+  """
+  header = []
+  buffers = []
+  offset = 0
+  for detection in predictions:
+    entries = {}
+    for key, value in detection.items():
+      value = np.asarray(value)
+      if 'mask' in key:
+        data = _rle_encode(value > mask_threshold)
+        entry = {'dtype': 'bool', 'encoding': 'rle'}
+      else:
+        data = np.ascontiguousarray(value)
+        entry = {'dtype': data.dtype.str, 'encoding': 'raw'}
+      data = data.tobytes()
+      entry.update(shape=value.shape, offset=offset, size=len(data))
+      entries[key] = entry
+      buffers.append(data)
+      offset += len(data)
+    header.append(entries)
+  header = json.dumps({'predictions': header}).encode('utf-8')
+  return b''.join(
+      [BINARY_FORMAT_MAGIC, struct.pack('<I', len(header)), header] + buffers
+  )
+
+
+def decode_predictions(message: bytes) -> list[dict[str, np.ndarray]]:
+  """Decodes predictions encoded by `encode_predictions`.
+
+  Args:
+    message: The encoded predictions.
+
+  Returns:
+    The detections of each model. Masks are boolean arrays.
+
+  Raises:
+    ValueError: If `message` is not in the binary prediction format.
+  """
+  magic_size = len(BINARY_FORMAT_MAGIC)
+  if message[:magic_size] != BINARY_FORMAT_MAGIC:
+    raise ValueError('Not a binary prediction message.')
+  (header_size,) = struct.unpack_from('<I', message, magic_size)
+  start = magic_size + 4
+  header = json.loads(message[start : start + header_size].decode('utf-8'))
+  payload = memoryview(message)[start + header_size :]
+  predictions = []
+  for entries in header['predictions']:
+    detection = {}
+    for key, entry in entries.items():
+      data = payload[entry['offset'] : entry['offset'] + entry['size']]
+      if entry['encoding'] == 'rle':
+        detection[key] = _rle_decode(
+            np.frombuffer(data, np.uint32), entry['shape']
+        )
+      else:
+        detection[key] = np.frombuffer(data, entry['dtype']).reshape(
+            entry['shape']
+        )
+    predictions.append(detection)
+  return predictions
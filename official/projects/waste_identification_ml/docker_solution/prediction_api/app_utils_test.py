@@ -0,0 +1,89 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import unittest
+
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.projects.waste_identification_ml.docker_solution.prediction_api import app_utils
+
+
+class AppUtilsTest(unittest.TestCase):
+
+  def test_encode_predictions_round_trip(self):
+    rng = np.random.default_rng(0)
+    masks = np.zeros((1, 3, 64, 128), np.float32)
+    masks[0, 0, 10:20, 30:90] = 0.9
+    masks[0, 1, :, :5] = 0.7
+    masks[0, 2, 0, 0] = 1.0
+    predictions = [
+        {
+            'detection_boxes': rng.random((1, 3, 4), np.float32),
+            'detection_classes': np.array([[1.0, 2.0, 3.0]], np.float32),
+            'num_detections': np.array([3.0], np.float32),
+            'detection_masks': masks,
+        },
+        {
+            'detection_scores': np.zeros((1, 0), np.float32),
+            'detection_masks': np.zeros((1, 0, 64, 128), np.float32),
+        },
+    ]
+
+    message = app_utils.encode_predictions(predictions)
+    decoded = app_utils.decode_predictions(message)
+
+    self.assertEqual(len(decoded), 2)
+    for expected, actual in zip(predictions, decoded):
+      self.assertEqual(expected.keys(), actual.keys())
+      for key, value in expected.items():
+        if 'mask' in key:
+          np.testing.assert_array_equal(actual[key], value > 0.5)
+        else:
+          np.testing.assert_array_equal(actual[key], value)
+          self.assertEqual(actual[key].dtype, value.dtype)
+    self.assertLess(len(message), masks.size)
+
+  def test_decode_predictions_rejects_other_formats(self):
+    with self.assertRaises(ValueError):
+      app_utils.decode_predictions(b'{"predictions": []}')
+
+  def test_perform_batch_detection_matches_single_images(self):
+    def model(images):
+      means = tf.reduce_mean(images, axis=[1, 2])
+      return {
+          'detection_scores': means,
+          'num_detections': tf.cast(tf.shape(images)[1:2], tf.float32)
+          * tf.ones_like(means[:, 0]),
+      }
+
+    images = [
+        tf.random.uniform((1, 8, 16, 3), seed=i) for i in range(3)
+    ]
+    models = [model, lambda images: model(2 * images)]
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+      batched = app_utils.perform_batch_detection(models, images, executor)
+
+    self.assertEqual(len(batched), 3)
+    for image, detections in zip(images, batched):
+      for model_fn, actual in zip(models, detections):
+        expected = app_utils.perform_detection(model_fn, image)
+        self.assertEqual(expected.keys(), actual.keys())
+        for key in expected:
+          np.testing.assert_allclose(actual[key], expected[key], rtol=1e-6)
+
+
+if __name__ == '__main__':
+  unittest.main()
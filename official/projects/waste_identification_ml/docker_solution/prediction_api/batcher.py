@@ -0,0 +1,147 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Request-coalescing batcher for the prediction server.
+
+Requests submitted from async handlers are grouped into batches of at most
+`max_batch_size` items, waiting at most `max_wait_s` for a batch to fill, and
+each batch is processed on a worker thread so that the event loop is never
+blocked by inference.
+"""
+
+import asyncio
+import concurrent.futures
+from typing import Any, Callable, Sequence
+
+
+class MicroBatcher:
+  """Coalesces concurrent requests into batches run on a thread pool.
+
+  A batch is dispatched as soon as it holds `max_batch_size` items or
+  `max_wait_s` seconds after its first item arrived, and only when one of the
+  `num_workers` workers is free. Requests arriving while all workers are busy
+  therefore accumulate into the next batch, so batches grow with the load.
+
+  Attributes:
+    max_batch_size: The maximum number of items in a batch.
+    max_wait_s: The maximum time to wait for a batch to fill, in seconds.
+  """
+
+  def __init__(
+      self,
+      batch_fn: Callable[[Sequence[Any]], Sequence[Any]],
+      max_batch_size: int = 8,
+      max_wait_s: float = 0.005,
+      num_workers: int = 1,
+  ):
+    """Initializes the batcher.
+
+    Args:
+      batch_fn: A function mapping a list of items to a list of results of the
+        same length. It is called on a worker thread.
+      max_batch_size: The maximum number of items in a batch.
+      max_wait_s: The maximum time to wait for a batch to fill, in seconds.
+      num_workers: The number of batches processed concurrently.
+
+    Raises:
+      ValueError: If `max_batch_size` or `num_workers` is not positive, or
+        `max_wait_s` is negative.
+    """
+    if max_batch_size < 1:
+      raise ValueError(f'max_batch_size must be positive: {max_batch_size}')
+    if max_wait_s < 0:
+      raise ValueError(f'max_wait_s must not be negative: {max_wait_s}')
+    if num_workers < 1:
+      raise ValueError(f'num_workers must be positive: {num_workers}')
+    self.max_batch_size = max_batch_size
+    self.max_wait_s = max_wait_s
+    self._batch_fn = batch_fn
+    self._num_workers = num_workers
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=num_workers, thread_name_prefix='batcher'
+    )
+    self._queue = None
+    self._free_workers = None
+    self._collector = None
+    # The event loop only keeps weak references to tasks, so the dispatches of
+    # the running batches are kept here until they are done.
+    self._pending_dispatches = set()
+
+  async def submit(self, item: Any) -> Any:
+    """Adds `item` to the next batch and returns its result."""
+    if self._collector is None:
+      self._queue = asyncio.Queue()
+      self._free_workers = asyncio.Semaphore(self._num_workers)
+      self._collector = asyncio.create_task(self._collect())
+    future = asyncio.get_running_loop().create_future()
+    await self._queue.put((item, future))
+    return await future
+
+  async def _collect(self):
+    """Forms batches from the queue and dispatches them to the workers."""
+    loop = asyncio.get_running_loop()
+    while True:
+      await self._free_workers.acquire()
+      batch = [await self._queue.get()]
+      deadline = loop.time() + self.max_wait_s
+      while len(batch) < self.max_batch_size:
+        if self._queue.empty():
+          timeout = deadline - loop.time()
+          if timeout <= 0:
+            break
+          try:
+            batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+          except asyncio.TimeoutError:
+            break
+        else:
+          batch.append(self._queue.get_nowait())
+      dispatch = asyncio.create_task(self._dispatch(batch))
+      self._pending_dispatches.add(dispatch)
+      dispatch.add_done_callback(self._pending_dispatches.discard)
+
+  async def _dispatch(self, batch):
+    """Runs `batch_fn` on a worker and resolves the futures of the batch."""
+    items, futures = zip(*batch)
+    try:
+      results = await asyncio.get_running_loop().run_in_executor(
+          self._executor, self._batch_fn, list(items)
+      )
+      if len(results) != len(items):
+        raise ValueError(
+            f'batch_fn returned {len(results)} results for {len(items)} items.'
+        )
+    except Exception as e:  # pylint: disable=broad-except
+      for future in futures:
+        if not future.done():
+          future.set_exception(e)
+    else:
+      for future, result in zip(futures, results):
+        if not future.done():
+          future.set_result(result)
+    finally:
+      self._free_workers.release()
+
+  async def close(self):
+    """Stops forming batches and waits for the running batches."""
+    if self._collector is not None:
+      self._collector.cancel()
+      try:
+        await self._collector
+      except asyncio.CancelledError:
+        pass
+      self._collector = None
+    await asyncio.gather(*self._pending_dispatches)
+    await asyncio.get_running_loop().run_in_executor(
+        None, self._executor.shutdown
+    )
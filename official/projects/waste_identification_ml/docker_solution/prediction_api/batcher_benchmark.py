@@ -0,0 +1,147 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks request batching and response encoding of the prediction server.
+
+A local stand-in client sends frames at a fixed rate, as a conveyor camera
+would, to `MicroBatcher`s wrapping two stand-in models whose latency is a fixed
+overhead plus a per-image cost. Latency percentiles and throughput are reported
+for the unbatched server (`max_batch_size=1`, models run one after the other)
+and for batched servers running the models concurrently. The JSON and binary
+encodings of a full-resolution Mask R-CNN response are compared as well.
+
+Example usage:
+  python -m official.projects.waste_identification_ml.docker_solution.prediction_api.batcher_benchmark \
+    --fps=20 --num_requests=200 --max_batch_sizes=1,4,8
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+
+from official.projects.waste_identification_ml.docker_solution.prediction_api import app_utils
+from official.projects.waste_identification_ml.docker_solution.prediction_api import batcher
+
+_FPS = flags.DEFINE_float('fps', 20.0, 'Frames per second sent by the client.')
+_NUM_REQUESTS = flags.DEFINE_integer('num_requests', 200,
+                                     'Number of requests per configuration.')
+_MAX_BATCH_SIZES = flags.DEFINE_list('max_batch_sizes', ['1', '4', '8'],
+                                     'Maximum batch sizes to benchmark.')
+_MAX_WAIT_MS = flags.DEFINE_float('max_wait_ms', 5.0,
+                                  'Maximum time to wait for a batch to fill.')
+_MODEL_OVERHEAD_MS = flags.DEFINE_float(
+    'model_overhead_ms', 40.0, 'Per-call latency of each stand-in model.')
+_MODEL_PER_IMAGE_MS = flags.DEFINE_float(
+    'model_per_image_ms', 5.0, 'Per-image latency of each stand-in model.')
+_NUM_DETECTIONS = flags.DEFINE_integer(
+    'num_detections', 20, 'Number of detections in the encoded response.')
+
+_HEIGHT, _WIDTH = 512, 1024
+
+
+def _stand_in_model(images):
+  """Sleeps like an accelerator-bound model and returns small detections."""
+  time.sleep((_MODEL_OVERHEAD_MS.value +
+              _MODEL_PER_IMAGE_MS.value * len(images)) / 1000)
+  return [{'num_detections': np.array([0.0], np.float32)} for _ in images]
+
+
+def _make_batch_fn(concurrent_models):
+  executor = concurrent.futures.ThreadPoolExecutor(2)
+
+  def batch_fn(images):
+    models = [_stand_in_model, _stand_in_model]
+    if concurrent_models:
+      detections = list(executor.map(lambda model: model(images), models))
+    else:
+      detections = [model(images) for model in models]
+    return list(zip(*detections))
+
+  return batch_fn
+
+
+async def _run_client(micro_batcher):
+  """Sends requests at a fixed rate and returns their latencies."""
+  latencies = []
+
+  async def request(i):
+    start = time.perf_counter()
+    await micro_batcher.submit(i)
+    latencies.append(time.perf_counter() - start)
+
+  tasks = []
+  start = time.perf_counter()
+  for i in range(_NUM_REQUESTS.value):
+    await asyncio.sleep(max(0.0, start + i / _FPS.value - time.perf_counter()))
+    tasks.append(asyncio.create_task(request(i)))
+  await asyncio.gather(*tasks)
+  elapsed = time.perf_counter() - start
+  await micro_batcher.close()
+  return np.array(latencies), elapsed
+
+
+def _benchmark_batching():
+  for max_batch_size in [int(x) for x in _MAX_BATCH_SIZES.value]:
+    micro_batcher = batcher.MicroBatcher(
+        _make_batch_fn(concurrent_models=max_batch_size > 1),
+        max_batch_size=max_batch_size,
+        max_wait_s=_MAX_WAIT_MS.value / 1000)
+    latencies, elapsed = asyncio.run(_run_client(micro_batcher))
+    logging.info(
+        'max_batch_size %2d  p50 %7.1f ms  p95 %7.1f ms  throughput %6.1f '
+        'images/s', max_batch_size, np.percentile(latencies, 50) * 1e3,
+        np.percentile(latencies, 95) * 1e3, len(latencies) / elapsed)
+
+
+def _benchmark_encoding():
+  rng = np.random.default_rng(0)
+  masks = np.zeros((1, _NUM_DETECTIONS.value, _HEIGHT, _WIDTH), np.float32)
+  for i in range(_NUM_DETECTIONS.value):
+    y, x = rng.integers(0, _HEIGHT - 100), rng.integers(0, _WIDTH - 100)
+    masks[0, i, y:y + 100, x:x + 100] = 1.0
+  detection = {
+      'detection_boxes': rng.random((1, _NUM_DETECTIONS.value, 4), np.float32),
+      'detection_scores': rng.random((1, _NUM_DETECTIONS.value), np.float32),
+      'detection_classes': np.ones((1, _NUM_DETECTIONS.value), np.float32),
+      'num_detections': np.array([_NUM_DETECTIONS.value], np.float32),
+      'detection_masks': masks,
+  }
+  predictions = [detection, detection]
+
+  start = time.perf_counter()
+  json_message = json.dumps({'predictions': predictions},
+                            cls=app_utils.NumpyEncoder)
+  json_time = time.perf_counter() - start
+  start = time.perf_counter()
+  binary_message = app_utils.encode_predictions(predictions)
+  binary_time = time.perf_counter() - start
+  logging.info('json    %9.1f ms  %11d bytes', json_time * 1e3,
+               len(json_message))
+  logging.info('binary  %9.1f ms  %11d bytes', binary_time * 1e3,
+               len(binary_message))
+
+
+def main(_):
+  _benchmark_batching()
+  _benchmark_encoding()
+
+
+if __name__ == '__main__':
+  app.run(main)
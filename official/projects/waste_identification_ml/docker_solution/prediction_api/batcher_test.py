@@ -0,0 +1,124 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+
+from official.projects.waste_identification_ml.docker_solution.prediction_api import batcher
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+
+  async def test_coalesces_concurrent_requests(self):
+    batches = []
+
+    def batch_fn(items):
+      batches.append(list(items))
+      return [item * 2 for item in items]
+
+    micro_batcher = batcher.MicroBatcher(
+        batch_fn, max_batch_size=4, max_wait_s=0.5
+    )
+    results = await asyncio.gather(
+        *[micro_batcher.submit(i) for i in range(10)]
+    )
+    await micro_batcher.close()
+
+    self.assertEqual(results, [i * 2 for i in range(10)])
+    self.assertEqual(batches, [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]])
+
+  async def test_dispatches_partial_batch_after_max_wait(self):
+    micro_batcher = batcher.MicroBatcher(
+        lambda items: items, max_batch_size=8, max_wait_s=0.01
+    )
+    result = await asyncio.wait_for(micro_batcher.submit('image'), timeout=5)
+    await micro_batcher.close()
+
+    self.assertEqual(result, 'image')
+
+  async def test_batches_grow_while_workers_are_busy(self):
+    release = threading.Event()
+    batches = []
+
+    def batch_fn(items):
+      batches.append(list(items))
+      release.wait(timeout=5)
+      return items
+
+    micro_batcher = batcher.MicroBatcher(
+        batch_fn, max_batch_size=8, max_wait_s=0.0
+    )
+    first = asyncio.create_task(micro_batcher.submit(0))
+    while not batches:
+      await asyncio.sleep(0.001)
+    rest = [asyncio.create_task(micro_batcher.submit(i)) for i in range(1, 4)]
+    await asyncio.sleep(0.05)
+    release.set()
+    await asyncio.gather(first, *rest)
+    await micro_batcher.close()
+
+    self.assertEqual(batches, [[0], [1, 2, 3]])
+
+  async def test_propagates_errors_to_the_batch(self):
+    def batch_fn(items):
+      raise RuntimeError(f'failed on {len(items)} items')
+
+    micro_batcher = batcher.MicroBatcher(
+        batch_fn, max_batch_size=2, max_wait_s=0.5
+    )
+    results = await asyncio.gather(
+        micro_batcher.submit(0), micro_batcher.submit(1),
+        return_exceptions=True,
+    )
+    await micro_batcher.close()
+
+    self.assertEqual(len(results), 2)
+    for result in results:
+      self.assertIsInstance(result, RuntimeError)
+      self.assertEqual(str(result), 'failed on 2 items')
+
+  async def test_close_waits_for_running_batches(self):
+    started = threading.Event()
+    release = threading.Event()
+
+    def batch_fn(items):
+      started.set()
+      release.wait(timeout=5)
+      return items
+
+    micro_batcher = batcher.MicroBatcher(
+        batch_fn, max_batch_size=1, max_wait_s=0.0
+    )
+    result = asyncio.create_task(micro_batcher.submit('image'))
+    while not started.is_set():
+      await asyncio.sleep(0.001)
+    close = asyncio.create_task(micro_batcher.close())
+    await asyncio.sleep(0.05)
+    self.assertFalse(close.done())
+    release.set()
+    await close
+
+    self.assertFalse(micro_batcher._pending_dispatches)
+    self.assertEqual(await result, 'image')
+
+  def test_invalid_arguments(self):
+    with self.assertRaises(ValueError):
+      batcher.MicroBatcher(lambda items: items, max_batch_size=0)
+    with self.assertRaises(ValueError):
+      batcher.MicroBatcher(lambda items: items, max_wait_s=-1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -17,14 +17,17 @@
 The script relies heavily on the ffmpeg library for video processing and
 ffprobe for metadata extraction.
 
-It focuses on two primary functionalities:
-1) Splitting a video into individual frames, and
-2) Extracting the creation time of the video from its metadata.
+It focuses on three primary functionalities:
+1) Splitting a video into individual frames,
+2) Streaming the frames of a video through a pipe, and
+3) Extracting the creation time of the video from its metadata.
 """
 
 import datetime
 import os
+from typing import Iterator
 import ffmpeg
+import numpy as np
 
 
 def split_video_to_frames(video_name: str, folder_name: str, fps: int) -> None:
@@ -47,6 +50,56 @@ def split_video_to_frames(video_name: str, folder_name: str, fps: int) -> None:
   )
 
 
+def stream_video_frames(video_name: str, fps: int) -> Iterator[np.ndarray]:
+  """Decodes the frames of a video through a pipe, without writing them.
+
+  The frames are the same as those written by `split_video_to_frames` and read
+  back with OpenCV.
+
+  Args:
+    video_name: The name/path of the video file.
+    fps: Frames per second to extract from the video.
+
+  Yields:
+    The frames of the video as uint8 BGR arrays of shape [height, width, 3].
+
+  Raises:
+    ffmpeg.Error: If ffmpeg fails to decode the video. Its errors are logged
+      to stderr.
+  """
+  stream = next(
+      s for s in ffmpeg.probe(video_name)['streams']
+      if s['codec_type'] == 'video'
+  )
+  width, height = int(stream['width']), int(stream['height'])
+  frame_size = width * height * 3
+
+  # stderr is not piped, since ffmpeg would block once the unread pipe is
+  # full. Only errors are logged there.
+  process = (
+      ffmpeg
+      .input(video_name)
+      .filter('fps', fps=fps)
+      .output('pipe:', format='rawvideo', pix_fmt='bgr24')
+      .global_args('-loglevel', 'error', '-nostats')
+      .run_async(pipe_stdout=True)
+  )
+  try:
+    while True:
+      data = process.stdout.read(frame_size)
+      if len(data) < frame_size:
+        break
+      yield np.frombuffer(data, np.uint8).reshape(height, width, 3)
+    if process.wait() != 0:
+      raise ffmpeg.Error('ffmpeg', None, None)
+  finally:
+    process.stdout.close()
+    # The consumer may stop before the end of the video.
+    if process.poll() is None:
+      process.kill()
+    process.wait()
+
+
 def find_creation_time(video: str) -> str:
   """Find the creation time of a video file.
 
@@ -0,0 +1,103 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import ffmpeg_ops
+
+
+def _write_video(path, duration, num_tags=0):
+  """Writes a synthetic 64x48 video at 25 frames per second.
+
+  Args:
+    path: The path of the video file.
+    duration: The duration of the video in seconds.
+    num_tags: The number of long metadata tags of the video, which ffmpeg logs
+      when reading it.
+  """
+  metadata_path = path + '.txt'
+  with open(metadata_path, 'w') as f:
+    f.write(';FFMETADATA1\n')
+    for i in range(num_tags):
+      f.write(f'tag{i}={"x" * 900}\n')
+  subprocess.run([
+      'ffmpeg', '-y', '-f', 'lavfi', '-t', str(duration), '-i',
+      'testsrc2=size=64x48:rate=25', '-f', 'ffmetadata', '-i', metadata_path,
+      '-map_metadata', '1', '-vcodec', 'mpeg4', path
+  ], check=True, capture_output=True)
+
+
+def _count_streamed_frames(video_name, fps, timeout):
+  """Counts streamed frames, failing instead of hanging after `timeout`."""
+  result = {}
+
+  def count():
+    frames = list(ffmpeg_ops.stream_video_frames(video_name, fps))
+    result['num_frames'] = len(frames)
+    result['shape'] = frames[0].shape
+
+  thread = threading.Thread(target=count, daemon=True)
+  thread.start()
+  thread.join(timeout)
+  if thread.is_alive():
+    raise TimeoutError(f'Streaming {video_name} did not finish.')
+  return result
+
+
+@unittest.skipIf(
+    shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+    'ffmpeg is not installed.')
+class StreamVideoFramesTest(unittest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self._tmp_dir.cleanup)
+
+  def test_streams_video_with_verbose_ffmpeg_output(self):
+    video_name = os.path.join(self._tmp_dir.name, 'verbose.mkv')
+    # ffmpeg logs the metadata of its input, so these tags alone overflow a
+    # pipe buffer of stderr.
+    _write_video(video_name, duration=2, num_tags=128)
+
+    result = _count_streamed_frames(video_name, fps=25, timeout=60)
+
+    self.assertEqual(result['num_frames'], 2 * 25)
+    self.assertEqual(result['shape'], (48, 64, 3))
+
+  def test_matches_split_video_to_frames(self):
+    video_name = os.path.join(self._tmp_dir.name, 'short.mkv')
+    frames_dir = os.path.join(self._tmp_dir.name, 'frames')
+    _write_video(video_name, duration=4)
+
+    ffmpeg_ops.split_video_to_frames(video_name, frames_dir, fps=5)
+    result = _count_streamed_frames(video_name, fps=5, timeout=60)
+
+    self.assertEqual(result['num_frames'], len(os.listdir(frames_dir)))
+
+  def test_stops_decoding_when_consumer_stops(self):
+    video_name = os.path.join(self._tmp_dir.name, 'stop.mkv')
+    _write_video(video_name, duration=4)
+
+    frames = ffmpeg_ops.stream_video_frames(video_name, fps=25)
+    next(frames)
+    frames.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
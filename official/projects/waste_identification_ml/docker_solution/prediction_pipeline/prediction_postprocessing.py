@@ -105,11 +105,7 @@ def _transform_bounding_boxes(
     A list of transformed bounding boxes, each represented as [ymin, xmin, ymax,
     xmax] in the original image scale.
   """
-  transformed_boxes = []
-  for bb in results['detection_boxes'][0]:
-    ymin = int(bb[0] * HEIGHT)
-    xmin = int(bb[1] * WIDTH)
-    ymax = int(bb[2] * HEIGHT)
-    xmax = int(bb[3] * WIDTH)
-    transformed_boxes.append([ymin, xmin, ymax, xmax])
-  return transformed_boxes
+  boxes = np.asarray(results['detection_boxes'][0])
+  scale = np.array([HEIGHT, WIDTH, HEIGHT, WIDTH], dtype=boxes.dtype)
+  # Truncates toward zero, as int() does.
+  return (boxes * scale).astype(int).reshape(-1, 4).tolist()
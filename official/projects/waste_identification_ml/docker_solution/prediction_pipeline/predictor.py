@@ -25,6 +25,7 @@ Mask R-CNN model and returns prediction results which are then postprocessed.
 
 import json
 from absl import flags
+import cv2
 import numpy as np
 import requests
 
@@ -51,17 +52,40 @@ def send_image_for_prediction(
     A list containing the list of prediction results and the HTTP status
     code.
   """
+  with open(image_path, 'rb') as image_file:
+    return _post_image(image_path, image_file, port)
 
+
+def send_frame_for_prediction(
+    frame: np.ndarray,
+    port: int,
+    name: str = 'frame.png',
+) -> tuple[list[dict[str, np.ndarray]], int]:
+  """Send an in-memory frame to a local prediction service.
+
+  Args:
+    frame: A BGR image, as read by OpenCV.
+    port: Port number on the server end for sending an image for prediction.
+    name: The file name sent along with the frame.
+
+  Returns:
+    A list containing the list of prediction results and the HTTP status
+    code.
+  """
+  _, data = cv2.imencode('.png', frame)
+  return _post_image(name, data.tobytes(), port)
+
+
+def _post_image(name, data, port):
   url = f'http://localhost:{port}/predict'
   response = None
   try:
-    with open(image_path, 'rb') as image_file:
-      files = {'image': (image_path, image_file, 'image/png')}
-      response = requests.post(url, files=files)
-      response.raise_for_status()
-      result = json.loads(response.json())
-      result = result.get('predictions', [])[:2]
-      return result, response.status_code
+    files = {'image': (name, data, 'image/png')}
+    response = requests.post(url, files=files)
+    response.raise_for_status()
+    result = json.loads(response.json())
+    result = result.get('predictions', [])[:2]
+    return result, response.status_code
   except (requests.RequestException, json.JSONDecodeError) as e:
     print(f'An error occurred: {e}')
     return [], response.status_code if response else 500
@@ -24,7 +24,7 @@ sudo apt install python3-pip ffmpeg
 # google-auth: Authentication library for Google services
 # trackpy: Particle-tracking toolkit
 # google-cloud-storage: Google Cloud Storage API client library
-pip3 install natsort absl-py opencv-python pandas pandas-gbq \
+pip3 install natsort absl-py ffmpeg-python opencv-python pandas pandas-gbq \
   google-cloud-bigquery google-auth trackpy google-cloud-storage tensorflow \
   scikit-image scikit-learn webcolors
 
@@ -0,0 +1,361 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process streaming pipeline for frame-level predictions.
+
+Frames flow through four stages connected by bounded queues, so that every
+stage works concurrently and a slow stage applies back-pressure instead of
+filling memory or disk:
+
+1) decode: resizes the frames of a frame source, e.g. a video decoded through a
+   pipe by `ffmpeg_ops.stream_video_frames`,
+2) predict: groups frames into batches for the inference function,
+3) merge: merges the predictions of the models, e.g. with
+   `prediction_postprocessing.merge_predictions`, in a process pool,
+4) write: writes the merged results on writer threads.
+
+The pipeline reports the throughput and busy time of every stage and the
+depth of every queue, which shows which stage limits a host.
+"""
+
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional, Sequence
+import numpy as np
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import utils
+
+# Marks the end of the frames in a queue.
+_DONE = object()
+
+# Seconds between checks of the stop event by blocked queue operations.
+_POLL_INTERVAL_S = 0.1
+
+STAGES = ('decode', 'predict', 'merge', 'write')
+QUEUES = ('decoded', 'predicted', 'merged')
+
+
+class _Stopped(Exception):
+  """Raised in a stage when another stage failed."""
+
+
+def _timed_call(fn: Callable[[Any], Any], arg: Any) -> tuple[Any, float]:
+  start = time.perf_counter()
+  result = fn(arg)
+  return result, time.perf_counter() - start
+
+
+class StreamingPipeline:
+  """Runs frames through the decode, predict, merge and write stages.
+
+  Frames for which `predict_fn` returns None, e.g. because a request failed,
+  are dropped after the predict stage and counted in the stats.
+  """
+
+  def __init__(
+      self,
+      predict_fn: Callable[[Sequence[np.ndarray]], Sequence[Any]],
+      merge_fn: Callable[[Any], Any],
+      write_fn: Callable[[int, np.ndarray, Any], None],
+      preprocess_fn: Optional[
+          Callable[[np.ndarray], np.ndarray]
+      ] = utils.resize_image,
+      batch_size: int = 8,
+      max_batch_wait_s: float = 0.05,
+      num_merge_workers: int = 2,
+      num_writers: int = 2,
+      queue_size: int = 16,
+      mp_context: str = 'spawn',
+      report_interval_s: float = 30.0,
+  ):
+    """Initializes the pipeline.
+
+    Args:
+      predict_fn: Maps a batch of frames to the predictions of each frame.
+      merge_fn: Maps the predictions of a frame to its merged result. It must
+        be picklable when `num_merge_workers` is positive.
+      write_fn: Writes the merged result of a frame, given the index of the
+        frame, the frame and the result.
+      preprocess_fn: Applied to each frame in the decode stage.
+      batch_size: The maximum number of frames in a batch.
+      max_batch_wait_s: The maximum time to wait for a batch to fill.
+      num_merge_workers: The number of merge processes. If 0, frames are
+        merged in the merge stage thread.
+      num_writers: The number of writer threads.
+      queue_size: The capacity of each queue between stages.
+      mp_context: The multiprocessing start method of the merge processes.
+        'spawn' is the default because forking a process which has started
+        TensorFlow is unsafe.
+      report_interval_s: Seconds between progress logs.
+    """
+    self._predict_fn = predict_fn
+    self._merge_fn = merge_fn
+    self._write_fn = write_fn
+    self._preprocess_fn = preprocess_fn
+    self._batch_size = batch_size
+    self._max_batch_wait_s = max_batch_wait_s
+    self._num_merge_workers = num_merge_workers
+    self._num_writers = num_writers
+    self._queue_size = queue_size
+    self._mp_context = mp_context
+    self._report_interval_s = report_interval_s
+
+  def run(self, frames: Iterable[np.ndarray]) -> dict[str, Any]:
+    """Runs all the frames through the pipeline.
+
+    Args:
+      frames: The frame source, e.g. `ffmpeg_ops.stream_video_frames`.
+
+    Returns:
+      A dictionary with, for each stage in `STAGES`, the number of `items` it
+      processed, its throughput in `items_per_s` over the whole run, and the
+      fraction of the run it spent working in `busy_fraction`, summed over
+      its workers; for each queue in `QUEUES`, its `mean_depth` and
+      `max_depth`; the number of `dropped_frames`, and `wall_time_s`.
+
+    Raises:
+      Exception: The first exception raised by a stage.
+    """
+    self._stop = threading.Event()
+    self._errors = []
+    self._lock = threading.Lock()
+    self._items = collections.Counter()
+    self._busy = collections.Counter()
+    self._dropped = 0
+    self._queues = {
+        name: queue.Queue(maxsize=self._queue_size) for name in QUEUES
+    }
+    self._depths = {name: [] for name in QUEUES}
+
+    if self._num_merge_workers > 0:
+      merge_executor = concurrent.futures.ProcessPoolExecutor(
+          self._num_merge_workers,
+          mp_context=multiprocessing.get_context(self._mp_context),
+      )
+    else:
+      merge_executor = None
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=self._guard, args=(self._decode, frames)),
+        threading.Thread(target=self._guard, args=(self._predict,)),
+        threading.Thread(
+            target=self._guard, args=(self._merge, merge_executor)
+        ),
+    ] + [
+        threading.Thread(target=self._guard, args=(self._write,))
+        for _ in range(self._num_writers)
+    ]
+    for thread in threads:
+      thread.start()
+    monitor = threading.Thread(target=self._monitor, args=(start,))
+    monitor.start()
+    try:
+      for thread in threads:
+        thread.join()
+    finally:
+      self._stop.set()
+      monitor.join()
+      if merge_executor is not None:
+        merge_executor.shutdown(cancel_futures=True)
+
+    if self._errors:
+      raise self._errors[0]
+    stats = self._stats(time.perf_counter() - start)
+    self._log(stats)
+    return stats
+
+  def _guard(self, stage, *args):
+    try:
+      stage(*args)
+    except _Stopped:
+      pass
+    except Exception as e:  # pylint: disable=broad-except
+      with self._lock:
+        self._errors.append(e)
+      self._stop.set()
+
+  def _record(self, stage, items, busy_s):
+    with self._lock:
+      self._items[stage] += items
+      self._busy[stage] += busy_s
+
+  def _put(self, name, item):
+    while True:
+      if self._stop.is_set():
+        raise _Stopped()
+      try:
+        self._queues[name].put(item, timeout=_POLL_INTERVAL_S)
+        return
+      except queue.Full:
+        pass
+
+  def _get(self, name, timeout=None):
+    """Gets an item, raising `queue.Empty` after `timeout` seconds."""
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    while True:
+      if self._stop.is_set():
+        raise _Stopped()
+      poll = _POLL_INTERVAL_S
+      if deadline is not None:
+        poll = min(poll, deadline - time.perf_counter())
+        if poll <= 0:
+          raise queue.Empty()
+      try:
+        return self._queues[name].get(timeout=poll)
+      except queue.Empty:
+        pass
+
+  def _decode(self, frames):
+    frames = iter(frames)
+    index = 0
+    while True:
+      start = time.perf_counter()
+      frame = next(frames, _DONE)
+      if frame is _DONE:
+        break
+      if self._preprocess_fn is not None:
+        frame = self._preprocess_fn(frame)
+      self._record('decode', 1, time.perf_counter() - start)
+      self._put('decoded', (index, frame))
+      index += 1
+    self._put('decoded', _DONE)
+
+  def _predict(self):
+    done = False
+    while not done:
+      item = self._get('decoded')
+      if item is _DONE:
+        break
+      batch = [item]
+      deadline = time.perf_counter() + self._max_batch_wait_s
+      while len(batch) < self._batch_size:
+        try:
+          item = self._get(
+              'decoded', timeout=max(0.0, deadline - time.perf_counter())
+          )
+        except queue.Empty:
+          break
+        if item is _DONE:
+          done = True
+          break
+        batch.append(item)
+
+      indices, batch_frames = zip(*batch)
+      start = time.perf_counter()
+      predictions = self._predict_fn(list(batch_frames))
+      self._record('predict', len(batch), time.perf_counter() - start)
+      for index, frame, prediction in zip(indices, batch_frames, predictions):
+        if prediction is None:
+          with self._lock:
+            self._dropped += 1
+        else:
+          self._put('predicted', (index, frame, prediction))
+    self._put('predicted', _DONE)
+
+  def _merge(self, executor):
+    # Results are passed on in frame order, with a bounded number of frames in
+    # flight in the process pool.
+    in_flight = collections.deque()
+    max_in_flight = 2 * max(self._num_merge_workers, 1)
+
+    def pass_on_oldest():
+      index, frame, future = in_flight.popleft()
+      merged, busy_s = future.result()
+      self._record('merge', 1, busy_s)
+      self._put('merged', (index, frame, merged))
+
+    while True:
+      item = self._get('predicted')
+      if item is _DONE:
+        break
+      index, frame, prediction = item
+      if executor is None:
+        future = concurrent.futures.Future()
+        future.set_result(_timed_call(self._merge_fn, prediction))
+      else:
+        future = executor.submit(_timed_call, self._merge_fn, prediction)
+      in_flight.append((index, frame, future))
+      while len(in_flight) >= max_in_flight or (
+          in_flight and in_flight[0][2].done()
+      ):
+        pass_on_oldest()
+    while in_flight:
+      pass_on_oldest()
+    self._put('merged', _DONE)
+
+  def _write(self):
+    while True:
+      item = self._get('merged')
+      if item is _DONE:
+        self._put('merged', _DONE)  # Stops the other writers.
+        return
+      index, frame, merged = item
+      start = time.perf_counter()
+      self._write_fn(index, frame, merged)
+      self._record('write', 1, time.perf_counter() - start)
+
+  def _monitor(self, start):
+    last_report = start
+    while not self._stop.wait(_POLL_INTERVAL_S):
+      for name, q in self._queues.items():
+        self._depths[name].append(q.qsize())
+      now = time.perf_counter()
+      if now - last_report >= self._report_interval_s:
+        last_report = now
+        self._log(self._stats(now - start))
+
+  def _stats(self, wall_time_s):
+    with self._lock:
+      stats = {
+          stage: {
+              'items': self._items[stage],
+              'items_per_s': self._items[stage] / wall_time_s,
+              'busy_fraction': self._busy[stage] / wall_time_s,
+          }
+          for stage in STAGES
+      }
+      stats['dropped_frames'] = self._dropped
+    for name, depths in self._depths.items():
+      depths = list(depths)
+      stats[name] = {
+          'mean_depth': float(np.mean(depths)) if depths else 0.0,
+          'max_depth': max(depths, default=0),
+      }
+    stats['wall_time_s'] = wall_time_s
+    return stats
+
+  def _log(self, stats):
+    for stage in STAGES:
+      logging.info(
+          '%-8s %6d frames  %7.2f frames/s  busy %5.1f%%',
+          stage,
+          stats[stage]['items'],
+          stats[stage]['items_per_s'],
+          100 * stats[stage]['busy_fraction'],
+      )
+    for name in QUEUES:
+      logging.info(
+          '%-9s queue depth mean %5.1f  max %3d / %d',
+          name,
+          stats[name]['mean_depth'],
+          stats[name]['max_depth'],
+          self._queue_size,
+      )
+    if stats['dropped_frames']:
+      logging.info('%d frames dropped', stats['dropped_frames'])
@@ -0,0 +1,117 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+import numpy as np
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import streaming_pipeline
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import utils
+
+
+def fake_model(frames):
+  """Returns the predictions of two fake models for each frame."""
+  return [
+      [{'mean': np.mean(frame)}, {'max': np.max(frame)}] for frame in frames
+  ]
+
+
+def fake_merge(predictions):
+  return predictions[0]['mean'] + predictions[1]['max']
+
+
+def _make_frames(num_frames):
+  rng = np.random.default_rng(0)
+  return [
+      rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)
+      for _ in range(num_frames)
+  ]
+
+
+class StreamingPipelineTest(unittest.TestCase):
+
+  def _run(self, frames, **kwargs):
+    written = {}
+    lock = threading.Lock()
+
+    def write_fn(index, frame, merged):
+      with lock:
+        written[index] = (frame.shape, merged)
+
+    batches = []
+
+    def predict_fn(batch):
+      batches.append(len(batch))
+      return fake_model(batch)
+
+    pipeline = streaming_pipeline.StreamingPipeline(
+        predict_fn, fake_merge, write_fn, **kwargs
+    )
+    stats = pipeline.run(iter(frames))
+    return written, batches, stats
+
+  def test_matches_per_frame_processing(self):
+    frames = _make_frames(20)
+    for num_merge_workers in (0, 2):
+      written, batches, stats = self._run(
+          frames, batch_size=4, max_batch_wait_s=1.0,
+          num_merge_workers=num_merge_workers,
+      )
+
+      expected = {
+          i: ((utils.HEIGHT, utils.WIDTH, 3),
+              fake_merge(fake_model([utils.resize_image(frame)])[0]))
+          for i, frame in enumerate(frames)
+      }
+      self.assertEqual(written, expected)
+      self.assertEqual(batches, [4] * 5)
+      for stage in streaming_pipeline.STAGES:
+        self.assertEqual(stats[stage]['items'], 20)
+        self.assertGreater(stats[stage]['items_per_s'], 0)
+      for name in streaming_pipeline.QUEUES:
+        self.assertLessEqual(stats[name]['max_depth'], 16)
+      self.assertEqual(stats['dropped_frames'], 0)
+
+  def test_drops_failed_frames(self):
+    def predict_fn(batch):
+      return [None if i % 2 else p for i, p in enumerate(fake_model(batch))]
+
+    written = []
+    pipeline = streaming_pipeline.StreamingPipeline(
+        predict_fn,
+        fake_merge,
+        lambda index, frame, merged: written.append(index),
+        preprocess_fn=None,
+        batch_size=2,
+        max_batch_wait_s=1.0,
+        num_merge_workers=0,
+        num_writers=1,
+    )
+    stats = pipeline.run(_make_frames(6))
+
+    self.assertEqual(written, [0, 2, 4])
+    self.assertEqual(stats['dropped_frames'], 3)
+
+  def test_raises_stage_errors(self):
+    def write_fn(index, frame, merged):
+      raise OSError(f'cannot write frame {index}')
+
+    pipeline = streaming_pipeline.StreamingPipeline(
+        fake_model, fake_merge, write_fn, num_merge_workers=0, queue_size=2
+    )
+    with self.assertRaisesRegex(OSError, 'cannot write frame'):
+      pipeline.run(_make_frames(50))
+
+
+if __name__ == '__main__':
+  unittest.main()
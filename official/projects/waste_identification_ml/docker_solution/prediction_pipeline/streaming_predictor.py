@@ -0,0 +1,130 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streams a video through the prediction server without writing frames.
+
+The frames are decoded from an ffmpeg pipe, sent to the FastAPI prediction
+server in concurrent requests, merged with
+`prediction_postprocessing.merge_predictions` in a process pool and their
+binary masks are written by `mask_bbox_saver.save_binary_masks`, all stages
+running concurrently in a `streaming_pipeline.StreamingPipeline`.
+
+Example usage:
+  python -m official.projects.waste_identification_ml.docker_solution.prediction_pipeline.streaming_predictor \
+    --video=video.mp4 --port=8000 --material_labels=material.csv \
+    --material_form_labels=material_form.csv
+"""
+
+import concurrent.futures
+import functools
+import os
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import ffmpeg_ops
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import mask_bbox_saver
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import prediction_postprocessing
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import predictor
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import streaming_pipeline
+from official.projects.waste_identification_ml.docker_solution.prediction_pipeline import utils
+from official.projects.waste_identification_ml.model_inference import labels
+
+_VIDEO = flags.DEFINE_string('video', None, 'The path to the video.')
+_FPS = flags.DEFINE_integer('fps', 15, 'Frames per second to extract.')
+_MATERIAL_LABELS = flags.DEFINE_string(
+    'material_labels', None, 'The labels of the material model.'
+)
+_MATERIAL_FORM_LABELS = flags.DEFINE_string(
+    'material_form_labels', None, 'The labels of the material form model.'
+)
+_SCORE = flags.DEFINE_float(
+    'score', 0.7, 'The minimum score of the merged detections.'
+)
+_MAX_DETECTION = flags.DEFINE_integer(
+    'max_detection', 100, 'Maximum number of detections from both models.'
+)
+_BATCH_SIZE = flags.DEFINE_integer(
+    'batch_size', 8, 'Number of frames sent to the server concurrently.'
+)
+_NUM_MERGE_WORKERS = flags.DEFINE_integer(
+    'num_merge_workers', 2, 'Number of processes merging predictions.'
+)
+_NUM_WRITERS = flags.DEFINE_integer(
+    'num_writers', 2, 'Number of threads writing masks.'
+)
+_QUEUE_SIZE = flags.DEFINE_integer(
+    'queue_size', 16, 'Capacity of the queues between stages.'
+)
+
+
+def _make_predict_fn(port, num_threads):
+  """Returns a function sending a batch of frames as concurrent requests."""
+  executor = concurrent.futures.ThreadPoolExecutor(num_threads)
+
+  def predict(frame):
+    results, status_code = predictor.send_frame_for_prediction(frame, port)
+    if status_code != 200 or len(results) < 2:
+      return None
+    return [utils.convert_and_change_dtype(result) for result in results]
+
+  return lambda frames: list(executor.map(predict, frames))
+
+
+def _write_masks(index, frame, result, folder):
+  del frame  # Unused.
+  mask_bbox_saver.save_binary_masks(
+      result, f'frame{index + 1:06d}.png', folder
+  )
+
+
+def main(_):
+  category_indices, category_index = labels.load_labels({
+      'material_model': _MATERIAL_LABELS.value,
+      'material_form_model': _MATERIAL_FORM_LABELS.value,
+  })
+  _, _, masks_folder = utils.create_folders_from_video_name(
+      os.path.basename(_VIDEO.value)
+  )
+  pipeline = streaming_pipeline.StreamingPipeline(
+      predict_fn=_make_predict_fn(flags.FLAGS.port, _BATCH_SIZE.value),
+      merge_fn=functools.partial(
+          prediction_postprocessing.merge_predictions,
+          score=_SCORE.value,
+          category_indices=category_indices,
+          category_index=category_index,
+          max_detection=_MAX_DETECTION.value,
+      ),
+      write_fn=functools.partial(_write_masks, folder=masks_folder),
+      batch_size=_BATCH_SIZE.value,
+      num_merge_workers=_NUM_MERGE_WORKERS.value,
+      num_writers=_NUM_WRITERS.value,
+      queue_size=_QUEUE_SIZE.value,
+  )
+  stats = pipeline.run(
+      ffmpeg_ops.stream_video_frames(_VIDEO.value, _FPS.value)
+  )
+  logging.info(
+      'Processed %d frames in %.1f seconds.',
+      stats['write']['items'],
+      stats['wall_time_s'],
+  )
+
+
+if __name__ == '__main__':
+  flags.mark_flags_as_required(
+      ['video', 'port', 'material_labels', 'material_form_labels']
+  )
+  app.run(main)
@@ -47,9 +47,19 @@ def read_image(path: str) -> np.ndarray:
   Returns:
     The resized image as a numpy array
   """
-  image = cv2.imread(path)
-  image = cv2.resize(image, (WIDTH, HEIGHT), interpolation=cv2.INTER_AREA)
-  return image
+  return resize_image(cv2.imread(path))
+
+
+def resize_image(image: np.ndarray) -> np.ndarray:
+  """Resizes an image to WIDTH x HEIGHT with INTER_AREA interpolation.
+
+  Args:
+    image: The image to be resized.
+
+  Returns:
+    The resized image as a numpy array
+  """
+  return cv2.resize(image, (WIDTH, HEIGHT), interpolation=cv2.INTER_AREA)
 
 
 def create_log_file(video_name: str, logs_folder_path: str) -> logging.Logger:
@@ -21,7 +21,6 @@ import numpy.typing as npt
 import pandas as pd
 from skimage import color as skimage_color
 import skimage.measure
-from sklearn import cluster as sklearn_cluster
 from sklearn import neighbors as sklearn_neighbors
 import webcolors
 
@@ -172,8 +171,8 @@ def find_dominant_color(
 
   The function performs the following steps:
     Filters out black or near-black pixels based on a threshold.
-    Uses k-means clustering to identify the dominant color among the remaining
-  pixels.
+    Takes the mean of the remaining pixels, which is the center that k-means
+  clustering with a single cluster converges to.
 
   Args:
     image: An array representation of the image.
@@ -193,10 +192,7 @@ def find_dominant_color(
   non_black_pixels = pixels[(pixels > black_threshold).any(axis=1)]
 
   if non_black_pixels.size != 0:
-    kmeans = sklearn_cluster.KMeans(
-        n_clusters=1, n_init=10, random_state=0
-    ).fit(non_black_pixels)
-    dominant_color = kmeans.cluster_centers_[0].astype(int)
+    dominant_color = non_black_pixels.mean(axis=0, dtype=np.float64).astype(int)
 
   else:
     dominant_color = ['Na', 'Na', 'Na']
@@ -300,6 +300,43 @@ def calculate_iou(
   return iou_score, union
 
 
+def pairwise_mask_iou(
+    masks_1: np.ndarray, masks_2: np.ndarray
+) -> np.ndarray:
+  """Calculates the IoU of every pair of masks from two sets of masks.
+
+  The intersections of all the pairs are computed by a single matrix product
+  of the flattened masks, restricted to the pixels covered by masks of both
+  sets, since other pixels cannot contribute to any intersection.
+
+  Args:
+    masks_1: An array of N masks of shape (N, height, width).
+    masks_2: An array of M masks of shape (M, height, width).
+
+  Returns:
+    A float64 array of shape (N, M) with the same IoU scores as
+    `calculate_iou`, which are NaN for pairs of empty masks.
+  """
+  if masks_1.shape[1:] != masks_2.shape[1:]:
+    raise ValueError('The masks must have the same dimensions.')
+  num_pixels = int(np.prod(masks_1.shape[1:]))
+  flat_1 = masks_1.reshape(len(masks_1), num_pixels).astype(bool)
+  flat_2 = masks_2.reshape(len(masks_2), num_pixels).astype(bool)
+
+  shared = np.logical_and(flat_1.any(axis=0), flat_2.any(axis=0))
+  # float32 products count pixels exactly up to 2**24.
+  dtype = np.float32 if np.count_nonzero(shared) < 2**24 else np.float64
+  intersections = np.matmul(
+      flat_1[:, shared].astype(dtype), flat_2[:, shared].T.astype(dtype)
+  ).astype(np.int64)
+
+  areas_1 = np.count_nonzero(flat_1, axis=1)
+  areas_2 = np.count_nonzero(flat_2, axis=1)
+  unions = areas_1[:, np.newaxis] + areas_2[np.newaxis, :] - intersections
+  with np.errstate(divide='ignore', invalid='ignore'):
+    return intersections / unions
+
+
 def find_similar_masks(
     results_1: DetectionResult,
     results_2: DetectionResult,
@@ -346,73 +383,82 @@ def find_similar_masks(
   detection_classes_names = []
 
   aligned_masks = 0
-  masks_list1 = results_1['detection_masks_reframed'][:num_detections]
-  masks_list2 = results_2['detection_masks_reframed'][:num_detections]
+  masks_list1 = np.asarray(
+      results_1['detection_masks_reframed'][:num_detections]
+  )
+  masks_list2 = np.asarray(
+      results_2['detection_masks_reframed'][:num_detections]
+  )
   scores_list1 = results_1['detection_scores'][0]
   scores_list2 = results_2['detection_scores'][0]
   matched_masks_list2 = [False] * len(masks_list2)
   matched_masks_list1 = [False] * len(masks_list1)
 
-  for i, mask1 in enumerate(masks_list1):
-    if (scores_list1[i] > min_score_thresh) and (
-        np.sum(mask1) < area_threshold
-    ):
-      is_similar = False
-
-      for j, mask2 in enumerate(masks_list2):
-        if scores_list2[j] > min_score_thresh and (
-            np.sum(mask2) < area_threshold
-        ):
-          iou, union = calculate_iou(mask1, mask2)
-
-          # masks which are present both in the 'detection_masks_reframed'
-          # key of 'results_1' & 'results_2' dictionary
-          if iou > iou_threshold:
-            aligned_masks += 1
-            is_similar = True
-            matched_masks_list2[j] = True
-            matched_masks_list1[i] = True
-
-            detection_masks_reframed.append(union)
-
-            avg_score, combined_box, combined_label, result_id = (
-                calculate_combined_scores_boxes_classes(
-                    i,
-                    j,
-                    results_1,
-                    results_2,
-                    category_indices,
-                    category_index_combined,
-                )
-            )
-            detection_scores.append(avg_score)
-            detection_boxes.append(combined_box)
-            detection_classes_names.append(combined_label)
-            detection_classes.append(result_id)
-            break
-
-      # masks which are only present in the 'detection_masks_reframed'
-      # of 'results_1' dictionary
-      if not is_similar:
-        aligned_masks += 1
-        detection_masks_reframed.append(mask1)
-        score, box, combined_label = calculate_single_result(
-            i, results_1, category_indices[0], 'after'
-        )
-        detection_scores.append(score)
-        detection_boxes.append(box)
-        detection_classes_names.append(combined_label)
-        result_id = find_id_by_name(category_index_combined, combined_label)
-        detection_classes.append(result_id)
+  def is_candidate(masks, scores):
+    areas = masks.reshape(len(masks), -1).sum(axis=1) if len(masks) else []
+    return [
+        scores[i] > min_score_thresh and areas[i] < area_threshold
+        for i in range(len(masks))
+    ]
+
+  candidates_1 = is_candidate(masks_list1, scores_list1)
+  candidates_2 = is_candidate(masks_list2, scores_list2)
+  (candidate_indices_2,) = np.nonzero(candidates_2)
+  if len(masks_list1) and len(masks_list2):
+    ious = pairwise_mask_iou(
+        masks_list1[candidates_1], masks_list2[candidate_indices_2]
+    )
+  else:
+    ious = np.zeros((np.count_nonzero(candidates_1), 0))
+
+  for row, i in enumerate(np.flatnonzero(candidates_1)):
+    mask1 = masks_list1[i]
+    # The first candidate of 'results_2' whose mask is similar, if any.
+    (similar,) = np.nonzero(ious[row] > iou_threshold)
+
+    # masks which are present both in the 'detection_masks_reframed'
+    # key of 'results_1' & 'results_2' dictionary
+    if similar.size:
+      j = candidate_indices_2[similar[0]]
+      aligned_masks += 1
+      matched_masks_list2[j] = True
+      matched_masks_list1[i] = True
+
+      detection_masks_reframed.append(np.logical_or(mask1, masks_list2[j]))
+
+      avg_score, combined_box, combined_label, result_id = (
+          calculate_combined_scores_boxes_classes(
+              i,
+              j,
+              results_1,
+              results_2,
+              category_indices,
+              category_index_combined,
+          )
+      )
+      detection_scores.append(avg_score)
+      detection_boxes.append(combined_box)
+      detection_classes_names.append(combined_label)
+      detection_classes.append(result_id)
+
+    # masks which are only present in the 'detection_masks_reframed'
+    # of 'results_1' dictionary
+    else:
+      aligned_masks += 1
+      detection_masks_reframed.append(mask1)
+      score, box, combined_label = calculate_single_result(
+          i, results_1, category_indices[0], 'after'
+      )
+      detection_scores.append(score)
+      detection_boxes.append(box)
+      detection_classes_names.append(combined_label)
+      result_id = find_id_by_name(category_index_combined, combined_label)
+      detection_classes.append(result_id)
 
   # masks which are only present in the 'detection_masks_reframed'
   # key of 'results_2' dictionary
   for k, mask2 in enumerate(masks_list2):
-    if (
-        (not matched_masks_list2[k])
-        and (scores_list2[k] > min_score_thresh)
-        and (np.sum(mask2) < area_threshold)
-    ):
+    if (not matched_masks_list2[k]) and candidates_2[k]:
       aligned_masks += 1
       detection_masks_reframed.append(mask2)
       score, box, combined_label = calculate_single_result(
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import tensorflow as tf, tf_keras
 from official.projects.waste_identification_ml.model_inference import postprocessing
 
@@ -27,6 +28,29 @@ class PostprocessingTest(tf.test.TestCase):
 
     self.assertAllEqual(expected, result)
 
+  def test_pairwise_mask_iou(self):
+    rng = np.random.default_rng(0)
+    masks_1 = rng.random((4, 16, 32)) < 0.3
+    masks_2 = np.concatenate(
+        [masks_1[:2], rng.random((2, 16, 32)) < 0.5, np.zeros((1, 16, 32))]
+    )
+
+    result = postprocessing.pairwise_mask_iou(masks_1, masks_2)
+
+    expected = [
+        [postprocessing.calculate_iou(m1, m2)[0] for m2 in masks_2]
+        for m1 in masks_1
+    ]
+    self.assertAllClose(expected, result, rtol=0, atol=0)
+    self.assertAllEqual(np.diag(result[:2, :2]), [1.0, 1.0])
+
+  def test_pairwise_mask_iou_of_empty_masks(self):
+    result = postprocessing.pairwise_mask_iou(
+        np.zeros((1, 4, 4)), np.zeros((1, 4, 4))
+    )
+
+    self.assertTrue(np.isnan(result[0, 0]))
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -186,6 +186,9 @@ class AveragePrecisionConfig(hyperparams.Config):
   top_k: int = 20
   top_n: Optional[int] = None
   return_per_class_ap: bool = False
+  # Accumulates the average precisions with numpy arrays instead of a heap
+  # per class. Only the ranking of tied predictions differs.
+  vectorized: bool = False
 
 
 @dataclasses.dataclass
@@ -137,6 +137,25 @@ def top_k_by_class(predictions, labels, k=20):
   return out_predictions, out_labels, out_true_positives
 
 
+def top_k_mask(predictions, k=20):
+  """Selects the top k predictions of each video.
+
+  Args:
+    predictions: A numpy matrix containing the outputs of the model. Dimensions
+      are 'batch' x 'num_classes'.
+    k: The number top predictions to pick.
+
+  Returns:
+    A bool numpy matrix with the same dimensions, True for the top k
+    predictions of each video.
+  """
+  k = min(k, predictions.shape[1])
+  indices = np.argpartition(predictions, -k, axis=1)[:, -k:]
+  mask = np.zeros(predictions.shape, dtype=bool)
+  np.put_along_axis(mask, indices, True, axis=1)
+  return mask
+
+
 def top_k_triplets(predictions, labels, k=20):
   """Get the top_k for a 1-d numpy array.
 
@@ -159,7 +178,7 @@ def top_k_triplets(predictions, labels, k=20):
 class EvaluationMetrics(object):
   """A class to store the evaluation metrics."""
 
-  def __init__(self, num_class, top_k, top_n):
+  def __init__(self, num_class, top_k, top_n, vectorized=False):
     """Construct an EvaluationMetrics object to store the evaluation metrics.
 
     Args:
@@ -168,6 +187,8 @@ class EvaluationMetrics(object):
         per video.
       top_n: A positive Integer specifying the average precision at n, or None
         to use all provided data points.
+      vectorized: Whether to accumulate the average precisions with
+        VectorizedMeanAveragePrecisionCalculator instead of a heap per class.
 
     Raises:
       ValueError: An error occurred when MeanAveragePrecisionCalculator cannot
@@ -175,9 +196,19 @@ class EvaluationMetrics(object):
     """
     self.sum_hit_at_one = 0.0
     self.sum_perr = 0.0
-    self.map_calculator = map_calculator.MeanAveragePrecisionCalculator(
-        num_class, filter_empty_classes=False, top_n=top_n)
-    self.global_ap_calculator = ap_calculator.AveragePrecisionCalculator()
+    self.vectorized = vectorized
+    if vectorized:
+      self.map_calculator = (
+          map_calculator.VectorizedMeanAveragePrecisionCalculator(
+              num_class, filter_empty_classes=False, top_n=top_n))
+      # The global average precision treats all classes as a single one.
+      self.global_ap_calculator = (
+          map_calculator.VectorizedMeanAveragePrecisionCalculator(
+              1, filter_empty_classes=False))
+    else:
+      self.map_calculator = map_calculator.MeanAveragePrecisionCalculator(
+          num_class, filter_empty_classes=False, top_n=top_n)
+      self.global_ap_calculator = ap_calculator.AveragePrecisionCalculator()
     self.top_k = top_k
     self.num_examples = 0
     self.num_class = num_class
@@ -205,12 +236,21 @@ class EvaluationMetrics(object):
     mean_perr = calculate_precision_at_equal_recall_rate(predictions, labels)
 
     # Take the top 20 predictions.
-    sparse_predictions, sparse_labels, num_positives = top_k_by_class(
-        predictions, labels, self.top_k)
-    self.map_calculator.accumulate(sparse_predictions, sparse_labels,
-                                   num_positives)
-    self.global_ap_calculator.accumulate(
-        flatten(sparse_predictions), flatten(sparse_labels), sum(num_positives))
+    if self.vectorized:
+      mask = top_k_mask(predictions, self.top_k)
+      num_positives = np.sum(labels, axis=0)
+      self.map_calculator.accumulate(predictions, labels, num_positives, mask)
+      self.global_ap_calculator.accumulate(
+          predictions[mask][:, np.newaxis], labels[mask][:, np.newaxis],
+          [np.sum(num_positives)])
+    else:
+      sparse_predictions, sparse_labels, num_positives = top_k_by_class(
+          predictions, labels, self.top_k)
+      self.map_calculator.accumulate(sparse_predictions, sparse_labels,
+                                     num_positives)
+      self.global_ap_calculator.accumulate(
+          flatten(sparse_predictions), flatten(sparse_labels),
+          sum(num_positives))
 
     self.num_examples += batch_size
     self.sum_hit_at_one += mean_hit_at_one * batch_size
@@ -240,7 +280,10 @@ class EvaluationMetrics(object):
 
     aps = self.map_calculator.peek_map_at_n()
     mean_ap = sum(aps) / self.num_class
-    gap = self.global_ap_calculator.peek_ap_at_n()
+    if self.vectorized:
+      gap = self.global_ap_calculator.peek_map_at_n()[0]
+    else:
+      gap = self.global_ap_calculator.peek_ap_at_n()
     lw_map = self.map_calculator.peek_log_weighted_map_at_n()
 
     epoch_info_dict = {
@@ -17,6 +17,7 @@ from absl.testing import parameterized
 import numpy as np
 import tensorflow as tf, tf_keras
 
+from official.projects.yt8m.eval_utils import eval_util
 from official.projects.yt8m.eval_utils.average_precision_calculator import AveragePrecisionCalculator
 
 
@@ -66,6 +67,35 @@ class YT8MAveragePrecisionCalculatorTest(parameterized.TestCase,
       ap = calculator.ap_at_n(self.prediction[i], self.ground_truth[i], n)
       logging.info('DEBUG %dth AP: %r', i + 1, ap)
 
+  @parameterized.parameters((None,), (3,), (40,))
+  def test_vectorized_evaluation_metrics(self, top_n):
+    num_class = 50
+    rng = np.random.default_rng(0)
+    metrics = eval_util.EvaluationMetrics(num_class, top_k=5, top_n=top_n)
+    vectorized_metrics = eval_util.EvaluationMetrics(
+        num_class, top_k=5, top_n=top_n, vectorized=True)
+    for _ in range(4):
+      predictions = [tf.constant(rng.random((16, num_class)))]
+      labels = [tf.constant(rng.random((16, num_class)) < 0.1)]
+      metrics.accumulate(predictions, labels)
+      vectorized_metrics.accumulate(predictions, labels)
+
+    expected = metrics.get(return_per_class_ap=True)
+    result = vectorized_metrics.get(return_per_class_ap=True)
+    self.assertGreater(expected['map'], 0.0)
+    self.assertAllClose(expected, result)
+
+  def test_vectorized_evaluation_metrics_clear(self):
+    metrics = eval_util.EvaluationMetrics(
+        10, top_k=3, top_n=None, vectorized=True)
+    predictions = [tf.constant(np.random.rand(4, 10))]
+    labels = [tf.constant(np.eye(4, 10))]
+    metrics.accumulate(predictions, labels)
+    self.assertFalse(metrics.map_calculator.is_empty())
+    metrics.clear()
+    self.assertTrue(metrics.map_calculator.is_empty())
+    self.assertTrue(metrics.global_ap_calculator.is_empty())
+
 
 if __name__ == '__main__':
   tf.test.main()
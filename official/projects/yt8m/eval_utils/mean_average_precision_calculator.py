@@ -134,3 +134,212 @@ class MeanAveragePrecisionCalculator(object):
     if not sum_log_weights:
       return 0
     return sum_log_weighted_ap / sum_log_weights
+
+
+def _average_precision_per_class(classes, predictions, positives, num_class,
+                                 num_positives, top_n):
+  """Computes the non-interpolated average precision at n of every class.
+
+  Args:
+    classes: An int numpy 1-D array with the class of each entry.
+    predictions: A numpy 1-D array with the prediction score of each entry.
+    positives: A bool numpy 1-D array, True for positive entries.
+    num_class: The number of classes.
+    num_positives: A numpy 1-D array with the total number of positives of each
+      class.
+    top_n: The number of top ranked entries of each class to consider, or None
+      to use all entries.
+
+  Returns:
+    A float numpy 1-D array of length num_class with the average precision at
+    n of each class (0 for classes without positives).
+  """
+  # Sort by class, then by descending prediction. The sort is stable, so tied
+  # predictions keep the order in which they were accumulated.
+  order = np.lexsort((-predictions, classes))
+  classes = classes[order]
+  positives = positives[order]
+  class_sizes = np.bincount(classes, minlength=num_class)
+  class_starts = np.cumsum(class_sizes) - class_sizes
+  ranks = np.arange(1, len(classes) + 1) - class_starts[classes]
+  cumulative_positives = np.cumsum(positives)
+  positives_before_class = (cumulative_positives - positives)[class_starts[
+      classes]]
+  precisions = (cumulative_positives - positives_before_class) / ranks
+  if top_n is not None:
+    positives &= ranks <= top_n
+    num_positives = np.minimum(num_positives, top_n)
+  sum_precisions = np.bincount(
+      classes[positives], weights=precisions[positives], minlength=num_class)
+  num_positives = np.asarray(num_positives, dtype=np.float64)
+  return np.divide(
+      sum_precisions,
+      num_positives,
+      out=np.zeros(num_class),
+      where=num_positives > 0)
+
+
+class VectorizedMeanAveragePrecisionCalculator(object):
+  """Calculates the mean average precision of all classes with numpy arrays.
+
+  Computes the same metrics as MeanAveragePrecisionCalculator without keeping
+  a heap per class. With `top_n`, the top n predictions of every class are
+  kept in a [num_class, top_n] array that is merged with each new batch using
+  `np.argpartition`; otherwise all accumulated predictions are kept in flat,
+  growable arrays. The average precision of all classes is then computed at
+  once. Tied predictions are ranked in the order they were accumulated rather
+  than in a shuffled order, so results can differ from the heap-based
+  calculator only when predictions of a class are tied.
+
+  Predictions are passed as dense [batch, num_class] matrices, with an optional
+  mask selecting the entries to accumulate.
+  """
+
+  _INITIAL_CAPACITY = 1024
+
+  def __init__(self, num_class, filter_empty_classes=True, top_n=None):
+    """Construct a calculator to calculate the (macro) average precision.
+
+    Args:
+      num_class: A positive Integer specifying the number of classes.
+      filter_empty_classes: whether to filter classes without any positives.
+      top_n: A positive Integer specifying the average precision at n, or None
+        to use all provided data points.
+
+    Raises:
+      ValueError: An error occurred when num_class is not a positive integer;
+      or top_n is not a positive integer.
+    """
+    if not isinstance(num_class, int) or num_class < 1:
+      raise ValueError("num_class must be a positive integer.")
+    if not ((isinstance(top_n, int) and top_n > 0) or top_n is None):
+      raise ValueError("top_n must be a positive integer or None.")
+
+    self._num_class = num_class
+    self._filter_empty_classes = filter_empty_classes
+    self._top_n = top_n
+    self.clear()
+
+  def clear(self):
+    """Clear the accumulated predictions."""
+    self._num_positives = np.zeros(self._num_class)
+    if self._top_n is not None:
+      # Empty slots hold a -inf prediction.
+      self._top_predictions = np.full((self._num_class, self._top_n), -np.inf)
+      self._top_actuals = np.zeros((self._num_class, self._top_n), dtype=bool)
+    else:
+      self._size = 0
+      self._classes = np.zeros(self._INITIAL_CAPACITY, dtype=np.int32)
+      self._predictions = np.zeros(self._INITIAL_CAPACITY)
+      self._actuals = np.zeros(self._INITIAL_CAPACITY, dtype=bool)
+
+  def accumulate(self, predictions, actuals, num_positives=None, mask=None):
+    """Accumulate the predictions and their ground truth labels.
+
+    Args:
+      predictions: A numpy matrix of prediction scores. Dimensions are 'batch' x
+        'num_classes'.
+      actuals: A numpy matrix of ground truth labels with the same dimensions.
+        Any value larger than 0 will be treated as positives, otherwise as
+        negatives.
+      num_positives: If provided, a list or numpy array with the number of true
+        positives for each class. If not provided, the number of true positives
+        will be inferred from the selected entries of 'actuals'.
+      mask: An optional bool numpy matrix with the same dimensions, selecting
+        the entries to accumulate. Defaults to all entries.
+
+    Raises:
+      ValueError: An error occurred when the shape of predictions and actuals
+      does not match.
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    actuals = np.asarray(actuals)
+    if predictions.shape != actuals.shape:
+      raise ValueError("the shape of predictions and actuals does not match.")
+    if mask is None:
+      mask = np.ones(predictions.shape, dtype=bool)
+
+    if num_positives is None:
+      num_positives = np.sum((actuals > 1e-5) & mask, axis=0)
+    self._num_positives += num_positives
+
+    if self._top_n is not None:
+      candidates = np.concatenate(
+          [self._top_predictions,
+           np.where(mask, predictions, -np.inf).T], axis=1)
+      candidate_actuals = np.concatenate(
+          [self._top_actuals, (actuals > 0).T], axis=1)
+      if candidates.shape[1] > self._top_n:
+        top = np.argpartition(
+            -candidates, self._top_n - 1, axis=1)[:, :self._top_n]
+        candidates = np.take_along_axis(candidates, top, axis=1)
+        candidate_actuals = np.take_along_axis(candidate_actuals, top, axis=1)
+      self._top_predictions = candidates
+      self._top_actuals = candidate_actuals
+    else:
+      # Transposing first keeps the entries of a class in batch order.
+      mask = mask.T
+      classes = np.broadcast_to(
+          np.arange(self._num_class)[:, np.newaxis], mask.shape)[mask]
+      self._append(classes, predictions.T[mask], (actuals > 0).T[mask])
+
+  def _append(self, classes, predictions, actuals):
+    """Appends entries to the flat arrays, growing them geometrically."""
+    size = self._size + len(classes)
+    if size > len(self._classes):
+      capacity = max(size, 2 * len(self._classes))
+      self._classes = np.resize(self._classes, capacity)
+      self._predictions = np.resize(self._predictions, capacity)
+      self._actuals = np.resize(self._actuals, capacity)
+    self._classes[self._size:size] = classes
+    self._predictions[self._size:size] = predictions
+    self._actuals[self._size:size] = actuals
+    self._size = size
+
+  def _entries(self):
+    """Returns the accumulated (classes, predictions, actuals) entries."""
+    if self._top_n is not None:
+      valid = self._top_predictions > -np.inf
+      classes = np.broadcast_to(
+          np.arange(self._num_class)[:, np.newaxis], valid.shape)[valid]
+      return classes, self._top_predictions[valid], self._top_actuals[valid]
+    return (self._classes[:self._size], self._predictions[:self._size],
+            self._actuals[:self._size])
+
+  def is_empty(self):
+    return not self._entries()[0].size
+
+  def _peek_aps(self):
+    """Returns the average precision of every class and the class filter."""
+    classes, predictions, actuals = self._entries()
+    aps = _average_precision_per_class(classes, predictions, actuals,
+                                       self._num_class, self._num_positives,
+                                       self._top_n)
+    if self._filter_empty_classes:
+      selected = self._num_positives > 0
+    else:
+      selected = np.ones(self._num_class, dtype=bool)
+    return aps, selected
+
+  def peek_map_at_n(self):
+    """Peek the non-interpolated mean average precision at n.
+
+    Returns:
+      An array of non-interpolated average precision at n (default 0) for each
+      class.
+    """
+    aps, selected = self._peek_aps()
+    return aps[selected].tolist()
+
+  def peek_log_weighted_map_at_n(self):
+    """Peek the non-interpolated log weighted mean average precision at n.
+
+    Returns:
+      Log weighted mean average precision.
+    """
+    aps, selected = self._peek_aps()
+    log_weights = np.log(1 + self._num_positives[selected])
+    sum_log_weights = np.sum(log_weights)
+    if not sum_log_weights:
+      return 0
+    return np.sum(aps[selected] * log_weights) / sum_log_weights
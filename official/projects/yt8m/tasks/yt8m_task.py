@@ -195,8 +195,9 @@ class YT8MTask(base_task.Task):
       num_classes = self.task_config.validation_data.num_classes
       top_k = self.task_config.evaluation.average_precision.top_k
       top_n = self.task_config.evaluation.average_precision.top_n
+      vectorized = self.task_config.evaluation.average_precision.vectorized
       self.avg_prec_metric = eval_util.EvaluationMetrics(
-          num_classes, top_k=top_k, top_n=top_n
+          num_classes, top_k=top_k, top_n=top_n, vectorized=vectorized
       )
 
     return metrics
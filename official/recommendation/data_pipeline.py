@@ -21,6 +21,7 @@ from __future__ import print_function
 import atexit
 import functools
 import os
+import shutil
 import sys
 import tempfile
 import threading
@@ -55,51 +56,43 @@ Eval:
 {spacer}Batch count per epoch:   {eval_batch_ct}"""
 
 
-class DatasetManager(object):
-  """Helper class for handling TensorFlow specific data tasks.
+class BaseDatasetManager(object):
+  """Bookkeeping shared by the dataset managers.
 
-  This class takes the (relatively) framework agnostic work done by the data
-  constructor classes and handles the TensorFlow specific portions (TFRecord
-  management, tf.Dataset creation, etc.).
+  A dataset manager receives the epochs built by a data constructor between
+  `start_construction` and `end_construction`, and yields them through
+  `get_dataset`. This class tracks the number of epochs built and requested,
+  and where they are stored.
   """
 
   def __init__(self,
                is_training,
-               stream_files,
                batches_per_epoch,
                shard_root=None,
                deterministic=False,
                num_train_epochs=None):
-    # type: (bool, bool, int, typing.Optional[str], bool, int) -> None
-    """Constructs a `DatasetManager` instance.
+    # type: (bool, int, typing.Optional[str], bool, int) -> None
+    """Constructs a `BaseDatasetManager` instance.
 
     Args:
       is_training: Boolean of whether the data provided is training or
         evaluation data. This determines whether to reuse the data (if
         is_training=False) and the exact structure to use when storing and
         yielding data.
-      stream_files: Boolean indicating whether data should be serialized and
-        written to file shards.
       batches_per_epoch: The number of batches in a single epoch.
-      shard_root: The base directory to be used when stream_files=True.
+      shard_root: The base directory to store epochs in, if any.
       deterministic: Forgo non-deterministic speedups. (i.e. sloppy=True)
       num_train_epochs: Number of epochs to generate. If None, then each call to
         `get_dataset()` increments the number of epochs requested.
     """
     self._is_training = is_training
     self._deterministic = deterministic
-    self._stream_files = stream_files
-    self._writers = []
-    self._write_locks = [
-        threading.RLock() for _ in range(rconst.NUM_FILE_SHARDS)
-    ] if stream_files else []
     self._batches_per_epoch = batches_per_epoch
     self._epochs_completed = 0
     self._epochs_requested = num_train_epochs if num_train_epochs else 0
     self._shard_root = shard_root
 
     self._result_queue = queue.Queue()
-    self._result_reuse = []
 
   @property
   def current_data_root(self):
@@ -113,6 +106,76 @@ class DatasetManager(object):
     return (self._epochs_completed - self._epochs_requested >=
             rconst.CYCLES_TO_BUFFER and self._is_training)
 
+  def increment_request_epoch(self):
+    self._epochs_requested += 1
+
+  def make_input_fn(self, batch_size):
+    """Create an input_fn which checks for batch size consistency."""
+
+    def input_fn(params):
+      """Returns batches for training."""
+
+      # Estimator passes batch_size during training and eval_batch_size during
+      # eval.
+      param_batch_size = (
+          params["batch_size"] if self._is_training else
+          params.get("eval_batch_size") or params["batch_size"])
+      if batch_size != param_batch_size:
+        raise ValueError("producer batch size ({}) differs from params batch "
+                         "size ({})".format(batch_size, param_batch_size))
+
+      epochs_between_evals = (
+          params.get("epochs_between_evals", 1) if self._is_training else 1)
+      return self.get_dataset(
+          batch_size=batch_size, epochs_between_evals=epochs_between_evals)
+
+    return input_fn
+
+
+class DatasetManager(BaseDatasetManager):
+  """Helper class for handling TensorFlow specific data tasks.
+
+  This class takes the (relatively) framework agnostic work done by the data
+  constructor classes and handles the TensorFlow specific portions (TFRecord
+  management, tf.Dataset creation, etc.).
+  """
+
+  def __init__(self,
+               is_training,
+               stream_files,
+               batches_per_epoch,
+               shard_root=None,
+               deterministic=False,
+               num_train_epochs=None):
+    # type: (bool, bool, int, typing.Optional[str], bool, int) -> None
+    """Constructs a `DatasetManager` instance.
+
+    Args:
+      is_training: Boolean of whether the data provided is training or
+        evaluation data. This determines whether to reuse the data (if
+        is_training=False) and the exact structure to use when storing and
+        yielding data.
+      stream_files: Boolean indicating whether data should be serialized and
+        written to file shards.
+      batches_per_epoch: The number of batches in a single epoch.
+      shard_root: The base directory to be used when stream_files=True.
+      deterministic: Forgo non-deterministic speedups. (i.e. sloppy=True)
+      num_train_epochs: Number of epochs to generate. If None, then each call to
+        `get_dataset()` increments the number of epochs requested.
+    """
+    super(DatasetManager, self).__init__(
+        is_training=is_training,
+        batches_per_epoch=batches_per_epoch,
+        shard_root=shard_root,
+        deterministic=deterministic,
+        num_train_epochs=num_train_epochs)
+    self._stream_files = stream_files
+    self._writers = []
+    self._write_locks = [
+        threading.RLock() for _ in range(rconst.NUM_FILE_SHARDS)
+    ] if stream_files else []
+    self._result_reuse = []
+
   @staticmethod
   def serialize(data):
     """Convert NumPy arrays into a TFRecords entry."""
@@ -268,9 +331,6 @@ class DatasetManager(object):
           self._result_reuse.append(result)
           yield result
 
-  def increment_request_epoch(self):
-    self._epochs_requested += 1
-
   def get_dataset(self, batch_size, epochs_between_evals):
     """Construct the dataset to be used for training and eval.
 
@@ -334,27 +394,119 @@ class DatasetManager(object):
 
     return dataset.prefetch(16)
 
-  def make_input_fn(self, batch_size):
-    """Create an input_fn which checks for batch size consistency."""
 
-    def input_fn(params):
-      """Returns batches for training."""
+class MemmapDatasetManager(BaseDatasetManager):
+  """Stores whole epochs in memory-mapped NumPy arrays.
 
-      # Estimator passes batch_size during training and eval_batch_size during
-      # eval.
-      param_batch_size = (
-          params["batch_size"] if self._is_training else
-          params.get("eval_batch_size") or params["batch_size"])
-      if batch_size != param_batch_size:
-        raise ValueError("producer batch size ({}) differs from params batch "
-                         "size ({})".format(batch_size, param_batch_size))
+  A constructor fills the arrays of an epoch in place, and `tf.data` reads each
+  batch as a slice of them. Batches are neither queued one by one nor
+  serialized to `tf.train.Example`s.
+  """
 
-      epochs_between_evals = (
-          params.get("epochs_between_evals", 1) if self._is_training else 1)
-      return self.get_dataset(
-          batch_size=batch_size, epochs_between_evals=epochs_between_evals)
+  def __init__(self,
+               is_training,
+               batches_per_epoch,
+               shard_root,
+               deterministic=False,
+               num_train_epochs=None):
+    # type: (bool, int, str, bool, int) -> None
+    super(MemmapDatasetManager, self).__init__(
+        is_training=is_training,
+        batches_per_epoch=batches_per_epoch,
+        shard_root=shard_root,
+        deterministic=deterministic,
+        num_train_epochs=num_train_epochs)
 
-    return input_fn
+  @property
+  def dtypes(self):
+    if self._is_training:
+      return {
+          movielens.USER_COLUMN: rconst.USER_DTYPE,
+          movielens.ITEM_COLUMN: rconst.ITEM_DTYPE,
+          rconst.VALID_POINT_MASK: np.bool_,
+          "labels": np.bool_,
+      }
+    return {
+        movielens.USER_COLUMN: rconst.USER_DTYPE,
+        movielens.ITEM_COLUMN: rconst.ITEM_DTYPE,
+        rconst.DUPLICATE_MASK: np.bool_,
+    }
+
+  def start_construction(self):
+    os.makedirs(self.current_data_root)
+
+  def create_arrays(self, batch_size):
+    """Allocates the arrays of the epoch under construction.
+
+    Args:
+      batch_size: The number of elements in a batch.
+
+    Returns:
+      The directory holding one `<key>.npy` file per feature, each with
+      `batches_per_epoch * batch_size` elements.
+    """
+    for key, dtype in self.dtypes.items():
+      np.lib.format.open_memmap(
+          os.path.join(self.current_data_root, key + ".npy"),
+          mode="w+",
+          dtype=dtype,
+          shape=(self._batches_per_epoch * batch_size,))
+    return self.current_data_root
+
+  def end_construction(self):
+    self._result_queue.put(self.current_data_root)
+    self._epochs_completed += 1
+
+  def _epoch_dataset(self, epoch_dir, batch_size):
+    """Returns a dataset of the batches stored in `epoch_dir`."""
+    keys = sorted(self.dtypes)
+    arrays = [
+        np.load(os.path.join(epoch_dir, key + ".npy"), mmap_mode="r")
+        for key in keys
+    ]
+    if self._is_training:
+      # The mappings outlive the files, so the disk space of a training epoch
+      # is released once its dataset is garbage collected.
+      shutil.rmtree(epoch_dir)
+
+    def get_batch(i):
+      return [x[i * batch_size:(i + 1) * batch_size] for x in arrays]
+
+    def map_fn(i):
+      values = tf.numpy_function(
+          get_batch, [i], [tf.as_dtype(x.dtype) for x in arrays],
+          stateful=False)
+      features = {
+          key: tf.reshape(value, [batch_size, 1])
+          for key, value in zip(keys, values)
+      }
+      if self._is_training:
+        return features, features.pop("labels")
+      return features
+
+    return tf.data.Dataset.range(self._batches_per_epoch).map(
+        map_fn,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=self._deterministic or None)
+
+  def get_dataset(self, batch_size, epochs_between_evals):
+    """Construct the dataset to be used for training and eval.
+
+    Args:
+      batch_size: The per-replica batch size of the dataset.
+      epochs_between_evals: How many epochs worth of data to yield.
+    """
+    assert self._is_training or epochs_between_evals == 1
+    self.increment_request_epoch()
+    dataset = None
+    for _ in range(epochs_between_evals):
+      epoch_dir = self._result_queue.get(timeout=300)
+      if not self._is_training:
+        self._result_queue.put(epoch_dir)  # Eval data is reused.
+      epoch_dataset = self._epoch_dataset(epoch_dir, batch_size)
+      dataset = (epoch_dataset if dataset is None else
+                 dataset.concatenate(epoch_dataset))
+    return dataset.prefetch(16)
 
 
 class BaseDataConstructor(threading.Thread):
@@ -974,9 +1126,274 @@ class BisectionDataConstructor(BaseDataConstructor):
     return output
 
 
+def _nth_negative_items(index_bounds, tally_keys, users, choices, num_items):
+  """Returns the `choices[i]`-th negative item of each user in `users`.
+
+  Args:
+    index_bounds: The start of the positives of each user, followed by the
+      total number of positives.
+    tally_keys: For each positive of each user, sorted by user and item, the
+      number of negatives before it offset by `user * (num_items + 1)`. This
+      makes the keys of all users one sorted array.
+    users: An array of users.
+    choices: The index of the negative to select for each user.
+    num_items: The number of items.
+
+  Returns:
+    An array of items with the same shape as `users`.
+  """
+  user_offsets = users.astype(np.int64) * (num_items + 1)
+  num_positives = index_bounds[users + 1] - index_bounds[users]
+  output = choices.astype(np.int64) + num_positives
+
+  # As in `BisectionDataConstructor.lookup_negative_items`, choices past the
+  # tally of the last positive of a user follow all of the positives and need
+  # no search.
+  last_tally = tally_keys[index_bounds[users + 1] - 1] - user_offsets
+  (to_search,) = np.nonzero(choices < last_tally)
+  if to_search.size:
+    query = user_offsets[to_search] + choices[to_search]
+    # Searching in ascending order keeps the accesses to `tally_keys` local.
+    order = np.argsort(query, kind="stable")
+    preceding_positives = np.empty_like(order)
+    preceding_positives[order] = np.searchsorted(
+        tally_keys, query[order], side="right")
+    # The chosen negative is preceded by every positive with no more negatives
+    # before it than the choice.
+    output[to_search] = (
+        choices[to_search] + preceding_positives -
+        index_bounds[users[to_search]])
+  return output.astype(rconst.ITEM_DTYPE)
+
+
+def _sample_negative_items(lookup, users, num_items, random_state):
+  """Samples a negative item for each user in `users`."""
+  index_bounds = lookup["index_bounds"]
+  num_negatives = num_items - (index_bounds[users + 1] - index_bounds[users])
+  choices = stat_utils.very_slightly_biased_randint(num_negatives,
+                                                    random_state)
+  return _nth_negative_items(index_bounds, lookup["tally_keys"], users,
+                             choices, num_items)
+
+
+def _load_arrays(directory, keys, mmap_mode):
+  return {
+      key: np.load(os.path.join(directory, key + ".npy"), mmap_mode=mmap_mode)
+      for key in keys
+  }
+
+
+_LOOKUP_KEYS = ("index_bounds", "tally_keys", "train_pos_users",
+                "train_pos_items", "eval_pos_users", "eval_pos_items")
+
+
+def _fill_training_slice(args):
+  """Fills the elements [start, stop) of a training epoch."""
+  (lookup_dir, epoch_dir, start, stop, seed, batch_size, num_users,
+   num_items) = args
+  lookup = _load_arrays(lookup_dir, _LOOKUP_KEYS, "r")
+  outputs = _load_arrays(epoch_dir, [
+      movielens.USER_COLUMN, movielens.ITEM_COLUMN, rconst.VALID_POINT_MASK,
+      "labels"
+  ], "r+")
+  order = np.load(os.path.join(epoch_dir, "order.npy"), mmap_mode="r")
+  random_state = np.random.RandomState(seed)  # pylint: disable=no-member
+
+  (num_elements,) = order.shape
+  (num_positives,) = lookup["train_pos_users"].shape
+  valid_stop = min(max(num_elements, start), stop)
+  indices = np.asarray(order[start:valid_stop])
+  positive_indices = np.mod(indices, num_positives)
+  users = lookup["train_pos_users"][positive_indices]
+  items = lookup["train_pos_items"][positive_indices]
+  negative_indices = np.greater_equal(indices, num_positives)
+  items[negative_indices] = _sample_negative_items(
+      lookup, users[negative_indices], num_items, random_state)
+
+  # Pad as `BaseDataConstructor._get_training_batch` does, counting from the
+  # first padded element of each batch.
+  pad_positions = np.arange(valid_stop, stop)
+  pad_positions -= np.maximum(num_elements,
+                              pad_positions // batch_size * batch_size)
+
+  valid = slice(start, valid_stop)
+  padded = slice(valid_stop, stop)
+  outputs[movielens.USER_COLUMN][valid] = users
+  outputs[movielens.USER_COLUMN][padded] = pad_positions % num_users
+  outputs[movielens.ITEM_COLUMN][valid] = items
+  outputs[movielens.ITEM_COLUMN][padded] = pad_positions % num_items
+  outputs["labels"][valid] = np.logical_not(negative_indices)
+  outputs["labels"][padded] = False
+  outputs[rconst.VALID_POINT_MASK][valid] = True
+  outputs[rconst.VALID_POINT_MASK][padded] = False
+  for output in outputs.values():
+    output.flush()
+
+
+def _fill_eval_slice(args):
+  """Fills the batches [start, stop) of the evaluation epoch."""
+  (lookup_dir, epoch_dir, start, stop, seed, eval_batch_size,
+   users_per_batch, num_items) = args
+  lookup = _load_arrays(lookup_dir, _LOOKUP_KEYS, "r")
+  outputs = _load_arrays(epoch_dir, [
+      movielens.USER_COLUMN, movielens.ITEM_COLUMN, rconst.DUPLICATE_MASK
+  ], "r+")
+  random_state = np.random.RandomState(seed)  # pylint: disable=no-member
+
+  for i in range(start, stop):
+    low_index = i * users_per_batch
+    high_index = (i + 1) * users_per_batch
+    users = np.repeat(
+        lookup["eval_pos_users"][low_index:high_index, np.newaxis],
+        1 + rconst.NUM_EVAL_NEGATIVES,
+        axis=1)
+    positive_items = lookup["eval_pos_items"][low_index:high_index, np.newaxis]
+    negative_items = _sample_negative_items(
+        lookup, users[:, :-1].flatten(), num_items,
+        random_state).reshape(-1, rconst.NUM_EVAL_NEGATIVES)
+    users, items, duplicate_mask = BaseDataConstructor._assemble_eval_batch(  # pylint: disable=protected-access
+        users, positive_items, negative_items, users_per_batch)
+
+    rows = slice(i * eval_batch_size, (i + 1) * eval_batch_size)
+    outputs[movielens.USER_COLUMN][rows] = users.flatten()
+    outputs[movielens.ITEM_COLUMN][rows] = items.flatten()
+    outputs[rconst.DUPLICATE_MASK][rows] = duplicate_mask.flatten()
+  for output in outputs.values():
+    output.flush()
+
+
+class MemmapDataConstructor(BisectionDataConstructor):
+  """Construct whole epochs into memory-mapped arrays with a process pool.
+
+  Negatives are located with the per-user negative tallies of
+  `BisectionDataConstructor`, but with a single vectorized `np.searchsorted`
+  for all users rather than a bisection loop: offsetting the tallies of each
+  user by `user * (num_items + 1)` makes the concatenated tallies sorted.
+
+  Each epoch is split into slices which are filled by a process pool. The
+  workers map the lookup arrays and the epoch arrays from disk, so only slice
+  bounds and seeds are sent to them, and the data is handed to `tf.data`
+  through `MemmapDatasetManager` rather than per-batch queues or files.
+  """
+
+  # Number of elements of the slices filled by each task. Slices only depend on
+  # the size of the epoch, so that seeded epochs do not depend on the number of
+  # worker processes.
+  _SLICE_SIZE = 2 ** 20
+
+  def __init__(self, *args, **kwargs):
+    # Number of worker processes filling the slices. Defaults to one per CPU.
+    self._num_workers = kwargs.pop("num_workers", None) or os.cpu_count() or 1
+    super(MemmapDataConstructor, self).__init__(*args, **kwargs)
+    if self._shard_root is not None:
+      raise ValueError(
+          "MemmapDataConstructor does not support `stream_files`.")
+    self._shard_root = tempfile.mkdtemp(prefix="ncf_memmap_")
+    atexit.register(shutil.rmtree, self._shard_root, ignore_errors=True)
+    self._lookup_dir = os.path.join(self._shard_root, "lookup")
+    self._train_dataset = MemmapDatasetManager(
+        True, self.train_batches_per_epoch, self._shard_root,
+        self.deterministic, self.num_train_epochs)
+    self._eval_dataset = MemmapDatasetManager(
+        False, self.eval_batches_per_epoch, self._shard_root,
+        self.deterministic, self.num_train_epochs)
+    self._pool = None
+
+  def construct_lookup_variables(self):
+    start_time = timeit.default_timer()
+    inner_bounds = np.argwhere(self._train_pos_users[1:] -
+                               self._train_pos_users[:-1])[:, 0] + 1
+    (upper_bound,) = self._train_pos_users.shape
+    self.index_bounds = np.array([0] + inner_bounds.tolist() + [upper_bound])
+
+    # Later logic will assume that the users are in sequential ascending order.
+    assert np.array_equal(self._train_pos_users[self.index_bounds[:-1]],
+                          np.arange(self._num_users))
+
+    # Same tallies as `BisectionDataConstructor`, without a loop over users.
+    user_order = np.lexsort((self._train_pos_items, self._train_pos_users))
+    self._sorted_train_pos_items = self._train_pos_items[user_order]
+    positions = (np.arange(upper_bound) -
+                 self.index_bounds[self._train_pos_users])
+    self._total_negatives = self._sorted_train_pos_items - positions
+    tally_keys = (
+        self._train_pos_users.astype(np.int64) * (self._num_items + 1) +
+        self._total_negatives)
+
+    os.makedirs(self._lookup_dir)
+    lookup = dict(
+        index_bounds=self.index_bounds,
+        tally_keys=tally_keys,
+        train_pos_users=self._train_pos_users,
+        train_pos_items=self._train_pos_items,
+        eval_pos_users=self._eval_pos_users,
+        eval_pos_items=self._eval_pos_items)
+    for key, value in lookup.items():
+      np.save(os.path.join(self._lookup_dir, key + ".npy"), value)
+
+    self._pool = popen_helper.get_forkpool(self._num_workers, closing=False)
+    atexit.register(self._pool.close)
+
+    logging.info("Negative tally keys built. Time: {:.1f} seconds".format(
+        timeit.default_timer() - start_time))
+
+  @staticmethod
+  def _slices(size, slice_size):
+    return [(start, min(start + slice_size, size))
+            for start in range(0, size, slice_size)]
+
+  def _construct_training_epoch(self):
+    """Construct a whole epoch of training data."""
+    if not self.create_data_offline:
+      self._wait_to_construct_train_epoch()
+
+    start_time = timeit.default_timer()
+    if self._stop_loop:
+      return
+
+    self._train_dataset.start_construction()
+    epoch_dir = self._train_dataset.create_arrays(self.train_batch_size)
+    np.save(os.path.join(epoch_dir, "order.npy"), next(self._shuffle_iterator))
+    self._pool.map(_fill_training_slice, [
+        (self._lookup_dir, epoch_dir, start, stop, stat_utils.random_int32(),
+         self.train_batch_size, self._num_users, self._num_items)
+        for start, stop in self._slices(
+            self.train_batches_per_epoch * self.train_batch_size,
+            self._SLICE_SIZE)
+    ])
+    os.remove(os.path.join(epoch_dir, "order.npy"))
+    self._train_dataset.end_construction()
+
+    logging.info("Epoch construction complete. Time: {:.1f} seconds".format(
+        timeit.default_timer() - start_time))
+
+  def _construct_eval_epoch(self):
+    """Construct the evaluation data."""
+    if self._stop_loop:
+      return
+
+    start_time = timeit.default_timer()
+
+    self._eval_dataset.start_construction()
+    epoch_dir = self._eval_dataset.create_arrays(self.eval_batch_size)
+    self._pool.map(_fill_eval_slice, [
+        (self._lookup_dir, epoch_dir, start, stop, stat_utils.random_int32(),
+         self.eval_batch_size, self._eval_users_per_batch, self._num_items)
+        for start, stop in self._slices(
+            self.eval_batches_per_epoch,
+            max(1, self._SLICE_SIZE // self.eval_batch_size))
+    ])
+    self._eval_dataset.end_construction()
+
+    logging.info("Eval construction complete. Time: {:.1f} seconds".format(
+        timeit.default_timer() - start_time))
+
+
 def get_constructor(name):
   if name == "bisection":
     return BisectionDataConstructor
   if name == "materialized":
     return MaterializedDataConstructor
+  if name == "memmap":
+    return MemmapDataConstructor
   raise ValueError("Unrecognized constructor: {}".format(name))
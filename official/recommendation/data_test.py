@@ -29,6 +29,7 @@ import scipy.stats
 import tensorflow as tf, tf_keras
 
 from official.recommendation import constants as rconst
+from official.recommendation import data_pipeline
 from official.recommendation import data_preprocessing
 from official.recommendation import movielens
 from official.recommendation import popen_helper
@@ -45,6 +46,10 @@ END_TO_END_TRAIN_MD5 = "b218738e915e825d03939c5e305a2698"
 END_TO_END_EVAL_MD5 = "d753d0f3186831466d6e218163a9501e"
 FRESH_RANDOMNESS_MD5 = "63d0dff73c0e5f1048fbdc8c65021e22"
 
+MEMMAP_END_TO_END_TRAIN_MD5 = "74a9ca5651dc1ccc1f088401a9f1a487"
+MEMMAP_END_TO_END_EVAL_MD5 = "4a744a216bfcee3a7608107041da71bb"
+MEMMAP_FRESH_RANDOMNESS_MD5 = "492cf1dcbf3e3237dd98c47c852bc091"
+
 
 def mock_download(*args, **kwargs):
   return
@@ -132,7 +137,9 @@ class BaseTest(tf.test.TestCase):
           break
     return output
 
-  def _test_end_to_end(self, constructor_type):
+  def _test_end_to_end(self, constructor_type,
+                       train_md5=END_TO_END_TRAIN_MD5,
+                       eval_md5=END_TO_END_EVAL_MD5):
     params = self.make_params(train_epochs=1)
     _, _, producer = data_preprocessing.instantiate_pipeline(
         dataset=DATASET,
@@ -190,7 +197,7 @@ class BaseTest(tf.test.TestCase):
         train_examples[l].add((u_raw, i_raw))
         counts[(u_raw, i_raw)] += 1
 
-    self.assertRegexpMatches(md5.hexdigest(), END_TO_END_TRAIN_MD5)
+    self.assertRegexpMatches(md5.hexdigest(), train_md5)
 
     num_positives_seen = len(train_examples[True])
     self.assertEqual(producer._train_pos_users.shape[0], num_positives_seen)
@@ -254,9 +261,10 @@ class BaseTest(tf.test.TestCase):
           # from the negatives.
           assert (u_raw, i_raw) not in self.seen_pairs
 
-    self.assertRegexpMatches(md5.hexdigest(), END_TO_END_EVAL_MD5)
+    self.assertRegexpMatches(md5.hexdigest(), eval_md5)
 
-  def _test_fresh_randomness(self, constructor_type):
+  def _test_fresh_randomness(self, constructor_type,
+                             expected_md5=FRESH_RANDOMNESS_MD5):
     train_epochs = 5
     params = self.make_params(train_epochs=train_epochs)
     _, _, producer = data_preprocessing.instantiate_pipeline(
@@ -300,7 +308,7 @@ class BaseTest(tf.test.TestCase):
         else:
           negative_counts[(u, i)] += 1
 
-    self.assertRegexpMatches(md5.hexdigest(), FRESH_RANDOMNESS_MD5)
+    self.assertRegexpMatches(md5.hexdigest(), expected_md5)
 
     # The positive examples should appear exactly once each epoch
     self.assertAllEqual(
@@ -355,6 +363,38 @@ class BaseTest(tf.test.TestCase):
   def test_fresh_randomness_bisection(self):
     self._test_fresh_randomness("bisection")
 
+  def test_end_to_end_memmap(self):
+    self._test_end_to_end("memmap", MEMMAP_END_TO_END_TRAIN_MD5,
+                          MEMMAP_END_TO_END_EVAL_MD5)
+
+  def test_fresh_randomness_memmap(self):
+    self._test_fresh_randomness("memmap", MEMMAP_FRESH_RANDOMNESS_MD5)
+
+  def test_memmap_negatives_match_bisection(self):
+    params = self.make_params(train_epochs=1)
+    _, _, producer = data_preprocessing.instantiate_pipeline(
+        dataset=DATASET,
+        data_dir=self.temp_data_dir,
+        params=params,
+        constructor_type="memmap",
+        deterministic=True)
+    data_pipeline.BisectionDataConstructor.construct_lookup_variables(producer)
+    total_negatives = producer._total_negatives
+    producer.construct_lookup_variables()
+    self.assertAllEqual(total_negatives, producer._total_negatives)
+
+    lookup = {
+        key: np.load(os.path.join(producer._lookup_dir, key + ".npy"))
+        for key in ("index_bounds", "tally_keys")
+    }
+    users = np.random.randint(0, NUM_USERS, size=100000)
+    np.random.seed(1)
+    expected = producer.lookup_negative_items(negative_users=users)
+    np.random.seed(1)
+    actual = data_pipeline._sample_negative_items(lookup, users, NUM_ITEMS,
+                                                  np.random)
+    self.assertAllEqual(expected, actual)
+
 
 if __name__ == "__main__":
   tf.test.main()
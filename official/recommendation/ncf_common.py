@@ -263,12 +263,14 @@ def define_ncf_flags():
   flags.DEFINE_enum(
       name="constructor_type",
       default="bisection",
-      enum_values=["bisection", "materialized"],
+      enum_values=["bisection", "materialized", "memmap"],
       case_sensitive=False,
       help=flags_core.help_wrap(
           "Strategy to use for generating false negatives. materialized has a"
           "precompute that scales badly, but a faster per-epoch construction"
-          "time and can be faster on very large systems."))
+          "time and can be faster on very large systems. memmap builds whole "
+          "epochs in memory-mapped arrays with a process pool and does not "
+          "support TPUs."))
 
   flags.DEFINE_string(
       name="train_dataset_path",
@@ -47,10 +47,12 @@ def permutation(args):
   return output
 
 
-def very_slightly_biased_randint(max_val_vector):
+def very_slightly_biased_randint(max_val_vector, random_state=None):
   sample_dtype = np.uint64
   out_dtype = max_val_vector.dtype
-  samples = np.random.randint(
+  if random_state is None:
+    random_state = np.random
+  samples = random_state.randint(
       low=0,
       high=np.iinfo(sample_dtype).max,
       size=max_val_vector.shape,
@@ -13,6 +13,3 @@
 # limitations under the License.
 
 """Vision package definition."""
-# pylint: disable=unused-import
-from official.vision import configs
-from official.vision import tasks
@@ -252,6 +252,9 @@ class MaskRCNNTask(cfg.TaskConfig):
   allowed_mask_class_ids: Optional[List[int]] = None
   # If set, the COCO metrics will be computed.
   use_coco_metrics: bool = True
+  # If set, the COCO per-image matching runs in the background while the eval
+  # batches arrive instead of all at once at the end of the evaluation.
+  streaming_coco_metrics: bool = False
   # If set, the Waymo Open Dataset evaluator would be used.
   use_wod_metrics: bool = False
   # If set, use instance metrics (AP, mask AP, etc.) computed by an efficient
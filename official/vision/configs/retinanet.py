@@ -210,6 +210,9 @@ class RetinaNetTask(cfg.TaskConfig):
   export_config: ExportConfig = dataclasses.field(default_factory=ExportConfig)
   # If set, the COCO metrics will be computed.
   use_coco_metrics: bool = True
+  # If set, the COCO per-image matching runs in the background while the eval
+  # batches arrive instead of all at once at the end of the evaluation.
+  streaming_coco_metrics: bool = False
   # If set, the Waymo Open Dataset evaluator would be used.
   use_wod_metrics: bool = False
 
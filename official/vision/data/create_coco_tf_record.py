@@ -75,6 +75,10 @@ _NUM_PROCESSES = flags.DEFINE_integer(
     'num_processes', None,
     ('Number of parallel processes to use. '
      'If set to 0, disables multi-processing.'))
+_RESUME = flags.DEFINE_boolean(
+    'resume', False,
+    'Whether to skip the output shards that already exist, e.g. to resume a '
+    'conversion that crashed.')
 
 
 FLAGS = flags.FLAGS
@@ -530,9 +534,11 @@ def _create_tf_record_from_coco_annotations(images_info_file,
       include_panoptic_masks=include_panoptic_masks,
       include_masks=include_masks)
 
-  num_skipped = tfrecord_lib.write_tf_record_dataset(
+  num_skipped = tfrecord_lib.write_tf_record_dataset_streaming(
       output_path, coco_annotations_iter, create_tf_example, num_shards,
-      multiple_processes=_NUM_PROCESSES.value)
+      num_examples=len(images),
+      multiple_processes=_NUM_PROCESSES.value,
+      resume=_RESUME.value)
 
   logging.info('Finished writing, skipped %d annotations.', num_skipped)
 
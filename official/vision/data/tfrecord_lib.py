@@ -14,9 +14,13 @@
 
 """Helper functions for creating TFRecord datasets."""
 
+import functools
 import hashlib
 import io
 import itertools
+import os
+import queue
+import threading
 
 from absl import logging
 import numpy as np
@@ -182,6 +186,215 @@ def write_tf_record_dataset(output_path, annotation_iterator,
   return total_num_annotations_skipped
 
 
+def _process_and_serialize(indexed_args, process_func, unpack_arguments):
+  """Runs `process_func` and serializes its tf.train.Example in the worker."""
+  index, args = indexed_args
+  if unpack_arguments:
+    tf_example, num_annotations_skipped = process_func(*args)
+  else:
+    tf_example, num_annotations_skipped = process_func(args)
+  return index, tf_example.SerializeToString(), num_annotations_skipped
+
+
+class _ShardWriter:
+  """Writes serialized records of a single shard on a background thread.
+
+  Records are first written to a temporary file which is renamed to the final
+  shard path on `close`, so an existing shard file is always complete.
+  """
+
+  def __init__(self, path, max_queue_size):
+    self._path = path
+    self._temp_path = path + '.incomplete'
+    self._queue = queue.Queue(maxsize=max_queue_size)
+    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._error = None
+    self._thread.start()
+
+  def _run(self):
+    try:
+      with tf.io.TFRecordWriter(self._temp_path) as writer:
+        while True:
+          record = self._queue.get()
+          if record is None:
+            break
+          writer.write(record)
+    except Exception as e:  # pylint: disable=broad-except
+      self._error = e
+      # Keeps draining so that the producer never blocks on a dead writer.
+      while self._queue.get() is not None:
+        pass
+
+  def write(self, record):
+    self._queue.put(record)
+
+  def close(self):
+    self._queue.put(None)
+    self._thread.join()
+    if self._error is not None:
+      raise self._error
+    tf.io.gfile.rename(self._temp_path, self._path, overwrite=True)
+
+
+def write_tf_record_dataset_streaming(output_path,
+                                      annotation_iterator,
+                                      process_func,
+                                      num_shards,
+                                      num_examples=None,
+                                      multiple_processes=None,
+                                      unpack_arguments=True,
+                                      max_in_flight=None,
+                                      resume=False):
+  """Streams annotations through worker processes into TFRecord shards.
+
+  Unlike `write_tf_record_dataset`, examples are never all materialized in the
+  parent process: at most `max_in_flight` annotations are being processed or
+  waiting to be written at any time, `tf.train.Example`s are serialized in the
+  worker processes so only bytes cross the process boundary, and every shard is
+  written by its own thread.
+
+  Shard `i` holds the i-th contiguous block of `num_examples` examples, in the
+  order of `annotation_iterator`. Shards are written to a temporary file and
+  only renamed to their final name once complete, so with `resume=True` a
+  conversion that crashed can be restarted and shards that already exist are
+  skipped without processing their annotations.
+
+  Args:
+    output_path: The prefix path to create TF record files.
+    annotation_iterator: An iterator of tuples containing details about the
+      dataset.
+    process_func: A picklable function which takes the elements from the
+      tuples of annotation_iterator as arguments and returns a tuple of
+      (tf.train.Example, int). The integer indicates the number of annotations
+      that were skipped.
+    num_shards: int, the number of shards to write for the dataset.
+    num_examples: int, the number of elements in `annotation_iterator`. If
+      None, `len(annotation_iterator)` is used.
+    multiple_processes: integer, the number of multiple parallel processes to
+      use. If None, uses multi-processing with number of processes equal to
+      `os.cpu_count()`, which is Python's default behavior. If set to 0,
+      multi-processing is disabled.
+    unpack_arguments: Whether to unpack the tuples from annotation_iterator as
+      individual arguments to the process func or to pass the returned value as
+      it is.
+    max_in_flight: int, the maximum number of annotations being processed or
+      buffered for writing. Defaults to 16 per process.
+    resume: Whether to skip the shards that already exist at `output_path`.
+
+  Returns:
+    num_skipped: The total number of skipped annotations of the shards written
+      by this call.
+  """
+  if num_examples is None:
+    num_examples = len(annotation_iterator)
+  if multiple_processes is None or multiple_processes > 0:
+    pool = mp.Pool(processes=multiple_processes)
+    num_processes = multiple_processes or os.cpu_count()
+  else:
+    pool = None
+    num_processes = 1
+  if max_in_flight is None:
+    max_in_flight = 16 * num_processes
+
+  shard_paths = [
+      output_path + '-%05d-of-%05d.tfrecord' % (i, num_shards)
+      for i in range(num_shards)
+  ]
+  shard_starts = [num_examples * i // num_shards for i in range(num_shards + 1)]
+
+  def shard_of(index):
+    return max(0, np.searchsorted(shard_starts, index, side='right') - 1)
+
+  completed_shards = set()
+  if resume:
+    completed_shards = {
+        i for i, path in enumerate(shard_paths) if tf.io.gfile.exists(path)
+    }
+    logging.info('Resuming, skipping %d of %d completed shards.',
+                 len(completed_shards), num_shards)
+
+  # Bounds the number of annotations handed to the pool. A slot is released
+  # once the corresponding record has been passed on to its shard writer.
+  in_flight = threading.Semaphore(max_in_flight)
+  # The pool consumes `pending_annotations` on its task handler thread, which
+  # must not stay blocked on `in_flight` once the results are abandoned, or
+  # `pool.terminate()` waits for it forever.
+  stopped = threading.Event()
+
+  def pending_annotations():
+    for index, args in enumerate(annotation_iterator):
+      if index >= num_examples:
+        raise ValueError(
+            'annotation_iterator has more than num_examples={} '
+            'elements.'.format(num_examples))
+      if shard_of(index) in completed_shards:
+        continue
+      in_flight.acquire()
+      if stopped.is_set():
+        return
+      yield index, args
+
+  serialize_func = functools.partial(
+      _process_and_serialize,
+      process_func=process_func,
+      unpack_arguments=unpack_arguments)
+  if pool is not None:
+    results = pool.imap_unordered(serialize_func, pending_annotations())
+  else:
+    results = map(serialize_func, pending_annotations())
+
+  writers = {}
+  reorder_buffer = {}
+  next_index = 0
+  total_num_annotations_skipped = 0
+
+  def advance_to_pending(index):
+    # Skips the examples of the shards completed by a previous run.
+    while index < num_examples and shard_of(index) in completed_shards:
+      index = shard_starts[shard_of(index) + 1]
+    return index
+
+  try:
+    next_index = advance_to_pending(next_index)
+    for index, record, num_annotations_skipped in results:
+      reorder_buffer[index] = (record, num_annotations_skipped)
+      # Writes records in order, so that every shard is deterministic.
+      while next_index in reorder_buffer:
+        record, num_annotations_skipped = reorder_buffer.pop(next_index)
+        if next_index % LOG_EVERY == 0:
+          logging.info('On image %d', next_index)
+        total_num_annotations_skipped += num_annotations_skipped
+        shard = shard_of(next_index)
+        if shard not in writers:
+          writers[shard] = _ShardWriter(shard_paths[shard], max_in_flight)
+        writers[shard].write(record)
+        in_flight.release()
+        next_index += 1
+        if next_index == shard_starts[shard + 1]:
+          writers.pop(shard).close()
+        next_index = advance_to_pending(next_index)
+  finally:
+    stopped.set()
+    in_flight.release()
+    if pool is not None:
+      pool.terminate()
+      pool.join()
+
+  if writers or next_index != num_examples:
+    raise ValueError(
+        'annotation_iterator has {} elements, expected num_examples={}.'.format(
+            next_index, num_examples))
+  # Shards that have no examples at all are written as empty files.
+  for shard, path in enumerate(shard_paths):
+    if shard_starts[shard] == shard_starts[shard + 1] and not (
+        tf.io.gfile.exists(path)):
+      _ShardWriter(path, 1).close()
+
+  logging.info('Finished writing, skipped %d annotations.',
+               total_num_annotations_skipped)
+  return total_num_annotations_skipped
+
+
 def check_and_make_dir(directory):
   """Creates the directory if it doesn't exist."""
   if not tf.io.gfile.isdir(directory):
@@ -32,6 +32,12 @@ def process_sample(x):
   return tf.train.Example(features=tf.train.Features(feature=d)), 0
 
 
+def process_sample_below_ten(x):
+  if x.int64_list.value[0] < 10:
+    raise ValueError('Should have been skipped.')
+  return process_sample(x)
+
+
 def parse_function(example_proto):
 
   feature_description = {
@@ -59,6 +65,58 @@ class TfrecordLibTest(parameterized.TestCase):
     read_values = set(d['x'] for d in dataset.as_numpy_iterator())
     self.assertSetEqual(read_values, set(range(17)))
 
+  @parameterized.parameters(0, 2)
+  def test_write_tf_record_dataset_streaming(self, multiple_processes):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(17)]
+
+    path = os.path.join(FLAGS.test_tmpdir, f'stream{multiple_processes}')
+
+    num_skipped = tfrecord_lib.write_tf_record_dataset_streaming(
+        path, iter(data), process_sample, 3, num_examples=len(data),
+        multiple_processes=multiple_processes, max_in_flight=4)
+    tfrecord_files = sorted(tf.io.gfile.glob(path + '*'))
+
+    self.assertEqual(num_skipped, 0)
+    self.assertLen(tfrecord_files, 3)
+    read_values = []
+    for tfrecord_file in tfrecord_files:
+      dataset = tf.data.TFRecordDataset(tfrecord_file).map(parse_function)
+      read_values.append([d['x'] for d in dataset.as_numpy_iterator()])
+    self.assertEqual(read_values,
+                     [list(range(0, 5)), list(range(5, 11)),
+                      list(range(11, 17))])
+
+  def test_write_tf_record_dataset_streaming_resume(self):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(20)]
+    path = os.path.join(FLAGS.test_tmpdir, 'resume')
+    tfrecord_lib.write_tf_record_dataset_streaming(
+        path, data, process_sample, 2, multiple_processes=0)
+    second_shard = path + '-00001-of-00002.tfrecord'
+    tf.io.gfile.remove(second_shard)
+
+    # The first shard holds the examples below ten and must not be rewritten.
+    tfrecord_lib.write_tf_record_dataset_streaming(
+        path, data, process_sample_below_ten, 2, multiple_processes=0,
+        resume=True)
+
+    dataset = tf.data.TFRecordDataset(second_shard).map(parse_function)
+    self.assertEqual([d['x'] for d in dataset.as_numpy_iterator()],
+                     list(range(10, 20)))
+    self.assertEmpty(tf.io.gfile.glob(path + '*.incomplete'))
+
+  @parameterized.parameters(0, 2)
+  def test_write_tf_record_dataset_streaming_worker_error(
+      self, multiple_processes):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(20)]
+    path = os.path.join(FLAGS.test_tmpdir, f'error{multiple_processes}')
+
+    # The error is raised while annotations are waiting for a free slot.
+    with self.assertRaisesRegex(ValueError, 'Should have been skipped'):
+      tfrecord_lib.write_tf_record_dataset_streaming(
+          path, data, process_sample_below_ten, 2,
+          multiple_processes=multiple_processes, max_in_flight=2)
+    self.assertEmpty(tf.io.gfile.glob(path + '*.tfrecord'))
+
   def test_convert_to_feature_float(self):
 
     proto = tfrecord_lib.convert_to_feature(0.0)
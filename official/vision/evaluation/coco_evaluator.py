@@ -27,6 +27,9 @@ See also: https://github.com/cocodataset/cocoapi/
 """
 
 import atexit
+import collections
+import concurrent.futures
+import copy
 import tempfile
 from absl import logging
 import numpy as np
@@ -37,6 +40,65 @@ import tensorflow as tf, tf_keras
 from official.vision.evaluation import coco_utils
 
 
+def _make_coco_eval(coco_gt, coco_dt, iou_type, kpt_oks_sigmas=None):
+  """Creates a `cocoeval.COCOeval` for the given IoU type."""
+  if iou_type == 'keypoints':
+    return cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type,
+                             kpt_oks_sigmas=kpt_oks_sigmas)
+  return cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type)
+
+
+def _set_eval_params(coco_eval, image_ids, category_ids, max_num_detections):
+  """Sets the params the same way `COCOeval.evaluate` normalizes them."""
+  params = coco_eval.params
+  params.imgIds = list(np.unique(image_ids))
+  params.catIds = list(np.unique(category_ids))
+  if max_num_detections is not None:
+    params.maxDets[2] = max_num_detections
+  params.maxDets = sorted(params.maxDets)
+  return params
+
+
+def _evaluate_images(coco_gt, coco_dt, iou_type, image_ids, category_ids,
+                     max_num_detections=None, kpt_oks_sigmas=None):
+  """Runs the per-image matching of `COCOeval.evaluate` on a few images.
+
+  Args:
+    coco_gt: the ground-truth COCO api object.
+    coco_dt: the detection result COCO api object.
+    iou_type: one of 'bbox', 'segm' or 'keypoints'.
+    image_ids: the ids of the images to evaluate.
+    category_ids: the ids of the categories to evaluate.
+    max_num_detections: if set, overrides the largest `maxDets` value.
+    kpt_oks_sigmas: the sigmas used to calculate keypoint OKS.
+
+  Returns:
+    A dictionary mapping (category id, area range index, image id) to the
+    non-empty `COCOeval.evaluateImg` results.
+  """
+  coco_eval = _make_coco_eval(coco_gt, coco_dt, iou_type, kpt_oks_sigmas)
+  params = _set_eval_params(coco_eval, image_ids, category_ids,
+                            max_num_detections)
+  coco_eval._prepare()  # pylint: disable=protected-access
+  if iou_type == 'keypoints':
+    compute_iou = coco_eval.computeOks
+  else:
+    compute_iou = coco_eval.computeIoU
+  coco_eval.ious = {(image_id, category_id): compute_iou(image_id, category_id)
+                    for image_id in params.imgIds
+                    for category_id in params.catIds}
+
+  eval_images = {}
+  for category_id in params.catIds:
+    for area_index, area_range in enumerate(params.areaRng):
+      for image_id in params.imgIds:
+        eval_image = coco_eval.evaluateImg(image_id, category_id, area_range,
+                                           params.maxDets[-1])
+        if eval_image is not None:
+          eval_images[category_id, area_index, image_id] = eval_image
+  return eval_images
+
+
 class COCOEvaluator(object):
   """COCO evaluation metric class."""
 
@@ -48,7 +110,9 @@ class COCOEvaluator(object):
                need_rescale_keypoints=False,
                per_category_metrics=False,
                max_num_eval_detections=100,
-               kpt_oks_sigmas=None):
+               kpt_oks_sigmas=None,
+               streaming=False,
+               num_streaming_workers=4):
     """Constructs COCO evaluation class.
 
     The class provides the interface to COCO metrics_fn. The
@@ -74,6 +138,11 @@ class COCOEvaluator(object):
       kpt_oks_sigmas: The sigmas used to calculate keypoint OKS. See
         http://cocodataset.org/#keypoints-eval. When None, it will use the
         defaults in COCO.
+      streaming: If true, the per-image COCO matching runs on a background
+        thread pool as `update_state` receives batches and only the compact
+        per-image match results are kept, so `evaluate` only accumulates and
+        summarizes them. The metrics are identical to the non-streaming mode.
+      num_streaming_workers: The number of threads used in streaming mode.
     Raises:
       ValueError: if max_num_eval_detections is not an integer.
     """
@@ -126,7 +195,17 @@ class COCOEvaluator(object):
       self._metric_names.extend(keypoint_metric_names)
       self._required_prediction_fields.extend(['detection_keypoints'])
       self._required_groundtruth_fields.extend(['keypoints'])
-      self._kpt_oks_sigmas = kpt_oks_sigmas
+    self._kpt_oks_sigmas = kpt_oks_sigmas
+
+    self._iou_types = ['bbox']
+    if self._include_mask:
+      self._iou_types.append('segm')
+    if self._include_keypoint:
+      self._iou_types.append('keypoints')
+    self._streaming = streaming
+    if self._streaming:
+      self._executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=num_streaming_workers)
 
     self.reset_states()
 
@@ -139,6 +218,10 @@ class COCOEvaluator(object):
     self._predictions = {}
     if not self._annotation_file:
       self._groundtruths = {}
+    if self._streaming:
+      for future in getattr(self, '_streaming_futures', []):
+        future.cancel()
+      self._streaming_futures = []
 
   def result(self):
     """Evaluates detection results, and reset_states."""
@@ -154,48 +237,12 @@ class COCOEvaluator(object):
       coco_metric: float numpy array with shape [24] representing the
         coco-style evaluation metrics (box and mask).
     """
-    if not self._annotation_file:
-      logging.info('There is no annotation_file in COCOEvaluator.')
-      gt_dataset = coco_utils.convert_groundtruths_to_coco_dataset(
-          self._groundtruths)
-      coco_gt = coco_utils.COCOWrapper(
-          eval_type=('mask' if self._include_mask else 'box'),
-          gt_dataset=gt_dataset)
+    if self._streaming:
+      coco_evals = self._accumulate_streaming_results()
     else:
-      logging.info('Using annotation file: %s', self._annotation_file)
-      coco_gt = self._coco_gt
-    coco_predictions = coco_utils.convert_predictions_to_coco_annotations(
-        self._predictions)
-    coco_dt = coco_gt.loadRes(predictions=coco_predictions)
-    image_ids = [ann['image_id'] for ann in coco_predictions]
-
-    coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='bbox')
-    coco_eval.params.imgIds = image_ids
-    coco_eval.params.maxDets[2] = self.max_num_eval_detections
-    coco_eval.evaluate()
-    coco_eval.accumulate()
-    coco_eval.summarize()
-    coco_metrics = coco_eval.stats
-    metrics = coco_metrics
-
-    if self._include_mask:
-      mcoco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='segm')
-      mcoco_eval.params.imgIds = image_ids
-      mcoco_eval.evaluate()
-      mcoco_eval.accumulate()
-      mcoco_eval.summarize()
-      mask_coco_metrics = mcoco_eval.stats
-      metrics = np.hstack((metrics, mask_coco_metrics))
-
-    if self._include_keypoint:
-      kcoco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='keypoints',
-                                     kpt_oks_sigmas=self._kpt_oks_sigmas)
-      kcoco_eval.params.imgIds = image_ids
-      kcoco_eval.evaluate()
-      kcoco_eval.accumulate()
-      kcoco_eval.summarize()
-      keypoint_coco_metrics = kcoco_eval.stats
-      metrics = np.hstack((metrics, keypoint_coco_metrics))
+      coco_evals = self._run_coco_eval()
+    metrics = np.hstack(
+        [coco_evals[iou_type].stats for iou_type in self._iou_types])
 
     metrics_dict = {}
     for i, name in enumerate(self._metric_names):
@@ -203,18 +250,136 @@ class COCOEvaluator(object):
 
     # Adds metrics per category.
     if self._per_category_metrics:
-      metrics_dict.update(self._retrieve_per_category_metrics(coco_eval))
+      metrics_dict.update(
+          self._retrieve_per_category_metrics(coco_evals['bbox']))
 
       if self._include_mask:
         metrics_dict.update(self._retrieve_per_category_metrics(
-            mcoco_eval, prefix='mask'))
+            coco_evals['segm'], prefix='mask'))
 
       if self._include_keypoint:
         metrics_dict.update(self._retrieve_per_category_metrics(
-            mcoco_eval, prefix='keypoints'))
+            coco_evals['keypoints'], prefix='keypoints'))
 
     return metrics_dict
 
+  def _run_coco_eval(self):
+    """Runs the full COCO evaluation on the accumulated predictions.
+
+    Returns:
+      A dictionary mapping each IoU type to its summarized `COCOeval`.
+    """
+    if not self._annotation_file:
+      logging.info('There is no annotation_file in COCOEvaluator.')
+      gt_dataset = coco_utils.convert_groundtruths_to_coco_dataset(
+          self._groundtruths)
+      coco_gt = coco_utils.COCOWrapper(
+          eval_type=('mask' if self._include_mask else 'box'),
+          gt_dataset=gt_dataset)
+    else:
+      logging.info('Using annotation file: %s', self._annotation_file)
+      coco_gt = self._coco_gt
+    coco_predictions = coco_utils.convert_predictions_to_coco_columns(
+        self._predictions)
+    coco_dt = coco_gt.loadRes(predictions=coco_predictions)
+    image_ids = coco_predictions['image_id'].tolist()
+
+    coco_evals = collections.OrderedDict()
+    for iou_type in self._iou_types:
+      coco_eval = _make_coco_eval(coco_gt, coco_dt, iou_type,
+                                  self._kpt_oks_sigmas)
+      coco_eval.params.imgIds = image_ids
+      if iou_type == 'bbox':
+        coco_eval.params.maxDets[2] = self.max_num_eval_detections
+      coco_eval.evaluate()
+      coco_eval.accumulate()
+      coco_eval.summarize()
+      coco_evals[iou_type] = coco_eval
+    return coco_evals
+
+  def _evaluate_batch(self, groundtruths, predictions):
+    """Runs the per-image COCO matching of a single batch in streaming mode.
+
+    Args:
+      groundtruths: a dictionary of numpy arrays of a single batch, only used if
+        there is no annotation file.
+      predictions: a dictionary of numpy arrays of a single batch.
+
+    Returns:
+      A tuple of (image ids, ground-truth category ids, eval images), where
+      eval images maps each IoU type to the non-empty per-image results keyed
+      by (category id, area range index, image id).
+    """
+    if self._annotation_file:
+      coco_gt = self._coco_gt
+    else:
+      coco_gt = coco_utils.COCOWrapper(
+          eval_type=('mask' if self._include_mask else 'box'),
+          gt_dataset=coco_utils.convert_groundtruths_to_coco_dataset(
+              {k: [v] for k, v in groundtruths.items()}))
+    coco_predictions = coco_utils.convert_predictions_to_coco_columns(
+        {k: [v] for k, v in predictions.items()})
+    coco_dt = coco_gt.loadRes(predictions=coco_predictions)
+
+    # Categories without any ground-truth or detection in these images have no
+    # per-image results, so only the ones present are evaluated here.
+    image_ids = sorted(set(coco_predictions['image_id'].tolist()))
+    gt_category_ids = {
+        ann['category_id']
+        for ann in coco_gt.loadAnns(coco_gt.getAnnIds(imgIds=image_ids))
+    }
+    category_ids = sorted(
+        gt_category_ids | set(coco_predictions['category_id'].tolist()))
+
+    eval_images = {}
+    for iou_type in self._iou_types:
+      eval_images[iou_type] = _evaluate_images(
+          coco_gt, coco_dt, iou_type, image_ids, category_ids,
+          max_num_detections=(self.max_num_eval_detections
+                              if iou_type == 'bbox' else None),
+          kpt_oks_sigmas=self._kpt_oks_sigmas)
+    if self._annotation_file:
+      gt_category_ids = set()
+    return image_ids, gt_category_ids, eval_images
+
+  def _accumulate_streaming_results(self):
+    """Accumulates and summarizes the per-image results of streaming mode.
+
+    Returns:
+      A dictionary mapping each IoU type to its summarized `COCOeval`.
+    """
+    image_ids = set()
+    category_ids = set()
+    eval_images = {iou_type: {} for iou_type in self._iou_types}
+    for future in self._streaming_futures:
+      batch_image_ids, batch_category_ids, batch_eval_images = future.result()
+      image_ids.update(batch_image_ids)
+      category_ids.update(batch_category_ids)
+      for iou_type, batch_results in batch_eval_images.items():
+        eval_images[iou_type].update(batch_results)
+    if self._annotation_file:
+      category_ids = self._coco_gt.getCatIds()
+
+    coco_evals = collections.OrderedDict()
+    for iou_type in self._iou_types:
+      coco_eval = _make_coco_eval(None, None, iou_type, self._kpt_oks_sigmas)
+      params = _set_eval_params(
+          coco_eval, sorted(image_ids), sorted(category_ids),
+          self.max_num_eval_detections if iou_type == 'bbox' else None)
+      # Lays the results out in the [category, area range, image] order
+      # `COCOeval.accumulate` indexes them with.
+      coco_eval.evalImgs = [
+          eval_images[iou_type].get((category_id, area_index, image_id))
+          for category_id in params.catIds
+          for area_index in range(len(params.areaRng))
+          for image_id in params.imgIds
+      ]
+      coco_eval._paramsEval = copy.deepcopy(params)  # pylint: disable=protected-access
+      coco_eval.accumulate()
+      coco_eval.summarize()
+      coco_evals[iou_type] = coco_eval
+    return coco_evals
+
   def _retrieve_per_category_metrics(self, coco_eval, prefix=''):
     """Retrieves and per-category metrics and retuns them in a dict.
 
@@ -365,6 +530,17 @@ class COCOEvaluator(object):
       self._process_bbox_predictions(predictions)
     if self._need_rescale_keypoints:
       self._process_keypoints_predictions(predictions)
+    if self._streaming:
+      if not self._annotation_file:
+        for k in self._required_groundtruth_fields:
+          if k not in groundtruths:
+            raise ValueError(
+                'Missing the required key `{}` in groundtruths!'.format(k))
+      self._streaming_futures.append(
+          self._executor.submit(self._evaluate_batch, groundtruths,
+                                predictions))
+      return
+
     for k, v in six.iteritems(predictions):
       if k not in self._predictions:
         self._predictions[k] = [v]
@@ -0,0 +1,143 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for coco_evaluator."""
+
+import io
+import json
+import os
+
+from absl.testing import parameterized
+import numpy as np
+from PIL import Image
+import tensorflow as tf, tf_keras
+
+from official.vision.evaluation import coco_evaluator
+from official.vision.evaluation import coco_utils
+
+_HEIGHT = 64
+_WIDTH = 96
+_NUM_INSTANCES = 4
+_NUM_DETECTIONS = 10
+
+
+def _generate_batches(num_batches, batch_size, include_mask, seed=0):
+  """Generates random ground-truth and perturbed detection batches."""
+  rng = np.random.default_rng(seed)
+  batches = []
+  for b in range(num_batches):
+    shape = [batch_size, _NUM_INSTANCES]
+    ymin = rng.uniform(0, _HEIGHT / 2, shape)
+    xmin = rng.uniform(0, _WIDTH / 2, shape)
+    boxes = np.stack([
+        ymin, xmin, ymin + rng.uniform(4, _HEIGHT / 2, shape),
+        xmin + rng.uniform(4, _WIDTH / 2, shape)
+    ], axis=-1)
+    classes = rng.integers(1, 4, shape)
+    source_id = np.arange(b * batch_size + 1, (b + 1) * batch_size + 1)
+    groundtruths = {
+        'source_id': source_id,
+        'height': np.full([batch_size], _HEIGHT),
+        'width': np.full([batch_size], _WIDTH),
+        'num_detections': np.full([batch_size], _NUM_INSTANCES),
+        'boxes': boxes,
+        'classes': classes,
+    }
+    detection_boxes = np.concatenate(
+        [boxes, boxes + rng.normal(0, 3, boxes.shape), boxes[:, :2]], axis=1)
+    predictions = {
+        'source_id': source_id,
+        'num_detections': np.full([batch_size], _NUM_DETECTIONS),
+        'detection_boxes': detection_boxes.astype(np.float32),
+        'detection_classes': np.concatenate(
+            [classes, classes, rng.integers(1, 5, [batch_size, 2])], axis=1),
+        'detection_scores': rng.random([batch_size, _NUM_DETECTIONS]).astype(
+            np.float32),
+        'image_info': np.tile([[[_HEIGHT, _WIDTH], [_HEIGHT, _WIDTH],
+                                [1.0, 1.0], [0.0, 0.0]]],
+                              [batch_size, 1, 1]).astype(np.float32),
+    }
+    if include_mask:
+      png_masks = np.empty(shape, dtype=object)
+      for j in range(batch_size):
+        for k in range(_NUM_INSTANCES):
+          mask = np.zeros([_HEIGHT, _WIDTH], np.uint8)
+          y0, x0, y1, x1 = boxes[j, k].astype(int)
+          mask[y0:y1, x0:x1] = 255
+          buffer = io.BytesIO()
+          Image.fromarray(mask).save(buffer, format='PNG')
+          png_masks[j, k] = buffer.getvalue()
+      groundtruths['masks'] = png_masks
+      predictions['detection_masks'] = rng.uniform(
+          0.5, 1.0, [batch_size, _NUM_DETECTIONS, 28, 28]).astype(np.float32)
+    batches.append((
+        {k: tf.constant(v) for k, v in groundtruths.items()},
+        {k: tf.constant(v) for k, v in predictions.items()},
+    ))
+  return batches
+
+
+class COCOEvaluatorTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _evaluate(self, batches, **kwargs):
+    evaluator = coco_evaluator.COCOEvaluator(**kwargs)
+    for groundtruths, predictions in batches:
+      evaluator.update_state(groundtruths, predictions)
+    return evaluator.result()
+
+  @parameterized.parameters(False, True)
+  def test_streaming_matches_batch_evaluation(self, include_mask):
+    batches = _generate_batches(
+        num_batches=3, batch_size=4, include_mask=include_mask)
+    kwargs = dict(annotation_file=None, include_mask=include_mask,
+                  per_category_metrics=True)
+    expected = self._evaluate(batches, **kwargs)
+    streaming = self._evaluate(batches, streaming=True, **kwargs)
+
+    self.assertGreater(expected['AP'], 0.0)
+    self.assertDictEqual(expected, streaming)
+
+  def test_streaming_with_annotation_file(self):
+    batches = _generate_batches(num_batches=2, batch_size=4,
+                                include_mask=False)
+    groundtruths = {}
+    for batch_groundtruths, _ in batches:
+      for k, v in batch_groundtruths.items():
+        groundtruths.setdefault(k, []).append(v.numpy())
+    annotation_file = os.path.join(self.create_tempdir(), 'annotation.json')
+    with tf.io.gfile.GFile(annotation_file, 'w') as f:
+      f.write(json.dumps(
+          coco_utils.convert_groundtruths_to_coco_dataset(groundtruths)))
+
+    kwargs = dict(annotation_file=annotation_file, include_mask=False)
+    expected = self._evaluate(batches, **kwargs)
+    streaming = self._evaluate(batches, streaming=True,
+                               num_streaming_workers=2, **kwargs)
+
+    self.assertGreater(expected['AP'], 0.0)
+    self.assertDictEqual(expected, streaming)
+
+  def test_streaming_reset_states(self):
+    batches = _generate_batches(num_batches=2, batch_size=2,
+                                include_mask=False)
+    evaluator = coco_evaluator.COCOEvaluator(
+        annotation_file=None, include_mask=False, streaming=True)
+    evaluator.update_state(*batches[0])
+    first = evaluator.result()
+    evaluator.update_state(*batches[0])
+    self.assertDictEqual(first, evaluator.result())
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -14,6 +14,7 @@
 
 """Util functions related to pycocotools and COCO eval."""
 
+import collections
 import copy
 import json
 
@@ -31,6 +32,20 @@ from official.vision.ops import box_ops
 from official.vision.ops import mask_ops
 
 
+def _group_by_key(keys, values):
+  """Groups `values` by `keys` preserving their order, as `COCO.createIndex`."""
+  groups = collections.defaultdict(list)
+  if not keys.size:
+    return groups
+  order = np.argsort(keys, kind='stable')
+  sorted_keys = keys[order]
+  boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+  for group in np.split(order, boundaries):
+    group = group.tolist()
+    groups[keys[group[0]].item()] = [values[k] for k in group]
+  return groups
+
+
 class COCOWrapper(coco.COCO):
   """COCO wrapper class.
 
@@ -41,6 +56,8 @@ class COCOWrapper(coco.COCO):
        dictionary.
     3. Support loading the prediction results using the external annotation
        dictionary.
+    4. Support loading the prediction results from a columnar structured numpy
+       array, see `convert_predictions_to_coco_columns`.
   """
 
   def __init__(self, eval_type='box', annotation_file=None, gt_dataset=None):
@@ -71,8 +88,9 @@ class COCOWrapper(coco.COCO):
 
     Args:
       predictions: a list of dictionary each representing an annotation in COCO
-        format. The required fields are `image_id`, `category_id`, `score`,
-        `bbox`, `segmentation`.
+        format, or a structured numpy array as returned by
+        `convert_predictions_to_coco_columns`. The required fields are
+        `image_id`, `category_id`, `score`, `bbox`, `segmentation`.
 
     Returns:
       res: result COCO api object.
@@ -81,9 +99,14 @@ class COCOWrapper(coco.COCO):
       ValueError: if the set of image id from predctions is not the subset of
         the set of image id of the ground-truth dataset.
     """
+    if isinstance(predictions, np.ndarray) and predictions.dtype.names:
+      return self._load_res_columns(predictions)
+
     res = coco.COCO()
-    res.dataset['images'] = copy.deepcopy(self.dataset['images'])
-    res.dataset['categories'] = copy.deepcopy(self.dataset['categories'])
+    # The ground-truth metadata is only read by the COCO API, so it is shared
+    # with the result object rather than copied.
+    res.dataset['images'] = list(self.dataset['images'])
+    res.dataset['categories'] = list(self.dataset['categories'])
 
     image_ids = [ann['image_id'] for ann in predictions]
     if set(image_ids) != (set(image_ids) & set(self.getImgIds())):
@@ -102,6 +125,66 @@ class COCOWrapper(coco.COCO):
     res.createIndex()
     return res
 
+  def _load_res_columns(self, predictions):
+    """Loads columnar predictions and returns a result api object.
+
+    Areas and box polygons are computed with array operations, and the result
+    index shares the ground-truth `imgs` and `cats` instead of rebuilding them.
+
+    Args:
+      predictions: a structured numpy array as returned by
+        `convert_predictions_to_coco_columns`.
+
+    Returns:
+      res: result COCO api object.
+
+    Raises:
+      ValueError: if the set of image id from predctions is not the subset of
+        the set of image id of the ground-truth dataset.
+    """
+    image_ids = predictions['image_id'].tolist()
+    if not set(image_ids).issubset(self.imgs):
+      raise ValueError('Results do not correspond to the current dataset!')
+
+    bboxes = predictions['bbox']
+    columns = {
+        'image_id': image_ids,
+        'category_id': predictions['category_id'].tolist(),
+        'bbox': bboxes.tolist(),
+        'score': predictions['score'].tolist(),
+        'id': predictions['id'].tolist(),
+    }
+    if self._eval_type == 'box':
+      x1 = bboxes[:, 0]
+      y1 = bboxes[:, 1]
+      x2 = bboxes[:, 0] + bboxes[:, 2]
+      y2 = bboxes[:, 1] + bboxes[:, 3]
+      columns['area'] = (bboxes[:, 2] * bboxes[:, 3]).tolist()
+      polygons = np.stack([x1, y1, x1, y2, x2, y2, x2, y1], axis=-1).tolist()
+      columns['segmentation'] = [[polygon] for polygon in polygons]
+    elif self._eval_type == 'mask':
+      segmentations = predictions['segmentation'].tolist()
+      columns['area'] = mask_api.area(segmentations).tolist()
+      columns['segmentation'] = segmentations
+    if 'keypoints' in predictions.dtype.names:
+      columns['keypoints'] = predictions['keypoints'].tolist()
+
+    keys = list(columns)
+    annotations = [
+        dict(zip(keys, values)) for values in zip(*columns.values())
+    ]
+
+    res = coco.COCO()
+    res.dataset['images'] = self.dataset['images']
+    res.dataset['categories'] = self.dataset['categories']
+    res.dataset['annotations'] = annotations
+    res.imgs = self.imgs
+    res.cats = self.cats
+    res.anns = dict(zip(columns['id'], annotations))
+    res.imgToAnns = _group_by_key(predictions['image_id'], annotations)
+    res.catToImgs = _group_by_key(predictions['category_id'], image_ids)
+    return res
+
 
 def convert_predictions_to_coco_annotations(predictions):
   """Converts a batch of predictions to annotations in COCO format.
@@ -187,6 +270,96 @@ def convert_predictions_to_coco_annotations(predictions):
   return coco_predictions
 
 
+def convert_predictions_to_coco_columns(predictions):
+  """Converts a batch of predictions to a columnar COCO results array.
+
+  This is the vectorized counterpart of
+  `convert_predictions_to_coco_annotations`. Instead of one dictionary per
+  detection it returns a single structured numpy array, which
+  `COCOWrapper.loadRes` consumes without any per-detection Python work. Unlike
+  `convert_predictions_to_coco_annotations`, `predictions` is not modified.
+
+  Args:
+    predictions: a dictionary of lists of numpy arrays in the format expected by
+      `convert_predictions_to_coco_annotations`.
+
+  Returns:
+    coco_predictions: a structured numpy array of shape [num_detections] with
+      the fields `id`, `image_id`, `category_id`, `score`, `bbox` (xywh),
+      and optionally `segmentation` (RLE dictionaries) and `keypoints`.
+  """
+  columns = collections.defaultdict(list)
+  use_outer_box = 'detection_outer_boxes' in predictions
+  for i in range(len(predictions['source_id'])):
+    batch_size, max_num_detections = predictions['detection_classes'][i].shape
+    boxes = box_ops.yxyx_to_xywh(predictions['detection_boxes'][i])
+    columns['bbox'].append(boxes.reshape([-1, 4]))
+    columns['image_id'].append(
+        np.repeat(
+            np.reshape(predictions['source_id'][i], [batch_size]),
+            max_num_detections))
+    columns['category_id'].append(
+        predictions['detection_classes'][i].reshape([-1]))
+    columns['score'].append(predictions['detection_scores'][i].reshape([-1]))
+
+    if 'detection_keypoints' in predictions:
+      # Adds extra ones to indicate the visibility for each keypoint as is
+      # recommended by MSCOCO. Also, convert keypoint from [y, x] to [x, y]
+      # as mandated by COCO.
+      keypoints = predictions['detection_keypoints'][i]
+      coco_keypoints = np.concatenate(
+          [
+              keypoints[..., 1:],
+              keypoints[..., :1],
+              np.ones(keypoints.shape[:-1] + (1,)),
+          ],
+          axis=-1,
+      ).astype(int)
+      columns['keypoints'].append(
+          coco_keypoints.reshape([batch_size * max_num_detections, -1]))
+
+    if 'detection_masks' in predictions:
+      if use_outer_box:
+        mask_boxes = box_ops.yxyx_to_xywh(
+            predictions['detection_outer_boxes'][i])
+      else:
+        mask_boxes = boxes
+      for j in range(batch_size):
+        image_masks = mask_ops.paste_instance_masks(
+            predictions['detection_masks'][i][j],
+            mask_boxes[j],
+            int(predictions['image_info'][i][j, 0, 0]),
+            int(predictions['image_info'][i][j, 0, 1]),
+        )
+        # Encodes all the masks of an image with a single call.
+        binary_masks = (image_masks > 0.0).astype(np.uint8)
+        columns['segmentation'].extend(
+            mask_api.encode(np.asfortranarray(binary_masks.transpose(1, 2, 0))))
+
+  num_detections = sum(len(ids) for ids in columns['image_id'])
+  fields = [
+      ('id', np.int64),
+      ('image_id', np.result_type(*columns['image_id'])),
+      ('category_id', np.int64),
+      ('score', np.result_type(*columns['score'])),
+      ('bbox', np.result_type(*columns['bbox']), (4,)),
+  ]
+  if 'segmentation' in columns:
+    fields.append(('segmentation', object))
+  if 'keypoints' in columns:
+    fields.append(
+        ('keypoints', np.int64, (columns['keypoints'][0].shape[-1],)))
+
+  coco_predictions = np.empty([num_detections], dtype=fields)
+  coco_predictions['id'] = np.arange(1, num_detections + 1)
+  for name, values in columns.items():
+    if name == 'segmentation':
+      coco_predictions[name] = values
+    else:
+      coco_predictions[name] = np.concatenate(values, axis=0)
+  return coco_predictions
+
+
 def convert_groundtruths_to_coco_dataset(groundtruths, label_map=None):
   """Converts ground-truths to the dataset in COCO format.
 
@@ -14,16 +14,78 @@
 
 """Tests for coco_utils."""
 
+import copy
+import io
 import os
 
+from absl.testing import parameterized
 import numpy as np
+from PIL import Image
+from pycocotools import cocoeval
 import tensorflow as tf, tf_keras
 
 from official.vision.dataloaders import tfexample_utils
 from official.vision.evaluation import coco_utils
 
 
-class CocoUtilsTest(tf.test.TestCase):
+def _random_groundtruths_and_predictions(num_images, include_mask):
+  """Generates a random COCO-style eval set and perturbed detections."""
+  rng = np.random.default_rng(0)
+  height, width = 64, 96
+  num_instances, num_detections = 4, 10
+  ymin = rng.uniform(0, height / 2, [1, num_images, num_instances])
+  xmin = rng.uniform(0, width / 2, [1, num_images, num_instances])
+  boxes = np.stack([
+      ymin, xmin,
+      ymin + rng.uniform(4, height / 2, ymin.shape),
+      xmin + rng.uniform(4, width / 2, xmin.shape)
+  ], axis=-1)[0]
+  classes = rng.integers(1, 3, [num_images, num_instances])
+  groundtruths = {
+      'source_id': [np.arange(1, num_images + 1)],
+      'height': [np.full([num_images], height)],
+      'width': [np.full([num_images], width)],
+      'num_detections': [np.full([num_images], num_instances)],
+      'boxes': [boxes],
+      'classes': [classes],
+  }
+  detection_boxes = np.concatenate(
+      [boxes, boxes + rng.normal(0, 3, boxes.shape)], axis=1)
+  detection_boxes = np.concatenate(
+      [detection_boxes, detection_boxes[:, :2]], axis=1).astype(np.float32)
+  predictions = {
+      'source_id': [np.arange(1, num_images + 1)],
+      'detection_boxes': [detection_boxes],
+      'detection_classes': [
+          np.concatenate(
+              [classes, classes, rng.integers(1, 3, [num_images, 2])], axis=1)
+      ],
+      'detection_scores': [
+          rng.random([num_images, num_detections]).astype(np.float32)
+      ],
+  }
+  if include_mask:
+    png_masks = np.empty([num_images, num_instances], dtype=object)
+    for j in range(num_images):
+      for k in range(num_instances):
+        mask = np.zeros([height, width], np.uint8)
+        y0, x0, y1, x1 = boxes[j, k].astype(int)
+        mask[y0:y1, x0:x1] = 255
+        buffer = io.BytesIO()
+        Image.fromarray(mask).save(buffer, format='PNG')
+        png_masks[j, k] = buffer.getvalue()
+    groundtruths['masks'] = [png_masks]
+    predictions['detection_masks'] = [
+        rng.uniform(0.5, 1.0, [num_images, num_detections, 28, 28]).astype(
+            np.float32)
+    ]
+    predictions['image_info'] = [
+        np.tile([[[height, width]]], [num_images, 4, 1]).astype(np.float32)
+    ]
+  return groundtruths, predictions
+
+
+class CocoUtilsTest(tf.test.TestCase, parameterized.TestCase):
 
   def test_scan_and_generator_annotation_file(self):
     num_samples = 10
@@ -90,6 +152,61 @@ class CocoUtilsTest(tf.test.TestCase):
       expected_keypoint_ann = expected_keypoint_ann.flatten().tolist()
       self.assertAllEqual(anns[i]['keypoints'], expected_keypoint_ann)
 
+  @parameterized.parameters(('box', 'bbox'), ('mask', 'segm'))
+  def test_columnar_predictions_match_annotations(self, eval_type, iou_type):
+    include_mask = eval_type == 'mask'
+    groundtruths, predictions = _random_groundtruths_and_predictions(
+        num_images=8, include_mask=include_mask)
+    coco_gt = coco_utils.COCOWrapper(
+        eval_type=eval_type,
+        gt_dataset=coco_utils.convert_groundtruths_to_coco_dataset(
+            groundtruths))
+
+    columns = coco_utils.convert_predictions_to_coco_columns(predictions)
+    annotations = coco_utils.convert_predictions_to_coco_annotations(
+        copy.deepcopy(predictions))
+    self.assertLen(columns, len(annotations))
+
+    stats = []
+    for coco_predictions in (annotations, columns):
+      coco_dt = coco_gt.loadRes(predictions=coco_predictions)
+      coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type)
+      coco_eval.evaluate()
+      coco_eval.accumulate()
+      coco_eval.summarize()
+      stats.append(coco_eval.stats)
+    self.assertGreater(stats[0][0], 0.0)
+    self.assertAllEqual(stats[0], stats[1])
+
+  def test_columnar_predictions_do_not_copy_groundtruth(self):
+    groundtruths, predictions = _random_groundtruths_and_predictions(
+        num_images=2, include_mask=False)
+    coco_gt = coco_utils.COCOWrapper(
+        eval_type='box',
+        gt_dataset=coco_utils.convert_groundtruths_to_coco_dataset(
+            groundtruths))
+    columns = coco_utils.convert_predictions_to_coco_columns(predictions)
+    coco_dt = coco_gt.loadRes(predictions=columns)
+
+    self.assertIs(coco_dt.imgs, coco_gt.imgs)
+    self.assertIs(coco_dt.cats, coco_gt.cats)
+    self.assertLen(coco_dt.getAnnIds(imgIds=[1]), 10)
+    ann = coco_dt.loadAnns([1])[0]
+    self.assertAlmostEqual(ann['area'], ann['bbox'][2] * ann['bbox'][3],
+                           places=3)
+
+  def test_columnar_predictions_raise_on_unknown_images(self):
+    groundtruths, predictions = _random_groundtruths_and_predictions(
+        num_images=2, include_mask=False)
+    coco_gt = coco_utils.COCOWrapper(
+        eval_type='box',
+        gt_dataset=coco_utils.convert_groundtruths_to_coco_dataset(
+            groundtruths))
+    predictions['source_id'] = [np.array([1, 5])]
+    columns = coco_utils.convert_predictions_to_coco_columns(predictions)
+    with self.assertRaisesRegex(ValueError, 'do not correspond'):
+      coco_gt.loadRes(predictions=columns)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -26,7 +26,9 @@ https://github.com/tensorflow/models/blob/master/research/deeplab/evaluation/pan
 """
 
 import collections
-from typing import Any, Dict, Optional, Tuple, Union
+import functools
+import multiprocessing as mp
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import tensorflow as tf, tf_keras
@@ -35,6 +37,13 @@ from official.vision.ops import box_ops
 
 _EPSILON = 1e-10
 
+# Segment ids up to this value are histogrammed with `np.bincount`; larger ids
+# fall back to a sort-based `np.unique` pass to bound the histogram memory.
+_MAX_BINCOUNT_SEGMENT_ID = 1 << 24
+# Upper bound on the dense (num_gt_segments * num_pred_segments) intersection
+# histogram before falling back to a sorted-key pass.
+_MAX_BINCOUNT_INTERSECTIONS = 1 << 24
+
 
 def realdiv_maybe_zero(x, y):
   """Element-wise x / y where y may contain zeros, for those returns 0 too."""
@@ -48,6 +57,127 @@ def _ids_to_counts(id_array):
   return dict(zip(ids, counts))
 
 
+def _segment_ids_and_areas(segment_id):
+  """Returns the sorted unique segment ids, their areas and per-pixel indices.
+
+  Args:
+    segment_id: A 1D numpy array of non-negative combined segment ids.
+
+  Returns:
+    A tuple of (ids, areas, indices), where `ids` are the sorted unique segment
+    ids, `areas` their pixel counts and `indices` the position of every pixel's
+    segment in `ids`.
+  """
+  max_id = int(segment_id.max()) if segment_id.size else 0
+  if max_id >= _MAX_BINCOUNT_SEGMENT_ID:
+    ids, indices, areas = np.unique(
+        segment_id, return_inverse=True, return_counts=True)
+    return ids, areas, indices.reshape(-1)
+
+  histogram = np.bincount(segment_id, minlength=max_id + 1)
+  ids = np.flatnonzero(histogram)
+  lookup = np.zeros(max_id + 1, dtype=np.int64)
+  lookup[ids] = np.arange(ids.size)
+  return ids, histogram[ids], lookup[segment_id]
+
+
+def _compute_image_statistics(
+    groundtruths: Dict[str, np.ndarray],
+    predictions: Dict[str, np.ndarray],
+    ignored_label: int,
+    max_instances_per_category: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+  """Matches the segments of a single image with array operations.
+
+  This is the vectorized counterpart of the dict/set based matching in
+  `PanopticQuality.compare_and_accumulate`. Matched segments are returned in
+  the same (ground-truth id, predicted id) order the reference implementation
+  visits them, so accumulating them yields bit-identical results.
+
+  Args:
+    groundtruths: A dictionary with `category_mask` and `instance_mask`.
+    predictions: A dictionary with `category_mask` and `instance_mask`.
+    ignored_label: A category id that is ignored in evaluation.
+    max_instances_per_category: The maximum number of instances for each
+      category.
+
+  Returns:
+    A tuple of (tp_categories, tp_ious, fn_categories, fp_categories): the
+    category of each true positive match and its IoU, and the category of each
+    false negative and false positive segment.
+  """
+  gt_segment_id = (
+      groundtruths['category_mask'].astype(np.uint32).reshape(-1) *
+      max_instances_per_category +
+      groundtruths['instance_mask'].astype(np.uint32).reshape(-1))
+  pred_segment_id = (
+      predictions['category_mask'].astype(np.uint32).reshape(-1) *
+      max_instances_per_category +
+      predictions['instance_mask'].astype(np.uint32).reshape(-1))
+
+  gt_ids, gt_areas, gt_indices = _segment_ids_and_areas(gt_segment_id)
+  pred_ids, pred_areas, pred_indices = _segment_ids_and_areas(pred_segment_id)
+  gt_categories = (gt_ids // max_instances_per_category).astype(np.int64)
+  pred_categories = (pred_ids // max_instances_per_category).astype(np.int64)
+  num_gt = gt_ids.size
+  num_pred = pred_ids.size
+
+  # Histogram the (ground-truth segment, predicted segment) pairs. Keys are in
+  # row-major order, i.e. sorted by ground-truth id and then predicted id.
+  intersection_key = gt_indices * num_pred + pred_indices
+  if num_gt * num_pred <= _MAX_BINCOUNT_INTERSECTIONS:
+    histogram = np.bincount(intersection_key, minlength=num_gt * num_pred)
+    intersection_key = np.flatnonzero(histogram)
+    intersection_areas = histogram[intersection_key]
+  else:
+    intersection_key, intersection_areas = np.unique(
+        intersection_key, return_counts=True)
+  gt_rows = intersection_key // num_pred
+  pred_cols = intersection_key % num_pred
+
+  # Overlap of every predicted segment with the void segment (instance id 0 of
+  # the ignored category) and with all ignored ground-truth segments.
+  void_segment_id = ignored_label * max_instances_per_category
+  void_overlap = np.zeros(num_pred, dtype=np.int64)
+  is_void = gt_ids[gt_rows] == void_segment_id
+  void_overlap[pred_cols[is_void]] = intersection_areas[is_void]
+  ignored_overlap = np.zeros(num_pred, dtype=np.int64)
+  is_ignored = gt_categories[gt_rows] == ignored_label
+  np.add.at(ignored_overlap, pred_cols[is_ignored],
+            intersection_areas[is_ignored])
+
+  # IoU per pair of intersecting segments of the same category. The union does
+  # not include the predicted pixels that are ground-truth void.
+  same_category = gt_categories[gt_rows] == pred_categories[pred_cols]
+  gt_rows = gt_rows[same_category]
+  pred_cols = pred_cols[same_category]
+  intersection_areas = intersection_areas[same_category]
+  union = (
+      gt_areas[gt_rows] + pred_areas[pred_cols] - intersection_areas -
+      void_overlap[pred_cols])
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ious = intersection_areas / union
+  is_match = ious > 0.5
+
+  gt_matched = np.zeros(num_gt, dtype=bool)
+  gt_matched[gt_rows[is_match]] = True
+  pred_matched = np.zeros(num_pred, dtype=bool)
+  pred_matched[pred_cols[is_match]] = True
+
+  # Failing to detect a void segment is not a false negative, and a false
+  # positive is not penalized if it is mostly ignored in the ground-truth.
+  is_fn = ~gt_matched & (gt_categories != ignored_label)
+  is_fp = ~pred_matched & ~(ignored_overlap / pred_areas > 0.5)
+
+  return (gt_categories[gt_rows[is_match]], ious[is_match],
+          gt_categories[is_fn], pred_categories[is_fp])
+
+
+def _compute_image_statistics_star(groundtruths_and_predictions, **kwargs):
+  """Unpacks a (groundtruths, predictions) pair for `Pool.imap`."""
+  return _compute_image_statistics(*groundtruths_and_predictions, **kwargs)
+
+
 class PanopticQuality:
   """Metric class for Panoptic Quality.
 
@@ -57,7 +187,7 @@ class PanopticQuality:
   """
 
   def __init__(self, num_categories, ignored_label, max_instances_per_category,
-               offset):
+               offset, vectorized=True, num_workers=0):
     """Initialization for PanopticQualityMetric.
 
     Args:
@@ -70,11 +200,20 @@ class PanopticQuality:
       offset: The maximum number of unique labels. This is used, by multiplying
         the ground-truth labels, to generate unique ids for individual regions
         of overlap between ground-truth and predicted segments.
+      vectorized: Whether to match segments with the histogram based array
+        engine instead of the reference dict/set loops. Both produce identical
+        results.
+      num_workers: The number of processes `compare_and_accumulate_batch` fans
+        images out to. Images are evaluated in-process if it is 0. Only used
+        when `vectorized` is True.
     """
     self.num_categories = num_categories
     self.ignored_label = ignored_label
     self.max_instances_per_category = max_instances_per_category
     self.offset = offset
+    self.vectorized = vectorized
+    self.num_workers = num_workers
+    self._pool = None
     self.reset()
 
   def _naively_combine_labels(self, category_mask, instance_mask):
@@ -106,6 +245,13 @@ class PanopticQuality:
           category labels.
         - instance_array: A 2D numpy uint16 array of predicted instance labels.
     """
+    if self.vectorized:
+      self._accumulate_image_statistics(
+          _compute_image_statistics(groundtruths, predictions,
+                                    self.ignored_label,
+                                    self.max_instances_per_category))
+      return
+
     groundtruth_category_mask = groundtruths['category_mask']
     groundtruth_instance_mask = groundtruths['instance_mask']
     predicted_category_mask = predictions['category_mask']
@@ -214,6 +360,61 @@ class PanopticQuality:
       category = pred_segment_id // self.max_instances_per_category
       self.fp_per_class[category] += 1
 
+  def compare_and_accumulate_batch(
+      self,
+      groundtruths: Sequence[Dict[str, np.ndarray]],
+      predictions: Sequence[Dict[str, np.ndarray]],
+  ):
+    """Compares and accumulates a sequence of images.
+
+    With `num_workers > 0` the per-image matching runs on a process pool. The
+    workers only return the compact per-image match lists, which are then
+    accumulated in image order so the result is identical to calling
+    `compare_and_accumulate` on every image in turn.
+
+    Args:
+      groundtruths: A sequence of ground-truth dictionaries, one per image, in
+        the format expected by `compare_and_accumulate`.
+      predictions: A sequence of prediction dictionaries, one per image, in the
+        format expected by `compare_and_accumulate`.
+    """
+    if len(groundtruths) != len(predictions):
+      raise ValueError(
+          'The number of groundtruths ({}) and predictions ({}) must '
+          'match.'.format(len(groundtruths), len(predictions)))
+    if not self.vectorized or self.num_workers <= 0 or len(groundtruths) < 2:
+      for groundtruth, prediction in zip(groundtruths, predictions):
+        self.compare_and_accumulate(groundtruth, prediction)
+      return
+
+    if self._pool is None:
+      # TensorFlow is not fork-safe.
+      self._pool = mp.get_context('spawn').Pool(self.num_workers)
+    compute_fn = functools.partial(
+        _compute_image_statistics_star,
+        ignored_label=self.ignored_label,
+        max_instances_per_category=self.max_instances_per_category)
+    chunksize = max(1, len(groundtruths) // (4 * self.num_workers))
+    for statistics in self._pool.imap(
+        compute_fn, zip(groundtruths, predictions), chunksize=chunksize):
+      self._accumulate_image_statistics(statistics)
+
+  def _accumulate_image_statistics(
+      self, statistics: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]):
+    """Adds the output of `_compute_image_statistics` to the accumulators."""
+    tp_categories, tp_ious, fn_categories, fp_categories = statistics
+    np.add.at(self.tp_per_class, tp_categories, 1)
+    np.add.at(self.iou_per_class, tp_categories, tp_ious)
+    np.add.at(self.fn_per_class, fn_categories, 1)
+    np.add.at(self.fp_per_class, fp_categories, 1)
+
+  def close(self):
+    """Shuts down the worker pool, if any."""
+    if self._pool is not None:
+      self._pool.close()
+      self._pool.join()
+      self._pool = None
+
   def _valid_categories(self):
     """Categories with a "valid" value for the metric, have > 0 instances.
 
@@ -53,7 +53,8 @@ class PanopticQualityEvaluator:
   """Panoptic Quality metric class."""
 
   def __init__(self, num_categories, ignored_label, max_instances_per_category,
-               offset, is_thing=None, rescale_predictions=False):
+               offset, is_thing=None, rescale_predictions=False,
+               num_workers=0):
     """Constructs Panoptic Quality evaluation class.
 
     The class provides the interface to Panoptic Quality metrics_fn.
@@ -75,9 +76,12 @@ class PanopticQualityEvaluator:
       rescale_predictions: `bool`, whether to scale back prediction to original
         image sizes. If True, groundtruths['image_info'] is used to rescale
         predictions.
+      num_workers: `int`, the number of processes used to evaluate the images
+        of a batch in parallel. Images are evaluated in-process if it is 0.
     """
     self._pq_metric_module = panoptic_quality.PanopticQuality(
-        num_categories, ignored_label, max_instances_per_category, offset)
+        num_categories, ignored_label, max_instances_per_category, offset,
+        num_workers=num_workers)
     self._is_thing = is_thing
     self._rescale_predictions = rescale_predictions
     self._required_prediction_fields = ['category_mask', 'instance_mask']
@@ -89,8 +93,9 @@ class PanopticQualityEvaluator:
     return 'panoptic_quality'
 
   def reset_states(self):
-    """Resets internal states for a fresh run."""
+    """Resets internal states for a fresh run, and shuts down the workers."""
     self._pq_metric_module.reset()
+    self._pq_metric_module.close()
 
   def result(self):
     """Evaluates detection results, and reset_states."""
@@ -160,6 +165,8 @@ class PanopticQualityEvaluator:
         raise ValueError(
             'Missing the required key `{}` in groundtruths!'.format(k))
 
+    groundtruths_list = []
+    predictions_list = []
     if self._rescale_predictions:
       for idx in range(len(groundtruths['category_mask'])):
         image_info = groundtruths['image_info'][idx]
@@ -177,18 +184,18 @@ class PanopticQualityEvaluator:
             }
         groundtruths_, predictions_ = self._convert_to_numpy(
             groundtruths_, predictions_)
-
-        self._pq_metric_module.compare_and_accumulate(
-            groundtruths_, predictions_)
+        groundtruths_list.append(groundtruths_)
+        predictions_list.append(predictions_)
     else:
       for idx in range(len(groundtruths['category_mask'])):
-        groundtruths_ = {
+        groundtruths_list.append({
             'category_mask': groundtruths['category_mask'][idx],
             'instance_mask': groundtruths['instance_mask'][idx]
-        }
-        predictions_ = {
+        })
+        predictions_list.append({
             'category_mask': predictions['category_mask'][idx],
             'instance_mask': predictions['instance_mask'][idx]
-        }
-        self._pq_metric_module.compare_and_accumulate(groundtruths_,
-                                                      predictions_)
+        })
+
+    self._pq_metric_module.compare_and_accumulate_batch(groundtruths_list,
+                                                        predictions_list)
@@ -91,6 +91,37 @@ class PanopticQualityEvaluatorTest(tf.test.TestCase):
     self.assertAlmostEqual(results['All_sq'], 0.84236111)
     self.assertEqual(results['All_num_categories'], 1)
 
+  def test_workers_match_in_process_and_are_shut_down_by_result(self):
+    rng = np.random.default_rng(0)
+    groundtruths = {
+        'category_mask': tf.convert_to_tensor(
+            rng.integers(0, 3, [4, 16, 16]).astype(np.uint16)),
+        'instance_mask': tf.convert_to_tensor(
+            rng.integers(0, 2, [4, 16, 16]).astype(np.uint16)),
+    }
+    predictions = {
+        'category_mask': tf.convert_to_tensor(
+            rng.integers(0, 3, [4, 16, 16]).astype(np.uint16)),
+        'instance_mask': tf.convert_to_tensor(
+            rng.integers(0, 2, [4, 16, 16]).astype(np.uint16)),
+    }
+    results = []
+    for num_workers in (0, 2):
+      pq_evaluator = panoptic_quality_evaluator.PanopticQualityEvaluator(
+          num_categories=3,
+          ignored_label=3,
+          max_instances_per_category=16,
+          offset=256,
+          num_workers=num_workers)
+      pq_evaluator.update_state(groundtruths, predictions)
+      results.append(pq_evaluator.result())
+      # pylint: disable=protected-access
+      self.assertIsNone(pq_evaluator._pq_metric_module._pool)
+      # pylint: enable=protected-access
+
+    for key, value in results[0].items():
+      np.testing.assert_array_equal(results[1][key], value)
+
 
 if __name__ == '__main__':
   tf.test.main()
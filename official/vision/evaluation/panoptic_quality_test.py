@@ -301,6 +301,65 @@ class PanopticQualityTest(absltest.TestCase):
     self.assertAlmostEqual(results['All_sq'], 1.0)
     self.assertEqual(results['All_num_categories'], 2)
 
+  def _random_image(self, rng, num_categories, height=48, width=64):
+    """Generates a blocky ground-truth and a perturbed prediction."""
+    gt_category = np.kron(
+        rng.integers(0, num_categories, size=(height // 8, width // 8)),
+        np.ones((8, 8), np.int64)).astype(np.uint16)
+    gt_instance = np.kron(
+        rng.integers(0, 4, size=(height // 8, width // 8)),
+        np.ones((8, 8), np.int64)).astype(np.uint16)
+    pred_category = np.roll(gt_category, rng.integers(-3, 4), axis=1)
+    pred_instance = np.roll(gt_instance, rng.integers(-3, 4), axis=0)
+    noise = rng.random((height, width)) < 0.1
+    pred_category[noise] = rng.integers(0, num_categories, size=noise.sum())
+    return ({'category_mask': gt_category, 'instance_mask': gt_instance},
+            {'category_mask': pred_category, 'instance_mask': pred_instance})
+
+  def test_vectorized_matches_reference(self):
+    rng = np.random.default_rng(0)
+    images = [self._random_image(rng, num_categories=5) for _ in range(20)]
+    reference = panoptic_quality.PanopticQuality(
+        num_categories=5, ignored_label=0, max_instances_per_category=16,
+        offset=256, vectorized=False)
+    vectorized = panoptic_quality.PanopticQuality(
+        num_categories=5, ignored_label=0, max_instances_per_category=16,
+        offset=256)
+    for groundtruths, predictions in images:
+      reference.compare_and_accumulate(groundtruths, predictions)
+      vectorized.compare_and_accumulate(groundtruths, predictions)
+
+    self.assertGreater(reference.tp_per_class.sum(), 0)
+    np.testing.assert_array_equal(vectorized.iou_per_class,
+                                  reference.iou_per_class)
+    np.testing.assert_array_equal(vectorized.tp_per_class,
+                                  reference.tp_per_class)
+    np.testing.assert_array_equal(vectorized.fn_per_class,
+                                  reference.fn_per_class)
+    np.testing.assert_array_equal(vectorized.fp_per_class,
+                                  reference.fp_per_class)
+
+  def test_batch_with_workers_matches_reference(self):
+    rng = np.random.default_rng(1)
+    groundtruths, predictions = zip(
+        *[self._random_image(rng, num_categories=4) for _ in range(12)])
+    reference = panoptic_quality.PanopticQuality(
+        num_categories=4, ignored_label=3, max_instances_per_category=16,
+        offset=256, vectorized=False)
+    parallel = panoptic_quality.PanopticQuality(
+        num_categories=4, ignored_label=3, max_instances_per_category=16,
+        offset=256, num_workers=2)
+    reference.compare_and_accumulate_batch(groundtruths, predictions)
+    parallel.compare_and_accumulate_batch(groundtruths, predictions)
+    parallel.close()
+
+    reference_results = reference.result()
+    parallel_results = parallel.result()
+    for key in ('pq_per_class', 'sq_per_class', 'rq_per_class'):
+      np.testing.assert_array_equal(parallel_results[key],
+                                    reference_results[key])
+    self.assertEqual(parallel_results['All_pq'], reference_results['All_pq'])
+
 
 class PanopticQualityV2Test(tf.test.TestCase):
 
@@ -14,5 +14,6 @@
 
 """All necessary imports for registration."""
 # pylint: disable=unused-import
-from official import vision
+from official.vision import configs
+from official.vision import tasks
 from official.utils.testing import mock_task
@@ -136,6 +136,26 @@ class DetectionModule(export_base.ExportModule):
 
     return detections_dict
 
+  def _rescale_outputs(self, outputs, scales):
+    """Maps the boxes on resized images back to the original images."""
+    if (
+        isinstance(self.params.task.model, configs.retinanet.RetinaNet)
+        and self.params.task.export_config.output_normalized_coordinates
+    ):
+      return outputs
+    outputs = dict(outputs)
+    for key in ['detection_boxes', 'detection_outer_boxes', 'decoded_boxes']:
+      if key not in outputs:
+        continue
+      boxes = outputs[key]
+      # [y_scale, x_scale, y_scale, x_scale] broadcast over the boxes.
+      box_scales = tf.reshape(
+          tf.tile(scales, [1, 2]),
+          tf.concat([[-1], tf.ones([boxes.shape.rank - 2], tf.int32), [4]], 0),
+      )
+      outputs[key] = boxes * tf.cast(box_scales, boxes.dtype)
+    return outputs
+
   def preprocess(
       self, images: tf.Tensor
   ) -> Tuple[tf.Tensor, Mapping[str, tf.Tensor], tf.Tensor]:
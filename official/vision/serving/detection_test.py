@@ -153,6 +153,70 @@ class DetectionExportTest(tf.test.TestCase, parameterized.TestCase):
     self.assertAllEqual(outputs['num_detections'].numpy(),
                         expected_outputs['num_detections'].numpy())
 
+  @parameterized.parameters(
+      ('retinanet_resnetfpn_coco',),
+      ('maskrcnn_resnetfpn_coco',),
+  )
+  def test_export_image_bytes_fused(self, experiment_name):
+    params = exp_factory.get_exp_config(experiment_name)
+    params.task.model.backbone.resnet.model_id = 18
+    params.task.model.detection_generator.nms_version = 'batched'
+    module = detection.DetectionModule(
+        params,
+        batch_size=None,
+        input_image_size=[384, 384],
+        input_type='image_bytes_fused',
+        aspect_ratio_buckets=(0.75, 1.0, 4 / 3),
+    )
+    tmp_dir = self.get_temp_dir()
+    self._export_from_module(module, 'image_bytes_fused', tmp_dir)
+    detection_fn = tf.saved_model.load(tmp_dir).signatures['serving_default']
+
+    # The images have the sizes of the landscape and portrait buckets, so that
+    # they are neither downscaled nor resized, and the square bucket is empty.
+    rng = np.random.default_rng(0)
+    images = []
+    for size in [(288, 384), (384, 288), (288, 384)]:
+      image = rng.integers(0, 256, size + (3,), dtype=np.uint8)
+      images.append(tf.image.encode_jpeg(image).numpy())
+    outputs = detection_fn(tf.constant(images))
+
+    for i, image in enumerate(images):
+      expected_outputs = module.inference_from_image_bytes(tf.constant([image]))
+      for key in ['detection_boxes', 'detection_classes', 'num_detections']:
+        self.assertAllClose(outputs[key][i], expected_outputs[key][0])
+
+    # The images do not match a bucket, so that they keep their aspect ratio
+    # and are padded to the size of the closest bucket.
+    images = []
+    expected_images = []
+    scales = []
+    for size, bucket_size, scaled_size in [
+        ((300, 360), (288, 384), (288, 346)),
+        ((500, 300), (384, 288), (384, 230)),
+        ((100, 100), (384, 384), (384, 384)),
+    ]:
+      image = rng.integers(0, 256, size + (3,), dtype=np.uint8)
+      images.append(tf.image.encode_png(image).numpy())
+      expected_image = tf.cast(
+          tf.round(tf.image.resize(image, scaled_size)), tf.uint8
+      )
+      expected_image = tf.image.pad_to_bounding_box(
+          expected_image, 0, 0, *bucket_size
+      )
+      expected_images.append(tf.image.encode_png(expected_image).numpy())
+      scales.append(np.array(size) / np.array(scaled_size))
+    outputs = detection_fn(tf.constant(images))
+
+    for i, image in enumerate(expected_images):
+      expected_outputs = module.inference_from_image_bytes(tf.constant([image]))
+      self.assertAllClose(
+          outputs['detection_boxes'][i],
+          expected_outputs['detection_boxes'][0] * np.tile(scales[i], 2),
+      )
+      for key in ['detection_classes', 'num_detections']:
+        self.assertAllClose(outputs[key][i], expected_outputs[key][0])
+
   @parameterized.parameters(('retinanet_resnetfpn_coco',),
                             ('maskrcnn_spinenet_coco',))
   def test_build_model_pass_with_none_batch_size(self, experiment_type):
@@ -15,7 +15,8 @@
 """Base class for model export."""
 
 import abc
-from typing import Dict, List, Mapping, Optional, Text
+import math
+from typing import Dict, List, Mapping, Optional, Sequence, Text, Tuple
 
 import tensorflow as tf, tf_keras
 
@@ -35,7 +36,8 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
       input_type: str = 'image_tensor',
       num_channels: int = 3,
       model: Optional[tf_keras.Model] = None,
-      input_name: Optional[str] = None
+      input_name: Optional[str] = None,
+      aspect_ratio_buckets: Sequence[float] = (1.0,),
   ):
     """Initializes a module for export.
 
@@ -48,6 +50,8 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
       num_channels: The number of the image channels.
       model: A tf_keras.Model instance to be exported.
       input_name: A customized input tensor name.
+      aspect_ratio_buckets: The width / height aspect ratios of the buckets
+        images are resized to by the `image_bytes_fused` signature.
     """
     self.params = params
     self._batch_size = batch_size
@@ -55,6 +59,7 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
     self._num_channels = num_channels
     self._input_type = input_type
     self._input_name = input_name
+    self._aspect_ratio_buckets = sorted(aspect_ratio_buckets)
     if model is None:
       model = self._build_model()  # pylint: disable=assignment-from-none
     super().__init__(params=params, model=model)
@@ -108,6 +113,163 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
     )
     return image_tensor
 
+  def _decode_image_downscaled(
+      self, encoded_image_bytes: str, min_size: tf.Tensor
+  ) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Decodes an image, downscaling JPEGs while decoding.
+
+    JPEGs are decoded at the largest power-of-two downscale ratio, up to 8,
+    that keeps both sides of the image at least `min_size`. The downscaling
+    happens in the DCT domain, so that the skipped pixels are never computed.
+    Other formats are decoded at full size.
+
+    Args:
+      encoded_image_bytes: An encoded image string to be decoded.
+      min_size: A float tensor of shape [2] with the minimum height and width
+        of the decoded image.
+
+    Returns:
+      The decoded image tensor, and its original size as a float tensor of
+      shape [2].
+    """
+
+    def decode_jpeg(ratio):
+      return lambda: tf.image.decode_jpeg(
+          encoded_image_bytes, channels=self._num_channels, ratio=ratio
+      )
+
+    def decode_jpeg_downscaled():
+      original_size = tf.cast(
+          tf.image.extract_jpeg_shape(encoded_image_bytes)[:2], tf.float32
+      )
+      max_ratio = tf.reduce_min(original_size / min_size)
+      # Index of the ratio in (1, 2, 4, 8).
+      index = tf.cast(
+          tf.floor(tf.math.log(tf.maximum(max_ratio, 1.0)) / math.log(2.0)),
+          tf.int32,
+      )
+      image = tf.switch_case(
+          tf.minimum(index, 3), [decode_jpeg(2**i) for i in range(4)]
+      )
+      return image, original_size
+
+    def decode_image():
+      image = tf.image.decode_image(
+          encoded_image_bytes,
+          channels=self._num_channels,
+          expand_animations=False,
+      )
+      return image, tf.cast(tf.shape(image)[:2], tf.float32)
+
+    image, original_size = tf.cond(
+        tf.io.is_jpeg(encoded_image_bytes), decode_jpeg_downscaled, decode_image
+    )
+    image.set_shape((None, None, self._num_channels))
+    return image, original_size
+
+  def _decode_and_resize_image(
+      self, encoded_image_bytes: str, size: List[int]
+  ) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Decodes an image and resizes it to `size` for `serve`.
+
+    As in `preprocess_ops.resize_and_crop_image`, the image keeps its aspect
+    ratio: it is resized to the largest size bounded by `size`, then padded at
+    the bottom and right to `size`.
+
+    Args:
+      encoded_image_bytes: An encoded image string to be decoded.
+      size: The [height, width] to resize and pad the image to.
+
+    Returns:
+      The resized and padded uint8 image tensor, and the scale from the resized
+      image to the original image size as a float tensor of shape [2].
+    """
+    size_tensor = tf.constant(size, tf.float32)
+
+    def fit(image_size):
+      scale = tf.reduce_min(size_tensor / image_size)
+      return tf.clip_by_value(tf.round(image_size * scale), 1.0, size_tensor)
+
+    # Only JPEGs are downscaled while decoding, and their size is read from
+    # the header.
+    header_size = tf.cond(
+        tf.io.is_jpeg(encoded_image_bytes),
+        lambda: tf.cast(
+            tf.image.extract_jpeg_shape(encoded_image_bytes)[:2], tf.float32
+        ),
+        lambda: size_tensor,
+    )
+    image, original_size = self._decode_image_downscaled(
+        encoded_image_bytes, fit(header_size)
+    )
+    scaled_size = fit(original_size)
+    image = tf.image.resize(
+        image,
+        tf.cast(scaled_size, tf.int32),
+        method=tf.image.ResizeMethod.BILINEAR,
+    )
+    image = tf.cast(tf.round(image), tf.uint8)
+    image = tf.image.pad_to_bounding_box(image, 0, 0, size[0], size[1])
+    return image, original_size / scaled_size
+
+  def _bucket_sizes(self) -> List[List[int]]:
+    """Returns the image size of each bucket of `aspect_ratio_buckets`.
+
+    Each bucket size has the aspect ratio of the bucket and fits in the input
+    image size, so that the resizing in `serve` is close to the identity.
+    """
+    height, width = self._input_image_size
+    sizes = []
+    for aspect_ratio in self._aspect_ratio_buckets:
+      if aspect_ratio >= width / height:
+        sizes.append([max(1, round(width / aspect_ratio)), width])
+      else:
+        sizes.append([height, max(1, round(height * aspect_ratio))])
+    return sizes
+
+  def _bucket_index(self, encoded_image_bytes: str) -> tf.Tensor:
+    """Returns the bucket of the closest aspect ratio to an image's."""
+
+    def image_size():
+      image = tf.image.decode_image(
+          encoded_image_bytes,
+          channels=self._num_channels,
+          expand_animations=False,
+      )
+      return tf.shape(image)[:2]
+
+    # Only reads the header of JPEGs.
+    size = tf.cast(
+        tf.cond(
+            tf.io.is_jpeg(encoded_image_bytes),
+            lambda: tf.image.extract_jpeg_shape(encoded_image_bytes)[:2],
+            image_size,
+        ),
+        tf.float32,
+    )
+    log_aspect_ratio = tf.math.log(size[1] / size[0])
+    distances = tf.abs(
+        tf.math.log(tf.constant(self._aspect_ratio_buckets, tf.float32))
+        - log_aspect_ratio
+    )
+    return tf.cast(tf.argmin(distances), tf.int32)
+
+  def _rescale_outputs(
+      self, outputs: Mapping[str, tf.Tensor], scales: tf.Tensor
+  ) -> Mapping[str, tf.Tensor]:
+    """Maps outputs on resized images back to the original images.
+
+    Args:
+      outputs: The outputs of `serve`.
+      scales: A float tensor of shape [batch_size, 2] with the scale from each
+        resized image to its original size.
+
+    Returns:
+      The rescaled outputs.
+    """
+    del scales
+    return outputs
+
   def _build_model(self, **kwargs):
     """Returns a model built from the params."""
     return None
@@ -162,6 +324,74 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
       images = tf.stack(images)
     return self.serve(images)
 
+  @tf.function
+  def inference_from_image_bytes_fused(
+      self, inputs: tf.Tensor
+  ) -> Mapping[str, tf.Tensor]:
+    """Runs inference on encoded images with fused decoding and resizing.
+
+    Unlike `inference_from_image_bytes`, images of different sizes can be
+    batched together: each image is assigned to the bucket of the closest
+    aspect ratio, then decoded and resized to the static size of its bucket in
+    a single step, and `serve` runs once per non-empty bucket.
+
+    Args:
+      inputs: A string tensor of shape [batch_size] of encoded images.
+
+    Returns:
+      The outputs of `serve` in the order of `inputs`.
+    """
+    bucket_sizes = self._bucket_sizes()
+    with tf.device('cpu:0'):
+      if len(bucket_sizes) > 1:
+        bucket_indices = tf.map_fn(
+            self._bucket_index,
+            elems=inputs,
+            fn_output_signature=tf.TensorSpec([], tf.int32),
+            parallel_iterations=32,
+        )
+      else:
+        bucket_indices = tf.zeros(tf.shape(inputs), tf.int32)
+      positions = tf.dynamic_partition(
+          tf.range(tf.shape(inputs)[0]), bucket_indices, len(bucket_sizes)
+      )
+
+    all_outputs = []
+    all_scales = []
+    for size, bucket_positions in zip(bucket_sizes, positions):
+      with tf.device('cpu:0'):
+        images, scales = tf.map_fn(
+            lambda x, size=size: self._decode_and_resize_image(x, size),
+            elems=tf.gather(inputs, bucket_positions),
+            fn_output_signature=(
+                tf.TensorSpec(size + [self._num_channels], tf.uint8),
+                tf.TensorSpec([2], tf.float32),
+            ),
+            parallel_iterations=32,
+        )
+      # Some models do not support empty batches, so that they are skipped.
+      output_specs = tf.function(self.serve).get_concrete_function(
+          tf.TensorSpec([None] + size + [self._num_channels], tf.uint8)
+      ).structured_outputs
+      outputs = tf.cond(
+          tf.size(bucket_positions) > 0,
+          lambda images=images: self.serve(images),
+          lambda output_specs=output_specs: tf.nest.map_structure(
+              lambda t: tf.zeros(
+                  [0] + [d or 0 for d in t.shape[1:]], t.dtype
+              ),
+              output_specs,
+          ),
+      )
+      all_outputs.append(outputs)
+      all_scales.append(scales)
+
+    outputs = tf.nest.map_structure(
+        lambda *t: tf.dynamic_stitch(positions, t), *all_outputs
+    )
+    scales = tf.dynamic_stitch(positions, all_scales)
+    return self._rescale_outputs(outputs, scales)
+
   def get_inference_signatures(self, function_keys: Dict[Text, Text]):
     """Gets defined function signatures.
 
@@ -197,6 +427,17 @@ class ExportModule(export_base.ExportModule, metaclass=abc.ABCMeta):
                 input_signature
             )
         )
+      elif key == 'image_bytes_fused':
+        if len(self._input_image_size) != 2:
+          raise ValueError('`image_bytes_fused` only supports 2D images.')
+        input_signature = tf.TensorSpec(
+            shape=[self._batch_size], dtype=tf.string, name=self._input_name
+        )
+        signatures[def_name] = (
+            self.inference_from_image_bytes_fused.get_concrete_function(
+                input_signature
+            )
+        )
       elif key == 'serve_examples' or key == 'tf_example':
         input_signature = tf.TensorSpec(
             shape=[self._batch_size], dtype=tf.string, name=self._input_name
@@ -66,7 +66,8 @@ _PARAMS_OVERRIDE = flags.DEFINE_string(
 _BATCH_SIZE = flags.DEFINE_integer('batch_size', None, 'The batch size.')
 _IMAGE_TYPE = flags.DEFINE_string(
     'input_type', 'image_tensor',
-    'One of `image_tensor`, `image_bytes`, `tf_example` and `tflite`.')
+    'One of `image_tensor`, `image_bytes`, `image_bytes_fused`, `tf_example` '
+    'and `tflite`.')
 _INPUT_IMAGE_SIZE = flags.DEFINE_string(
     'input_image_size', '224,224',
     'The comma-separated string of two integers representing the height,width '
@@ -96,6 +97,10 @@ _FUNCTION_KEYS = flags.DEFINE_string(
         ' input types.'
     ),
 )
+_ASPECT_RATIO_BUCKETS = flags.DEFINE_list(
+    'aspect_ratio_buckets', ['1.0'],
+    'The comma-separated width / height aspect ratios of the buckets images '
+    'are resized to by the `image_bytes_fused` input type of detection models.')
 _ADD_TPU_FUNCTION_ALIAS = flags.DEFINE_bool(
     'add_tpu_function_alias',
     False,
@@ -151,6 +156,7 @@ def main(_):
       log_model_flops_and_params=_LOG_MODEL_FLOPS_AND_PARAMS.value,
       input_name=_INPUT_NAME.value,
       add_tpu_function_alias=_ADD_TPU_FUNCTION_ALIAS.value,
+      aspect_ratio_buckets=[float(x) for x in _ASPECT_RATIO_BUCKETS.value],
   )
 
 
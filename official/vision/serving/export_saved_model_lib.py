@@ -15,7 +15,7 @@
 r"""Vision models export utility function for serving/inference."""
 
 import os
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Sequence, Union
 
 from absl import logging
 import tensorflow as tf, tf_keras
@@ -47,6 +47,7 @@ def export_inference_graph(
     input_name: Optional[str] = None,
     function_keys: Optional[Union[List[str], Dict[str, str]]] = None,
     add_tpu_function_alias: Optional[bool] = False,
+    aspect_ratio_buckets: Sequence[float] = (1.0,),
 ):
   """Exports inference graph for the model specified in the exp config.
 
@@ -54,7 +55,8 @@ def export_inference_graph(
   at export_dir/checkpoint, and params is saved at export_dir/params.yaml.
 
   Args:
-    input_type: One of `image_tensor`, `image_bytes`, `tf_example` or `tflite`.
+    input_type: One of `image_tensor`, `image_bytes`, `image_bytes_fused`,
+      `tf_example` or `tflite`.
     batch_size: 'int', or None.
     input_image_size: List or Tuple of height and width.
     params: Experiment params.
@@ -79,6 +81,9 @@ def export_inference_graph(
       is provided, the values will be used as signature keys.
     add_tpu_function_alias: Whether to add TPU function alias so that it can be
       converted to a TPU compatible saved model later. Default is False.
+    aspect_ratio_buckets: The width / height aspect ratios of the buckets
+      images are resized to by the `image_bytes_fused` signature of detection
+      models.
   """
 
   if export_checkpoint_subdir:
@@ -118,6 +123,7 @@ def export_inference_graph(
           input_type=input_type,
           num_channels=num_channels,
           input_name=input_name,
+          aspect_ratio_buckets=aspect_ratio_buckets,
       )
     elif isinstance(
         params.task, configs.semantic_segmentation.SemanticSegmentationTask
@@ -0,0 +1,163 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks the encoded image serving signatures of vision modules on CPU.
+
+Batches of JPEGs of mixed sizes, with a fraction of repeated images, are served
+by a `ClassificationModule` and a `DetectionModule` through:
+- `image_bytes`: `inference_from_image_bytes`. Detection modules cannot batch
+  images of different sizes with it, so that they serve one image at a time.
+- `image_bytes_fused`: `inference_from_image_bytes_fused`.
+- `image_bytes_fused` with an `InferenceCache`.
+Latency percentiles per batch and throughput are reported for each, and for the
+decoding and resizing alone of the classification module.
+
+Example usage:
+  python -m official.vision.serving.image_bytes_benchmark \
+    --num_batches=20 --batch_size=8 --repeat_fraction=0.25
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.core import exp_factory
+from official.vision import registry_imports  # pylint: disable=unused-import
+from official.vision.serving import detection
+from official.vision.serving import image_classification
+from official.vision.serving import inference_cache
+
+_MODULES = flags.DEFINE_list(
+    'modules', ['classification', 'detection'], 'Modules to benchmark.')
+_NUM_BATCHES = flags.DEFINE_integer('num_batches', 20, 'Number of batches.')
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 8, 'Images per batch.')
+_IMAGE_SIZES = flags.DEFINE_list(
+    'image_sizes', ['480x640', '640x480', '720x1280', '1080x1920'],
+    'Sizes of the images, as heightxwidth.')
+_REPEAT_FRACTION = flags.DEFINE_float(
+    'repeat_fraction', 0.25, 'Fraction of images repeated from a small pool.')
+_DETECTION_IMAGE_SIZE = flags.DEFINE_integer(
+    'detection_image_size', 384, 'Input image size of the detection model.')
+
+
+def _build_module(name):
+  """Returns the module to benchmark."""
+  if name == 'classification':
+    params = exp_factory.get_exp_config('resnet_imagenet')
+    params.task.model.backbone.resnet.model_id = 18
+    return image_classification.ClassificationModule(
+        params,
+        batch_size=None,
+        input_image_size=[224, 224],
+        input_type='image_bytes_fused')
+  params = exp_factory.get_exp_config('retinanet_resnetfpn_coco')
+  params.task.model.backbone.resnet.model_id = 18
+  params.task.model.detection_generator.nms_version = 'batched'
+  size = _DETECTION_IMAGE_SIZE.value
+  return detection.DetectionModule(
+      params,
+      batch_size=None,
+      input_image_size=[size, size],
+      input_type='image_bytes_fused',
+      aspect_ratio_buckets=(9 / 16, 3 / 4, 1.0, 4 / 3, 16 / 9))
+
+
+def _generate_batches(rng):
+  """Generates batches of smooth JPEGs, with repeats from a small pool."""
+
+  def encode(size):
+    height, width = size
+    y, x = np.mgrid[0:height, 0:width]
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    image = np.stack([
+        127.5 * (1 + np.sin(x / 37 + phase[0])),
+        127.5 * (1 + np.sin(y / 23 + phase[1])),
+        127.5 * (1 + np.sin((x + y) / 51 + phase[2])),
+    ], axis=-1).astype(np.uint8)
+    return tf.image.encode_jpeg(image, quality=90).numpy()
+
+  sizes = [tuple(int(d) for d in s.split('x')) for s in _IMAGE_SIZES.value]
+  pool = [encode(sizes[i % len(sizes)]) for i in range(4)]
+  batches = []
+  for _ in range(_NUM_BATCHES.value):
+    batch = []
+    for _ in range(_BATCH_SIZE.value):
+      if rng.uniform() < _REPEAT_FRACTION.value:
+        batch.append(pool[rng.integers(len(pool))])
+      else:
+        batch.append(encode(sizes[rng.integers(len(sizes))]))
+    batches.append(batch)
+  return batches
+
+
+def _benchmark(name, serve_batch, batches):
+  serve_batch(batches[0])  # Warms up.
+  latencies = []
+  start = time.perf_counter()
+  for batch in batches:
+    batch_start = time.perf_counter()
+    serve_batch(batch)
+    latencies.append(time.perf_counter() - batch_start)
+  elapsed = time.perf_counter() - start
+  logging.info(
+      '%-36s p50 %8.1f ms  p95 %8.1f ms  throughput %6.1f images/s', name,
+      np.percentile(latencies, 50) * 1e3, np.percentile(latencies, 95) * 1e3,
+      len(batches) * _BATCH_SIZE.value / elapsed)
+
+
+def main(_):
+  rng = np.random.default_rng(0)
+  batches = _generate_batches(rng)
+  spec = tf.TensorSpec([None], tf.string)
+  for name in _MODULES.value:
+    module = _build_module(name)
+    image_bytes_fn = module.inference_from_image_bytes.get_concrete_function(
+        spec)
+    fused_fn = module.inference_from_image_bytes_fused.get_concrete_function(
+        spec)
+
+    if name == 'classification':
+      # pylint: disable=protected-access
+      size = module._input_image_size
+      decode_fn = tf.function(lambda x, m=module: tf.map_fn(
+          m._decode_image, x, fn_output_signature=tf.uint8))
+      fused_decode_fn = tf.function(lambda x, m=module, size=size: tf.map_fn(
+          lambda image: m._decode_and_resize_image(image, size)[0], x,
+          fn_output_signature=tf.uint8))
+      # pylint: enable=protected-access
+      _benchmark(f'{name} decode', lambda batch: decode_fn(tf.constant(batch)),
+                 batches)
+      _benchmark(f'{name} fused decode',
+                 lambda batch: fused_decode_fn(tf.constant(batch)), batches)
+      serve_image_bytes = lambda batch, fn=image_bytes_fn: fn(
+          tf.constant(batch))
+    else:
+      serve_image_bytes = lambda batch, fn=image_bytes_fn: [
+          fn(tf.constant([image])) for image in batch
+      ]
+    _benchmark(f'{name} image_bytes', serve_image_bytes, batches)
+    _benchmark(f'{name} image_bytes_fused',
+               lambda batch, fn=fused_fn: fn(tf.constant(batch)), batches)
+    cache = inference_cache.InferenceCache(fused_fn)
+    _benchmark(f'{name} image_bytes_fused cached', cache, batches)
+    logging.info('%-36s hits %d  misses %d', f'{name} cache', cache.hits,
+                 cache.misses)
+
+
+if __name__ == '__main__':
+  app.run(main)
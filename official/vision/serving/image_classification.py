@@ -54,7 +54,7 @@ class ClassificationModule(export_base.ExportModule):
 
     # For these input types, decode_image already performs cropping.
     if not (
-        self._input_type in ['tf_example', 'image_bytes']
+        self._input_type in ['tf_example', 'image_bytes', 'image_bytes_fused']
         and len(self._input_image_size) == 2):
       image = self._crop_and_resize(image)
 
@@ -96,6 +96,23 @@ class ClassificationModule(export_base.ExportModule):
       )
     return image_tensor
 
+  def _decode_and_resize_image(self, encoded_image_bytes, size):
+    """Decodes, center crops and resizes an image in a single step."""
+    min_size = tf.constant(size, tf.float32)
+    if self.params.task.train_data.aug_crop:
+      # The center crop keeps a fraction of the short side of the image.
+      min_size /= preprocess_ops.CENTER_CROP_FRACTION
+    image, original_size = self._decode_image_downscaled(
+        encoded_image_bytes, min_size
+    )
+    image = self._crop_and_resize(tf.cast(image, dtype=tf.float32))
+    image = tf.cast(image, tf.uint8)
+    return image, original_size / tf.constant(size, tf.float32)
+
+  def _bucket_sizes(self):
+    # Images are center cropped to squares, so that one bucket is enough.
+    return [self._input_image_size]
+
   def serve(self, images):
     """Cast image to float and run inference.
 
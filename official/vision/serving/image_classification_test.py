@@ -176,5 +176,51 @@ class ImageClassificationExportTest(tf.test.TestCase, parameterized.TestCase):
     self.assertAllClose(out['probs'].numpy(), expected_prob.numpy())
 
 
+  def test_export_image_bytes_fused(self):
+    tmp_dir = self.get_temp_dir()
+    module = self._get_classification_module(
+        'image_bytes_fused', batch_size=None
+    )
+    self._export_from_module(module, 'image_bytes_fused', tmp_dir)
+    classification_fn = tf.saved_model.load(tmp_dir).signatures[
+        'serving_default'
+    ]
+
+    rng = np.random.default_rng(0)
+    images = [
+        tf.image.encode_jpeg(
+            rng.integers(0, 256, (300, 200, 3), dtype=np.uint8)
+        ).numpy(),
+        tf.image.encode_png(
+            rng.integers(0, 256, (250, 250, 3), dtype=np.uint8)
+        ).numpy(),
+    ]
+    out = classification_fn(tf.constant(images))
+
+    # Neither image is downscaled while decoding.
+    for i, image in enumerate(images):
+      expected = module.inference_from_image_bytes(tf.constant([image]))
+      self.assertAllClose(out['logits'][i], expected['logits'][0])
+
+  def test_decode_and_resize_image_downscaled(self):
+    module = self._get_classification_module('image_bytes_fused')
+    y, x = np.mgrid[0:600, 0:800]
+    image = np.stack([y * 255 // 600, x * 255 // 800, (y + x) * 255 // 1400],
+                     axis=-1).astype(np.uint8)
+    encoded_image = tf.image.encode_jpeg(image)
+
+    # The JPEG is decoded at half size in the DCT domain.
+    resized_image, scale = module._decode_and_resize_image(
+        encoded_image, [224, 224]
+    )
+    expected_image = module._decode_image(encoded_image)
+
+    self.assertAllClose(scale, [600 / 224, 800 / 224])
+    self.assertEqual(resized_image.shape, expected_image.shape)
+    difference = tf.abs(
+        tf.cast(resized_image, tf.float32) - tf.cast(expected_image, tf.float32)
+    )
+    self.assertLess(tf.reduce_mean(difference), 1.0)
+
 if __name__ == '__main__':
   tf.test.main()
@@ -0,0 +1,115 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content-hash result cache for serving functions on encoded images."""
+
+import collections
+import hashlib
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+import tensorflow as tf, tf_keras
+
+
+class InferenceCache:
+  """Caches the per-image outputs of a serving function.
+
+  Images are identified by a hash of their encoded bytes, so that repeated
+  images, within a batch or across calls, are decoded and run through the
+  model once. The function only runs on the images missing from the cache, and
+  the least recently used outputs are evicted beyond `max_size` images.
+  """
+
+  def __init__(
+      self,
+      inference_fn: Callable[[tf.Tensor], Mapping[str, tf.Tensor]],
+      max_size: int = 1024,
+      batch_size: Optional[int] = None,
+  ):
+    """Initializes the cache.
+
+    Args:
+      inference_fn: A serving function mapping a string tensor of encoded
+        images of shape [batch_size] to outputs with a leading batch dimension,
+        e.g. the `image_bytes_fused` signature of an exported module.
+      max_size: The maximum number of images to cache the outputs of.
+      batch_size: The static batch size of `inference_fn`, or None if it
+        accepts any batch size. With a static batch size, the missing images
+        are run in batches of `batch_size`, the last one padded by repeating
+        its last image.
+    """
+    if batch_size is not None and batch_size < 1:
+      raise ValueError(f'`batch_size` must be positive, got {batch_size}.')
+    self._inference_fn = inference_fn
+    self._max_size = max_size
+    self._batch_size = batch_size
+    self._outputs = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __call__(self, encoded_images: Sequence[bytes]) -> Dict[str, np.ndarray]:
+    """Returns the outputs of the serving function on `encoded_images`.
+
+    Args:
+      encoded_images: The encoded images.
+
+    Returns:
+      A dictionary of the outputs stacked in the order of `encoded_images`, or
+      an empty dictionary if there are no images.
+    """
+    if not encoded_images:
+      return {}
+    keys = [hashlib.sha256(image).digest() for image in encoded_images]
+    outputs = {}
+    missing = {}
+    for key, image in zip(keys, encoded_images):
+      if key in outputs or key in missing:
+        self.hits += 1
+      elif key in self._outputs:
+        self._outputs.move_to_end(key)
+        outputs[key] = self._outputs[key]
+        self.hits += 1
+      else:
+        missing[key] = image
+        self.misses += 1
+
+    if missing:
+      for key, key_outputs in zip(missing, self._run(list(missing.values()))):
+        outputs[key] = key_outputs
+        self._outputs[key] = key_outputs
+      while len(self._outputs) > self._max_size:
+        self._outputs.popitem(last=False)
+
+    names = outputs[keys[0]].keys()
+    return {
+        name: np.stack([outputs[key][name] for key in keys]) for name in names
+    }
+
+  def _run(self, images: Sequence[bytes]) -> List[Dict[str, np.ndarray]]:
+    """Runs the serving function and returns the outputs of each image."""
+    batch_size = self._batch_size or len(images)
+    outputs = []
+    for start in range(0, len(images), batch_size):
+      batch = list(images[start:start + batch_size])
+      num_images = len(batch)
+      batch += batch[-1:] * (batch_size - num_images)
+      batch_outputs = self._inference_fn(tf.constant(batch))
+      batch_outputs = {k: np.asarray(v) for k, v in batch_outputs.items()}
+      # Copies the outputs of each image, since a view would keep the whole
+      # batch alive while the image is cached.
+      outputs.extend(
+          {k: v[i].copy() for k, v in batch_outputs.items()}
+          for i in range(num_images)
+      )
+    return outputs
@@ -0,0 +1,92 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for inference_cache."""
+
+import tensorflow as tf, tf_keras
+
+from official.vision.serving import inference_cache
+
+
+class InferenceCacheTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.batches = []
+
+  def _inference_fn(self, inputs):
+    self.batches.append(inputs.numpy().tolist())
+    return {
+        'length': tf.strings.length(inputs),
+        'bytes': tf.strings.unicode_decode(inputs, 'UTF-8').to_tensor(
+            shape=[None, 4]),
+    }
+
+  def test_runs_only_on_missing_images(self):
+    cache = inference_cache.InferenceCache(self._inference_fn)
+
+    outputs = cache([b'ab', b'abc', b'ab'])
+    self.assertAllEqual(outputs['length'], [2, 3, 2])
+    self.assertAllEqual(outputs['bytes'][2], [97, 98, 0, 0])
+    outputs = cache([b'abc', b'abcd'])
+    self.assertAllEqual(outputs['length'], [3, 4])
+
+    self.assertEqual(self.batches, [[b'ab', b'abc'], [b'abcd']])
+    self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+  def test_evicts_least_recently_used(self):
+    cache = inference_cache.InferenceCache(self._inference_fn, max_size=2)
+
+    cache([b'a', b'b'])
+    cache([b'a', b'c'])  # Evicts b'b'.
+    outputs = cache([b'b', b'a'])
+
+    self.assertAllEqual(outputs['length'], [1, 1])
+    self.assertEqual(self.batches, [[b'a', b'b'], [b'c'], [b'b']])
+
+  def test_pads_missing_images_to_batch_size(self):
+    def inference_fn(inputs):
+      # A static batch size, as for a signature exported with a batch size.
+      self.assertEqual(inputs.shape, [2])
+      return self._inference_fn(inputs)
+
+    cache = inference_cache.InferenceCache(inference_fn, batch_size=2)
+
+    outputs = cache([b'a', b'bb', b'ccc'])
+    self.assertAllEqual(outputs['length'], [1, 2, 3])
+    outputs = cache([b'bb', b'dddd'])
+    self.assertAllEqual(outputs['length'], [2, 4])
+
+    self.assertEqual(
+        self.batches, [[b'a', b'bb'], [b'ccc', b'ccc'], [b'dddd', b'dddd']]
+    )
+
+  def test_cached_outputs_do_not_reference_batch_outputs(self):
+    cache = inference_cache.InferenceCache(self._inference_fn)
+
+    cache([b'a', b'bb'])
+
+    for image_outputs in cache._outputs.values():
+      for value in image_outputs.values():
+        self.assertIsNone(value.base)
+
+  def test_empty_input(self):
+    cache = inference_cache.InferenceCache(self._inference_fn)
+
+    self.assertEqual(cache([]), {})
+    self.assertEmpty(self.batches)
+
+
+if __name__ == '__main__':
+  tf.test.main()
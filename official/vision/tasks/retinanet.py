@@ -287,6 +287,7 @@ class RetinaNetTask(base_task.Task):
             include_mask=False,
             per_category_metrics=self.task_config.per_category_metrics,
             max_num_eval_detections=self.task_config.max_num_eval_detections,
+            streaming=self.task_config.streaming_coco_metrics,
         )
       if self._task_config.use_wod_metrics:
         # To use Waymo open dataset metrics, please install one of the pip
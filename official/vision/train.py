@@ -26,7 +26,6 @@ from official.core import task_factory
 from official.core import train_lib
 from official.core import train_utils
 from official.modeling import performance
-from official.vision import registry_imports  # pylint: disable=unused-import
 from official.vision.utils import summary_manager
 
 
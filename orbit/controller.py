@@ -14,6 +14,8 @@
 
 """Provides a `Controller` class for managing the outer training loop."""
 
+import concurrent.futures
+import contextlib
 import pprint
 import time
 
@@ -23,6 +25,7 @@ from absl import logging
 
 from orbit import runner
 from orbit import utils
+from orbit.utils import step_profiler
 
 import tensorflow as tf, tf_keras
 
@@ -57,6 +60,12 @@ def _format_output(output, indent=4):
 Action = Callable[[runner.Output], None]
 
 
+def _check_eval_steps(steps: int):
+  """Raises an error if `steps` is not a valid number of evaluation steps."""
+  if steps <= 0 and steps != -1:
+    raise ValueError(f"`steps` ({steps}) should be > 0, or == -1.")
+
+
 class Controller:
   """Class that controls the outer loop of model training and evaluation.
 
@@ -89,6 +98,23 @@ class Controller:
   additional logging, etc. See the `orbit.actions` package for a small handful
   of predefined actions and some utility classes that may be useful in defining
   your own.
+
+  `train_and_evaluate` can also run its evaluations asynchronously, on an
+  `async_evaluator` holding its own copy of the model (for instance built under
+  a strategy over separate devices). At each evaluation point, the weights are
+  handed over to it either by calling `async_eval_snapshot_fn`, or through the
+  checkpoint saved at that step, which is restored into `async_eval_checkpoint`,
+  and the evaluation then runs on a background thread while training continues.
+  Its summaries are written at the step the weights were taken at, and
+  `eval_actions` run on the evaluation thread, where
+  `tf.summary.experimental.get_step()` returns that same step.
+
+  When a `checkpoint_manager` is provided, the training summaries also include
+  "checkpoint_blocking_seconds", the time the outer loop was blocked saving or
+  syncing on checkpoints since the previous training summaries. With async
+  checkpointing (and asynchronous exports with a SavedModel checkpoint
+  manager), this is the time spent taking snapshots of the variables, and
+  waiting on writes still in flight.
   """
 
   def __init__(
@@ -111,7 +137,13 @@ class Controller:
       # Evaluation related
       eval_summary_dir: Optional[str] = None,
       summary_manager: Optional[utils.SummaryManagerInterface] = None,
-      eval_summary_manager: Optional[utils.SummaryManagerInterface] = None):
+      eval_summary_manager: Optional[utils.SummaryManagerInterface] = None,
+      # Asynchronous evaluation related
+      async_evaluator: Optional[runner.AbstractEvaluator] = None,
+      async_eval_snapshot_fn: Optional[Callable[[], None]] = None,
+      async_eval_checkpoint: Optional[tf.train.Checkpoint] = None,
+      # Profiling related
+      profiler: Optional[utils.StepProfiler] = None):
     """Initializes a `Controller` instance.
 
     Note that if `checkpoint_manager` is provided and there are checkpoints in
@@ -172,16 +204,56 @@ class Controller:
         `eval_summary_dir` will be ignored. Otherwise the eval summary manager
         will be created internally for TensorBoard summaries by default from the
         `eval_summary_dir`.
+      async_evaluator: An optional instance of `orbit.AbstractEvaluator` with
+        its own copy of the model variables. If provided, `train_and_evaluate`
+        runs its evaluations with it on a background thread instead of
+        pausing training to run `evaluator`. Its summaries are written to
+        `eval_summary_dir` at the step of the evaluated weights, so it can not
+        be combined with `eval_summary_manager`.
+      async_eval_snapshot_fn: A callable copying the current weights of the
+        trained model into the model of `async_evaluator`, e.g. with
+        `eval_model.set_weights(model.get_weights())`. It is called on the
+        training thread at each evaluation point.
+      async_eval_checkpoint: A `tf.train.Checkpoint` tracking the variables of
+        `async_evaluator`, with the same structure as the checkpoint of
+        `checkpoint_manager`. At each evaluation point, a checkpoint is saved
+        and then restored into it on the evaluation thread. Exactly one of
+        `async_eval_snapshot_fn` and `async_eval_checkpoint` must be provided
+        with `async_evaluator`.
+      profiler: An optional instance of `orbit.utils.StepProfiler`, recording
+        the time spent in each phase of the outer loop. Its report, including
+        the goodput, is added to the summaries written after each block of
+        `steps_per_loop` training steps, and it captures `tf.profiler` traces
+        over its trace windows.
 
     Raises:
       ValueError: If both `trainer` and `evaluator` are `None`.
       ValueError: If `steps_per_loop` is not a positive integer or a callable.
       ValueError: If `summary_interval` is not a positive integer or is not
         divisible by `steps_per_loop`.
+      ValueError: If `async_evaluator` is provided without exactly one of
+        `async_eval_snapshot_fn` and `async_eval_checkpoint`, with
+        `async_eval_checkpoint` but no `checkpoint_manager`, or with
+        `eval_summary_manager`.
     """
     if trainer is None and evaluator is None:
       raise ValueError("`trainer` and `evaluator` should not both be `None`.")
 
+    if async_evaluator is not None:
+      if (async_eval_snapshot_fn is None) == (async_eval_checkpoint is None):
+        raise ValueError(
+            "Exactly one of `async_eval_snapshot_fn` and "
+            "`async_eval_checkpoint` is required with `async_evaluator`.")
+      if async_eval_checkpoint is not None and checkpoint_manager is None:
+        raise ValueError(
+            "`checkpoint_manager` is required with `async_eval_checkpoint`.")
+      if eval_summary_manager is not None:
+        # Its summaries would be written at the current training step instead
+        # of the step of the evaluated weights.
+        raise ValueError(
+            "`eval_summary_manager` can not be used with `async_evaluator`, "
+            "set `eval_summary_dir` instead.")
+
     if trainer is not None:
       if steps_per_loop is None:
         raise ValueError(
@@ -207,6 +279,7 @@ class Controller:
 
     self.trainer = trainer
     self.evaluator = evaluator
+    self.async_evaluator = async_evaluator
 
     self.strategy = strategy or tf.distribute.get_strategy()
 
@@ -215,10 +288,12 @@ class Controller:
 
     self.global_step = global_step
     self.checkpoint_manager = checkpoint_manager
+    self.profiler = profiler
     self._enable_async_checkpoint_saving = enable_async_checkpointing
     self._checkpoint_options = tf.train.CheckpointOptions(
         enable_async=enable_async_checkpointing
     )
+    self._checkpoint_blocking_seconds = 0.0
 
     if self.trainer is not None:
       self.step_timer = None
@@ -243,6 +318,20 @@ class Controller:
           self.eval_summary_manager = utils.SummaryManager(
               eval_summary_dir, tf.summary.scalar, global_step=self.global_step)
 
+    if self.async_evaluator is not None:
+      self._async_eval_snapshot_fn = async_eval_snapshot_fn
+      self._async_eval_checkpoint = async_eval_checkpoint
+      # The step the weights under asynchronous evaluation were taken at, which
+      # its summaries are written at while `global_step` keeps increasing.
+      self._async_eval_step = tf.Variable(
+          0, dtype=tf.int64, trainable=False, name="async_eval_step")
+      self._async_eval_summary_manager = utils.SummaryManager(
+          eval_summary_dir or summary_dir,
+          tf.summary.scalar,
+          global_step=self._async_eval_step)
+      self._async_eval_executor = None
+      self._async_eval_future = None
+
     tf.summary.experimental.set_step(self.global_step)
 
     # Restores the model if needed.
@@ -286,6 +375,8 @@ class Controller:
     if checkpoint_at_completion:
       self._maybe_save_checkpoint(check_interval=False)
 
+    if self.profiler is not None:
+      self.profiler.maybe_stop_trace(current_step, force=True)
     self._sync_on_async_checkpointing()
 
   def evaluate(self, steps: int = -1) -> Optional[runner.Output]:
@@ -309,46 +400,10 @@ class Controller:
       ValueError: If `steps` is not a positive value or -1.
     """
     self._require("evaluator", for_method="evaluate")
-
-    if steps > 0:
-      steps_msg = f"running {steps} steps of evaluation..."
-    elif steps == -1:
-      steps_msg = "running complete evaluation..."
-    else:
-      raise ValueError(f"`steps` ({steps}) should be > 0, or == -1.")
-
-    current_step = self.global_step.numpy()
-    _log(f" eval | step: {current_step: 6d} | {steps_msg}")
-
-    start = time.time()
+    _check_eval_steps(steps)
     assert isinstance(self.evaluator, runner.AbstractEvaluator)
-    with self.eval_summary_manager.summary_writer().as_default():
-      steps_tensor = tf.convert_to_tensor(steps, dtype=tf.int32)
-      eval_output = self.evaluator.evaluate(steps_tensor)
-    elapsed = time.time() - start
-
-    eval_output = eval_output or {}
-    for action in self.eval_actions:
-      action(eval_output)
-    eval_output = tf.nest.map_structure(utils.get_value, eval_output)
-
-    if steps > 0:
-      # Only log if steps has been specified.
-      steps_per_second = steps / elapsed
-      eval_output["steps_per_second"] = steps_per_second
-      steps_per_second_log = f"steps/sec: {steps_per_second: 6.1f} | "
-    else:
-      steps_per_second_log = ""
-
-    _log(f" eval | step: {current_step: 6d} | "
-         f"{steps_per_second_log}"
-         f"eval time: {elapsed: 6.1f} sec | "
-         f"output: {_format_output(eval_output)}")
-
-    self.eval_summary_manager.write_summaries(eval_output)
-    self.eval_summary_manager.flush()
-
-    return eval_output
+    return self._evaluate(self.evaluator, steps, self.global_step.numpy(),
+                          self.eval_summary_manager)
 
   def train_and_evaluate(
       self,
@@ -364,6 +419,11 @@ class Controller:
     In addition, this method will run a final evaluation at the end of the
     training sequence.
 
+    If an `async_evaluator` was passed to `Controller.__init__`, evaluations run
+    on it in the background while training continues. At most one evaluation
+    is in flight: training waits at an evaluation point until the previous
+    evaluation has finished, and any error it raised is re-raised there.
+
     When async checkpointing is enabled, a sync is triggered at the end of this
     method to make sure any ongoing async checkpoint saving is finished before
     returning.
@@ -382,6 +442,9 @@ class Controller:
       The evaluation results as a dictionary mapping names to NumPy values.
     """
     self._require("trainer", for_method="train_and_evaluate")
+    if self.async_evaluator is not None:
+      return self._train_and_evaluate_async(train_steps, eval_steps,
+                                            eval_interval)
     self._require("evaluator", for_method="train_and_evaluate")
 
     output = None
@@ -397,6 +460,83 @@ class Controller:
     self._sync_on_async_checkpointing()
     return output
 
+  def _train_and_evaluate_async(
+      self,
+      train_steps: int,
+      eval_steps: int,
+      eval_interval: Optional[int],
+  ) -> Optional[runner.Output]:
+    """Runs `train_and_evaluate` with evaluations on `async_evaluator`."""
+    _check_eval_steps(eval_steps)
+    self._async_eval_executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="orbit_async_eval")
+    try:
+      current_step = self.global_step.numpy()
+      eval_interval = eval_interval or (train_steps - current_step)
+      while current_step < train_steps:
+        interval = min(train_steps - current_step, eval_interval)
+        num_steps = current_step + interval
+        self.train(steps=num_steps, checkpoint_at_completion=False)
+        self._start_async_evaluation(eval_steps)
+        current_step = self.global_step.numpy()
+      self._maybe_save_checkpoint(check_interval=False)
+      output = self._wait_for_async_evaluation()
+    finally:
+      self._async_eval_executor.shutdown(wait=True)
+      self._async_eval_executor = None
+      self._async_eval_future = None
+    self._sync_on_async_checkpointing()
+    return output
+
+  def _start_async_evaluation(self, steps: int):
+    """Hands the current weights over to `async_evaluator` and evaluates them.
+
+    Args:
+      steps: The number of evaluation steps to run, or -1 for a complete
+        evaluation.
+    """
+    self._wait_for_async_evaluation()
+    current_step = self.global_step.numpy()
+    if self._async_eval_snapshot_fn is not None:
+      self._async_eval_snapshot_fn()
+      checkpoint_path = None
+    else:
+      assert isinstance(self.checkpoint_manager, tf.train.CheckpointManager)
+      checkpoint_path = self.checkpoint_manager.latest_checkpoint
+      if (checkpoint_path is None or
+          not checkpoint_path.endswith(f"-{current_step}")):
+        with self._checkpointing():
+          checkpoint_path = self.checkpoint_manager.save(
+              checkpoint_number=current_step,
+              check_interval=False,
+              options=self._checkpoint_options)
+        _log(f"saved checkpoint to {checkpoint_path}.")
+      # The evaluation thread must not read a checkpoint still being written.
+      self._sync_on_async_checkpointing()
+    self._async_eval_future = self._async_eval_executor.submit(
+        self._evaluate_snapshot, steps, current_step, checkpoint_path)
+
+  def _wait_for_async_evaluation(self) -> Optional[runner.Output]:
+    """Returns the output of the evaluation in flight (if any) when done."""
+    if self._async_eval_future is None:
+      return None
+    future, self._async_eval_future = self._async_eval_future, None
+    with self._phase(step_profiler.ASYNC_EVAL_WAIT):
+      return future.result()
+
+  def _evaluate_snapshot(self, steps: int, step: int,
+                         checkpoint_path: Optional[str]) -> runner.Output:
+    """Runs `async_evaluator` on the weights taken at `step`."""
+    self._async_eval_step.assign(step)
+    # The default summary step is local to this thread.
+    tf.summary.experimental.set_step(self._async_eval_step)
+    if checkpoint_path is not None:
+      _log(f"restoring evaluation model from {checkpoint_path}...")
+      self._async_eval_checkpoint.restore(checkpoint_path).expect_partial()
+    assert isinstance(self.async_evaluator, runner.AbstractEvaluator)
+    return self._evaluate(self.async_evaluator, steps, step,
+                          self._async_eval_summary_manager)
+
   def evaluate_continuously(
       self,
       steps: int = -1,
@@ -512,7 +652,10 @@ class Controller:
         # Create a predicate to determine when summaries should be written.
         should_record = lambda: (self.global_step % self.summary_interval == 0)
       assert isinstance(self.trainer, runner.AbstractTrainer)
-      with tf.summary.record_if(should_record):
+      if self.profiler is not None:
+        self.profiler.maybe_start_trace(current_step)
+      with tf.summary.record_if(should_record), self._phase(
+          step_profiler.TRAIN_LOOP):
         num_steps_tensor = tf.convert_to_tensor(num_steps, dtype=tf.int32)
         train_output = self.trainer.train(num_steps_tensor)
 
@@ -525,9 +668,13 @@ class Controller:
           f"to be {expected_step}, but it was {self.global_step.numpy()}.")
       logging.warning(message)
 
+    if self.profiler is not None:
+      self.profiler.maybe_stop_trace(self.global_step.numpy())
+
     train_output = train_output or {}
-    for action in self.train_actions:
-      action(train_output)
+    with self._phase(step_profiler.TRAIN_ACTIONS):
+      for action in self.train_actions:
+        action(train_output)
     train_output = tf.nest.map_structure(utils.get_value, train_output)
 
     current_step = self.global_step.numpy()
@@ -537,8 +684,70 @@ class Controller:
          f"output: {_format_output(train_output)}")
 
     train_output["steps_per_second"] = steps_per_second
-    self.summary_manager.write_summaries(train_output)
-    self.summary_manager.flush()
+    if self.checkpoint_manager is not None:
+      train_output["checkpoint_blocking_seconds"] = (
+          self._checkpoint_blocking_seconds)
+      self._checkpoint_blocking_seconds = 0.0
+    if self.profiler is not None:
+      train_output.update(self.profiler.report(current_step))
+    with self._phase(step_profiler.SUMMARIES):
+      self.summary_manager.write_summaries(train_output)
+      self.summary_manager.flush()
+
+  def _evaluate(
+      self,
+      evaluator: runner.AbstractEvaluator,
+      steps: int,
+      current_step: int,
+      summary_manager: utils.SummaryManagerInterface,
+  ) -> runner.Output:
+    """Runs `evaluator`, then applies `eval_actions` and writes summaries.
+
+    Args:
+      evaluator: The evaluator to run.
+      steps: The number of evaluation steps to run, or -1 for a complete
+        evaluation.
+      current_step: The global step of the evaluated weights, used for logging.
+      summary_manager: The summary manager to write the evaluation output with.
+
+    Returns:
+      The evaluation results as a dictionary mapping names to NumPy values.
+    """
+    if steps > 0:
+      steps_msg = f"running {steps} steps of evaluation..."
+    else:
+      steps_msg = "running complete evaluation..."
+    _log(f" eval | step: {current_step: 6d} | {steps_msg}")
+
+    start = time.time()
+    with summary_manager.summary_writer().as_default(), self._phase(
+        step_profiler.EVAL):
+      steps_tensor = tf.convert_to_tensor(steps, dtype=tf.int32)
+      eval_output = evaluator.evaluate(steps_tensor)
+    elapsed = time.time() - start
+
+    eval_output = eval_output or {}
+    for action in self.eval_actions:
+      action(eval_output)
+    eval_output = tf.nest.map_structure(utils.get_value, eval_output)
+
+    if steps > 0:
+      # Only log if steps has been specified.
+      steps_per_second = steps / elapsed
+      eval_output["steps_per_second"] = steps_per_second
+      steps_per_second_log = f"steps/sec: {steps_per_second: 6.1f} | "
+    else:
+      steps_per_second_log = ""
+
+    _log(f" eval | step: {current_step: 6d} | "
+         f"{steps_per_second_log}"
+         f"eval time: {elapsed: 6.1f} sec | "
+         f"output: {_format_output(eval_output)}")
+
+    summary_manager.write_summaries(eval_output)
+    summary_manager.flush()
+
+    return eval_output
 
   def _maybe_save_checkpoint(self, check_interval: bool = True):
     """Conditionally saves a checkpoint.
@@ -557,15 +766,32 @@ class Controller:
       A boolean indicating whether a checkpoint was saved.
     """
     if self.checkpoint_manager and self.checkpoint_manager.checkpoint_interval:
-      ckpt_path = self.checkpoint_manager.save(
-          checkpoint_number=self.global_step.numpy(),
-          check_interval=check_interval,
-          options=self._checkpoint_options)
+      with self._checkpointing():
+        ckpt_path = self.checkpoint_manager.save(
+            checkpoint_number=self.global_step.numpy(),
+            check_interval=check_interval,
+            options=self._checkpoint_options)
       if ckpt_path is not None:
         _log(f"saved checkpoint to {ckpt_path}.")
         return True
     return False
 
+  def _phase(self, name: str):
+    """Returns a context manager timing phase `name` if profiling is enabled."""
+    if self.profiler is None:
+      return contextlib.nullcontext()
+    return self.profiler.phase(name)
+
+  @contextlib.contextmanager
+  def _checkpointing(self):
+    """Returns a context manager timing the loop blocked on checkpoints."""
+    start = time.perf_counter()
+    try:
+      with self._phase(step_profiler.CHECKPOINT):
+        yield
+    finally:
+      self._checkpoint_blocking_seconds += time.perf_counter() - start
+
   def _require(self, attribute, for_method):
     """Utility method to raise an error if the given `attribute` is not set."""
     if getattr(self, attribute, None) is None:
@@ -578,7 +804,8 @@ class Controller:
     # pylint: disable=protected-access
     if self.checkpoint_manager:
       logging.info("Sync on async checkpoint saving.")
-      self.checkpoint_manager.sync()
+      with self._checkpointing():
+        self.checkpoint_manager.sync()
 
 
 class StepTimer:
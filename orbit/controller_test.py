@@ -14,7 +14,9 @@
 
 """Tests for orbit.controller."""
 
+import json
 import os
+import threading
 
 from absl import logging
 from absl.testing import parameterized
@@ -432,6 +434,173 @@ class ControllerTest(tf.test.TestCase, parameterized.TestCase):
         summaries_with_matching_keyword(
             "eval_loss", os.path.join(self.model_dir, "summaries/eval")))
 
+  @parameterized.named_parameters(
+      ("_snapshot", False),
+      ("_checkpoint", True),
+  )
+  def test_train_and_evaluate_async(self, from_checkpoint):
+    test_runner = TestRunner()
+    test_evaluator = TestEvaluator()
+    checkpoint = tf.train.Checkpoint(
+        model=test_runner.model, optimizer=test_runner.optimizer)
+    checkpoint_manager = tf.train.CheckpointManager(
+        checkpoint,
+        self.model_dir,
+        max_to_keep=None,
+        step_counter=test_runner.global_step,
+        checkpoint_interval=10)
+
+    eval_steps = []
+    eval_started = threading.Event()
+    training_continued = threading.Event()
+
+    def record_eval_step(output):
+      del output
+      eval_steps.append(int(tf.summary.experimental.get_step()))
+
+    def wait_for_training(output):
+      del output
+      eval_started.set()
+      # Training goes on while the first evaluation runs.
+      training_continued.wait(timeout=60)
+
+    def notify_evaluation(output):
+      del output
+      if test_runner.global_step.numpy() > 6:
+        eval_started.wait(timeout=60)
+        training_continued.set()
+
+    if from_checkpoint:
+      async_eval_kwargs = dict(
+          async_eval_checkpoint=tf.train.Checkpoint(
+              model=test_evaluator.model))
+    else:
+      async_eval_kwargs = dict(
+          async_eval_snapshot_fn=lambda: test_evaluator.model.set_weights(
+              test_runner.model.get_weights()))
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        async_evaluator=test_evaluator,
+        train_actions=[notify_evaluation],
+        eval_actions=[record_eval_step, wait_for_training],
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        checkpoint_manager=checkpoint_manager,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        eval_summary_dir=os.path.join(self.model_dir, "summaries/eval"),
+        **async_eval_kwargs)
+    output = test_controller.train_and_evaluate(
+        train_steps=12, eval_steps=2, eval_interval=6)
+
+    self.assertTrue(training_continued.is_set())
+    self.assertEqual(eval_steps, [6, 12])
+    self.assertEqual(test_runner.global_step, 12)
+
+    # The final evaluation matches a synchronous evaluation of the weights.
+    test_evaluator.model.set_weights(test_runner.model.get_weights())
+    self.assertAllClose(output["eval_loss"],
+                        test_evaluator.evaluate(tf.constant(2))["eval_loss"])
+
+    summaries = summaries_with_matching_keyword(
+        "eval_loss", os.path.join(self.model_dir, "summaries/eval"))
+    self.assertLen(summaries, 2)
+    event_paths = tf.io.gfile.glob(
+        os.path.join(self.model_dir, "summaries/eval", "events*"))
+    steps = [
+        event.step
+        for event in tf.compat.v1.train.summary_iterator(event_paths[-1])
+        if any("eval_loss" in value.tag for value in event.summary.value)
+    ]
+    self.assertEqual(steps, [6, 12])
+
+  def test_profiler(self):
+    test_runner = TestRunner()
+    checkpoint = tf.train.Checkpoint(
+        model=test_runner.model, optimizer=test_runner.optimizer)
+    checkpoint_manager = tf.train.CheckpointManager(
+        checkpoint,
+        self.model_dir,
+        max_to_keep=None,
+        step_counter=test_runner.global_step,
+        checkpoint_interval=4)
+    log_path = os.path.join(self.model_dir, "profile.jsonl")
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        evaluator=test_runner,
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        checkpoint_manager=checkpoint_manager,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        eval_summary_dir=os.path.join(self.model_dir, "summaries/eval"),
+        profiler=orbit.utils.StepProfiler(log_path=log_path))
+    test_controller.train_and_evaluate(
+        train_steps=8, eval_steps=2, eval_interval=4)
+
+    self.assertNotEmpty(
+        summaries_with_matching_keyword(
+            "goodput", os.path.join(self.model_dir, "summaries/train")))
+    with tf.io.gfile.GFile(log_path) as f:
+      records = [json.loads(line) for line in f]
+    self.assertEqual([record["step"] for record in records], [2, 4, 6, 8])
+    for record in records:
+      self.assertBetween(record["goodput"], 0.0, 1.0)
+      self.assertEqual(record["phases"]["train_loop"]["count"], 1)
+    # Phases outside of the train loop are reported after it.
+    self.assertIn("summaries", records[1]["phases"])
+    self.assertIn("checkpoint", records[2]["phases"])
+    self.assertIn("eval", records[2]["phases"])
+
+  def test_train_and_evaluate_async_raises_eval_errors(self):
+    test_runner = TestRunner()
+    test_evaluator = TestEvaluator()
+
+    def fail(output):
+      del output
+      raise RuntimeError("evaluation failed")
+
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        async_evaluator=test_evaluator,
+        async_eval_snapshot_fn=lambda: None,
+        eval_actions=[fail],
+        global_step=test_runner.global_step,
+        steps_per_loop=2)
+    with self.assertRaisesRegex(RuntimeError, "evaluation failed"):
+      test_controller.train_and_evaluate(
+          train_steps=12, eval_steps=2, eval_interval=4)
+    # Training stops at the evaluation point following the failure.
+    self.assertEqual(test_runner.global_step, 8)
+
+  def test_async_evaluator_requires_weights(self):
+    test_runner = TestRunner()
+    with self.assertRaisesRegex(ValueError, "Exactly one of"):
+      controller.Controller(
+          trainer=test_runner,
+          async_evaluator=TestEvaluator(),
+          global_step=test_runner.global_step,
+          steps_per_loop=2)
+    with self.assertRaisesRegex(ValueError, "`checkpoint_manager` is required"):
+      controller.Controller(
+          trainer=test_runner,
+          async_evaluator=TestEvaluator(),
+          async_eval_checkpoint=tf.train.Checkpoint(),
+          global_step=test_runner.global_step,
+          steps_per_loop=2)
+
+  def test_async_evaluator_rejects_eval_summary_manager(self):
+    test_runner = TestRunner()
+    with self.assertRaisesRegex(ValueError, "`eval_summary_manager` can not"):
+      controller.Controller(
+          trainer=test_runner,
+          async_evaluator=TestEvaluator(),
+          async_eval_snapshot_fn=lambda: None,
+          eval_summary_manager=orbit.utils.SummaryManager(
+              os.path.join(self.model_dir, "summaries/eval"),
+              tf.summary.scalar,
+              global_step=test_runner.global_step),
+          global_step=test_runner.global_step,
+          steps_per_loop=2)
+
   @parameterized.named_parameters(
       ("_sync_checkpoint_saving", False),
       ("_async_checkpoint_saving", True)
@@ -470,6 +639,34 @@ class ControllerTest(tf.test.TestCase, parameterized.TestCase):
     self.assertFalse(
         tf.io.gfile.exists(os.path.join(self.model_dir, "summaries/eval")))
 
+  def test_checkpoint_blocking_seconds(self):
+    test_runner = TestRunner()
+    checkpoint = tf.train.Checkpoint(
+        model=test_runner.model, optimizer=test_runner.optimizer)
+    checkpoint_manager = tf.train.CheckpointManager(
+        checkpoint,
+        self.model_dir,
+        max_to_keep=None,
+        step_counter=test_runner.global_step,
+        checkpoint_interval=2)
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        checkpoint_manager=checkpoint_manager,
+        enable_async_checkpointing=True)
+    test_controller.train(steps=6)
+
+    summaries = summaries_with_matching_keyword(
+        "checkpoint_blocking_seconds",
+        os.path.join(self.model_dir, "summaries/train"))
+    self.assertLen(summaries, 3)
+    # Checkpoints are saved after the first inner loop.
+    for summary in summaries[1:]:
+      self.assertGreater(
+          tf.make_ndarray(summary.value[0].tensor), 0.0)
+
   def test_evaluate_only(self):
     test_runner = TestRunner()
 
@@ -24,6 +24,8 @@ from orbit.utils.loop_fns import create_loop_fn
 from orbit.utils.loop_fns import create_tf_while_loop_fn
 from orbit.utils.loop_fns import LoopFnWithSummaries
 
+from orbit.utils.step_profiler import StepProfiler
+
 from orbit.utils.summary_manager import SummaryManager
 from orbit.utils.summary_manager_interface import SummaryManagerInterface
 
@@ -0,0 +1,172 @@
+# Copyright 2024 The Orbit Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Provides a utility class for profiling the phases of a training loop."""
+
+import collections
+import contextlib
+import json
+import threading
+import time
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from absl import logging
+
+import tensorflow as tf, tf_keras
+
+# Phases recorded by `orbit.Controller`.
+TRAIN_LOOP = "train_loop"
+TRAIN_ACTIONS = "train_actions"
+SUMMARIES = "summaries"
+CHECKPOINT = "checkpoint"
+EVAL = "eval"
+ASYNC_EVAL_WAIT = "async_eval_wait"
+
+# A phase that trainers may record themselves, e.g. around host-side `next()`
+# calls on an input iterator. It is nested in `TRAIN_LOOP`, and is subtracted
+# from the productive time.
+INPUT = "input"
+
+
+class StepProfiler:
+  """Times the phases of a training loop and reports its goodput.
+
+  The `Controller` records the time it spends in each phase of its outer loop
+  (the `trainer.train` call, train actions, summary writing, checkpointing and
+  evaluation) with `phase`, which user code can call as well to break phases
+  down further. After each inner loop of training, `report` returns the
+  fraction of wall-clock time spent in each phase since the previous report,
+  together with the goodput, the fraction of time spent in the train loop
+  outside of `INPUT`. These are written to the training summaries, and appended
+  as one JSON object per line to `log_path`. A goodput well below one shows
+  the largest other phase is the bottleneck, e.g. "checkpoint" for a
+  checkpoint-bound job, or "input" for an input-bound job.
+
+  In addition, `tf.profiler` traces can be captured over given step windows.
+  Windows are aligned to inner loop boundaries: a trace starts before the first
+  inner loop starting at or after its start step, and stops after the first
+  inner loop ending at or after its stop step, or when `Controller.train`
+  returns, e.g. for an evaluation in `Controller.train_and_evaluate`.
+  """
+
+  def __init__(self,
+               log_path: Optional[str] = None,
+               trace_dir: Optional[str] = None,
+               trace_windows: Iterable[Tuple[int, int]] = ()):
+    """Initializes the `StepProfiler` instance.
+
+    Args:
+      log_path: An optional path of a file to append the JSON reports to.
+      trace_dir: The directory to write `tf.profiler` traces to. Required if
+        `trace_windows` is not empty.
+      trace_windows: `(start_step, stop_step)` pairs of global steps between
+        which to capture `tf.profiler` traces.
+
+    Raises:
+      ValueError: If `trace_windows` is not empty and `trace_dir` is `None`, or
+        if a window does not have `start_step < stop_step`.
+    """
+    self._log_path = log_path
+    self._trace_dir = trace_dir
+    self._trace_windows = sorted(trace_windows)
+    if self._trace_windows and trace_dir is None:
+      raise ValueError("`trace_dir` is required with `trace_windows`.")
+    for start_step, stop_step in self._trace_windows:
+      if start_step >= stop_step:
+        raise ValueError(
+            f"Trace window ({start_step}, {stop_step}) should have "
+            "`start_step < stop_step`.")
+    self._trace_stop_step = None
+
+    self._lock = threading.Lock()
+    self._seconds = collections.defaultdict(float)
+    self._counts = collections.Counter()
+    self._last_report_time = time.perf_counter()
+
+  @contextlib.contextmanager
+  def phase(self, name: str):
+    """Returns a context manager adding the time spent in it to phase `name`."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      elapsed = time.perf_counter() - start
+      with self._lock:
+        self._seconds[name] += elapsed
+        self._counts[name] += 1
+
+  def maybe_start_trace(self, step: int):
+    """Starts a trace if a window starts at or before `step`."""
+    if self._trace_stop_step is not None or not self._trace_windows:
+      return
+    start_step, stop_step = self._trace_windows[0]
+    if step < start_step:
+      return
+    self._trace_windows.pop(0)
+    if step >= stop_step:
+      logging.warning("Skipping trace window (%d, %d), already at step %d.",
+                      start_step, stop_step, step)
+      return
+    logging.info("Starting profiler trace at step %d.", step)
+    tf.profiler.experimental.start(self._trace_dir)
+    self._trace_stop_step = stop_step
+
+  def maybe_stop_trace(self, step: int, force: bool = False):
+    """Stops the trace in progress if its window ends at or before `step`."""
+    if self._trace_stop_step is None:
+      return
+    if force or step >= self._trace_stop_step:
+      logging.info("Stopping profiler trace at step %d.", step)
+      tf.profiler.experimental.stop()
+      self._trace_stop_step = None
+
+  def report(self, step: int) -> Dict[str, float]:
+    """Returns the profile since the previous report, and logs it to a file.
+
+    Args:
+      step: The current global step, recorded in the JSON log.
+
+    Returns:
+      A dictionary with the "goodput", and the fraction of wall-clock time spent
+      in each phase as "time_fraction/<phase>".
+    """
+    now = time.perf_counter()
+    with self._lock:
+      seconds = dict(self._seconds)
+      counts = dict(self._counts)
+      self._seconds.clear()
+      self._counts.clear()
+    wall_time = now - self._last_report_time
+    self._last_report_time = now
+
+    productive = seconds.get(TRAIN_LOOP, 0.0) - seconds.get(INPUT, 0.0)
+    goodput = max(productive, 0.0) / wall_time if wall_time > 0 else 0.0
+    if self._log_path is not None:
+      record = {
+          "step": int(step),
+          "wall_time": wall_time,
+          "goodput": goodput,
+          "phases": {
+              name: {"seconds": seconds[name], "count": counts[name]}
+              for name in sorted(seconds)
+          },
+      }
+      with tf.io.gfile.GFile(self._log_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    output = {"goodput": goodput}
+    for name in sorted(seconds):
+      output[f"time_fraction/{name}"] = seconds[name] / wall_time
+    return output
@@ -0,0 +1,83 @@
+# Copyright 2024 The Orbit Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for orbit.utils.step_profiler."""
+
+import json
+import os
+import time
+
+from orbit.utils import step_profiler
+
+import tensorflow as tf, tf_keras
+
+
+class StepProfilerTest(tf.test.TestCase):
+
+  def test_report(self):
+    log_path = os.path.join(self.get_temp_dir(), "profile.jsonl")
+    profiler = step_profiler.StepProfiler(log_path=log_path)
+    with profiler.phase(step_profiler.TRAIN_LOOP):
+      with profiler.phase(step_profiler.INPUT):
+        time.sleep(0.05)
+      time.sleep(0.1)
+    with profiler.phase(step_profiler.CHECKPOINT):
+      time.sleep(0.1)
+    output = profiler.report(step=10)
+
+    self.assertCountEqual(output, [
+        "goodput", "time_fraction/train_loop", "time_fraction/input",
+        "time_fraction/checkpoint"
+    ])
+    self.assertAllInRange(list(output.values()), 0.0, 1.0)
+    self.assertGreater(output["time_fraction/train_loop"],
+                       output["time_fraction/checkpoint"])
+    self.assertAllClose(
+        output["goodput"],
+        output["time_fraction/train_loop"] - output["time_fraction/input"])
+
+    # Reports only cover the time since the previous report.
+    self.assertEqual(profiler.report(step=20), {"goodput": 0.0})
+
+    with tf.io.gfile.GFile(log_path) as f:
+      records = [json.loads(line) for line in f]
+    self.assertLen(records, 2)
+    self.assertEqual(records[0]["step"], 10)
+    self.assertEqual(records[0]["phases"]["input"]["count"], 1)
+    self.assertAllClose(records[0]["goodput"], output["goodput"])
+    self.assertEqual(records[1]["phases"], {})
+
+  def test_trace_windows(self):
+    trace_dir = self.get_temp_dir()
+    profiler = step_profiler.StepProfiler(
+        trace_dir=trace_dir, trace_windows=[(4, 6), (1, 2)])
+    traced = []
+    for step in range(0, 10, 2):
+      profiler.maybe_start_trace(step)
+      traced.append(profiler._trace_stop_step is not None)  # pylint: disable=protected-access
+      profiler.maybe_stop_trace(step + 2)
+    # The (1, 2) window has passed when training reaches step 2.
+    self.assertEqual(traced, [False, False, True, False, False])
+    self.assertNotEmpty(
+        tf.io.gfile.glob(os.path.join(trace_dir, "plugins", "profile", "*")))
+
+  def test_invalid_trace_windows(self):
+    with self.assertRaisesRegex(ValueError, "`trace_dir` is required"):
+      step_profiler.StepProfiler(trace_windows=[(1, 2)])
+    with self.assertRaisesRegex(ValueError, "start_step < stop_step"):
+      step_profiler.StepProfiler(trace_dir="/tmp", trace_windows=[(2, 2)])
+
+
+if __name__ == "__main__":
+  tf.test.main()
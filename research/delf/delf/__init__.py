@@ -23,6 +23,7 @@ from delf.protos import box_pb2
 from delf.protos import datum_pb2
 from delf.protos import delf_config_pb2
 from delf.protos import feature_pb2
+from delf.python import aggregated_descriptor_store
 from delf.python import box_io
 from delf.python import datum_io
 from delf.python import feature_aggregation_extractor
@@ -0,0 +1,406 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Packed, memory-mapped storage of aggregated descriptors.
+
+A store is a local directory holding the aggregated descriptors of a list of
+images, concatenated into one contiguous array, with the offsets of each image
+in it, and similarly for the visual words of ASMK/ASMK* descriptors. Opening a
+store memory-maps these arrays with `np.memmap`, so that it takes constant time
+and descriptors are only paged in from disk when accessed.
+
+For ASMK/ASMK*, the store also holds the inverted file of the descriptors: one
+row of descriptor values per visual word of each image, sorted by visual word
+and then by image, with the image of each row and the offsets of each distinct
+visual word in the rows. An index is then built from a store without sorting.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+
+import numpy as np
+
+from delf import aggregation_config_pb2
+from delf.python import datum_io
+
+# Aliases for aggregation types.
+_VLAD = aggregation_config_pb2.AggregationConfig.VLAD
+_ASMK = aggregation_config_pb2.AggregationConfig.ASMK
+_ASMK_STAR = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+
+# Extensions of datum files.
+_VLAD_EXTENSION_SUFFIX = 'vlad'
+_ASMK_EXTENSION_SUFFIX = 'asmk'
+_ASMK_STAR_EXTENSION_SUFFIX = 'asmk_star'
+
+# Files of a store.
+_METADATA_FILENAME = 'metadata.json'
+_DESCRIPTORS_FILENAME = 'descriptors.bin'
+_DESCRIPTOR_OFFSETS_FILENAME = 'descriptor_offsets.bin'
+_VISUAL_WORDS_FILENAME = 'visual_words.bin'
+_VISUAL_WORD_OFFSETS_FILENAME = 'visual_word_offsets.bin'
+_IMAGE_NAMES_FILENAME = 'image_names.txt'
+_INVERTED_DESCRIPTORS_FILENAME = 'inverted_descriptors.bin'
+_INVERTED_IMAGE_IDS_FILENAME = 'inverted_image_ids.bin'
+_INVERTED_VISUAL_WORDS_FILENAME = 'inverted_visual_words.bin'
+_INVERTED_VISUAL_WORD_OFFSETS_FILENAME = 'inverted_visual_word_offsets.bin'
+
+_FORMAT_VERSION = 2
+_OFFSET_DTYPE = np.int64
+_VISUAL_WORD_DTYPE = np.uint32
+_IMAGE_ID_DTYPE = np.int64
+# Number of inverted file rows copied at once when writing a store.
+_ROWS_PER_CHUNK = 1 << 16
+
+
+def AggregatedDescriptorsExtension(config):
+  """Returns the extension of the datum files of aggregated descriptors.
+
+  Args:
+    config: AggregationConfig used for images.
+
+  Returns:
+    extension: String, e.g. '.asmk_star'.
+
+  Raises:
+    ValueError: If aggregation type is invalid.
+  """
+  extension = '.'
+  if config.use_regional_aggregation:
+    extension += 'r'
+  if config.aggregation_type == _VLAD:
+    extension += _VLAD_EXTENSION_SUFFIX
+  elif config.aggregation_type == _ASMK:
+    extension += _ASMK_EXTENSION_SUFFIX
+  elif config.aggregation_type == _ASMK_STAR:
+    extension += _ASMK_STAR_EXTENSION_SUFFIX
+  else:
+    raise ValueError('Invalid aggregation type: %d' % config.aggregation_type)
+  return extension
+
+
+def _DescriptorDtype(aggregation_type):
+  return np.uint8 if aggregation_type == _ASMK_STAR else np.float32
+
+
+def _OpenArray(path, dtype, size):
+  """Memory-maps a 1-D array from a file, which may be empty."""
+  if not size:
+    return np.zeros([0], dtype=dtype)
+  return np.memmap(path, dtype=dtype, mode='r', shape=(size,))
+
+
+class AggregatedDescriptorStoreWriter(object):
+  """Writes a store, one image at a time.
+
+  Descriptors are appended to the files of the store as images are added, and
+  the store can only be opened once the writer is closed.
+
+  Args:
+    store_dir: Local directory to write the store to.
+    aggregation_type: Aggregation type of the descriptors.
+  """
+
+  def __init__(self, store_dir, aggregation_type):
+    self._store_dir = store_dir
+    self._aggregation_type = aggregation_type
+    self._has_visual_words = aggregation_type in (_ASMK, _ASMK_STAR)
+    self._descriptor_dtype = _DescriptorDtype(aggregation_type)
+    if not os.path.isdir(store_dir):
+      os.makedirs(store_dir)
+    # A store being rewritten can not be opened anymore.
+    metadata_path = os.path.join(store_dir, _METADATA_FILENAME)
+    if os.path.exists(metadata_path):
+      os.remove(metadata_path)
+    self._descriptors_file = open(
+        os.path.join(store_dir, _DESCRIPTORS_FILENAME), 'wb')
+    self._visual_words_file = open(
+        os.path.join(store_dir, _VISUAL_WORDS_FILENAME), 'wb')
+    self._image_names = []
+    self._descriptor_offsets = [0]
+    self._visual_word_offsets = [0]
+    # Number of descriptor values per visual word, set by the first image with
+    # visual words.
+    self._row_size = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.Close()
+    else:
+      self.Abort()
+
+  def Add(self, image_name, aggregated_descriptors, visual_words=None):
+    """Adds the descriptors of an image.
+
+    Args:
+      image_name: String.
+      aggregated_descriptors: 1-D NumPy array. For ASMK*, it is converted to
+        uint8, otherwise to float32.
+      visual_words: Used only for ASMK/ASMK* aggregation type. 1-D sorted NumPy
+        integer array denoting visual words corresponding to
+        `aggregated_descriptors`.
+
+    Raises:
+      ValueError: If `visual_words` is missing for ASMK/ASMK*, or if the
+        number of descriptor values per visual word is inconsistent.
+    """
+    aggregated_descriptors = np.ravel(aggregated_descriptors).astype(
+        self._descriptor_dtype)
+    self._descriptors_file.write(aggregated_descriptors.tobytes())
+    self._descriptor_offsets.append(self._descriptor_offsets[-1] +
+                                    len(aggregated_descriptors))
+    if self._has_visual_words:
+      if visual_words is None:
+        raise ValueError('Visual words are required for ASMK/ASMK*.')
+      visual_words = np.ravel(visual_words).astype(_VISUAL_WORD_DTYPE)
+      if len(visual_words):
+        if self._row_size is None:
+          self._row_size = len(aggregated_descriptors) // len(visual_words)
+        if len(aggregated_descriptors) != self._row_size * len(visual_words):
+          raise ValueError(
+              'Dimensionality of aggregated descriptors of %s is inconsistent: '
+              '%d values for %d visual words.' %
+              (image_name, len(aggregated_descriptors), len(visual_words)))
+      self._visual_words_file.write(visual_words.tobytes())
+    else:
+      visual_words = []
+    self._visual_word_offsets.append(self._visual_word_offsets[-1] +
+                                     len(visual_words))
+    self._image_names.append(image_name)
+
+  def _WriteInvertedFile(self):
+    """Writes the inverted file, sorting the descriptors by visual word.
+
+    Returns:
+      row_size: Number of descriptor values per visual word.
+      num_inverted_visual_words: Number of distinct visual words.
+    """
+    num_visual_words = self._visual_word_offsets[-1]
+    row_size = self._row_size or 0
+    visual_words = _OpenArray(
+        os.path.join(self._store_dir, _VISUAL_WORDS_FILENAME),
+        _VISUAL_WORD_DTYPE, num_visual_words)
+    rows = np.reshape(
+        _OpenArray(
+            os.path.join(self._store_dir, _DESCRIPTORS_FILENAME),
+            self._descriptor_dtype, num_visual_words * row_size),
+        [num_visual_words, row_size])
+    order = np.argsort(visual_words, kind='stable')
+    sorted_visual_words = visual_words[order]
+
+    with open(
+        os.path.join(self._store_dir, _INVERTED_DESCRIPTORS_FILENAME),
+        'wb') as f:
+      for start in range(0, num_visual_words, _ROWS_PER_CHUNK):
+        f.write(rows[order[start:start + _ROWS_PER_CHUNK]].tobytes())
+    image_ids = np.repeat(
+        np.arange(len(self._image_names), dtype=_IMAGE_ID_DTYPE),
+        np.diff(self._visual_word_offsets))
+    image_ids[order].tofile(
+        os.path.join(self._store_dir, _INVERTED_IMAGE_IDS_FILENAME))
+    unique_visual_words, starts = np.unique(
+        sorted_visual_words, return_index=True)
+    unique_visual_words.astype(_VISUAL_WORD_DTYPE).tofile(
+        os.path.join(self._store_dir, _INVERTED_VISUAL_WORDS_FILENAME))
+    np.append(starts, num_visual_words).astype(_OFFSET_DTYPE).tofile(
+        os.path.join(self._store_dir, _INVERTED_VISUAL_WORD_OFFSETS_FILENAME))
+    return row_size, len(unique_visual_words)
+
+  def Abort(self):
+    """Closes the files of an incomplete store, which can not be opened."""
+    self._descriptors_file.close()
+    self._visual_words_file.close()
+
+  def Close(self):
+    """Writes the offsets, the inverted file and metadata of the store."""
+    self._descriptors_file.close()
+    self._visual_words_file.close()
+    row_size, num_inverted_visual_words = self._WriteInvertedFile()
+    np.array(self._descriptor_offsets, dtype=_OFFSET_DTYPE).tofile(
+        os.path.join(self._store_dir, _DESCRIPTOR_OFFSETS_FILENAME))
+    np.array(self._visual_word_offsets, dtype=_OFFSET_DTYPE).tofile(
+        os.path.join(self._store_dir, _VISUAL_WORD_OFFSETS_FILENAME))
+    with open(os.path.join(self._store_dir, _IMAGE_NAMES_FILENAME), 'w') as f:
+      f.writelines(name + '\n' for name in self._image_names)
+    metadata = {
+        'format_version': _FORMAT_VERSION,
+        'aggregation_type': int(self._aggregation_type),
+        'num_images': len(self._image_names),
+        'num_descriptor_values': self._descriptor_offsets[-1],
+        'num_visual_words': self._visual_word_offsets[-1],
+        'row_size': row_size,
+        'num_inverted_visual_words': num_inverted_visual_words,
+    }
+    # The metadata is written last, to only open complete stores.
+    with open(os.path.join(self._store_dir, _METADATA_FILENAME), 'w') as f:
+      json.dump(metadata, f)
+
+
+class AggregatedDescriptorStore(object):
+  """Read-only, memory-mapped store of aggregated descriptors.
+
+  Args:
+    store_dir: Local directory of the store.
+
+  Raises:
+    ValueError: If the store format is not supported.
+  """
+
+  def __init__(self, store_dir):
+    self._store_dir = store_dir
+    with open(os.path.join(store_dir, _METADATA_FILENAME)) as f:
+      metadata = json.load(f)
+    if metadata['format_version'] != _FORMAT_VERSION:
+      raise ValueError('Unsupported store format version: %d' %
+                       metadata['format_version'])
+    self._aggregation_type = metadata['aggregation_type']
+    self._num_images = metadata['num_images']
+    self._image_names = None
+
+    self._descriptors = _OpenArray(
+        os.path.join(store_dir, _DESCRIPTORS_FILENAME),
+        _DescriptorDtype(self._aggregation_type),
+        metadata['num_descriptor_values'])
+    self._descriptor_offsets = _OpenArray(
+        os.path.join(store_dir, _DESCRIPTOR_OFFSETS_FILENAME), _OFFSET_DTYPE,
+        self._num_images + 1)
+    self._visual_words = _OpenArray(
+        os.path.join(store_dir, _VISUAL_WORDS_FILENAME), _VISUAL_WORD_DTYPE,
+        metadata['num_visual_words'])
+    self._visual_word_offsets = _OpenArray(
+        os.path.join(store_dir, _VISUAL_WORD_OFFSETS_FILENAME), _OFFSET_DTYPE,
+        self._num_images + 1)
+
+    num_rows = metadata['num_visual_words']
+    row_size = metadata['row_size']
+    num_inverted_visual_words = metadata['num_inverted_visual_words']
+    self._inverted_descriptors = np.reshape(
+        _OpenArray(
+            os.path.join(store_dir, _INVERTED_DESCRIPTORS_FILENAME),
+            _DescriptorDtype(self._aggregation_type), num_rows * row_size),
+        [num_rows, row_size])
+    self._inverted_image_ids = _OpenArray(
+        os.path.join(store_dir, _INVERTED_IMAGE_IDS_FILENAME), _IMAGE_ID_DTYPE,
+        num_rows)
+    self._inverted_visual_words = _OpenArray(
+        os.path.join(store_dir, _INVERTED_VISUAL_WORDS_FILENAME),
+        _VISUAL_WORD_DTYPE, num_inverted_visual_words)
+    self._inverted_visual_word_offsets = _OpenArray(
+        os.path.join(store_dir, _INVERTED_VISUAL_WORD_OFFSETS_FILENAME),
+        _OFFSET_DTYPE, num_inverted_visual_words + 1)
+
+  def __len__(self):
+    return self._num_images
+
+  @property
+  def aggregation_type(self):
+    return self._aggregation_type
+
+  @property
+  def image_names(self):
+    """List of image names, in the order of the store, read on first access."""
+    if self._image_names is None:
+      with open(os.path.join(self._store_dir, _IMAGE_NAMES_FILENAME)) as f:
+        self._image_names = f.read().splitlines()
+    return self._image_names
+
+  @property
+  def descriptors(self):
+    """1-D array of the concatenated aggregated descriptors of all images."""
+    return self._descriptors
+
+  @property
+  def descriptor_offsets(self):
+    """1-D array of the #images + 1 offsets of images in `descriptors`."""
+    return self._descriptor_offsets
+
+  @property
+  def visual_words(self):
+    """1-D array of the concatenated visual words of all images."""
+    return self._visual_words
+
+  @property
+  def visual_word_offsets(self):
+    """1-D array of the #images + 1 offsets of images in `visual_words`."""
+    return self._visual_word_offsets
+
+  @property
+  def inverted_descriptors(self):
+    """2-D array of the descriptor values of each visual word of each image.
+
+    Rows are sorted by visual word, then by image. Empty for VLAD.
+    """
+    return self._inverted_descriptors
+
+  @property
+  def inverted_image_ids(self):
+    """1-D array of the image of each row of `inverted_descriptors`."""
+    return self._inverted_image_ids
+
+  @property
+  def inverted_visual_words(self):
+    """1-D sorted array of the distinct visual words of all images."""
+    return self._inverted_visual_words
+
+  @property
+  def inverted_visual_word_offsets(self):
+    """1-D array of the offsets of `inverted_visual_words` in the rows.
+
+    The rows of the i-th visual word are `inverted_visual_word_offsets[i]` to
+    `inverted_visual_word_offsets[i + 1]`.
+    """
+    return self._inverted_visual_word_offsets
+
+  def Get(self, i):
+    """Returns the descriptors of the i-th image.
+
+    Args:
+      i: Integer index of the image.
+
+    Returns:
+      aggregated_descriptors: 1-D NumPy array, a view of the store.
+      visual_words: If using VLAD aggregation, an empty array. Otherwise, 1-D
+        NumPy array, a view of the store.
+    """
+    d_start, d_end = self._descriptor_offsets[i:i + 2]
+    v_start, v_end = self._visual_word_offsets[i:i + 2]
+    return (self._descriptors[d_start:d_end], self._visual_words[v_start:v_end])
+
+
+def PackDatumFiles(input_dir, image_list, config, store_dir):
+  """Packs the datum files of aggregated descriptors into a store.
+
+  Args:
+    input_dir: Directory where aggregated descriptors are located.
+    image_list: List of image names for which to pack descriptors.
+    config: AggregationConfig used for images.
+    store_dir: Local directory to write the store to.
+  """
+  extension = AggregatedDescriptorsExtension(config)
+  with AggregatedDescriptorStoreWriter(store_dir,
+                                       config.aggregation_type) as writer:
+    for image_name in image_list:
+      descriptors_fullpath = os.path.join(input_dir, image_name + extension)
+      if config.aggregation_type == _VLAD:
+        writer.Add(image_name, datum_io.ReadFromFile(descriptors_fullpath))
+      else:
+        d, v = datum_io.ReadPairFromFile(descriptors_fullpath)
+        writer.Add(image_name, d, v)
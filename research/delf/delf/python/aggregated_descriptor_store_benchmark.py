@@ -0,0 +1,130 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks loading ASMK* index descriptors on synthetic descriptors.
+
+Compares reading one datum file per image and building the index from the
+lists of descriptors, to opening a memory-mapped `AggregatedDescriptorStore`
+and building the index from it.
+
+Example usage:
+  python aggregated_descriptor_store_benchmark.py --num_index_images=10000
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from delf import aggregated_descriptor_store
+from delf import aggregation_config_pb2
+from delf import datum_io
+from delf import feature_aggregation_similarity
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer('codebook_size', 65536, 'Number of visual words.')
+flags.DEFINE_integer('feature_dimensionality', 128,
+                     'Dimensionality of local features.')
+flags.DEFINE_integer('num_visual_words_per_image', 500,
+                     'Number of visual words of each image.')
+flags.DEFINE_integer('num_index_images', 10000, 'Number of index images.')
+
+
+def _WriteDatumFiles(config, input_dir):
+  """Writes random ASMK* descriptors of index images to datum files."""
+  rng = np.random.RandomState(0)
+  extension = aggregated_descriptor_store.AggregatedDescriptorsExtension(config)
+  image_names = []
+  for i in range(FLAGS.num_index_images):
+    v = np.sort(
+        rng.choice(
+            FLAGS.codebook_size, FLAGS.num_visual_words_per_image,
+            replace=False)).astype(np.uint32)
+    d = rng.randint(
+        256,
+        size=FLAGS.num_visual_words_per_image * FLAGS.feature_dimensionality //
+        8)
+    image_name = 'image_%d' % i
+    datum_io.WritePairToFile(
+        d.astype(np.float32), v,
+        os.path.join(input_dir, image_name + extension))
+    image_names.append(image_name)
+  return image_names
+
+
+def _ReadDatumFiles(config, input_dir, image_names):
+  """Reads descriptors as `perform_retrieval.py` does without a store."""
+  extension = aggregated_descriptor_store.AggregatedDescriptorsExtension(config)
+  aggregated_descriptors = []
+  visual_words = []
+  for image_name in image_names:
+    d, v = datum_io.ReadPairFromFile(
+        os.path.join(input_dir, image_name + extension))
+    aggregated_descriptors.append(d.astype('uint8'))
+    visual_words.append(v)
+  return aggregated_descriptors, visual_words
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise RuntimeError('Too many command-line arguments.')
+  config = aggregation_config_pb2.AggregationConfig()
+  config.codebook_size = FLAGS.codebook_size
+  config.feature_dimensionality = FLAGS.feature_dimensionality
+  config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+  config.use_l2_normalization = True
+
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    input_dir = os.path.join(tmp_dir, 'datum')
+    store_dir = os.path.join(tmp_dir, 'store')
+    os.makedirs(input_dir)
+    image_names = _WriteDatumFiles(config, input_dir)
+    start = time.time()
+    aggregated_descriptor_store.PackDatumFiles(input_dir, image_names, config,
+                                               store_dir)
+    print('Packed %d images in %.2f s' % (len(image_names),
+                                          time.time() - start))
+
+    start = time.time()
+    aggregated_descriptors, visual_words = _ReadDatumFiles(
+        config, input_dir, image_names)
+    read_time = time.time() - start
+    start = time.time()
+    feature_aggregation_similarity.AggregatedRepresentationIndex(
+        config, aggregated_descriptors, visual_words)
+    build_time = time.time() - start
+    print('datum files: read %8.3f s, index built in %8.3f s' %
+          (read_time, build_time))
+
+    start = time.time()
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+    open_time = time.time() - start
+    start = time.time()
+    feature_aggregation_similarity.AggregatedRepresentationIndex.FromStore(
+        config, store)
+    build_time = time.time() - start
+    print('store:       open %8.3f s, index built in %8.3f s' %
+          (open_time, build_time))
+
+
+if __name__ == '__main__':
+  app.run(main)
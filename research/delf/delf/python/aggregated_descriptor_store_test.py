@@ -0,0 +1,256 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the store of aggregated descriptors."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from unittest import mock
+
+from absl import flags
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from delf import aggregated_descriptor_store
+from delf import aggregation_config_pb2
+from delf import datum_io
+from delf import feature_aggregation_similarity
+
+FLAGS = flags.FLAGS
+
+_VLAD = aggregation_config_pb2.AggregationConfig.VLAD
+_ASMK = aggregation_config_pb2.AggregationConfig.ASMK
+_ASMK_STAR = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+
+
+def _CreateConfig(aggregation_type, feature_dimensionality=16):
+  config = aggregation_config_pb2.AggregationConfig()
+  config.codebook_size = 10
+  config.feature_dimensionality = feature_dimensionality
+  config.aggregation_type = aggregation_type
+  config.use_l2_normalization = True
+  config.alpha = 3.0
+  config.tau = 0.0
+  return config
+
+
+def _RandomAggregatedDescriptors(config, num_images, seed):
+  """Generates random aggregated descriptors and visual words."""
+  rng = np.random.RandomState(seed)
+  aggregated_descriptors = []
+  visual_words = []
+  for i in range(num_images):
+    if config.aggregation_type == _VLAD:
+      d = rng.randn(config.codebook_size * config.feature_dimensionality)
+      v = np.array([], dtype=np.uint32)
+    else:
+      # The first image has no visual words.
+      num_visual_words = 0 if i == 0 else rng.randint(1, config.codebook_size)
+      v = np.sort(
+          rng.choice(config.codebook_size, num_visual_words, replace=False))
+      d = rng.randn(num_visual_words, config.feature_dimensionality)
+      d /= np.linalg.norm(d, axis=1, keepdims=True)
+      if config.aggregation_type == _ASMK_STAR:
+        d = np.packbits(d > 0, axis=1)
+    aggregated_descriptors.append(
+        np.reshape(d, [-1]).astype(np.uint8 if config.aggregation_type ==
+                                   _ASMK_STAR else np.float32))
+    visual_words.append(v)
+  return aggregated_descriptors, visual_words
+
+
+class AggregatedDescriptorStoreTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(_VLAD, _ASMK, _ASMK_STAR)
+  def testPackDatumFilesRoundTrip(self, aggregation_type):
+    # Construct inputs.
+    config = _CreateConfig(aggregation_type)
+    aggregated_descriptors, visual_words = _RandomAggregatedDescriptors(
+        config, 5, 0)
+    image_names = ['image_%d' % i for i in range(5)]
+    input_dir = os.path.join(FLAGS.test_tmpdir, 'datum_%d' % aggregation_type)
+    store_dir = os.path.join(FLAGS.test_tmpdir, 'store_%d' % aggregation_type)
+    tf.io.gfile.makedirs(input_dir)
+    extension = aggregated_descriptor_store.AggregatedDescriptorsExtension(
+        config)
+    for name, d, v in zip(image_names, aggregated_descriptors, visual_words):
+      path = os.path.join(input_dir, name + extension)
+      if aggregation_type == _VLAD:
+        datum_io.WriteToFile(d, path)
+      else:
+        datum_io.WritePairToFile(d, v.astype(np.uint32), path)
+
+    # Run tested function.
+    aggregated_descriptor_store.PackDatumFiles(input_dir, image_names, config,
+                                               store_dir)
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+
+    # Compare actual and expected results.
+    self.assertLen(store, 5)
+    self.assertEqual(store.aggregation_type, aggregation_type)
+    self.assertEqual(store.image_names, image_names)
+    for i in range(5):
+      d, v = store.Get(i)
+      self.assertEqual(d.dtype, aggregated_descriptors[i].dtype)
+      self.assertAllEqual(d, aggregated_descriptors[i])
+      self.assertAllEqual(v, visual_words[i])
+
+  @parameterized.parameters(_ASMK, _ASMK_STAR)
+  def testInvertedFile(self, aggregation_type):
+    # Construct inputs.
+    config = _CreateConfig(aggregation_type)
+    aggregated_descriptors, visual_words = _RandomAggregatedDescriptors(
+        config, 5, 0)
+    store_dir = os.path.join(FLAGS.test_tmpdir,
+                             'inverted_store_%d' % aggregation_type)
+
+    # Run tested function.
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, aggregation_type) as writer:
+      for i, (d, v) in enumerate(zip(aggregated_descriptors, visual_words)):
+        writer.Add('image_%d' % i, d, v)
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+
+    # Compare actual and expected results.
+    exp_postings = sorted(
+        (word, i, row)
+        for i, (d, v) in enumerate(zip(aggregated_descriptors, visual_words))
+        if len(v)
+        for word, row in zip(v, np.reshape(d, [len(v), -1]).tolist()))
+    exp_visual_words = sorted(set(word for word, _, _ in exp_postings))
+    offsets = store.inverted_visual_word_offsets
+    self.assertAllEqual(store.inverted_visual_words, exp_visual_words)
+    self.assertAllEqual(store.inverted_image_ids,
+                        [i for _, i, _ in exp_postings])
+    self.assertAllEqual(store.inverted_descriptors,
+                        [row for _, _, row in exp_postings])
+    self.assertEqual(offsets[0], 0)
+    self.assertEqual(offsets[-1], len(exp_postings))
+    for word, start, end in zip(exp_visual_words, offsets[:-1], offsets[1:]):
+      self.assertAllEqual(
+          [w for w, _, _ in exp_postings[start:end]], [word] * (end - start))
+
+  def testEmptyStore(self):
+    store_dir = os.path.join(FLAGS.test_tmpdir, 'empty_store')
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, _ASMK):
+      pass
+
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+
+    self.assertEmpty(store)
+    self.assertEmpty(store.image_names)
+    self.assertAllEqual(store.descriptor_offsets, [0])
+    self.assertAllEqual(store.visual_word_offsets, [0])
+
+  def testAsmkRequiresVisualWords(self):
+    store_dir = os.path.join(FLAGS.test_tmpdir, 'asmk_store')
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, _ASMK) as writer:
+      with self.assertRaisesRegex(ValueError, 'Visual words are required'):
+        writer.Add('image', np.zeros([16]))
+
+  def testInconsistentDimensionality(self):
+    store_dir = os.path.join(FLAGS.test_tmpdir, 'inconsistent_store')
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, _ASMK) as writer:
+      writer.Add('image_0', np.zeros([32]), np.array([1, 2]))
+      with self.assertRaisesRegex(ValueError, 'image_1 is inconsistent'):
+        writer.Add('image_1', np.zeros([32]), np.array([1, 2, 3]))
+
+  def testFailedPackCanNotBeOpened(self):
+    store_dir = os.path.join(FLAGS.test_tmpdir, 'failed_store')
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, _VLAD):
+      pass
+
+    # A pack interrupted by an error also invalidates the existing store.
+    with self.assertRaisesRegex(RuntimeError, 'Interrupted'):
+      with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+          store_dir, _VLAD) as writer:
+        writer.Add('image_0', np.zeros([16]))
+        raise RuntimeError('Interrupted')
+
+    with self.assertRaises(IOError):
+      aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+
+  @parameterized.parameters(_VLAD, _ASMK, _ASMK_STAR)
+  def testIndexFromStoreMatchesIndexFromLists(self, aggregation_type):
+    # Construct inputs.
+    config = _CreateConfig(aggregation_type)
+    index_descriptors, index_visual_words = _RandomAggregatedDescriptors(
+        config, 20, 0)
+    query_descriptors, query_visual_words = _RandomAggregatedDescriptors(
+        config, 3, 1)
+    store_dir = os.path.join(FLAGS.test_tmpdir,
+                             'index_store_%d' % aggregation_type)
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, aggregation_type) as writer:
+      for i, (d, v) in enumerate(zip(index_descriptors, index_visual_words)):
+        writer.Add('image_%d' % i, d, v)
+
+    # Run tested function.
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+    index = (
+        feature_aggregation_similarity.AggregatedRepresentationIndex.FromStore(
+            config, store))
+
+    # Compare with the index built from lists of descriptors.
+    exp_index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+        config, index_descriptors, index_visual_words)
+    self.assertEqual(index.num_images, 20)
+    for d, v in zip(query_descriptors, query_visual_words):
+      self.assertAllClose(
+          index.ComputeSimilarities(d, v), exp_index.ComputeSimilarities(d, v))
+
+  @parameterized.parameters((_ASMK, 16), (_ASMK_STAR, 64))
+  def testIndexFromStoreUsesInvertedFile(self, aggregation_type,
+                                         feature_dimensionality):
+    # Construct inputs.
+    config = _CreateConfig(aggregation_type, feature_dimensionality)
+    index_descriptors, index_visual_words = _RandomAggregatedDescriptors(
+        config, 20, 0)
+    query_descriptors, query_visual_words = _RandomAggregatedDescriptors(
+        config, 3, 1)
+    store_dir = os.path.join(FLAGS.test_tmpdir,
+                             'memmap_store_%d' % aggregation_type)
+    with aggregated_descriptor_store.AggregatedDescriptorStoreWriter(
+        store_dir, aggregation_type) as writer:
+      for i, (d, v) in enumerate(zip(index_descriptors, index_visual_words)):
+        writer.Add('image_%d' % i, d, v)
+
+    # Run tested function, which must not sort the descriptors.
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(store_dir)
+    with mock.patch.object(np, 'argsort', side_effect=AssertionError):
+      index = (
+          feature_aggregation_similarity.AggregatedRepresentationIndex
+          .FromStore(config, store))
+
+    # The descriptors of the index are those of the store, and similarities
+    # match the index built from lists of descriptors.
+    self.assertTrue(
+        np.shares_memory(index._descriptors, store.inverted_descriptors))
+    exp_index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+        config, index_descriptors, index_visual_words)
+    for d, v in zip(query_descriptors, query_visual_words):
+      self.assertAllClose(
+          index.ComputeSimilarities(d, v), exp_index.ComputeSimilarities(d, v))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -18,7 +18,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+from concurrent import futures
 import io
+import multiprocessing
 import os
 
 import matplotlib.pyplot as plt
@@ -40,6 +43,8 @@ _STATUS_CHECK_GV_ITERATIONS = 10
 _NUM_TO_RERANK = 100
 _NUM_RANSAC_TRIALS = 1000
 _MIN_RANSAC_SAMPLES = 3
+# Minimum number of inliers of candidates counted to stop re-ranking early.
+_MIN_NUM_INLIERS_TO_STOP = 20
 
 
 def MatchFeatures(query_locations,
@@ -53,7 +58,9 @@ def MatchFeatures(query_locations,
                   index_im_array=None,
                   query_im_scale_factors=None,
                   index_im_scale_factors=None,
-                  use_ratio_test=False):
+                  use_ratio_test=False,
+                  index_image_tree=None,
+                  kdtree_workers=-1):
   """Matches local features using geometric verification.
 
   First, finds putative local feature matches by matching `query_descriptors`
@@ -88,6 +95,10 @@ def MatchFeatures(query_locations,
       index image.
     use_ratio_test: If True, descriptor matching is performed via ratio test,
       instead of distance-based threshold.
+    index_image_tree: Optional. If not None, a `spatial.cKDTree` built from
+      `index_image_descriptors`, which is then not built again.
+    kdtree_workers: Number of threads used to query the KD-tree. If -1
+      (default), all CPUs are used.
 
   Returns:
     score: Number of inliers of match. If no match is found, returns 0.
@@ -111,37 +122,23 @@ def MatchFeatures(query_locations,
         'images.')
 
   # Construct KD-tree used to find nearest neighbors.
-  index_image_tree = spatial.cKDTree(index_image_descriptors)
+  if index_image_tree is None:
+    index_image_tree = spatial.cKDTree(index_image_descriptors)
   if use_ratio_test:
     distances, indices = index_image_tree.query(
-        query_descriptors, k=2, n_jobs=-1)
-    query_locations_to_use = np.array([
-        query_locations[i,]
-        for i in range(num_features_query)
-        if distances[i][0] < descriptor_matching_threshold * distances[i][1]
-    ])
-    index_image_locations_to_use = np.array([
-        index_image_locations[indices[i][0],]
-        for i in range(num_features_query)
-        if distances[i][0] < descriptor_matching_threshold * distances[i][1]
-    ])
+        query_descriptors, k=2, workers=kdtree_workers)
+    matched = distances[:, 0] < descriptor_matching_threshold * distances[:, 1]
+    indices = indices[:, 0]
   else:
     _, indices = index_image_tree.query(
         query_descriptors,
         distance_upper_bound=descriptor_matching_threshold,
-        n_jobs=-1)
-
-    # Select feature locations for putative matches.
-    query_locations_to_use = np.array([
-        query_locations[i,]
-        for i in range(num_features_query)
-        if indices[i] != num_features_index_image
-    ])
-    index_image_locations_to_use = np.array([
-        index_image_locations[indices[i],]
-        for i in range(num_features_query)
-        if indices[i] != num_features_index_image
-    ])
+        workers=kdtree_workers)
+    matched = indices != num_features_index_image
+
+  # Select feature locations for putative matches.
+  query_locations_to_use = query_locations[matched]
+  index_image_locations_to_use = index_image_locations[indices[matched]]
 
   # If there are not enough putative matches, early return 0.
   if query_locations_to_use.shape[0] <= _MIN_RANSAC_SAMPLES:
@@ -154,7 +151,7 @@ def MatchFeatures(query_locations,
       min_samples=_MIN_RANSAC_SAMPLES,
       residual_threshold=ransac_residual_threshold,
       max_trials=_NUM_RANSAC_TRIALS,
-      random_state=ransac_seed)
+      rng=ransac_seed)
   match_viz_bytes = b''
 
   if inliers is None:
@@ -187,6 +184,312 @@ def MatchFeatures(query_locations,
   return sum(inliers), match_viz_bytes
 
 
+def ReadLocalFeatures(features_dir, image_name,
+                      local_feature_extension=_DELF_EXTENSION):
+  """Reads local features of an image.
+
+  Args:
+    features_dir: Directory where local feature files are located (string).
+    image_name: Name of the image (string).
+    local_feature_extension: String, extension of local feature files.
+
+  Returns:
+    locations: NumPy array of shape [#features, 2].
+    descriptors: NumPy array of shape [#features, depth].
+  """
+  locations, _, descriptors, _, _ = feature_io.ReadFromFile(
+      os.path.join(features_dir, image_name + local_feature_extension))
+  return locations, descriptors
+
+
+class _IndexFeaturesCache(object):
+  """LRU cache of local features and KD-trees of index images.
+
+  Args:
+    index_names: List of names for index images (strings).
+    index_features_dir: Directory where index local feature files are located
+      (string).
+    local_feature_extension: String, extension of local feature files.
+    cache_size: Maximum number of index images whose features are cached. If 0,
+      features are loaded, and their KD-tree built, on every access.
+  """
+
+  def __init__(self, index_names, index_features_dir, local_feature_extension,
+               cache_size):
+    self._index_names = index_names
+    self._index_features_dir = index_features_dir
+    self._local_feature_extension = local_feature_extension
+    self._cache_size = cache_size
+    self._entries = collections.OrderedDict()
+
+  def Get(self, index_image_id):
+    """Returns locations, descriptors and KD-tree of an index image.
+
+    Args:
+      index_image_id: Index of the image in `index_names`.
+
+    Returns:
+      locations: NumPy array of shape [#features, 2].
+      descriptors: NumPy array of shape [#features, depth].
+      tree: `spatial.cKDTree` of `descriptors`, or None if there are no
+        features.
+    """
+    entry = self._entries.get(index_image_id)
+    if entry is not None:
+      self._entries.move_to_end(index_image_id)
+      return entry
+
+    locations, descriptors = ReadLocalFeatures(
+        self._index_features_dir, self._index_names[index_image_id],
+        self._local_feature_extension)
+    tree = spatial.cKDTree(descriptors) if locations.shape[0] else None
+    entry = (locations, descriptors, tree)
+    if self._cache_size:
+      self._entries[index_image_id] = entry
+      if len(self._entries) > self._cache_size:
+        self._entries.popitem(last=False)
+    return entry
+
+
+def _MatchIndexImages(cache, query_locations, query_descriptors,
+                      index_image_ids, match_kwargs):
+  """Returns the number of inliers of the query to each index image."""
+  num_inliers = []
+  for index_image_id in index_image_ids:
+    locations, descriptors, tree = cache.Get(index_image_id)
+    inliers, _ = MatchFeatures(
+        query_locations,
+        query_descriptors,
+        locations,
+        descriptors,
+        index_image_tree=tree,
+        **match_kwargs)
+    num_inliers.append(inliers)
+  return num_inliers
+
+
+# Cache of index features of a re-ranking worker process.
+_worker_cache = None
+
+
+def _InitWorker(index_names, index_features_dir, local_feature_extension,
+                cache_size):
+  global _worker_cache
+  _worker_cache = _IndexFeaturesCache(index_names, index_features_dir,
+                                      local_feature_extension, cache_size)
+
+
+def _MatchIndexImagesInWorker(query_locations, query_descriptors,
+                              index_image_ids, match_kwargs):
+  return _MatchIndexImages(_worker_cache, query_locations, query_descriptors,
+                           index_image_ids, match_kwargs)
+
+
+def _SortByInliersAndInitialScores(num_inliers, initial_scores):
+  """Sorts index images based on (number of inliers, initial score).
+
+  Args:
+    num_inliers: List with number of inliers of each index image.
+    initial_scores: 1D NumPy array with initial similarity scores of each index
+      image.
+
+  Returns:
+    output_ranks: List with index image indices, sorted from the most to the
+      least similar.
+  """
+  return sorted(
+      range(len(num_inliers)),
+      key=lambda k: (num_inliers[k], initial_scores[k]),
+      reverse=True)
+
+
+class GeometricVerificationReranker(object):
+  """Re-ranks retrieval results of queries using geometric verification.
+
+  Local features of index images, and the KD-trees used to match them, are
+  kept in an LRU cache shared by all queries. If `num_processes` is positive,
+  candidates are verified by worker processes, and each index image is always
+  verified by the same process, which caches its features.
+
+  Re-ranking of a query can stop early, once `num_verified_to_stop` candidates
+  have at least `min_num_inliers` inliers: the remaining candidates are then
+  ranked by their initial scores only. The output ranks do not depend on
+  `num_processes`.
+
+  Args:
+    index_names: List of names for index images (strings).
+    index_features_dir: Directory where index local feature files are located
+      (string).
+    local_feature_extension: String, extension to use for loading local feature
+      files.
+    num_to_rerank: Maximum number of top-ranked index images to re-rank.
+    cache_size: Maximum number of index images whose local features are cached,
+      in each worker process if `num_processes` is positive.
+    num_processes: Number of worker processes. If 0, candidates are verified in
+      the calling process.
+    num_verified_to_stop: Number of candidates with at least `min_num_inliers`
+      inliers after which re-ranking stops. If None, all candidates are
+      verified.
+    min_num_inliers: Minimum number of inliers of verified candidates.
+    batch_size: Number of candidates verified in parallel, before checking
+      whether to stop early. If None, `4 * num_processes` are used when stopping
+      early, and all candidates otherwise.
+    ransac_seed: Seed used by RANSAC. If None (default), no seed is provided.
+    descriptor_matching_threshold: Threshold used for local descriptor matching.
+    ransac_residual_threshold: Residual error threshold for considering matches
+      as inliers, used in RANSAC algorithm.
+    use_ratio_test: If True, descriptor matching is performed via ratio test,
+      instead of distance-based threshold.
+  """
+
+  def __init__(self,
+               index_names,
+               index_features_dir,
+               local_feature_extension=_DELF_EXTENSION,
+               num_to_rerank=_NUM_TO_RERANK,
+               cache_size=0,
+               num_processes=0,
+               num_verified_to_stop=None,
+               min_num_inliers=_MIN_NUM_INLIERS_TO_STOP,
+               batch_size=None,
+               ransac_seed=None,
+               descriptor_matching_threshold=0.9,
+               ransac_residual_threshold=10.0,
+               use_ratio_test=False):
+    self._num_index_images = len(index_names)
+    self._num_to_rerank = num_to_rerank
+    self._num_verified_to_stop = num_verified_to_stop
+    self._min_num_inliers = min_num_inliers
+    self._match_kwargs = {
+        'ransac_seed': ransac_seed,
+        'descriptor_matching_threshold': descriptor_matching_threshold,
+        'ransac_residual_threshold': ransac_residual_threshold,
+        'use_ratio_test': use_ratio_test,
+    }
+    if batch_size is None and num_verified_to_stop is not None:
+      batch_size = 4 * max(num_processes, 1)
+    self._batch_size = max(batch_size or num_to_rerank, 1)
+
+    self._cache = None
+    self._executors = []
+    if num_processes:
+      # Each worker process queries KD-trees with a single thread. TensorFlow,
+      # imported with `feature_io`, is not fork-safe.
+      self._match_kwargs['kdtree_workers'] = 1
+      context = multiprocessing.get_context('spawn')
+      for _ in range(num_processes):
+        self._executors.append(
+            futures.ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_InitWorker,
+                initargs=(index_names, index_features_dir,
+                          local_feature_extension, cache_size)))
+    else:
+      self._cache = _IndexFeaturesCache(index_names, index_features_dir,
+                                        local_feature_extension, cache_size)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.Close()
+
+  def Close(self):
+    """Shuts down the worker processes."""
+    for executor in self._executors:
+      executor.shutdown()
+    self._executors = []
+
+  def _MatchIndexImages(self, query_locations, query_descriptors,
+                        index_image_ids):
+    """Returns the number of inliers of the query to each index image."""
+    if not self._executors:
+      return _MatchIndexImages(self._cache, query_locations, query_descriptors,
+                               index_image_ids, self._match_kwargs)
+
+    # Index images are assigned to worker processes by their index, so that
+    # their cached features are reused by later queries.
+    num_processes = len(self._executors)
+    shards = [[] for _ in range(num_processes)]
+    for index_image_id in index_image_ids:
+      shards[index_image_id % num_processes].append(index_image_id)
+    shard_futures = [
+        executor.submit(_MatchIndexImagesInWorker, query_locations,
+                        query_descriptors, shard, self._match_kwargs)
+        for executor, shard in zip(self._executors, shards)
+        if shard
+    ]
+    num_inliers = {}
+    for shard, future in zip([shard for shard in shards if shard],
+                             shard_futures):
+      num_inliers.update(zip(shard, future.result()))
+    return [num_inliers[index_image_id] for index_image_id in index_image_ids]
+
+  def Rerank(self, input_ranks, initial_scores, query_locations,
+             query_descriptors, junk_ids):
+    """Re-ranks retrieval results of a query using geometric verification.
+
+    Args:
+      input_ranks: 1D NumPy array with indices of top-ranked index images,
+        sorted from the most to the least similar.
+      initial_scores: 1D NumPy array with initial similarity scores between
+        query and index images. Entry i corresponds to score for image i.
+      query_locations: Locations of local features for query image. NumPy
+        array of shape [#query_features, 2].
+      query_descriptors: Descriptors of local features for query image. NumPy
+        array of shape [#query_features, depth].
+      junk_ids: Set with indices of junk images which should not be considered
+        during re-ranking.
+
+    Returns:
+      output_ranks: 1D NumPy array with index image indices, sorted from the
+        most to the least similar according to the geometric verification and
+        initial scores.
+
+    Raises:
+      ValueError: If `input_ranks`, `initial_scores` and index images do not
+        have the same number of entries.
+    """
+    if len(input_ranks) != self._num_index_images:
+      raise ValueError('input_ranks and index_names have different number of '
+                       'elements: %d vs %d' %
+                       (len(input_ranks), self._num_index_images))
+    if len(initial_scores) != self._num_index_images:
+      raise ValueError('initial_scores and index_names have different number '
+                       'of elements: %d vs %d' %
+                       (len(initial_scores), self._num_index_images))
+
+    # Filter out junk images from list that will be re-ranked.
+    input_ranks_for_gv = [ind for ind in input_ranks if ind not in junk_ids]
+    input_ranks_for_gv = input_ranks_for_gv[:self._num_to_rerank]
+    num_to_rerank = len(input_ranks_for_gv)
+
+    # Loop over batches of top-ranked images and get results.
+    print('Starting to re-rank')
+    num_inliers = [0] * self._num_index_images
+    num_verified = 0
+    for start in range(0, num_to_rerank, self._batch_size):
+      batch = input_ranks_for_gv[start:start + self._batch_size]
+      batch_num_inliers = self._MatchIndexImages(query_locations,
+                                                 query_descriptors, batch)
+      for i, (index_image_id, inliers) in enumerate(
+          zip(batch, batch_num_inliers), start=start):
+        if i > 0 and i % _STATUS_CHECK_GV_ITERATIONS == 0:
+          print('Re-ranking: i = %d out of %d' % (i, num_to_rerank))
+        num_inliers[index_image_id] = inliers
+        if inliers >= self._min_num_inliers:
+          num_verified += 1
+        # Candidates after the one which stops re-ranking are ignored, even if
+        # they were verified in the same batch.
+        if num_verified == self._num_verified_to_stop:
+          print('Stopping re-ranking after %d out of %d' %
+                (i + 1, num_to_rerank))
+          return _SortByInliersAndInitialScores(num_inliers, initial_scores)
+
+    return _SortByInliersAndInitialScores(num_inliers, initial_scores)
+
+
 def RerankByGeometricVerification(input_ranks,
                                   initial_scores,
                                   query_name,
@@ -201,6 +504,9 @@ def RerankByGeometricVerification(input_ranks,
                                   use_ratio_test=False):
   """Re-ranks retrieval results using geometric verification.
 
+  To re-rank many queries, `GeometricVerificationReranker` can be used instead,
+  to cache index features across queries and verify candidates in parallel.
+
   Args:
     input_ranks: 1D NumPy array with indices of top-ranked index images, sorted
       from the most to the least similar.
@@ -232,72 +538,15 @@ def RerankByGeometricVerification(input_ranks,
     ValueError: If `input_ranks`, `initial_scores` and `index_names` do not have
       the same number of entries.
   """
-  num_index_images = len(index_names)
-  if len(input_ranks) != num_index_images:
-    raise ValueError('input_ranks and index_names have different number of '
-                     'elements: %d vs %d' %
-                     (len(input_ranks), len(index_names)))
-  if len(initial_scores) != num_index_images:
-    raise ValueError('initial_scores and index_names have different number of '
-                     'elements: %d vs %d' %
-                     (len(initial_scores), len(index_names)))
-
-  # Filter out junk images from list that will be re-ranked.
-  input_ranks_for_gv = []
-  for ind in input_ranks:
-    if ind not in junk_ids:
-      input_ranks_for_gv.append(ind)
-  num_to_rerank = min(_NUM_TO_RERANK, len(input_ranks_for_gv))
-
-  # Load query image features.
-  query_features_path = os.path.join(query_features_dir,
-                                     query_name + local_feature_extension)
-  query_locations, _, query_descriptors, _, _ = feature_io.ReadFromFile(
-      query_features_path)
-
-  # Initialize list containing number of inliers and initial similarity scores.
-  inliers_and_initial_scores = []
-  for i in range(num_index_images):
-    inliers_and_initial_scores.append([0, initial_scores[i]])
-
-  # Loop over top-ranked images and get results.
-  print('Starting to re-rank')
-  for i in range(num_to_rerank):
-    if i > 0 and i % _STATUS_CHECK_GV_ITERATIONS == 0:
-      print('Re-ranking: i = %d out of %d' % (i, num_to_rerank))
-
-    index_image_id = input_ranks_for_gv[i]
-
-    # Load index image features.
-    index_image_features_path = os.path.join(
-        index_features_dir,
-        index_names[index_image_id] + local_feature_extension)
-    (index_image_locations, _, index_image_descriptors, _,
-     _) = feature_io.ReadFromFile(index_image_features_path)
-
-    inliers_and_initial_scores[index_image_id][0], _ = MatchFeatures(
-        query_locations,
-        query_descriptors,
-        index_image_locations,
-        index_image_descriptors,
-        ransac_seed=ransac_seed,
-        descriptor_matching_threshold=descriptor_matching_threshold,
-        ransac_residual_threshold=ransac_residual_threshold,
-        use_ratio_test=use_ratio_test)
-
-  # Sort based on (inliers_score, initial_score).
-  def _InliersInitialScoresSorting(k):
-    """Helper function to sort list based on two entries.
-
-    Args:
-      k: Index into `inliers_and_initial_scores`.
-
-    Returns:
-      Tuple containing inlier score and initial score.
-    """
-    return (inliers_and_initial_scores[k][0], inliers_and_initial_scores[k][1])
-
-  output_ranks = sorted(
-      range(num_index_images), key=_InliersInitialScoresSorting, reverse=True)
-
-  return output_ranks
+  query_locations, query_descriptors = ReadLocalFeatures(
+      query_features_dir, query_name, local_feature_extension)
+  with GeometricVerificationReranker(
+      index_names,
+      index_features_dir,
+      local_feature_extension=local_feature_extension,
+      ransac_seed=ransac_seed,
+      descriptor_matching_threshold=descriptor_matching_threshold,
+      ransac_residual_threshold=ransac_residual_threshold,
+      use_ratio_test=use_ratio_test) as reranker:
+    return reranker.Rerank(input_ranks, initial_scores, query_locations,
+                           query_descriptors, junk_ids)
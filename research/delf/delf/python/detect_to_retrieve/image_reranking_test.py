@@ -0,0 +1,274 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for image re-ranking based on geometric verification."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+from unittest import mock
+
+from absl import flags
+from absl.testing import parameterized
+import numpy as np
+from scipy import spatial
+from skimage import measure
+import tensorflow as tf
+
+from delf import feature_io
+from delf.python.detect_to_retrieve import image_reranking
+
+FLAGS = flags.FLAGS
+
+_NUM_FEATURES = 200
+_DEPTH = 16
+_NUM_INDEX_IMAGES = 16
+
+
+def _WriteView(path, landmark_locations, landmark_descriptors, rng):
+  """Writes local features of a random view of a landmark."""
+  num_landmark_features = _NUM_FEATURES // 2
+  kept = rng.choice(
+      len(landmark_locations), num_landmark_features, replace=False)
+  affine = np.eye(2) + rng.uniform(-0.2, 0.2, [2, 2])
+  locations = np.concatenate([
+      landmark_locations[kept].dot(affine.T) +
+      rng.normal(0.0, 1.0, [num_landmark_features, 2]),
+      rng.uniform(0.0, 256.0, [_NUM_FEATURES - num_landmark_features, 2])
+  ])
+  descriptors = np.concatenate([
+      landmark_descriptors[kept] +
+      rng.normal(0.0, 0.03, [num_landmark_features, _DEPTH]),
+      rng.normal(size=[_NUM_FEATURES - num_landmark_features, _DEPTH])
+  ])
+  descriptors /= np.linalg.norm(descriptors, axis=1, keepdims=True)
+  feature_io.WriteToFile(path, locations.astype(np.float32),
+                         np.ones([_NUM_FEATURES], dtype=np.float32),
+                         descriptors.astype(np.float32),
+                         np.ones([_NUM_FEATURES], dtype=np.float32))
+
+
+def _WriteFeatures(features_dir):
+  """Writes features of views of 2 landmarks, and returns initial scores.
+
+  Even index images and the query are views of the first landmark, odd index
+  images of the second one.
+  """
+  rng = np.random.RandomState(0)
+  landmark_locations = rng.uniform(0.0, 256.0, [2, _NUM_FEATURES, 2])
+  landmark_descriptors = rng.normal(size=[2, _NUM_FEATURES, _DEPTH])
+  landmark_descriptors /= np.linalg.norm(
+      landmark_descriptors, axis=2, keepdims=True)
+
+  index_names = ['index_%d' % i for i in range(_NUM_INDEX_IMAGES)]
+  for i, name in enumerate(index_names):
+    _WriteView(
+        os.path.join(features_dir, name + '.delf'), landmark_locations[i % 2],
+        landmark_descriptors[i % 2], rng)
+  _WriteView(
+      os.path.join(features_dir, 'query.delf'), landmark_locations[0],
+      landmark_descriptors[0], rng)
+  initial_scores = rng.uniform(0.0, 1.0, _NUM_INDEX_IMAGES)
+  return index_names, initial_scores
+
+
+def _SelectWithListComprehensions(query_locations, query_descriptors,
+                                  index_image_locations,
+                                  index_image_descriptors,
+                                  descriptor_matching_threshold,
+                                  use_ratio_test):
+  """Selects putative matches as `MatchFeatures` used to, one at a time."""
+  num_features_query = query_locations.shape[0]
+  num_features_index_image = index_image_locations.shape[0]
+  index_image_tree = spatial.cKDTree(index_image_descriptors)
+  if use_ratio_test:
+    distances, indices = index_image_tree.query(query_descriptors, k=2)
+    query_locations_to_use = np.array([
+        query_locations[i,]
+        for i in range(num_features_query)
+        if distances[i][0] < descriptor_matching_threshold * distances[i][1]
+    ])
+    index_image_locations_to_use = np.array([
+        index_image_locations[indices[i][0],]
+        for i in range(num_features_query)
+        if distances[i][0] < descriptor_matching_threshold * distances[i][1]
+    ])
+  else:
+    _, indices = index_image_tree.query(
+        query_descriptors, distance_upper_bound=descriptor_matching_threshold)
+    query_locations_to_use = np.array([
+        query_locations[i,]
+        for i in range(num_features_query)
+        if indices[i] != num_features_index_image
+    ])
+    index_image_locations_to_use = np.array([
+        index_image_locations[indices[i],]
+        for i in range(num_features_query)
+        if indices[i] != num_features_index_image
+    ])
+  return index_image_locations_to_use, query_locations_to_use
+
+
+class ImageRerankingTest(tf.test.TestCase, parameterized.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super(ImageRerankingTest, cls).setUpClass()
+    cls._features_dir = os.path.join(FLAGS.test_tmpdir, 'features')
+    tf.io.gfile.makedirs(cls._features_dir)
+    cls._index_names, cls._initial_scores = _WriteFeatures(cls._features_dir)
+    cls._input_ranks = np.argsort(-cls._initial_scores)
+    cls._query_locations, cls._query_descriptors = (
+        image_reranking.ReadLocalFeatures(cls._features_dir, 'query'))
+
+  def _Rerank(self, junk_ids=frozenset(), **kwargs):
+    with image_reranking.GeometricVerificationReranker(
+        self._index_names, self._features_dir, ransac_seed=0,
+        **kwargs) as reranker:
+      return reranker.Rerank(self._input_ranks, self._initial_scores,
+                             self._query_locations, self._query_descriptors,
+                             junk_ids)
+
+  def _NumInliers(self, index_image_id):
+    locations, descriptors = image_reranking.ReadLocalFeatures(
+        self._features_dir, self._index_names[index_image_id])
+    num_inliers, _ = image_reranking.MatchFeatures(
+        self._query_locations,
+        self._query_descriptors,
+        locations,
+        descriptors,
+        ransac_seed=0)
+    return num_inliers
+
+  @parameterized.parameters(False, True)
+  def testMatchFeaturesSelectionMatchesListComprehensions(self,
+                                                          use_ratio_test):
+    # Construct inputs.
+    locations, descriptors = image_reranking.ReadLocalFeatures(
+        self._features_dir, self._index_names[0])
+    threshold = 0.8 if use_ratio_test else 0.9
+
+    # Run tested function, capturing the putative matches fed into RANSAC.
+    with mock.patch.object(
+        measure, 'ransac', wraps=measure.ransac) as ransac:
+      num_inliers, _ = image_reranking.MatchFeatures(
+          self._query_locations,
+          self._query_descriptors,
+          locations,
+          descriptors,
+          ransac_seed=0,
+          descriptor_matching_threshold=threshold,
+          use_ratio_test=use_ratio_test)
+
+    # Compare actual and expected results.
+    exp_index_locations, exp_query_locations = _SelectWithListComprehensions(
+        self._query_locations, self._query_descriptors, locations, descriptors,
+        threshold, use_ratio_test)
+    index_locations, query_locations = ransac.call_args[0][0]
+    self.assertGreater(len(exp_query_locations), 50)
+    self.assertAllEqual(index_locations, exp_index_locations)
+    self.assertAllEqual(query_locations, exp_query_locations)
+    self.assertGreater(num_inliers, 20)
+
+  def testRerankingPutsVerifiedImagesFirst(self):
+    output_ranks = self._Rerank()
+
+    # Views of the same landmark as the query are verified.
+    self.assertCountEqual(output_ranks[:_NUM_INDEX_IMAGES // 2],
+                          range(0, _NUM_INDEX_IMAGES, 2))
+
+  def testEarlyStopCutoff(self):
+    # Candidates are verified in the order of the input ranks until 4 of them
+    # have at least 20 inliers, and the others keep their initial scores.
+    num_inliers = [0] * _NUM_INDEX_IMAGES
+    num_verified = 0
+    num_matched = 0
+    for index_image_id in self._input_ranks:
+      num_inliers[index_image_id] = self._NumInliers(index_image_id)
+      num_matched += 1
+      if num_inliers[index_image_id] >= 20:
+        num_verified += 1
+        if num_verified == 4:
+          break
+    exp_ranks = image_reranking._SortByInliersAndInitialScores(
+        num_inliers, self._initial_scores)
+
+    with mock.patch.object(
+        image_reranking, 'MatchFeatures',
+        wraps=image_reranking.MatchFeatures) as match_features:
+      output_ranks = self._Rerank(
+          num_verified_to_stop=4, min_num_inliers=20, batch_size=1)
+
+    self.assertEqual(output_ranks, exp_ranks)
+    self.assertEqual(match_features.call_count, num_matched)
+    self.assertLess(num_matched, _NUM_INDEX_IMAGES)
+    # The cutoff changes the ranks, since other views are not verified.
+    self.assertNotEqual(output_ranks, self._Rerank())
+
+  @parameterized.parameters(None, 4)
+  def testRanksIndependentOfNumProcesses(self, num_verified_to_stop):
+    exp_ranks = self._Rerank(
+        junk_ids={2}, num_verified_to_stop=num_verified_to_stop)
+
+    output_ranks = self._Rerank(
+        junk_ids={2}, num_verified_to_stop=num_verified_to_stop,
+        num_processes=2)
+
+    self.assertEqual(output_ranks, exp_ranks)
+
+  def testCachedMatchesUncached(self):
+    exp_ranks = image_reranking.RerankByGeometricVerification(
+        self._input_ranks, self._initial_scores, 'query', self._index_names,
+        self._features_dir, self._features_dir, set(), ransac_seed=0)
+
+    with mock.patch.object(
+        feature_io, 'ReadFromFile',
+        wraps=feature_io.ReadFromFile) as read_from_file:
+      with image_reranking.GeometricVerificationReranker(
+          self._index_names, self._features_dir,
+          cache_size=_NUM_INDEX_IMAGES, ransac_seed=0) as reranker:
+        for _ in range(2):
+          output_ranks = reranker.Rerank(self._input_ranks,
+                                         self._initial_scores,
+                                         self._query_locations,
+                                         self._query_descriptors, set())
+          self.assertEqual(output_ranks, exp_ranks)
+
+    # Features are reused by the second query.
+    self.assertEqual(read_from_file.call_count, _NUM_INDEX_IMAGES)
+
+  def testIndexFeaturesCacheEvictsLeastRecentlyUsed(self):
+    cache = image_reranking._IndexFeaturesCache(
+        self._index_names, self._features_dir, '.delf', cache_size=2)
+
+    with mock.patch.object(
+        feature_io, 'ReadFromFile',
+        wraps=feature_io.ReadFromFile) as read_from_file:
+      for index_image_id in [0, 1, 0, 2, 0]:  # Evicts image 1.
+        cache.Get(index_image_id)
+      self.assertEqual(read_from_file.call_count, 3)
+      locations, descriptors, tree = cache.Get(1)
+      self.assertEqual(read_from_file.call_count, 4)
+
+    exp_locations, exp_descriptors = image_reranking.ReadLocalFeatures(
+        self._features_dir, self._index_names[1])
+    self.assertAllEqual(locations, exp_locations)
+    self.assertAllEqual(descriptors, exp_descriptors)
+    self.assertAllEqual(tree.data, exp_descriptors)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,107 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Packs aggregated descriptors of Revisited Oxford/Paris index images.
+
+The datum files of aggregated descriptors, one per image, are packed into a
+store which `perform_retrieval.py` memory-maps with `--index_store_dir`, instead
+of reading each of the files.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from absl import app
+import tensorflow as tf
+
+from google.protobuf import text_format
+from delf import aggregated_descriptor_store
+from delf import aggregation_config_pb2
+from delf.python.datasets.revisited_op import dataset
+
+cmd_args = None
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise RuntimeError('Too many command-line arguments.')
+
+  # Read list of images from dataset file.
+  print('Reading list of images from dataset file...')
+  query_list, index_list, _ = dataset.ReadDatasetFile(
+      cmd_args.dataset_file_path)
+  if cmd_args.use_query_images:
+    image_list = query_list
+  else:
+    image_list = index_list
+  print('done! Found %d images' % len(image_list))
+
+  config = aggregation_config_pb2.AggregationConfig()
+  with tf.io.gfile.GFile(cmd_args.aggregation_config_path, 'r') as f:
+    text_format.Merge(f.read(), config)
+
+  start = time.time()
+  aggregated_descriptor_store.PackDatumFiles(cmd_args.aggregation_dir,
+                                             image_list, config,
+                                             cmd_args.output_store_dir)
+  print('Packed descriptors of %d images in %f seconds' %
+        (len(image_list), time.time() - start))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.register('type', 'bool', lambda v: v.lower() == 'true')
+  parser.add_argument(
+      '--aggregation_config_path',
+      type=str,
+      default='/tmp/index_aggregation_config.pbtxt',
+      help="""
+      Path to AggregationConfig proto text file used to extract the aggregated
+      descriptors.
+      """)
+  parser.add_argument(
+      '--dataset_file_path',
+      type=str,
+      default='/tmp/gnd_roxford5k.mat',
+      help="""
+      Dataset file for Revisited Oxford or Paris dataset, in .mat format.
+      """)
+  parser.add_argument(
+      '--use_query_images',
+      type=lambda x: (str(x).lower() == 'true'),
+      default=False,
+      help="""
+      If True, packs descriptors of query images; otherwise, of index images.
+      """)
+  parser.add_argument(
+      '--aggregation_dir',
+      type=str,
+      default='/tmp/index_aggregation',
+      help="""
+      Directory where aggregated descriptors are located.
+      """)
+  parser.add_argument(
+      '--output_store_dir',
+      type=str,
+      default='/tmp/index_aggregation_store',
+      help="""
+      Local directory where the store of aggregated descriptors will be written.
+      """)
+  cmd_args, unparsed = parser.parse_known_args()
+  app.run(main=main, argv=[sys.argv[0]] + unparsed)
@@ -29,6 +29,7 @@ import numpy as np
 import tensorflow as tf
 
 from google.protobuf import text_format
+from delf import aggregated_descriptor_store
 from delf import aggregation_config_pb2
 from delf import datum_io
 from delf import feature_aggregation_similarity
@@ -42,11 +43,6 @@ _VLAD = aggregation_config_pb2.AggregationConfig.VLAD
 _ASMK = aggregation_config_pb2.AggregationConfig.ASMK
 _ASMK_STAR = aggregation_config_pb2.AggregationConfig.ASMK_STAR
 
-# Extensions.
-_VLAD_EXTENSION_SUFFIX = 'vlad'
-_ASMK_EXTENSION_SUFFIX = 'asmk'
-_ASMK_STAR_EXTENSION_SUFFIX = 'asmk_star'
-
 # Precision-recall ranks to use in metric computation.
 _PR_RANKS = (1, 5, 10)
 
@@ -71,18 +67,8 @@ def _ReadAggregatedDescriptors(input_dir, image_list, config):
     visual_words: If using VLAD aggregation, returns an empty list. Otherwise,
       returns a list containing #images items, each a 1D NumPy array.
   """
-  # Compose extension of aggregated descriptors.
-  extension = '.'
-  if config.use_regional_aggregation:
-    extension += 'r'
-  if config.aggregation_type == _VLAD:
-    extension += _VLAD_EXTENSION_SUFFIX
-  elif config.aggregation_type == _ASMK:
-    extension += _ASMK_EXTENSION_SUFFIX
-  elif config.aggregation_type == _ASMK_STAR:
-    extension += _ASMK_STAR_EXTENSION_SUFFIX
-  else:
-    raise ValueError('Invalid aggregation type: %d' % config.aggregation_type)
+  extension = aggregated_descriptor_store.AggregatedDescriptorsExtension(
+      config)
 
   num_images = len(image_list)
   aggregated_descriptors = []
@@ -138,49 +124,69 @@ def main(argv):
   # Read aggregated descriptors.
   query_aggregated_descriptors, query_visual_words = _ReadAggregatedDescriptors(
       cmd_args.query_aggregation_dir, query_list, query_config)
-  index_aggregated_descriptors, index_visual_words = _ReadAggregatedDescriptors(
-      cmd_args.index_aggregation_dir, index_list, index_config)
 
-  # Create similarity computer.
-  similarity_computer = (
-      feature_aggregation_similarity.SimilarityAggregatedRepresentation(
-          index_config))
+  # Create index, which computes similarities to all index images at once.
+  if cmd_args.index_store_dir:
+    store = aggregated_descriptor_store.AggregatedDescriptorStore(
+        cmd_args.index_store_dir)
+    if store.image_names != index_list:
+      raise ValueError('Images of store %s do not match the index images.' %
+                       cmd_args.index_store_dir)
+    index = (
+        feature_aggregation_similarity.AggregatedRepresentationIndex.FromStore(
+            index_config, store))
+  else:
+    index_aggregated_descriptors, index_visual_words = (
+        _ReadAggregatedDescriptors(cmd_args.index_aggregation_dir, index_list,
+                                   index_config))
+    index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+        index_config, index_aggregated_descriptors, index_visual_words)
 
   # Compute similarity between query and index images, potentially re-ranking
   # with geometric verification.
   ranks_before_gv = np.zeros([num_query_images, num_index_images],
                              dtype='int32')
+  reranker = None
   if cmd_args.use_geometric_verification:
     medium_ranks_after_gv = np.zeros([num_query_images, num_index_images],
                                      dtype='int32')
     hard_ranks_after_gv = np.zeros([num_query_images, num_index_images],
                                    dtype='int32')
-  for i in range(num_query_images):
-    print('Performing retrieval with query %d (%s)...' % (i, query_list[i]))
-    start = time.clock()
-
-    # Compute similarity between aggregated descriptors.
-    similarities = np.zeros([num_index_images])
-    for j in range(num_index_images):
-      similarities[j] = similarity_computer.ComputeSimilarity(
-          query_aggregated_descriptors[i], index_aggregated_descriptors[j],
-          query_visual_words[i], index_visual_words[j])
-
-    ranks_before_gv[i] = np.argsort(-similarities)
-
-    # Re-rank using geometric verification.
-    if cmd_args.use_geometric_verification:
-      medium_ranks_after_gv[i] = image_reranking.RerankByGeometricVerification(
-          ranks_before_gv[i], similarities, query_list[i], index_list,
-          cmd_args.query_features_dir, cmd_args.index_features_dir,
-          set(medium_ground_truth[i]['junk']))
-      hard_ranks_after_gv[i] = image_reranking.RerankByGeometricVerification(
-          ranks_before_gv[i], similarities, query_list[i], index_list,
-          cmd_args.query_features_dir, cmd_args.index_features_dir,
-          set(hard_ground_truth[i]['junk']))
-
-    elapsed = (time.clock() - start)
-    print('done! Retrieval for query %d took %f seconds' % (i, elapsed))
+    reranker = image_reranking.GeometricVerificationReranker(
+        index_list,
+        cmd_args.index_features_dir,
+        cache_size=cmd_args.reranking_cache_size,
+        num_processes=cmd_args.num_reranking_processes,
+        num_verified_to_stop=cmd_args.num_verified_to_stop or None)
+  try:
+    for i in range(num_query_images):
+      print('Performing retrieval with query %d (%s)...' % (i, query_list[i]))
+      start = time.clock()
+
+      # Compute similarity between aggregated descriptors.
+      similarities = index.ComputeSimilarities(
+          query_aggregated_descriptors[i],
+          query_visual_words[i] if query_visual_words else None)
+
+      ranks_before_gv[i] = np.argsort(-similarities)
+
+      # Re-rank using geometric verification.
+      if cmd_args.use_geometric_verification:
+        query_locations, query_descriptors = image_reranking.ReadLocalFeatures(
+            cmd_args.query_features_dir, query_list[i])
+        medium_ranks_after_gv[i] = reranker.Rerank(
+            ranks_before_gv[i], similarities, query_locations,
+            query_descriptors, set(medium_ground_truth[i]['junk']))
+        hard_ranks_after_gv[i] = reranker.Rerank(
+            ranks_before_gv[i], similarities, query_locations,
+            query_descriptors, set(hard_ground_truth[i]['junk']))
+
+      elapsed = (time.clock() - start)
+      print('done! Retrieval for query %d took %f seconds' % (i, elapsed))
+  finally:
+    # Stops the worker processes of the reranker, even if retrieval failed.
+    if reranker is not None:
+      reranker.Close()
 
   # Create output directory if necessary.
   if not tf.io.gfile.exists(cmd_args.output_dir):
@@ -257,6 +263,15 @@ if __name__ == '__main__':
       help="""
       Directory where index aggregated descriptors are located.
       """)
+  parser.add_argument(
+      '--index_store_dir',
+      type=str,
+      default='',
+      help="""
+      If set, directory of the store of index aggregated descriptors, written by
+      `pack_aggregated_descriptors.py`, which is memory-mapped instead of
+      reading `index_aggregation_dir`.
+      """)
   parser.add_argument(
       '--query_aggregation_dir',
       type=str,
@@ -290,6 +305,34 @@ if __name__ == '__main__':
       Directory where query local image features are located, all in .delf
       format.
       """)
+  parser.add_argument(
+      '--num_reranking_processes',
+      type=int,
+      default=0,
+      help="""
+      Only used if `use_geometric_verification` is True.
+      Number of worker processes verifying re-ranking candidates. If 0, they are
+      verified in the main process.
+      """)
+  parser.add_argument(
+      '--reranking_cache_size',
+      type=int,
+      default=200,
+      help="""
+      Only used if `use_geometric_verification` is True.
+      Number of index images whose local features are cached across queries, in
+      each worker process if `num_reranking_processes` is positive.
+      """)
+  parser.add_argument(
+      '--num_verified_to_stop',
+      type=int,
+      default=0,
+      help="""
+      Only used if `use_geometric_verification` is True.
+      If positive, re-ranking of a query stops once this number of candidates
+      is geometrically verified. Otherwise, all top-ranked candidates are
+      verified.
+      """)
   parser.add_argument(
       '--output_dir',
       type=str,
@@ -159,9 +159,7 @@ class SimilarityAggregatedRepresentation(object):
           'Descriptors have incompatible dimensionality: %d vs %d' %
           (len(descriptors_1), len(descriptors_2)))
 
-    h = 0
-    for i in range(num_descriptors):
-      h += self._number_bits[np.bitwise_xor(descriptors_1[i], descriptors_2[i])]
+    h = np.sum(self._number_bits[np.bitwise_xor(descriptors_1, descriptors_2)])
 
     # If local feature dimensionality is lower than 8, then use that to compute
     # proper binarized inner product.
@@ -263,3 +261,356 @@ class SimilarityAggregatedRepresentation(object):
       final_similarity /= np.sqrt(num_visual_words_1 * num_visual_words_2)
 
     return final_similarity
+
+
+def _Concatenate(arrays):
+  """Concatenates 1-D arrays.
+
+  Args:
+    arrays: List of 1-D NumPy arrays.
+
+  Returns:
+    concatenated: 1-D NumPy array.
+    offsets: 1-D NumPy integer array of the len(arrays) + 1 offsets of arrays in
+      `concatenated`.
+  """
+  offsets = np.cumsum([0] + [len(a) for a in arrays])
+  if not arrays:
+    return np.zeros([0]), offsets
+  return np.concatenate([np.asarray(a) for a in arrays]), offsets
+
+
+def _PopCount64(x):
+  """Counts the bits set in each element of a uint64 NumPy array.
+
+  Args:
+    x: NumPy uint64 array.
+
+  Returns:
+    count: NumPy uint64 array of the same shape, with the number of bits set.
+  """
+  x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+  x = ((x & np.uint64(0x3333333333333333)) +
+       ((x >> np.uint64(2)) & np.uint64(0x3333333333333333)))
+  x = (x + (x >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+  return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+class AggregatedRepresentationIndex(object):
+  """Index scoring a query against all of its aggregated representations.
+
+  This computes the same similarities as `SimilarityAggregatedRepresentation`,
+  for all index images at once. For VLAD, the index descriptors are stacked
+  into a matrix. For ASMK/ASMK*, they are stored in an inverted file, sorted by
+  visual word, so that only the descriptors of the visual words of the query
+  are compared to it. ASMK* binarized residuals are packed into uint64 words,
+  and compared with vectorized XOR and popcount.
+
+  Args:
+    aggregation_config: AggregationConfig object defining type of aggregation to
+      use.
+    aggregated_descriptors: List of 1-D NumPy arrays, one per index image.
+    visual_words: Used only for ASMK/ASMK* aggregation type. List of 1-D sorted
+      NumPy integer arrays, one per index image, denoting visual words
+      corresponding to `aggregated_descriptors`.
+
+  Raises:
+    ValueError: If aggregation type is invalid, or if descriptor dimensionality
+      or type is inconsistent.
+  """
+
+  def __init__(self, aggregation_config, aggregated_descriptors,
+               visual_words=None):
+    aggregated_descriptors = list(aggregated_descriptors)
+    if visual_words is None:
+      visual_words = [[]] * len(aggregated_descriptors)
+    self._Initialize(aggregation_config, *_Concatenate(aggregated_descriptors),
+                     *_Concatenate(visual_words))
+
+  @classmethod
+  def FromStore(cls, aggregation_config, store):
+    """Creates an index of the images of an `AggregatedDescriptorStore`.
+
+    The index uses the memory-mapped inverted file of the store, which is
+    already sorted by visual word. ASMK* descriptors are only copied if their
+    number of bytes per visual word is not a multiple of 8.
+
+    Args:
+      aggregation_config: AggregationConfig object defining type of aggregation
+        to use.
+      store: AggregatedDescriptorStore with the descriptors of index images.
+
+    Returns:
+      index: AggregatedRepresentationIndex.
+    """
+    index = cls.__new__(cls)
+    # pylint: disable=protected-access
+    index._Initialize(
+        aggregation_config,
+        store.descriptors,
+        store.descriptor_offsets,
+        store.visual_words,
+        store.visual_word_offsets,
+        inverted_file=(store.inverted_descriptors, store.inverted_image_ids,
+                       store.inverted_visual_words,
+                       store.inverted_visual_word_offsets))
+    # pylint: enable=protected-access
+    return index
+
+  def _Initialize(self,
+                  aggregation_config,
+                  descriptors,
+                  descriptor_offsets,
+                  visual_words,
+                  visual_word_offsets,
+                  inverted_file=None):
+    """Builds the index from concatenated descriptors of all images.
+
+    Args:
+      aggregation_config: AggregationConfig object defining type of aggregation
+        to use.
+      descriptors: 1-D NumPy array of the concatenated aggregated descriptors.
+      descriptor_offsets: 1-D NumPy integer array of the #images + 1 offsets of
+        images in `descriptors`.
+      visual_words: 1-D NumPy integer array of the concatenated visual words.
+      visual_word_offsets: 1-D NumPy integer array of the #images + 1 offsets of
+        images in `visual_words`.
+      inverted_file: Optional inverted file of ASMK/ASMK* descriptors, as
+        written by `AggregatedDescriptorStoreWriter`. If None, it is built by
+        sorting the descriptors by visual word.
+
+    Raises:
+      ValueError: If aggregation type is invalid, or if descriptor
+        dimensionality or type is inconsistent.
+    """
+    self._similarity_computer = SimilarityAggregatedRepresentation(
+        aggregation_config)
+    self._feature_dimensionality = aggregation_config.feature_dimensionality
+    self._aggregation_type = aggregation_config.aggregation_type
+    self._use_l2_normalization = aggregation_config.use_l2_normalization
+    self._num_images = len(descriptor_offsets) - 1
+
+    if self._aggregation_type == _VLAD:
+      self._descriptors = np.reshape(descriptors, [self._num_images, -1])
+    elif self._aggregation_type in (_ASMK, _ASMK_STAR):
+      self._BuildInvertedFile(descriptors, descriptor_offsets, visual_words,
+                              visual_word_offsets, inverted_file)
+    else:
+      raise ValueError('Invalid aggregation type: %d' % self._aggregation_type)
+
+  @property
+  def num_images(self):
+    return self._num_images
+
+  def _PackBinarized(self, descriptors):
+    """Packs rows of binarized residual bytes into uint64 words.
+
+    Args:
+      descriptors: 2-D NumPy uint8 array, with `self._num_bytes` columns.
+
+    Returns:
+      packed_descriptors: 2-D NumPy uint64 array, a view of `descriptors` if
+        its number of columns is a multiple of 8.
+    """
+    if descriptors.shape[1] == 8 * self._num_words64:
+      return np.ascontiguousarray(descriptors).view(np.uint64)
+    packed_descriptors = np.zeros(
+        [len(descriptors), 8 * self._num_words64], dtype=np.uint8)
+    packed_descriptors[:, :self._num_bytes] = descriptors
+    return packed_descriptors.view(np.uint64)
+
+  def _PerVisualWordDescriptors(self, aggregated_descriptors, visual_words,
+                                descriptor_name):
+    """Reshapes aggregated descriptors to one row per visual word.
+
+    Args:
+      aggregated_descriptors: 1-D NumPy array.
+      visual_words: 1-D NumPy integer array.
+      descriptor_name: String.
+
+    Returns:
+      descriptors: 2-D NumPy array with one row per visual word. For ASMK*, the
+        binarized residuals are packed into uint64 words.
+
+    Raises:
+      ValueError: If descriptor dimensionality or type is incorrect.
+    """
+    num_visual_words = len(visual_words)
+    if self._aggregation_type == _ASMK:
+      self._similarity_computer._CheckAsmkDimensionality(  # pylint: disable=protected-access
+          aggregated_descriptors, num_visual_words, descriptor_name)
+      return np.reshape(aggregated_descriptors,
+                        [num_visual_words, self._feature_dimensionality])
+
+    if aggregated_descriptors.dtype != 'uint8':
+      raise ValueError('Incorrect input descriptor type: %s' %
+                       aggregated_descriptors.dtype)
+    if len(aggregated_descriptors) != num_visual_words * self._num_bytes:
+      raise ValueError('ASMK* dimensionality is inconsistent.')
+    return self._PackBinarized(
+        np.reshape(aggregated_descriptors, [num_visual_words, self._num_bytes]))
+
+  def _BuildInvertedFile(self,
+                         descriptors,
+                         descriptor_offsets,
+                         visual_words,
+                         visual_word_offsets,
+                         inverted_file=None):
+    """Builds the inverted file of ASMK/ASMK* descriptors.
+
+    Args:
+      descriptors: 1-D NumPy array of the concatenated aggregated descriptors.
+      descriptor_offsets: 1-D NumPy integer array of the #images + 1 offsets of
+        images in `descriptors`.
+      visual_words: 1-D NumPy integer array of the concatenated visual words.
+      visual_word_offsets: 1-D NumPy integer array of the #images + 1 offsets of
+        images in `visual_words`.
+      inverted_file: Optional tuple of the rows of descriptor values sorted by
+        visual word then image, the image id of each row, the sorted distinct
+        visual words, and their #distinct visual words + 1 offsets in the rows.
+        If None, it is built by sorting `descriptors`.
+
+    Raises:
+      ValueError: If descriptor dimensionality or type is inconsistent.
+    """
+    self._num_visual_words = np.diff(visual_word_offsets).astype(np.int64)
+    num_values = np.diff(descriptor_offsets)
+    if self._aggregation_type == _ASMK:
+      per_visual_word_dimensionality = self._feature_dimensionality
+    else:
+      if descriptors.dtype != 'uint8':
+        raise ValueError('Incorrect input descriptor type: %s' %
+                         descriptors.dtype)
+      # Bytes of binarized residuals per visual word, which are the same for all
+      # images. If local feature dimensionality is lower than 8, then use that
+      # to compute proper binarized inner product.
+      with_visual_words = np.flatnonzero(self._num_visual_words)
+      self._num_bytes = 0
+      if len(with_visual_words):
+        first = with_visual_words[0]
+        self._num_bytes = int(num_values[first] //
+                              self._num_visual_words[first])
+      self._num_words64 = -(-self._num_bytes // 8)
+      self._total_num_bits = (
+          min(self._feature_dimensionality, 8) * self._num_bytes)
+      per_visual_word_dimensionality = self._num_bytes
+
+    invalid = np.flatnonzero(
+        num_values != self._num_visual_words * per_visual_word_dimensionality)
+    if len(invalid):
+      raise ValueError(
+          'Dimensionality of aggregated descriptor %d is inconsistent: %d '
+          'values for %d visual words.' %
+          (invalid[0], num_values[invalid[0]],
+           self._num_visual_words[invalid[0]]))
+
+    if inverted_file is None:
+      descriptors = np.reshape(descriptors,
+                               [-1, max(per_visual_word_dimensionality, 1)])
+      image_ids = np.repeat(np.arange(self._num_images), self._num_visual_words)
+      order = np.argsort(visual_words, kind='stable')
+
+      # Postings sorted by visual word, then by image.
+      sorted_visual_words = visual_words[order]
+      unique_visual_words, starts = np.unique(
+          sorted_visual_words, return_index=True)
+      inverted_file = (descriptors[order], image_ids[order],
+                       unique_visual_words,
+                       np.append(starts, len(sorted_visual_words)))
+
+    (self._descriptors, self._image_ids, self._visual_words,
+     visual_word_offsets) = inverted_file
+    if self._aggregation_type == _ASMK_STAR:
+      self._descriptors = self._PackBinarized(self._descriptors)
+    self._visual_word_starts = visual_word_offsets[:-1]
+    self._visual_word_ends = visual_word_offsets[1:]
+
+  def ComputeSimilarities(self, aggregated_descriptors, visual_words=None):
+    """Computes the similarities of a query to all index images.
+
+    Args:
+      aggregated_descriptors: 1-D NumPy array of the query.
+      visual_words: Used only for ASMK/ASMK* aggregation type. 1-D sorted NumPy
+        integer array denoting visual words corresponding to
+        `aggregated_descriptors`.
+
+    Returns:
+      similarities: 1-D NumPy float array with one similarity per index image.
+        The larger, the more similar.
+
+    Raises:
+      ValueError: If the query descriptor dimensionality or type is incorrect.
+    """
+    if self._aggregation_type == _VLAD:
+      return np.dot(self._descriptors, aggregated_descriptors)
+
+    similarities = np.full([self._num_images], -1.0)
+    num_query_visual_words = len(visual_words)
+    if not num_query_visual_words:
+      return similarities
+    query_descriptors = self._PerVisualWordDescriptors(aggregated_descriptors,
+                                                       visual_words, 'query')
+
+    # Postings of the visual words of the query.
+    positions = np.searchsorted(self._visual_words, visual_words)
+    positions = np.minimum(positions, max(len(self._visual_words) - 1, 0))
+    found = np.zeros([num_query_visual_words], dtype=bool)
+    if len(self._visual_words):
+      found = self._visual_words[positions] == visual_words
+    query_rows = np.flatnonzero(found)
+    starts = self._visual_word_starts[positions[query_rows]]
+    lengths = self._visual_word_ends[positions[query_rows]] - starts
+    query_rows = np.repeat(query_rows, lengths)
+    postings = (
+        np.repeat(starts - np.cumsum(lengths) + lengths, lengths) +
+        np.arange(len(query_rows)))
+
+    index_descriptors = self._descriptors[postings]
+    query_descriptors = query_descriptors[query_rows]
+    if self._aggregation_type == _ASMK:
+      inner_products = np.einsum('ij,ij->i', index_descriptors,
+                                 query_descriptors)
+    else:
+      hamming_distances = np.sum(
+          _PopCount64(np.bitwise_xor(index_descriptors, query_descriptors)),
+          axis=1)
+      inner_products = (
+          1.0 - 2.0 * hamming_distances.astype(np.float64) /
+          self._total_num_bits)
+    unnormalized_similarities = np.bincount(
+        self._image_ids[postings],
+        weights=self._similarity_computer._SigmaFn(inner_products),  # pylint: disable=protected-access
+        minlength=self._num_images)
+
+    has_visual_words = self._num_visual_words > 0
+    similarities[has_visual_words] = unnormalized_similarities[has_visual_words]
+    if self._use_l2_normalization:
+      similarities[has_visual_words] /= np.sqrt(
+          num_query_visual_words * self._num_visual_words[has_visual_words])
+    return similarities
+
+  def ComputeTopK(self, aggregated_descriptors, visual_words=None, k=100):
+    """Retrieves the index images most similar to a query.
+
+    Args:
+      aggregated_descriptors: 1-D NumPy array of the query.
+      visual_words: Used only for ASMK/ASMK* aggregation type. 1-D sorted NumPy
+        integer array denoting visual words corresponding to
+        `aggregated_descriptors`.
+      k: Integer, the number of index images to return.
+
+    Returns:
+      indices: 1-D NumPy integer array of the indices of the (up to) `k` most
+        similar index images, by decreasing similarity. Ties are returned in
+        arbitrary order.
+      similarities: 1-D NumPy float array of their similarities.
+    """
+    similarities = self.ComputeSimilarities(aggregated_descriptors,
+                                            visual_words)
+    k = min(k, self._num_images)
+    if k < self._num_images:
+      indices = np.argpartition(-similarities, k - 1)[:k]
+    else:
+      indices = np.arange(self._num_images)
+    indices = indices[np.argsort(-similarities[indices], kind='stable')]
+    return indices, similarities[indices]
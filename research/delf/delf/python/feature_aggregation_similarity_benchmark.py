@@ -0,0 +1,122 @@
+# Copyright 2024 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks ASMK/ASMK* similarity computation on synthetic descriptors.
+
+Compares scoring queries against an index one pair at a time with
+`SimilarityAggregatedRepresentation`, to scoring them against the whole index
+at once with `AggregatedRepresentationIndex`.
+
+Example usage:
+  python feature_aggregation_similarity_benchmark.py \
+    --num_index_images=10000 --num_pairwise_index_images=1000
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from delf import aggregation_config_pb2
+from delf import feature_aggregation_similarity
+
+FLAGS = flags.FLAGS
+
+flags.DEFINE_integer('codebook_size', 65536, 'Number of visual words.')
+flags.DEFINE_integer('feature_dimensionality', 128,
+                     'Dimensionality of local features.')
+flags.DEFINE_integer('num_visual_words_per_image', 500,
+                     'Number of visual words of each image.')
+flags.DEFINE_integer('num_index_images', 10000, 'Number of index images.')
+flags.DEFINE_integer(
+    'num_pairwise_index_images', 1000,
+    'Number of index images to score one pair at a time, the time of which is '
+    'extrapolated to the whole index.')
+flags.DEFINE_integer('num_queries', 5, 'Number of queries.')
+
+
+def _RandomAggregatedDescriptors(aggregation_type, num_images, rng):
+  """Generates random aggregated descriptors and visual words."""
+  aggregated_descriptors = []
+  visual_words = []
+  for _ in range(num_images):
+    v = np.sort(
+        rng.choice(
+            FLAGS.codebook_size, FLAGS.num_visual_words_per_image,
+            replace=False))
+    d = rng.randn(FLAGS.num_visual_words_per_image,
+                  FLAGS.feature_dimensionality).astype(np.float32)
+    d /= np.linalg.norm(d, axis=1, keepdims=True)
+    if aggregation_type == aggregation_config_pb2.AggregationConfig.ASMK_STAR:
+      d = np.packbits(d > 0, axis=1)
+    aggregated_descriptors.append(np.reshape(d, [-1]))
+    visual_words.append(v)
+  return aggregated_descriptors, visual_words
+
+
+def _Benchmark(aggregation_type, name):
+  """Prints the time to score queries pairwise and with an index."""
+  rng = np.random.RandomState(0)
+  config = aggregation_config_pb2.AggregationConfig()
+  config.codebook_size = FLAGS.codebook_size
+  config.feature_dimensionality = FLAGS.feature_dimensionality
+  config.aggregation_type = aggregation_type
+  config.use_l2_normalization = True
+  config.alpha = 3.0
+  config.tau = 0.0
+  index_descriptors, index_visual_words = _RandomAggregatedDescriptors(
+      aggregation_type, FLAGS.num_index_images, rng)
+  query_descriptors, query_visual_words = _RandomAggregatedDescriptors(
+      aggregation_type, FLAGS.num_queries, rng)
+
+  similarity_computer = (
+      feature_aggregation_similarity.SimilarityAggregatedRepresentation(config))
+  num_pairwise = min(FLAGS.num_pairwise_index_images, FLAGS.num_index_images)
+  start = time.time()
+  for d, v in zip(query_descriptors, query_visual_words):
+    for j in range(num_pairwise):
+      similarity_computer.ComputeSimilarity(d, index_descriptors[j], v,
+                                            index_visual_words[j])
+  pairwise_time = ((time.time() - start) * FLAGS.num_index_images /
+                   num_pairwise / FLAGS.num_queries)
+
+  start = time.time()
+  index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+      config, index_descriptors, index_visual_words)
+  build_time = time.time() - start
+  start = time.time()
+  for d, v in zip(query_descriptors, query_visual_words):
+    index.ComputeTopK(d, v, k=100)
+  index_time = (time.time() - start) / FLAGS.num_queries
+
+  print('%-6s pairwise: %8.3f s/query (extrapolated), index: %8.3f s/query '
+        '(%.1fx), index built in %.1f s' %
+        (name, pairwise_time, index_time, pairwise_time / index_time,
+         build_time))
+
+
+def main(argv):
+  if len(argv) > 1:
+    raise RuntimeError('Too many command-line arguments.')
+  _Benchmark(aggregation_config_pb2.AggregationConfig.ASMK, 'ASMK')
+  _Benchmark(aggregation_config_pb2.AggregationConfig.ASMK_STAR, 'ASMK*')
+
+
+if __name__ == '__main__':
+  app.run(main)
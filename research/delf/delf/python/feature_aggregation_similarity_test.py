@@ -18,6 +18,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from absl.testing import parameterized
 import numpy as np
 import tensorflow as tf
 
@@ -25,7 +26,30 @@ from delf import aggregation_config_pb2
 from delf import feature_aggregation_similarity
 
 
-class FeatureAggregationSimilarityTest(tf.test.TestCase):
+def _RandomAggregatedDescriptors(aggregation_type, num_images, codebook_size,
+                                 feature_dimensionality, seed):
+  """Generates random aggregated descriptors and visual words."""
+  rng = np.random.RandomState(seed)
+  aggregated_descriptors = []
+  visual_words = []
+  for i in range(num_images):
+    # The first image has no visual words.
+    num_visual_words = 0 if i == 0 else rng.randint(1, codebook_size // 2)
+    v = np.sort(
+        rng.choice(codebook_size, num_visual_words, replace=False))
+    d = rng.randn(num_visual_words, feature_dimensionality)
+    d /= np.linalg.norm(d, axis=1, keepdims=True)
+    if aggregation_type == aggregation_config_pb2.AggregationConfig.ASMK_STAR:
+      d = np.packbits(d > 0, axis=1)
+    elif aggregation_type == aggregation_config_pb2.AggregationConfig.VLAD:
+      d = rng.randn(codebook_size, feature_dimensionality)
+    aggregated_descriptors.append(np.reshape(d, [-1]))
+    visual_words.append(v)
+  return aggregated_descriptors, visual_words
+
+
+class FeatureAggregationSimilarityTest(tf.test.TestCase,
+                                       parameterized.TestCase):
 
   def testComputeVladSimilarityWorks(self):
     # Construct inputs.
@@ -132,6 +156,60 @@ class FeatureAggregationSimilarityTest(tf.test.TestCase):
     # Compare actual and expected results.
     self.assertAllClose(similarity, exp_similarity)
 
+  @parameterized.parameters(
+      (aggregation_config_pb2.AggregationConfig.VLAD, 8, True),
+      (aggregation_config_pb2.AggregationConfig.ASMK, 8, True),
+      (aggregation_config_pb2.AggregationConfig.ASMK, 8, False),
+      (aggregation_config_pb2.AggregationConfig.ASMK_STAR, 4, True),
+      (aggregation_config_pb2.AggregationConfig.ASMK_STAR, 80, True),
+      (aggregation_config_pb2.AggregationConfig.ASMK_STAR, 80, False),
+  )
+  def testIndexSimilaritiesMatchPairwiseSimilarities(
+      self, aggregation_type, feature_dimensionality, use_l2_normalization):
+    # Construct inputs.
+    config = aggregation_config_pb2.AggregationConfig()
+    config.codebook_size = 20
+    config.feature_dimensionality = feature_dimensionality
+    config.aggregation_type = aggregation_type
+    config.use_l2_normalization = use_l2_normalization
+    config.alpha = 3.0
+    config.tau = 0.0
+    index_descriptors, index_visual_words = _RandomAggregatedDescriptors(
+        aggregation_type, 30, config.codebook_size, feature_dimensionality, 0)
+    query_descriptors, query_visual_words = _RandomAggregatedDescriptors(
+        aggregation_type, 3, config.codebook_size, feature_dimensionality, 1)
+
+    # Run tested function.
+    similarity_computer = (
+        feature_aggregation_similarity.SimilarityAggregatedRepresentation(
+            config))
+    index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+        config, index_descriptors, index_visual_words)
+
+    # Compare with similarities computed one pair at a time.
+    for d, v in zip(query_descriptors, query_visual_words):
+      similarities = index.ComputeSimilarities(d, v)
+      exp_similarities = [
+          similarity_computer.ComputeSimilarity(d, index_d, v, index_v)
+          for index_d, index_v in zip(index_descriptors, index_visual_words)
+      ]
+      self.assertAllClose(similarities, exp_similarities)
+
+      indices, top_similarities = index.ComputeTopK(d, v, k=5)
+      self.assertAllClose(top_similarities, np.sort(similarities)[::-1][:5])
+      self.assertAllClose(similarities[indices], top_similarities)
+
+  def testIndexAsmkStarRaisesOnInconsistentDimensionality(self):
+    config = aggregation_config_pb2.AggregationConfig()
+    config.feature_dimensionality = 16
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+    index = feature_aggregation_similarity.AggregatedRepresentationIndex(
+        config, [np.array([1, 2, 3, 4], dtype='uint8')], [np.array([0, 1])])
+
+    with self.assertRaisesRegex(ValueError, 'dimensionality is inconsistent'):
+      index.ComputeSimilarities(
+          np.array([1, 2, 3], dtype='uint8'), np.array([0]))
+
 
 if __name__ == '__main__':
   tf.test.main()
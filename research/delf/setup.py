@@ -21,7 +21,8 @@ install_requires = [
     'protobuf >= 3.8.0',
     'pandas >= 0.24.2',
     'numpy >= 1.16.1',
-    'scipy >= 1.2.2',
+    'scipy >= 1.6.0',
+    'scikit-image >= 0.19',
     'tensorflow >= 2.2.0',
     'tf_slim >= 1.1',
     'tensorflow_probability >= 0.9.0',
@@ -18,11 +18,14 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import copy
 import os
 import re
+import threading
 import time
 
 import numpy as np
+from six.moves import queue
 from six.moves import range
 import tensorflow.compat.v1 as tf
 
@@ -1130,6 +1133,180 @@ def get_evaluators(eval_config, categories, evaluator_options=None):
   return evaluators_list
 
 
+class EvaluatorPool(object):
+  """Feeds evaluation results to evaluators on a pool of worker threads.
+
+  `EvaluatorPool` exposes the `add_eval_dict` and `evaluate` methods of the
+  `DetectionEvaluator`s it wraps, so that the host-side metric computation of
+  an eager evaluation loop runs concurrently with model inference. Each eval
+  dict is converted to numpy once, on the calling thread, then put on the
+  bounded queues of the workers.
+
+  Evaluators implementing `get_internal_state` and `merge_internal_state`,
+  such as the COCO and Pascal evaluators, are sharded across the workers: each
+  eval dict is added to a new copy of the evaluator on one worker, in turn, and
+  the per-image states of these copies are merged into the evaluator in the
+  order the eval dicts were added. Any other evaluator is only ever accessed by
+  a single worker, which adds all eval dicts to it in order. Either way, the
+  metrics match a serial evaluation. `evaluate` waits for the queues to drain
+  and merges the metrics of all evaluators, in the order of `evaluators`.
+
+  Note that the workers are threads, so sharding only speeds up the parts of
+  the evaluators that release the GIL, e.g. in numpy.
+  """
+
+  _STOP = object()
+
+  def __init__(self, evaluators, num_workers=1, max_queue_size=8):
+    """Constructor.
+
+    Args:
+      evaluators: A list of `DetectionEvaluator`s, e.g. from `get_evaluators`,
+        which have not observed any images yet.
+      num_workers: The number of worker threads. Unless an evaluator can be
+        sharded, at most one worker is started per evaluator.
+      max_queue_size: The maximum number of eval dicts waiting in the queue of
+        each worker. `add_eval_dict` blocks when a queue is full.
+
+    Raises:
+      ValueError: if `num_workers` or `max_queue_size` is not positive.
+    """
+    if num_workers < 1:
+      raise ValueError('num_workers should be positive, got {}.'.format(
+          num_workers))
+    if max_queue_size < 1:
+      raise ValueError('max_queue_size should be positive, got {}.'.format(
+          max_queue_size))
+    self._evaluators = list(evaluators)
+    # Empty copies of the sharded evaluators, copied for each eval dict.
+    self._shard_templates = {
+        index: copy.deepcopy(evaluator)
+        for index, evaluator in enumerate(self._evaluators)
+        if hasattr(evaluator, 'get_internal_state') and
+        hasattr(evaluator, 'merge_internal_state')
+    }
+    unsharded_indices = [index for index in range(len(self._evaluators))
+                         if index not in self._shard_templates]
+    if not self._shard_templates and num_workers > len(unsharded_indices):
+      tf.logging.warning(
+          'Using %d evaluator workers instead of %d, since none of the '
+          'evaluators can be sharded.', max(len(unsharded_indices), 1),
+          num_workers)
+      num_workers = max(len(unsharded_indices), 1)
+    self._num_workers = num_workers
+    self._num_added = 0
+    # Shard states waiting for the states of earlier eval dicts to be merged.
+    self._pending_states = {index: {} for index in self._shard_templates}
+    self._num_merged = {index: 0 for index in self._shard_templates}
+    self._merge_lock = threading.Lock()
+    self._metrics = [None] * len(self._evaluators)
+    self._errors = []
+    self._queues = [queue.Queue(maxsize=max_queue_size)
+                    for _ in range(num_workers)]
+    self._worker_evaluator_indices = [
+        unsharded_indices[worker::num_workers] for worker in range(num_workers)
+    ]
+    self._threads = []
+    for worker, worker_queue in enumerate(self._queues):
+      thread = threading.Thread(
+          target=self._run_worker,
+          args=(worker, worker_queue),
+          name='evaluator_pool_{}'.format(worker))
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def _run_worker(self, worker, worker_queue):
+    """Adds eval dicts to the evaluators of a worker until stopped."""
+    evaluator_indices = self._worker_evaluator_indices[worker]
+    failed = False
+    while True:
+      item = worker_queue.get()
+      if item is self._STOP:
+        break
+      if failed:
+        # Keeps draining the queue so that `add_eval_dict` does not block.
+        continue
+      eval_dict_index, eval_dict = item
+      try:
+        eval_dict = {key: tf.convert_to_tensor(value)
+                     for key, value in eval_dict.items()}
+        for index in evaluator_indices:
+          self._evaluators[index].add_eval_dict(eval_dict)
+        if eval_dict_index % self._num_workers == worker:
+          for index, template in self._shard_templates.items():
+            shard_evaluator = copy.deepcopy(template)
+            shard_evaluator.add_eval_dict(eval_dict)
+            self._merge_shard_state(index, eval_dict_index,
+                                    shard_evaluator.get_internal_state())
+      except Exception as exc:  # pylint:disable=broad-except
+        self._errors.append(exc)
+        failed = True
+    if failed:
+      return
+    try:
+      for index in evaluator_indices:
+        self._metrics[index] = self._evaluators[index].evaluate()
+    except Exception as exc:  # pylint:disable=broad-except
+      self._errors.append(exc)
+
+  def _merge_shard_state(self, index, eval_dict_index, shard_state):
+    """Merges the shard states of an evaluator in the order of eval dicts."""
+    with self._merge_lock:
+      pending_states = self._pending_states[index]
+      pending_states[eval_dict_index] = shard_state
+      while self._num_merged[index] in pending_states:
+        state_tuple, image_ids = pending_states.pop(self._num_merged[index])
+        self._evaluators[index].merge_internal_state(image_ids, state_tuple)
+        self._num_merged[index] += 1
+
+  def _raise_error(self):
+    if self._errors:
+      raise self._errors[0]
+
+  def add_eval_dict(self, eval_dict):
+    """Queues an eval dict for all evaluators.
+
+    Args:
+      eval_dict: A dictionary that holds tensors for evaluating an object
+        detection model, returned from result_dict_for_batched_example().
+
+    Raises:
+      Exception: the first error raised by an evaluator so far, if any.
+    """
+    self._raise_error()
+    eval_dict = {key: value.numpy() if hasattr(value, 'numpy') else value
+                 for key, value in eval_dict.items()}
+    shard_worker = self._num_added % self._num_workers
+    for worker, worker_queue in enumerate(self._queues):
+      if (worker == shard_worker and self._shard_templates or
+          self._worker_evaluator_indices[worker]):
+        worker_queue.put((self._num_added, eval_dict))
+    self._num_added += 1
+
+  def evaluate(self):
+    """Waits for the queued eval dicts and returns the merged metrics.
+
+    Returns:
+      A dictionary of metrics, merged from the `evaluate` results of all
+      evaluators.
+
+    Raises:
+      Exception: the first error raised by an evaluator, if any.
+    """
+    for worker_queue in self._queues:
+      worker_queue.put(self._STOP)
+    for thread in self._threads:
+      thread.join()
+    self._raise_error()
+    for index in self._shard_templates:
+      self._metrics[index] = self._evaluators[index].evaluate()
+    eval_metrics = {}
+    for metrics in self._metrics:
+      eval_metrics.update(metrics)
+    return eval_metrics
+
+
 def get_eval_metric_ops_for_evaluators(eval_config,
                                        categories,
                                        eval_dict):
@@ -18,7 +18,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import threading
 import unittest
+from unittest import mock
 from absl.testing import parameterized
 
 import numpy as np
@@ -417,6 +419,124 @@ class EvalUtilTest(test_case.TestCase, parameterized.TestCase):
                          [[[0., 0.], [75., 150.], [150., 300.]]]],
                         detection_keypoints)
 
+  def _make_random_eval_dicts(self, num_batches, batch_size):
+    input_data_fields = fields.InputDataFields
+    detection_fields = fields.DetectionResultFields
+    rng = np.random.RandomState(0)
+
+    def random_boxes(num_boxes):
+      corners = rng.uniform(0., 0.5, size=(batch_size, num_boxes, 2))
+      sizes = rng.uniform(0.1, 0.5, size=(batch_size, num_boxes, 2))
+      return np.concatenate([corners, corners + sizes], axis=-1).astype(
+          np.float32)
+
+    eval_dicts = []
+    for i in range(num_batches):
+      key = tf.constant(
+          [str(i * batch_size + j) for j in range(batch_size)])
+      detections = {
+          detection_fields.detection_boxes: tf.constant(random_boxes(5)),
+          detection_fields.detection_scores: tf.constant(
+              rng.uniform(size=(batch_size, 5)).astype(np.float32)),
+          detection_fields.detection_classes: tf.constant(
+              rng.randint(0, 3, size=(batch_size, 5)).astype(np.float32)),
+          detection_fields.num_detections: tf.constant(
+              rng.randint(1, 6, size=batch_size).astype(np.float32)),
+      }
+      groundtruth = {
+          input_data_fields.groundtruth_boxes: tf.constant(random_boxes(3)),
+          input_data_fields.groundtruth_classes: tf.constant(
+              rng.randint(1, 4, size=(batch_size, 3)).astype(np.float32)),
+      }
+      eval_dicts.append(eval_util.result_dict_for_batched_example(
+          tf.zeros((batch_size, 20, 20, 3)), key, detections, groundtruth,
+          scale_to_absolute=True,
+          original_image_spatial_shapes=tf.constant(
+              [[20, 20]] * batch_size),
+          max_gt_boxes=tf.constant([3] * batch_size)))
+    return eval_dicts
+
+  @parameterized.parameters(1, 3)
+  @unittest.skipIf(tf_version.is_tf1(), 'Skipping TF2.X only test.')
+  def test_evaluator_pool_matches_serial_evaluation(self, num_workers):
+    eval_config = eval_pb2.EvalConfig()
+    eval_config.metrics_set.extend(
+        ['coco_detection_metrics', 'pascal_voc_detection_metrics'])
+    categories = self._get_categories_list()
+    eval_dicts = self._make_random_eval_dicts(num_batches=6, batch_size=4)
+
+    expected_metrics = {}
+    evaluators = eval_util.get_evaluators(eval_config, categories)
+    for eval_dict in eval_dicts:
+      for evaluator in evaluators:
+        evaluator.add_eval_dict(eval_dict)
+    for evaluator in evaluators:
+      expected_metrics.update(evaluator.evaluate())
+
+    pool = eval_util.EvaluatorPool(
+        eval_util.get_evaluators(eval_config, categories),
+        num_workers=num_workers, max_queue_size=2)
+    for eval_dict in eval_dicts:
+      pool.add_eval_dict(eval_dict)
+    metrics = pool.evaluate()
+
+    self.assertEqual(list(expected_metrics), list(metrics))
+    self.assertGreater(metrics['DetectionBoxes_Precision/mAP'], 0.0)
+    for name, value in expected_metrics.items():
+      self.assertAllClose(value, metrics[name], msg=name)
+
+  @unittest.skipIf(tf_version.is_tf1(), 'Skipping TF2.X only test.')
+  def test_evaluator_pool_shards_eval_dicts_across_workers(self):
+    categories = self._get_categories_list()
+    eval_dicts = self._make_random_eval_dicts(num_batches=6, batch_size=2)
+    evaluator = coco_evaluation.CocoDetectionEvaluator(categories)
+    threads = []
+    add_eval_dict = coco_evaluation.CocoDetectionEvaluator.add_eval_dict
+
+    def record_thread(shard_evaluator, eval_dict):
+      threads.append(threading.current_thread().name)
+      return add_eval_dict(shard_evaluator, eval_dict)
+
+    with mock.patch.object(coco_evaluation.CocoDetectionEvaluator,
+                           'add_eval_dict', record_thread):
+      pool = eval_util.EvaluatorPool([evaluator], num_workers=3)
+      for eval_dict in eval_dicts:
+        pool.add_eval_dict(eval_dict)
+      pool.evaluate()
+
+    self.assertCountEqual(
+        threads, ['evaluator_pool_{}'.format(i % 3) for i in range(6)])
+    # The images of all shards are merged, with unique annotation ids.
+    self.assertLen(evaluator._image_ids, 12)
+    annotation_ids = [annotation['id']
+                      for annotation in evaluator._groundtruth_list]
+    self.assertEqual(annotation_ids, list(range(1, 37)))
+
+  def test_evaluator_pool_caps_workers_of_unsharded_evaluators(self):
+
+    class UnshardedEvaluator(object):
+
+      def add_eval_dict(self, eval_dict):
+        del eval_dict
+
+      def evaluate(self):
+        return {'metric': 1.0}
+
+    with mock.patch.object(tf.logging, 'warning') as warning:
+      pool = eval_util.EvaluatorPool([UnshardedEvaluator()], num_workers=4)
+    self.assertLen(pool._threads, 1)
+    warning.assert_called_once()
+    self.assertEqual(pool.evaluate(), {'metric': 1.0})
+
+  @unittest.skipIf(tf_version.is_tf1(), 'Skipping TF2.X only test.')
+  def test_evaluator_pool_raises_evaluator_errors(self):
+    evaluator = coco_evaluation.CocoDetectionEvaluator(
+        self._get_categories_list())
+    pool = eval_util.EvaluatorPool([evaluator])
+    pool.add_eval_dict({fields.InputDataFields.key: tf.constant(['image1'])})
+    with self.assertRaises(KeyError):
+      pool.evaluate()
+
   def test_evaluator_options_from_eval_config_no_super_categories(self):
     eval_config_text_proto = """
       metrics_set: "coco_detection_metrics"
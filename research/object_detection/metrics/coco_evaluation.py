@@ -28,6 +28,12 @@ from object_detection.utils import np_mask_ops
 from object_detection.utils import object_detection_evaluation
 
 
+def _renumber_annotations(groundtruth_list, next_annotation_id):
+  """Offsets the ids of annotations numbered from 1 to `next_annotation_id`."""
+  return [dict(annotation, id=annotation['id'] + next_annotation_id - 1)
+          for annotation in groundtruth_list]
+
+
 class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
   """Class to evaluate COCO detection metrics."""
 
@@ -77,6 +83,40 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._groundtruth_list = []
     self._detection_boxes_list = []
 
+  def get_internal_state(self):
+    """Returns the exported groundtruth and detections, and their image ids.
+
+    The state of an evaluator that observed a shard of the images can be merged
+    into another evaluator with `merge_internal_state`.
+    """
+    state_tuple = (self._groundtruth_list, self._detection_boxes_list,
+                   self._groundtruth_labeled_classes, self._annotation_id - 1)
+    return state_tuple, self._image_ids
+
+  def merge_internal_state(self, image_ids, state_tuple):
+    """Merges the state of another evaluator, returned by `get_internal_state`.
+
+    The annotation ids of the merged groundtruth follow those already added, so
+    merging the states of consecutive shards of images yields the same metrics
+    as adding all the images to this evaluator, provided image ids are unique.
+
+    Args:
+      image_ids: A dict mapping the image ids of the state to whether
+        detections were added for them.
+      state_tuple: The state of the evaluator.
+    """
+    (groundtruth_list, detection_boxes_list, groundtruth_labeled_classes,
+     num_annotation_ids) = state_tuple
+    for image_id in image_ids:
+      if image_id in self._image_ids:
+        tf.logging.warning('Image with id %s already added.', image_id)
+    self._image_ids.update(image_ids)
+    self._groundtruth_list.extend(
+        _renumber_annotations(groundtruth_list, self._annotation_id))
+    self._annotation_id += num_annotation_ids
+    self._detection_boxes_list.extend(detection_boxes_list)
+    self._groundtruth_labeled_classes.update(groundtruth_labeled_classes)
+
   def add_single_ground_truth_image_info(self,
                                          image_id,
                                          groundtruth_dict):
@@ -999,6 +1039,40 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._groundtruth_list = []
     self._detection_masks_list = []
 
+  def get_internal_state(self):
+    """Returns the exported groundtruth and detections, and their image ids.
+
+    The state of an evaluator that observed a shard of the images can be merged
+    into another evaluator with `merge_internal_state`.
+    """
+    state_tuple = (self._groundtruth_list, self._detection_masks_list,
+                   self._image_ids_with_detections, self._annotation_id - 1)
+    return state_tuple, self._image_id_to_mask_shape_map
+
+  def merge_internal_state(self, image_ids, state_tuple):
+    """Merges the state of another evaluator, returned by `get_internal_state`.
+
+    The annotation ids of the merged groundtruth follow those already added, so
+    merging the states of consecutive shards of images yields the same metrics
+    as adding all the images to this evaluator, provided image ids are unique.
+
+    Args:
+      image_ids: A dict mapping the image ids of the state to the shape of
+        their groundtruth masks.
+      state_tuple: The state of the evaluator.
+    """
+    (groundtruth_list, detection_masks_list, image_ids_with_detections,
+     num_annotation_ids) = state_tuple
+    for image_id in image_ids:
+      if image_id in self._image_id_to_mask_shape_map:
+        tf.logging.warning('Image with id %s already added.', image_id)
+    self._image_id_to_mask_shape_map.update(image_ids)
+    self._groundtruth_list.extend(
+        _renumber_annotations(groundtruth_list, self._annotation_id))
+    self._annotation_id += num_annotation_ids
+    self._detection_masks_list.extend(detection_masks_list)
+    self._image_ids_with_detections.update(image_ids_with_detections)
+
   def add_single_ground_truth_image_info(self,
                                          image_id,
                                          groundtruth_dict):
@@ -39,6 +39,39 @@ def _get_categories_list():
   }]
 
 
+def _add_random_images(coco_evaluator, image_ids, rng, with_masks=False):
+  """Adds random groundtruth and detections of images to an evaluator."""
+  for image_id in image_ids:
+    num_boxes = rng.randint(1, 4)
+    corners = rng.uniform(0., 20., size=(num_boxes, 2))
+    boxes = np.concatenate(
+        [corners, corners + rng.uniform(5., 10., size=(num_boxes, 2))], axis=1)
+    groundtruth_dict = {
+        standard_fields.InputDataFields.groundtruth_boxes: boxes,
+        standard_fields.InputDataFields.groundtruth_classes:
+            rng.randint(1, 4, size=num_boxes),
+    }
+    detections_dict = {
+        standard_fields.DetectionResultFields.detection_boxes:
+            boxes + rng.uniform(-2., 2., size=boxes.shape),
+        standard_fields.DetectionResultFields.detection_scores:
+            rng.uniform(size=num_boxes),
+        standard_fields.DetectionResultFields.detection_classes:
+            rng.randint(1, 4, size=num_boxes),
+    }
+    if with_masks:
+      groundtruth_dict[
+          standard_fields.InputDataFields.groundtruth_instance_masks] = (
+              rng.randint(0, 2, size=(num_boxes, 32, 32)).astype(np.uint8))
+      detections_dict[standard_fields.DetectionResultFields.detection_masks] = (
+          groundtruth_dict[
+              standard_fields.InputDataFields.groundtruth_instance_masks])
+    coco_evaluator.add_single_ground_truth_image_info(
+        image_id=image_id, groundtruth_dict=groundtruth_dict)
+    coco_evaluator.add_single_detected_image_info(
+        image_id=image_id, detections_dict=detections_dict)
+
+
 def _get_category_keypoints_dict():
   return {
       'person': [{
@@ -252,6 +285,32 @@ class CocoDetectionEvaluationTest(tf.test.TestCase):
           })
 
 
+  def testMergeInternalStateMatchesSerialEvaluation(self):
+    image_ids = ['image%d' % i for i in range(10)]
+    serial_evaluator = coco_evaluation.CocoDetectionEvaluator(
+        _get_categories_list())
+    _add_random_images(serial_evaluator, image_ids, np.random.RandomState(0))
+    shard_evaluators = [
+        coco_evaluation.CocoDetectionEvaluator(_get_categories_list())
+        for _ in range(2)
+    ]
+    rng = np.random.RandomState(0)
+    _add_random_images(shard_evaluators[0], image_ids[:4], rng)
+    _add_random_images(shard_evaluators[1], image_ids[4:], rng)
+
+    coco_evaluator = coco_evaluation.CocoDetectionEvaluator(
+        _get_categories_list())
+    for shard_evaluator in shard_evaluators:
+      state_tuple, shard_image_ids = shard_evaluator.get_internal_state()
+      coco_evaluator.merge_internal_state(shard_image_ids, state_tuple)
+
+    self.assertEqual(coco_evaluator._groundtruth_list,
+                     serial_evaluator._groundtruth_list)
+    metrics = coco_evaluator.evaluate()
+    self.assertEqual(metrics, serial_evaluator.evaluate())
+    self.assertGreater(metrics['DetectionBoxes_Precision/mAP'], 0.0)
+
+
 @unittest.skipIf(tf_version.is_tf2(), 'Only Supported in TF1.X')
 class CocoEvaluationPyFuncTest(tf.test.TestCase):
 
@@ -1592,6 +1651,35 @@ class CocoMaskEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(metrics['DetectionMasks_Precision/mAP'], 1.0)
 
 
+  def testMergeInternalStateMatchesSerialEvaluation(self):
+    image_ids = ['image%d' % i for i in range(10)]
+    serial_evaluator = coco_evaluation.CocoMaskEvaluator(
+        _get_categories_list())
+    _add_random_images(serial_evaluator, image_ids, np.random.RandomState(0),
+                       with_masks=True)
+    shard_evaluators = [
+        coco_evaluation.CocoMaskEvaluator(_get_categories_list())
+        for _ in range(2)
+    ]
+    rng = np.random.RandomState(0)
+    _add_random_images(shard_evaluators[0], image_ids[:4], rng,
+                       with_masks=True)
+    _add_random_images(shard_evaluators[1], image_ids[4:], rng,
+                       with_masks=True)
+
+    coco_evaluator = coco_evaluation.CocoMaskEvaluator(
+        _get_categories_list())
+    for shard_evaluator in shard_evaluators:
+      state_tuple, shard_image_ids = shard_evaluator.get_internal_state()
+      coco_evaluator.merge_internal_state(shard_image_ids, state_tuple)
+
+    self.assertEqual(coco_evaluator._groundtruth_list,
+                     serial_evaluator._groundtruth_list)
+    metrics = coco_evaluator.evaluate()
+    self.assertEqual(metrics, serial_evaluator.evaluate())
+    self.assertGreater(metrics['DetectionMasks_Precision/mAP'], 0.0)
+
+
 @unittest.skipIf(tf_version.is_tf2(), 'Only Supported in TF1.X')
 class CocoMaskEvaluationPyFuncTest(tf.test.TestCase):
 
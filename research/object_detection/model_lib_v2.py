@@ -837,6 +837,7 @@ def eager_eval_loop(
     use_tpu=False,
     postprocess_on_cpu=False,
     global_step=None,
+    num_evaluator_workers=0,
     ):
   """Evaluate the model eagerly on the evaluation dataset.
 
@@ -844,6 +845,14 @@ def eager_eval_loop(
   the entire evaluation dataset, then return the metrics. It will also log
   the metrics to TensorBoard.
 
+  With `num_evaluator_workers` > 0, the evaluation results of each batch are
+  converted to numpy and streamed to the evaluators through an
+  `eval_util.EvaluatorPool`, so that the metric computation runs on worker
+  threads while the strategy runs inference on the next batches. The batches
+  are sharded across the workers for the COCO and Pascal evaluators, and the
+  per-image states of the shards are merged before computing the metrics,
+  which are the same as with the evaluators run on the calling thread.
+
   Args:
     detection_model: A DetectionModel (based on Keras) to evaluate.
     configs: Object detection configs that specify the evaluators that should
@@ -855,6 +864,9 @@ def eager_eval_loop(
       the CPU when using a TPU to execute the model.
     global_step: A variable containing the training step this model was trained
       to. Used for logging purposes.
+    num_evaluator_workers: The number of threads computing the evaluation
+      metrics. If 0, the evaluators run on the calling thread, after inference
+      on each batch.
 
   Returns:
     A dict of evaluation metrics representing the results of this evaluation.
@@ -995,6 +1007,9 @@ def eager_eval_loop(
         evaluators = class_agnostic_evaluators
       else:
         evaluators = class_aware_evaluators
+      if num_evaluator_workers > 0:
+        evaluators = [eval_util.EvaluatorPool(
+            evaluators, num_workers=num_evaluator_workers)]
 
     for evaluator in evaluators:
       evaluator.add_eval_dict(eval_dict)
@@ -1034,6 +1049,7 @@ def eval_continuously(
     timeout=3600,
     eval_index=0,
     save_final_config=False,
+    num_evaluator_workers=0,
     **kwargs):
   """Run continuous evaluation of a detection model eagerly.
 
@@ -1067,6 +1083,8 @@ def eval_continuously(
       index. By default, evaluates dataset at 0'th index.
     save_final_config: Whether to save the pipeline config file to the model
       directory.
+    num_evaluator_workers: The number of threads computing the evaluation
+      metrics, see `eager_eval_loop`.
     **kwargs: Additional keyword arguments for configuration override.
   """
   get_configs_from_pipeline_file = MODEL_BUILD_UTIL_MAP[
@@ -1162,6 +1180,7 @@ def eval_continuously(
           use_tpu=use_tpu,
           postprocess_on_cpu=postprocess_on_cpu,
           global_step=global_step,
+          num_evaluator_workers=num_evaluator_workers,
           )
 
     if global_step.numpy() == configs['train_config'].num_steps:
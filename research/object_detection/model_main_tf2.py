@@ -51,6 +51,10 @@ flags.DEFINE_string(
 
 flags.DEFINE_integer('eval_timeout', 3600, 'Number of seconds to wait for an'
                      'evaluation checkpoint before exiting.')
+flags.DEFINE_integer(
+    'num_evaluator_workers', 0, 'Number of threads computing the evaluation '
+    'metrics while the model runs inference on the next batches. If 0, the '
+    'metrics are computed after inference on each batch.')
 
 flags.DEFINE_bool('use_tpu', False, 'Whether the job is executing on a TPU.')
 flags.DEFINE_string(
@@ -86,7 +90,8 @@ def main(unused_argv):
         sample_1_of_n_eval_on_train_examples=(
             FLAGS.sample_1_of_n_eval_on_train_examples),
         checkpoint_dir=FLAGS.checkpoint_dir,
-        wait_interval=300, timeout=FLAGS.eval_timeout)
+        wait_interval=300, timeout=FLAGS.eval_timeout,
+        num_evaluator_workers=FLAGS.num_evaluator_workers)
   else:
     if FLAGS.use_tpu:
       # TPU is automatically inferred if tpu_name is None and
@@ -35,6 +35,7 @@ from abc import ABCMeta
 from abc import abstractmethod
 import collections
 import logging
+import multiprocessing
 import unicodedata
 import numpy as np
 import six
@@ -1078,6 +1079,30 @@ ObjectDetectionEvaluationState = collections.namedtuple(
     ])
 
 
+_INITIAL_ENTRY_CAPACITY = 1024
+
+
+def _concatenate_class_entries(entries):
+  """Concatenates the entries of a class given as an array or list of arrays."""
+  if isinstance(entries, np.ndarray):
+    return entries.astype(float)
+  return np.concatenate([np.zeros(0, dtype=float)] +
+                        [np.asarray(entry, dtype=float) for entry in entries])
+
+
+def _evaluate_image_infos(args):
+  """Evaluates a shard of images and returns the evaluation state."""
+  constructor_kwargs, image_infos = args
+  evaluation = ObjectDetectionEvaluation(**constructor_kwargs)
+  for image_key, groundtruth, _ in image_infos:
+    if groundtruth is not None:
+      evaluation.add_single_ground_truth_image_info(image_key, **groundtruth)
+  for image_key, _, detections in image_infos:
+    if detections is not None:
+      evaluation.add_single_detected_image_info(image_key, **detections)
+  return evaluation.get_internal_state()
+
+
 class ObjectDetectionEvaluation(object):
   """Internal implementation of Pascal object detection metrics."""
 
@@ -1122,6 +1147,17 @@ class ObjectDetectionEvaluation(object):
     if num_groundtruth_classes < 1:
       raise ValueError('Need at least 1 groundtruth class for evaluation.')
 
+    self._constructor_kwargs = dict(
+        num_groundtruth_classes=num_groundtruth_classes,
+        matching_iou_threshold=matching_iou_threshold,
+        nms_iou_threshold=nms_iou_threshold,
+        nms_max_output_boxes=nms_max_output_boxes,
+        recall_lower_bound=recall_lower_bound,
+        recall_upper_bound=recall_upper_bound,
+        use_weighted_mean_ap=use_weighted_mean_ap,
+        label_id_offset=label_id_offset,
+        group_of_weight=group_of_weight,
+        per_image_eval_class=per_image_eval_class)
     self.per_image_eval = per_image_eval_class(
         num_groundtruth_classes=num_groundtruth_classes,
         matching_iou_threshold=matching_iou_threshold,
@@ -1148,8 +1184,13 @@ class ObjectDetectionEvaluation(object):
   def _initialize_detections(self):
     """Initializes internal data structures."""
     self.detection_keys = set()
-    self.scores_per_class = [[] for _ in range(self.num_class)]
-    self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+    # Scores and tp/fp labels of all classes are stored in preallocated
+    # columns together with their class index, and grouped by class only in
+    # `evaluate`.
+    self._num_entries = 0
+    self._entry_classes = np.zeros(_INITIAL_ENTRY_CAPACITY, dtype=np.int32)
+    self._entry_scores = np.zeros(_INITIAL_ENTRY_CAPACITY, dtype=float)
+    self._entry_tp_fp_labels = np.zeros(_INITIAL_ENTRY_CAPACITY, dtype=float)
     self.num_images_correctly_detected_per_class = np.zeros(self.num_class)
     self.average_precision_per_class = np.empty(self.num_class, dtype=float)
     self.average_precision_per_class.fill(np.nan)
@@ -1162,6 +1203,47 @@ class ObjectDetectionEvaluation(object):
   def clear_detections(self):
     self._initialize_detections()
 
+  def _append_entries(self, class_indices, scores, tp_fp_labels):
+    """Appends per-detection entries, growing the columns geometrically."""
+    num_entries = self._num_entries + len(class_indices)
+    if num_entries > len(self._entry_classes):
+      capacity = max(num_entries, 2 * len(self._entry_classes))
+      self._entry_classes = np.resize(self._entry_classes, capacity)
+      self._entry_scores = np.resize(self._entry_scores, capacity)
+      self._entry_tp_fp_labels = np.resize(self._entry_tp_fp_labels, capacity)
+    self._entry_classes[self._num_entries:num_entries] = class_indices
+    self._entry_scores[self._num_entries:num_entries] = scores
+    self._entry_tp_fp_labels[self._num_entries:num_entries] = tp_fp_labels
+    self._num_entries = num_entries
+
+  def _group_entries_by_class(self):
+    """Returns the scores and tp/fp labels of each class.
+
+    Returns:
+      scores_per_class: A list of length num_class of float numpy arrays, in
+        the order the entries were added.
+      tp_fp_labels_per_class: A list of length num_class of float numpy arrays.
+    """
+    classes = self._entry_classes[:self._num_entries]
+    order = np.argsort(classes, kind='stable')
+    boundaries = np.searchsorted(classes[order], np.arange(1, self.num_class))
+    return (np.split(self._entry_scores[:self._num_entries][order],
+                     boundaries),
+            np.split(self._entry_tp_fp_labels[:self._num_entries][order],
+                     boundaries))
+
+  @property
+  def scores_per_class(self):
+    """Per-class lists holding the concatenated scores, if any."""
+    return [[scores] if scores.size else []
+            for scores in self._group_entries_by_class()[0]]
+
+  @property
+  def tp_fp_labels_per_class(self):
+    """Per-class lists holding the concatenated tp/fp labels, if any."""
+    return [[labels] if labels.size else []
+            for labels in self._group_entries_by_class()[1]]
+
   def get_internal_state(self):
     """Returns internal state of the evaluation.
 
@@ -1170,17 +1252,19 @@ class ObjectDetectionEvaluation(object):
     Returns:
       internal state of the evaluation.
     """
+    scores_per_class, tp_fp_labels_per_class = self._group_entries_by_class()
     return ObjectDetectionEvaluationState(
-        self.num_gt_instances_per_class, self.scores_per_class,
-        self.tp_fp_labels_per_class, self.num_gt_imgs_per_class,
-        self.num_images_correctly_detected_per_class)
+        self.num_gt_instances_per_class.copy(), scores_per_class,
+        tp_fp_labels_per_class, self.num_gt_imgs_per_class.copy(),
+        self.num_images_correctly_detected_per_class.copy())
 
   def merge_internal_state(self, state_tuple):
     """Merges internal state of the evaluation with the current state.
 
     Args:
       state_tuple: state tuple representing evaluation state: should be of type
-        ObjectDetectionEvaluationState.
+        ObjectDetectionEvaluationState. The per-class scores and tp/fp labels
+        can either be numpy arrays or lists of numpy arrays.
     """
     (num_gt_instances_per_class, scores_per_class, tp_fp_labels_per_class,
      num_gt_imgs_per_class, num_images_correctly_detected_per_class) = (
@@ -1189,12 +1273,47 @@ class ObjectDetectionEvaluation(object):
     assert self.num_class == len(scores_per_class)
     assert self.num_class == len(tp_fp_labels_per_class)
     for i in range(self.num_class):
-      self.scores_per_class[i].extend(scores_per_class[i])
-      self.tp_fp_labels_per_class[i].extend(tp_fp_labels_per_class[i])
-      self.num_gt_instances_per_class[i] += num_gt_instances_per_class[i]
-      self.num_gt_imgs_per_class[i] += num_gt_imgs_per_class[i]
-      self.num_images_correctly_detected_per_class[
-          i] += num_images_correctly_detected_per_class[i]
+      scores = _concatenate_class_entries(scores_per_class[i])
+      tp_fp_labels = _concatenate_class_entries(tp_fp_labels_per_class[i])
+      self._append_entries(np.full(len(scores), i), scores, tp_fp_labels)
+    self.num_gt_instances_per_class += num_gt_instances_per_class
+    self.num_gt_imgs_per_class += np.asarray(num_gt_imgs_per_class, dtype=int)
+    self.num_images_correctly_detected_per_class += (
+        num_images_correctly_detected_per_class)
+
+  def add_images_in_parallel(self, image_infos, num_workers):
+    """Evaluates images in worker processes and merges their state.
+
+    The images are split into `num_workers` contiguous shards, each shard is
+    evaluated by a separate ObjectDetectionEvaluation in its own process, and
+    the resulting states are merged in shard order with
+    `merge_internal_state`, which yields the same metrics as adding the images
+    one by one. Unlike the single image methods, the groundtruth of these
+    images is not retained.
+
+    Args:
+      image_infos: A sequence of (image_key, groundtruth, detections) tuples,
+        where groundtruth and detections are dicts of keyword arguments for
+        `add_single_ground_truth_image_info` and
+        `add_single_detected_image_info` (without `image_key`). Either dict can
+        be None if the image has no groundtruth or no detections.
+      num_workers: Number of worker processes.
+    """
+    image_infos = list(image_infos)
+    num_shards = max(1, min(num_workers, len(image_infos)))
+    boundaries = np.linspace(0, len(image_infos), num_shards + 1).astype(int)
+    shards = [(self._constructor_kwargs, image_infos[start:end])
+              for start, end in zip(boundaries[:-1], boundaries[1:])]
+    if num_shards == 1:
+      states = [_evaluate_image_infos(shard) for shard in shards]
+    else:
+      with multiprocessing.Pool(num_shards) as pool:
+        states = pool.map(_evaluate_image_infos, shards)
+    for (_, shard_infos), state in zip(shards, states):
+      self.detection_keys.update(
+          image_key for image_key, _, detections in shard_infos
+          if detections is not None)
+      self.merge_internal_state(state)
 
   def add_single_ground_truth_image_info(self,
                                          image_key,
@@ -1314,21 +1433,19 @@ class ObjectDetectionEvaluation(object):
         groundtruth_masks = np.empty(shape=[0, 1, 1], dtype=float)
       groundtruth_is_difficult_list = np.array([], dtype=bool)
       groundtruth_is_group_of_list = np.array([], dtype=bool)
-    scores, tp_fp_labels, is_class_correctly_detected_in_image = (
-        self.per_image_eval.compute_object_detection_metrics(
-            detected_boxes=detected_boxes,
-            detected_scores=detected_scores,
-            detected_class_labels=detected_class_labels,
-            groundtruth_boxes=groundtruth_boxes,
-            groundtruth_class_labels=groundtruth_class_labels,
-            groundtruth_is_difficult_list=groundtruth_is_difficult_list,
-            groundtruth_is_group_of_list=groundtruth_is_group_of_list,
-            detected_masks=detected_masks,
-            groundtruth_masks=groundtruth_masks))
-    for i in range(self.num_class):
-      if scores[i].shape[0] > 0:
-        self.scores_per_class[i].append(scores[i])
-        self.tp_fp_labels_per_class[i].append(tp_fp_labels[i])
+    (class_indices, scores, tp_fp_labels,
+     is_class_correctly_detected_in_image) = (
+         self.per_image_eval.compute_object_detection_metrics_columnar(
+             detected_boxes=detected_boxes,
+             detected_scores=detected_scores,
+             detected_class_labels=detected_class_labels,
+             groundtruth_boxes=groundtruth_boxes,
+             groundtruth_class_labels=groundtruth_class_labels,
+             groundtruth_is_difficult_list=groundtruth_is_difficult_list,
+             groundtruth_is_group_of_list=groundtruth_is_group_of_list,
+             detected_masks=detected_masks,
+             groundtruth_masks=groundtruth_masks))
+    self._append_entries(class_indices, scores, tp_fp_labels)
     (self.num_images_correctly_detected_per_class
     ) += is_class_correctly_detected_in_image
 
@@ -1350,18 +1467,25 @@ class ObjectDetectionEvaluation(object):
       groundtruth_is_group_of_list: A boolean numpy array of length M denoting
         whether a ground truth box is a group-of box or not
     """
-    for class_index in range(self.num_class):
-      num_gt_instances = np.sum(groundtruth_class_labels[
-          ~groundtruth_is_difficult_list
-          & ~groundtruth_is_group_of_list] == class_index)
-      num_groupof_gt_instances = self.group_of_weight * np.sum(
-          groundtruth_class_labels[
-              groundtruth_is_group_of_list
-              & ~groundtruth_is_difficult_list] == class_index)
-      self.num_gt_instances_per_class[
-          class_index] += num_gt_instances + num_groupof_gt_instances
-      if np.any(groundtruth_class_labels == class_index):
-        self.num_gt_imgs_per_class[class_index] += 1
+    # Labels outside of [0, num_class) are ignored.
+    groundtruth_class_labels = np.asarray(groundtruth_class_labels, dtype=int)
+    valid_labels = ((groundtruth_class_labels >= 0) &
+                    (groundtruth_class_labels < self.num_class))
+    groundtruth_class_labels = groundtruth_class_labels[valid_labels]
+    groundtruth_is_difficult_list = groundtruth_is_difficult_list[valid_labels]
+    groundtruth_is_group_of_list = groundtruth_is_group_of_list[valid_labels]
+    num_gt_instances = np.bincount(
+        groundtruth_class_labels[~groundtruth_is_difficult_list
+                                 & ~groundtruth_is_group_of_list],
+        minlength=self.num_class)
+    num_groupof_gt_instances = self.group_of_weight * np.bincount(
+        groundtruth_class_labels[groundtruth_is_group_of_list
+                                 & ~groundtruth_is_difficult_list],
+        minlength=self.num_class)
+    self.num_gt_instances_per_class += (
+        num_gt_instances + num_groupof_gt_instances)
+    self.num_gt_imgs_per_class += np.bincount(
+        groundtruth_class_labels, minlength=self.num_class) > 0
 
   def evaluate(self):
     """Compute evaluation result.
@@ -1386,15 +1510,12 @@ class ObjectDetectionEvaluation(object):
     if self.use_weighted_mean_ap:
       all_scores = np.array([], dtype=float)
       all_tp_fp_labels = np.array([], dtype=bool)
+    scores_per_class, tp_fp_labels_per_class = self._group_entries_by_class()
     for class_index in range(self.num_class):
       if self.num_gt_instances_per_class[class_index] == 0:
         continue
-      if not self.scores_per_class[class_index]:
-        scores = np.array([], dtype=float)
-        tp_fp_labels = np.array([], dtype=float)
-      else:
-        scores = np.concatenate(self.scores_per_class[class_index])
-        tp_fp_labels = np.concatenate(self.tp_fp_labels_per_class[class_index])
+      scores = scores_per_class[class_index]
+      tp_fp_labels = tp_fp_labels_per_class[class_index]
       if self.use_weighted_mean_ap:
         all_scores = np.append(all_scores, scores)
         all_tp_fp_labels = np.append(all_tp_fp_labels, tp_fp_labels)
@@ -1054,6 +1054,64 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(copy_mean_ap, mean_ap)
     self.assertAlmostEqual(copy_mean_corloc, mean_corloc)
 
+  def test_merge_internal_state_with_per_image_lists(self):
+    state = self.od_eval.get_internal_state()
+    # Splitting the entries of each class into several arrays, as produced by
+    # earlier versions of `get_internal_state`, leads to the same metrics.
+    list_state = state._replace(
+        scores_per_class=[np.array_split(s, 2) for s in state.scores_per_class],
+        tp_fp_labels_per_class=[
+            np.array_split(l, 2) for l in state.tp_fp_labels_per_class
+        ])
+    copy_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        self.od_eval.num_class)
+    copy_od_eval.merge_internal_state(list_state)
+
+    expected = self.od_eval.evaluate()
+    result = copy_od_eval.evaluate()
+    self.assertAllEqual(expected.average_precisions,
+                        result.average_precisions)
+    self.assertAllEqual(expected.corlocs, result.corlocs)
+
+  def test_add_images_in_parallel(self):
+    num_classes = 4
+    rng = np.random.RandomState(0)
+    image_infos = []
+    for image_index in range(12):
+      groundtruth_boxes = np.sort(rng.randint(0, 20, size=(6, 4)), axis=1)
+      groundtruth_boxes = groundtruth_boxes[:, [0, 2, 1, 3]].astype(float)
+      groundtruth = dict(
+          groundtruth_boxes=groundtruth_boxes,
+          groundtruth_class_labels=rng.randint(0, num_classes, 6),
+          groundtruth_is_group_of_list=rng.rand(6) < 0.2)
+      detections = dict(
+          detected_boxes=np.concatenate(
+              [groundtruth_boxes + rng.randint(-1, 2, size=(6, 4)),
+               groundtruth_boxes[::-1]]),
+          detected_scores=rng.rand(12),
+          detected_class_labels=rng.randint(0, num_classes, 12))
+      image_infos.append(('img%d' % image_index, groundtruth, detections))
+
+    def make_evaluation():
+      return object_detection_evaluation.ObjectDetectionEvaluation(
+          num_classes, group_of_weight=0.5)
+
+    serial_eval = make_evaluation()
+    for image_key, groundtruth, detections in image_infos:
+      serial_eval.add_single_ground_truth_image_info(image_key, **groundtruth)
+      serial_eval.add_single_detected_image_info(image_key, **detections)
+    parallel_eval = make_evaluation()
+    parallel_eval.add_images_in_parallel(image_infos, num_workers=3)
+
+    expected = serial_eval.evaluate()
+    result = parallel_eval.evaluate()
+    self.assertGreater(expected.mean_ap, 0.0)
+    self.assertAllEqual(expected.average_precisions,
+                        result.average_precisions)
+    self.assertAllEqual(expected.corlocs, result.corlocs)
+    self.assertEqual(expected.mean_ap, result.mean_ap)
+    self.assertEqual(serial_eval.detection_keys, parallel_eval.detection_keys)
+
 
 @unittest.skipIf(tf_version.is_tf2(), 'Eval Metrics ops are supported in TF1.X '
                  'only.')
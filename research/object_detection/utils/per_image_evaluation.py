@@ -33,6 +33,14 @@ from object_detection.utils import np_box_mask_list
 from object_detection.utils import np_box_mask_list_ops
 
 
+def _mask_other_classes(overlaps, detected_class_labels,
+                        groundtruth_class_labels):
+  """Sets the overlaps between boxes of different classes to -1."""
+  return np.where(
+      detected_class_labels[:, np.newaxis] == groundtruth_class_labels,
+      overlaps, -1.0)
+
+
 class PerImageEvaluation(object):
   """Evaluate detection result of a single image."""
 
@@ -133,6 +141,266 @@ class PerImageEvaluation(object):
 
     return scores, tp_fp_labels, is_class_correctly_detected_in_image
 
+  def compute_object_detection_metrics_columnar(self,
+                                                detected_boxes,
+                                                detected_scores,
+                                                detected_class_labels,
+                                                groundtruth_boxes,
+                                                groundtruth_class_labels,
+                                                groundtruth_is_difficult_list,
+                                                groundtruth_is_group_of_list,
+                                                detected_masks=None,
+                                                groundtruth_masks=None):
+    """Evaluates all classes of a single image in one pass.
+
+    Produces the same scores, tp/fp labels and CorLoc indicators as
+    `compute_object_detection_metrics`, but as flat arrays instead of one list
+    entry per class. Only the classes present among the detections are
+    visited, since the other classes contribute neither scores nor CorLoc. In
+    box mode the overlaps of all classes are computed at once and the greedy
+    matching is vectorized; in mask mode each present class is evaluated with
+    `_compute_tp_fp_for_single_class`.
+
+    Args:
+      detected_boxes: A float numpy array of shape [N, 4], representing N
+        regions of detected object regions. Each row is of the format [y_min,
+        x_min, y_max, x_max]
+      detected_scores: A float numpy array of shape [N, 1], representing the
+        confidence scores of the detected N object instances.
+      detected_class_labels: A integer numpy array of shape [N, 1], repreneting
+        the class labels of the detected N object instances.
+      groundtruth_boxes: A float numpy array of shape [M, 4], representing M
+        regions of object instances in ground truth
+      groundtruth_class_labels: An integer numpy array of shape [M, 1],
+        representing M class labels of object instances in ground truth
+      groundtruth_is_difficult_list: A boolean numpy array of length M denoting
+        whether a ground truth box is a difficult instance or not
+      groundtruth_is_group_of_list: A boolean numpy array of length M denoting
+        whether a ground truth box has group-of tag
+      detected_masks: (optional) A uint8 numpy array of shape [N, height,
+        width]. If not None, the metrics will be computed based on masks.
+      groundtruth_masks: (optional) A uint8 numpy array of shape [M, height,
+        width]. Can have empty masks, i.e. where all values are 0.
+
+    Returns:
+      class_indices: An integer numpy array of shape [K] with the class of each
+          entry. Entries are grouped by ascending class and, within a class,
+          ordered as in the per-class arrays of
+          `compute_object_detection_metrics`.
+      scores: A float numpy array of shape [K] with the entry scores.
+      tp_fp_labels: A float numpy array of shape [K] with the (weighted)
+          true/false positive label of each entry.
+      is_class_correctly_detected_in_image: a numpy integer array of
+          shape [C], indicating whether the correponding class has a least
+          one instance being correctly detected in the image
+
+    Raises:
+      ValueError: If detected masks is not None but groundtruth masks are None,
+        or the other way around.
+    """
+    if (detected_masks is None) != (groundtruth_masks is None):
+      raise ValueError(
+          'If `detected_masks` is provided, then `groundtruth_masks` should '
+          'also be provided.')
+    detected_boxes, detected_scores, detected_class_labels, detected_masks = (
+        self._remove_invalid_boxes(detected_boxes, detected_scores,
+                                   detected_class_labels, detected_masks))
+    groundtruth_is_difficult_list = groundtruth_is_difficult_list.astype(bool)
+    groundtruth_is_group_of_list = groundtruth_is_group_of_list.astype(bool)
+
+    # A stable sort keeps the detections of each class in their input order,
+    # i.e. the order produced by boolean indexing in `_get_ith_class_arrays`.
+    detection_order = np.argsort(detected_class_labels, kind='stable')
+    present_classes, class_starts = np.unique(
+        detected_class_labels[detection_order], return_index=True)
+    class_detection_indices = [
+        (class_index, indices) for class_index, indices in zip(
+            present_classes, np.split(detection_order, class_starts[1:]))
+        if 0 <= class_index < self.num_groundtruth_classes
+    ]
+
+    if detected_masks is not None:
+      return self._compute_columnar_per_class(
+          class_detection_indices, detected_boxes, detected_scores,
+          groundtruth_boxes, groundtruth_class_labels,
+          groundtruth_is_difficult_list, groundtruth_is_group_of_list,
+          detected_masks, groundtruth_masks)
+    return self._compute_columnar_box_mode(
+        class_detection_indices, detected_boxes, detected_scores,
+        detected_class_labels, groundtruth_boxes, groundtruth_class_labels,
+        groundtruth_is_difficult_list, groundtruth_is_group_of_list)
+
+  def _compute_columnar_per_class(self, class_detection_indices,
+                                  detected_boxes, detected_scores,
+                                  groundtruth_boxes, groundtruth_class_labels,
+                                  groundtruth_is_difficult_list,
+                                  groundtruth_is_group_of_list, detected_masks,
+                                  groundtruth_masks):
+    """Columnar evaluation running the single class matcher per class.
+
+    Args:
+      class_detection_indices: A list of (class_index, detection_indices) pairs
+        for the classes present among the detections, in ascending class order.
+      detected_boxes: A float numpy array of shape [N, 4].
+      detected_scores: A float numpy array of shape [N].
+      groundtruth_boxes: A float numpy array of shape [M, 4].
+      groundtruth_class_labels: An integer numpy array of shape [M].
+      groundtruth_is_difficult_list: A boolean numpy array of length M.
+      groundtruth_is_group_of_list: A boolean numpy array of length M.
+      detected_masks: A uint8 numpy array of shape [N, height, width].
+      groundtruth_masks: A uint8 numpy array of shape [M, height, width].
+
+    Returns:
+      See `compute_object_detection_metrics_columnar`.
+    """
+    is_class_correctly_detected_in_image = np.zeros(
+        self.num_groundtruth_classes, dtype=int)
+    result_classes = [np.zeros(0, dtype=int)]
+    result_scores = [np.zeros(0, dtype=float)]
+    result_tp_fp_labels = [np.zeros(0, dtype=float)]
+    for class_index, detection_indices in class_detection_indices:
+      selected_groundtruth = (groundtruth_class_labels == class_index)
+      scores, tp_fp_labels = self._compute_tp_fp_for_single_class(
+          detected_boxes=detected_boxes[detection_indices],
+          detected_scores=detected_scores[detection_indices],
+          groundtruth_boxes=groundtruth_boxes[selected_groundtruth],
+          groundtruth_is_difficult_list=groundtruth_is_difficult_list[
+              selected_groundtruth],
+          groundtruth_is_group_of_list=groundtruth_is_group_of_list[
+              selected_groundtruth],
+          detected_masks=detected_masks[detection_indices],
+          groundtruth_masks=groundtruth_masks[selected_groundtruth])
+      is_class_correctly_detected_in_image[class_index] = (
+          self._compute_is_class_correctly_detected_in_image(
+              detected_boxes=detected_boxes[detection_indices],
+              detected_scores=detected_scores[detection_indices],
+              groundtruth_boxes=groundtruth_boxes[selected_groundtruth],
+              detected_masks=detected_masks[detection_indices],
+              groundtruth_masks=groundtruth_masks[selected_groundtruth]))
+      result_classes.append(np.full(len(scores), class_index, dtype=int))
+      result_scores.append(scores)
+      result_tp_fp_labels.append(tp_fp_labels)
+    return (np.concatenate(result_classes),
+            np.concatenate(result_scores).astype(float),
+            np.concatenate(result_tp_fp_labels).astype(float),
+            is_class_correctly_detected_in_image)
+
+  def _compute_columnar_box_mode(self, class_detection_indices, detected_boxes,
+                                 detected_scores, detected_class_labels,
+                                 groundtruth_boxes, groundtruth_class_labels,
+                                 groundtruth_is_difficult_list,
+                                 groundtruth_is_group_of_list):
+    """Columnar box evaluation matching all classes of the image at once.
+
+    Overlaps are computed between all detections and all groundtruth boxes of
+    the image, with pairs of different classes set to -1 so that they never
+    match. Since every groundtruth box belongs to a single class, the greedy
+    matching of `_compute_tp_fp_for_single_class` then reduces to: the first
+    (highest scoring) detection matched to a non-difficult box is a true
+    positive, and group-of boxes keep the maximum score of their matches.
+
+    Args:
+      class_detection_indices: A list of (class_index, detection_indices) pairs
+        for the classes present among the detections, in ascending class order.
+      detected_boxes: A float numpy array of shape [N, 4].
+      detected_scores: A float numpy array of shape [N].
+      detected_class_labels: An integer numpy array of shape [N].
+      groundtruth_boxes: A float numpy array of shape [M, 4].
+      groundtruth_class_labels: An integer numpy array of shape [M].
+      groundtruth_is_difficult_list: A boolean numpy array of length M.
+      groundtruth_is_group_of_list: A boolean numpy array of length M.
+
+    Returns:
+      See `compute_object_detection_metrics_columnar`.
+    """
+    is_class_correctly_detected_in_image = np.zeros(
+        self.num_groundtruth_classes, dtype=int)
+    if not class_detection_indices:
+      return (np.zeros(0, dtype=int), np.zeros(0, dtype=float),
+              np.zeros(0, dtype=float), is_class_correctly_detected_in_image)
+
+    nms_indices = []
+    top_scoring_indices = []
+    for _, detection_indices in class_detection_indices:
+      detected_boxlist = np_box_list.BoxList(detected_boxes[detection_indices])
+      detected_boxlist.add_field('scores', detected_scores[detection_indices])
+      detected_boxlist.add_field('indices', detection_indices)
+      detected_boxlist = np_box_list_ops.non_max_suppression(
+          detected_boxlist, self.nms_max_output_boxes, self.nms_iou_threshold)
+      nms_indices.append(detected_boxlist.get_field('indices'))
+      top_scoring_indices.append(
+          detection_indices[np.argmax(detected_scores[detection_indices])])
+    nms_indices = np.concatenate(nms_indices)
+    top_scoring_indices = np.array(top_scoring_indices)
+
+    gt_boxlist = np_box_list.BoxList(groundtruth_boxes)
+    if groundtruth_boxes.shape[0] > 0:
+      overlaps = _mask_other_classes(
+          np_box_list_ops.iou(
+              np_box_list.BoxList(detected_boxes[top_scoring_indices]),
+              gt_boxlist), detected_class_labels[top_scoring_indices],
+          groundtruth_class_labels)
+      is_correct = np.max(overlaps, axis=1) >= self.matching_iou_threshold
+      is_class_correctly_detected_in_image[detected_class_labels[
+          top_scoring_indices[is_correct]]] = 1
+
+    scores = detected_scores[nms_indices]
+    classes = detected_class_labels[nms_indices]
+    detected_boxlist = np_box_list.BoxList(detected_boxes[nms_indices])
+    num_detected_boxes = len(nms_indices)
+    tp_fp_labels = np.zeros(num_detected_boxes, dtype=bool)
+    is_matched_to_difficult = np.zeros(num_detected_boxes, dtype=bool)
+    is_matched_to_group_of = np.zeros(num_detected_boxes, dtype=bool)
+
+    non_group_of = ~groundtruth_is_group_of_list
+    if np.any(non_group_of):
+      iou = _mask_other_classes(
+          np_box_list_ops.iou(
+              detected_boxlist,
+              np_box_list.BoxList(groundtruth_boxes[non_group_of])), classes,
+          groundtruth_class_labels[non_group_of])
+      gt_ids = np.argmax(iou, axis=1)
+      is_matched = (
+          iou[np.arange(num_detected_boxes), gt_ids] >=
+          self.matching_iou_threshold)
+      is_difficult = groundtruth_is_difficult_list[non_group_of][gt_ids]
+      is_matched_to_difficult = is_matched & is_difficult
+      candidates = np.flatnonzero(is_matched & ~is_difficult)
+      _, first_matches = np.unique(gt_ids[candidates], return_index=True)
+      tp_fp_labels[candidates[first_matches]] = True
+
+    group_of_classes = groundtruth_class_labels[groundtruth_is_group_of_list]
+    scores_group_of = np.zeros(len(group_of_classes), dtype=float)
+    if len(group_of_classes):
+      ioa = _mask_other_classes(
+          np.transpose(
+              np_box_list_ops.ioa(
+                  np_box_list.BoxList(
+                      groundtruth_boxes[groundtruth_is_group_of_list]),
+                  detected_boxlist)), classes, group_of_classes)
+      gt_ids = np.argmax(ioa, axis=1)
+      is_matched_to_group_of = (
+          ~tp_fp_labels & ~is_matched_to_difficult &
+          (ioa[np.arange(num_detected_boxes), gt_ids] >=
+           self.matching_iou_threshold))
+      np.maximum.at(scores_group_of, gt_ids[is_matched_to_group_of],
+                    scores[is_matched_to_group_of])
+    selector = (scores_group_of > 0) & (self.group_of_weight > 0)
+
+    valid_entries = ~is_matched_to_difficult & ~is_matched_to_group_of
+    result_classes = np.concatenate(
+        (classes[valid_entries], group_of_classes[selector]))
+    result_scores = np.concatenate(
+        (scores[valid_entries], scores_group_of[selector])).astype(float)
+    result_tp_fp_labels = np.concatenate(
+        (tp_fp_labels[valid_entries].astype(float),
+         self.group_of_weight * np.ones(np.count_nonzero(selector))))
+    # Detections are already grouped by class; the stable sort moves the
+    # group-of entries behind the detections of their class.
+    order = np.argsort(result_classes, kind='stable')
+    return (result_classes[order].astype(int), result_scores[order],
+            result_tp_fp_labels[order], is_class_correctly_detected_in_image)
+
   def _compute_cor_loc(self,
                        detected_boxes,
                        detected_scores,
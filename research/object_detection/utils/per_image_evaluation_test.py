@@ -663,6 +663,86 @@ class MultiClassesTpFpTest(tf.test.TestCase):
       self.assertTrue(np.array_equal(expected_tp_fp_labels[i], tp_fp_labels[i]))
 
 
+class ColumnarMetricsTest(tf.test.TestCase):
+
+  def _random_image(self, rng, num_classes, with_masks):
+    num_detections = rng.integers(0, 30)
+    num_groundtruth = rng.integers(0, 10)
+
+    def random_boxes(num_boxes):
+      corners = rng.integers(0, 12, size=(num_boxes, 2)).astype(float)
+      sizes = rng.integers(1, 8, size=(num_boxes, 2)).astype(float)
+      return np.concatenate([corners, corners + sizes], axis=1)
+
+    groundtruth_boxes = random_boxes(num_groundtruth)
+    groundtruth_class_labels = rng.integers(0, num_classes, num_groundtruth)
+    detected_boxes = random_boxes(num_detections)
+    detected_class_labels = rng.integers(0, num_classes, num_detections)
+    if num_groundtruth:
+      # Jittered copies of the groundtruth produce true positives.
+      copies = rng.integers(0, num_groundtruth, num_detections // 2)
+      detected_boxes[:len(copies)] = groundtruth_boxes[copies] + rng.integers(
+          -1, 2, size=(len(copies), 4))
+      detected_class_labels[:len(copies)] = groundtruth_class_labels[copies]
+    # A few degenerate boxes exercise `_remove_invalid_boxes`.
+    detected_boxes[rng.random(num_detections) < 0.1, 2] = -1.0
+    inputs = dict(
+        detected_boxes=detected_boxes,
+        # Rounded scores produce ties.
+        detected_scores=np.round(rng.random(num_detections), 1),
+        detected_class_labels=detected_class_labels,
+        groundtruth_boxes=groundtruth_boxes,
+        groundtruth_class_labels=groundtruth_class_labels,
+        groundtruth_is_difficult_list=rng.random(num_groundtruth) < 0.2,
+        groundtruth_is_group_of_list=rng.random(num_groundtruth) < 0.3)
+    if with_masks:
+      def boxes_to_masks(boxes):
+        masks = np.zeros((len(boxes), 20, 20), dtype=np.uint8)
+        for mask, (ymin, xmin, ymax, xmax) in zip(masks, boxes.astype(int)):
+          mask[max(ymin, 0):ymax, max(xmin, 0):xmax] = 1
+        return masks
+      inputs['detected_masks'] = boxes_to_masks(inputs['detected_boxes'])
+      groundtruth_masks = boxes_to_masks(inputs['groundtruth_boxes'])
+      groundtruth_masks[rng.random(num_groundtruth) < 0.3] = 0
+      inputs['groundtruth_masks'] = groundtruth_masks
+    return inputs
+
+  def _assert_columnar_matches_per_class(self, with_masks, nms_iou_threshold,
+                                         nms_max_output_boxes,
+                                         group_of_weight):
+    num_classes = 5
+    per_image_eval = per_image_evaluation.PerImageEvaluation(
+        num_classes, matching_iou_threshold=0.4,
+        nms_iou_threshold=nms_iou_threshold,
+        nms_max_output_boxes=nms_max_output_boxes,
+        group_of_weight=group_of_weight)
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+      inputs = self._random_image(rng, num_classes, with_masks)
+      scores, tp_fp_labels, is_class_correctly_detected_in_image = (
+          per_image_eval.compute_object_detection_metrics(**inputs))
+      (class_indices, columnar_scores, columnar_tp_fp_labels,
+       columnar_is_class_correctly_detected_in_image) = (
+           per_image_eval.compute_object_detection_metrics_columnar(**inputs))
+      self.assertAllEqual(is_class_correctly_detected_in_image,
+                          columnar_is_class_correctly_detected_in_image)
+      self.assertAllEqual(np.concatenate(scores), columnar_scores)
+      self.assertAllEqual(
+          np.concatenate(tp_fp_labels).astype(float), columnar_tp_fp_labels)
+      self.assertAllEqual(
+          np.repeat(np.arange(num_classes), [len(s) for s in scores]),
+          class_indices)
+
+  def test_box_mode_matches_per_class(self):
+    for nms_iou_threshold in (1.0, 0.5):
+      for group_of_weight in (0.0, 0.5):
+        self._assert_columnar_matches_per_class(
+            False, nms_iou_threshold, 8, group_of_weight)
+
+  def test_mask_mode_matches_per_class(self):
+    self._assert_columnar_matches_per_class(True, 1.0, 10000, 0.5)
+
+
 class CorLocTest(tf.test.TestCase):
 
   def test_compute_corloc_with_normal_iou_threshold(self):